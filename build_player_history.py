@@ -0,0 +1,39 @@
+"""Скрипт для построения истории игроков по уже сохраненным матчам (один проход по архиву)."""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from config import HISTORY_DB_PATH, HISTORY_SCAN_WORKERS, OUTPUT_DIR
+from player_history import PlayerHistory
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(
+        description="История игроков по завершенным матчам (сервер пополняет ее сам при завершении матча)"
+    )
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help="Папка с матчами")
+    parser.add_argument("--jobs", type=int, default=HISTORY_SCAN_WORKERS,
+                        help="Количество процессов (по умолчанию - число CPU)")
+    parser.add_argument("--rebuild", action="store_true", help="Удалить историю и построить ее заново")
+    args = parser.parse_args()
+    
+    db_path = HISTORY_DB_PATH if args.output_dir == OUTPUT_DIR else args.output_dir / HISTORY_DB_PATH.name
+    if args.rebuild:
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(db_path) + suffix).unlink(missing_ok=True)
+    
+    history = PlayerHistory(db_path, args.output_dir)
+    started = time.perf_counter()
+    result = history.backfill(args.jobs)
+    elapsed = time.perf_counter() - started
+    history.close()
+    print(f"Просмотрено файлов: {result['scanned']}, добавлено матчей: {result['added']} "
+          f"за {elapsed:.1f} с ({result['scanned'] / elapsed if elapsed else 0:.0f} файлов/с)")
+
+
+if __name__ == "__main__":
+    main()
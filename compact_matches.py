@@ -0,0 +1,70 @@
+"""Скрипт для сжатия старых матчей (прореживание обновлений до ~1 Гц)."""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from compaction import compact_matches, find_match_files
+from config import COMPACTION_INTERVAL_SECONDS, OUTPUT_DIR, RETENTION_DAYS
+
+
+def format_bytes(size: int) -> str:
+    """Форматирует размер в байтах в читаемый вид."""
+    for unit in ("Б", "КБ", "МБ"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "Б" else f"{size} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Сжатие старых матчей в папке output")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help="Папка с матчами")
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS,
+                        help="Сжимать матчи, которые не менялись дольше N дней")
+    parser.add_argument("--interval", type=float, default=COMPACTION_INTERVAL_SECONDS,
+                        help="Интервал между обычными обновлениями после сжатия (в секундах)")
+    parser.add_argument("--jobs", type=int, default=None, help="Количество процессов (по умолчанию - число CPU)")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать, сколько места освободится")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Выводить результат по каждому файлу")
+    args = parser.parse_args()
+    
+    paths = find_match_files(args.output_dir)
+    if not paths:
+        print("Файлы матчей не найдены.")
+        return
+    
+    started = time.perf_counter()
+    totals = {"compacted": 0, "skipped": 0, "error": 0}
+    bytes_before = bytes_after = updates_before = updates_after = 0
+    for result in compact_matches(paths, args.interval, args.days * 86400, args.dry_run, args.jobs):
+        totals[result["status"]] += 1
+        if result["status"] == "compacted":
+            bytes_before += result["bytes_before"]
+            bytes_after += result["bytes_after"]
+            updates_before += result["updates_before"]
+            updates_after += result["updates_after"]
+            if args.verbose:
+                print(f"{result['path']}: {result['updates_before']} -> {result['updates_after']} обновлений, "
+                      f"{format_bytes(result['bytes_before'])} -> {format_bytes(result['bytes_after'])}")
+        elif result["status"] == "error":
+            print(f"Ошибка в {result['path']}: {result['reason']}")
+        elif args.verbose:
+            print(f"{result['path']}: пропущен ({result['reason']})")
+    elapsed = time.perf_counter() - started
+    
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"\n{prefix}Файлов: {len(paths)}, сжато: {totals['compacted']}, "
+          f"пропущено: {totals['skipped']}, ошибок: {totals['error']}")
+    if totals["compacted"]:
+        print(f"{prefix}Обновлений: {updates_before} -> {updates_after}")
+        print(f"{prefix}Размер: {format_bytes(bytes_before)} -> {format_bytes(bytes_after)}, "
+              f"освобождено {format_bytes(bytes_before - bytes_after)}")
+    print(f"Время: {elapsed:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
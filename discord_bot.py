@@ -1,10 +1,11 @@
 """Discord бот для получения информации о матчах Dota 2."""
 import os
 import sys
-import json
+import time
 import asyncio
+import threading
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional
 
 import discord
 from discord.ext import commands
@@ -15,65 +16,84 @@ load_dotenv()
 
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from data_processor import DataProcessor
-from utils import get_dotabuff_url
+from account_links import AccountLinks, normalize_steamid
+from bot_responses import MatchResponseCache
+from catalog import MatchCatalog
+from live_scoreboard import LiveScoreboard
+from player_history import PlayerHistory
+from metrics import BOT_COMMANDS, BOT_COMMAND_SECONDS, start_metrics_server
 
 # Настройки бота
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "")
 COMMAND_PREFIX = "!"
+# Порт для метрик Prometheus (0 - не запускать сервер метрик)
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "0"))
 
 
-def get_latest_match_file() -> Optional[Path]:
-    """Находит последний файл матча."""
-    output_dir = Path(__file__).parent / "output"
-    
-    if not output_dir.exists():
-        return None
-    
-    # Ищем последний файл по датам
-    date_dirs = sorted([d for d in output_dir.iterdir() if d.is_dir()], reverse=True)
-    
-    for date_dir in date_dirs:
-        match_files = sorted(date_dir.glob("match_*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if match_files:
-            return match_files[0]
+_match_catalog: Optional[MatchCatalog] = None
+_account_links: Optional[AccountLinks] = None
+_player_history: Optional[PlayerHistory] = None
+_databases_lock = threading.Lock()
+
+
+def get_match_catalog() -> MatchCatalog:
+    """Каталог матчей (его обновляет сервер GSI); открывается при первом обращении, а не при импорте."""
+    global _match_catalog
+    with _databases_lock:
+        if _match_catalog is None:
+            _match_catalog = MatchCatalog()
+        return _match_catalog
+
+
+def get_account_links() -> AccountLinks:
+    """Привязки аккаунтов !link; открываются при первом обращении, а не при импорте."""
+    global _account_links
+    with _databases_lock:
+        if _account_links is None:
+            _account_links = AccountLinks()
+        return _account_links
+
+
+def get_player_history() -> PlayerHistory:
+    """История игроков по завершенным матчам (ее пополняет сервер GSI); открывается при первом обращении."""
+    global _player_history
+    with _databases_lock:
+        if _player_history is None:
+            _player_history = PlayerHistory()
+        return _player_history
+
+
+def linked_steamid(ctx) -> Optional[str]:
+    """SteamID, привязанный автором команды на этом сервере."""
+    return get_account_links().steamid(ctx.guild.id if ctx.guild else None, ctx.author.id)
+
+
+def latest_match_file(steamid: Optional[str]) -> Optional[Path]:
+    """Последний матч с этим SteamID (или просто последний) по каталогу."""
+    match_file = get_match_catalog().latest(steamid)
+    # Каталог сверяется с папкой при запуске сервера: файл мог быть удален позже
+    return match_file if match_file is not None and match_file.exists() else None
+
+
+async def find_match_file(ctx) -> Optional[Path]:
+    """
+    Находит матч для автора команды по каталогу (без обхода папки output).
     
-    return None
+    Если автор привязал SteamID (!link), берется последний матч с его
+    участием, иначе - последний матч на сервере GSI. Запросы к SQLite
+    выполняются в отдельном потоке, чтобы не блокировать цикл событий.
+    """
+    steamid = await asyncio.to_thread(linked_steamid, ctx)
+    return await asyncio.to_thread(latest_match_file, steamid)
 
 
-def get_players_from_match(match_file: Path) -> List[Dict[str, Any]]:
-    """Извлекает игроков из файла матча."""
-    try:
-        with open(match_file, 'r', encoding='utf-8') as f:
-            match_data = json.load(f)
-        
-        # Извлекаем аккаунты из последнего состояния
-        current_state = match_data.get("current_state", match_data.get("initial_state", {}))
-        raw_data = current_state.get("raw_data", {})
-        
-        # Если нет raw_data, пробуем использовать сам current_state
-        if not raw_data:
-            raw_data = current_state
-        
-        processor = DataProcessor()
-        # Получаем match_id для запроса к OpenDota
-        match_id = match_data.get("match_id")
-        players = processor.extract_players_accounts(raw_data, match_id)
-        
-        # Добавляем ссылки на Dotabuff
-        players_with_links = []
-        for player in players:
-            player_dict = player.copy()
-            steamid = player.get("steamid")
-            if steamid:
-                dotabuff_url = get_dotabuff_url(str(steamid))
-                player_dict["dotabuff_url"] = dotabuff_url
-            players_with_links.append(player_dict)
-        
-        return players_with_links
-    except Exception as e:
-        print(f"Ошибка при чтении файла матча: {e}")
-        return []
+async def send_no_match(ctx) -> None:
+    """Сообщает, что матч для автора команды не найден."""
+    steamid = await asyncio.to_thread(linked_steamid, ctx)
+    if steamid:
+        await ctx.send(f"❌ Матчи с аккаунтом {steamid} не найдены. Убедитесь, что сервер GSI запущен и матч активен.")
+    else:
+        await ctx.send("❌ Файлы матчей не найдены. Убедитесь, что сервер GSI запущен и матч активен.")
 
 
 # Создаем бота
@@ -81,6 +101,11 @@ intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
 
+# Готовые ответы !match по версии файла матча
+match_responses = MatchResponseCache()
+# Живые табло !live (одно построение на матч, ограниченная частота правок)
+live_scoreboards = LiveScoreboard()
+
 
 @bot.event
 async def on_ready():
@@ -89,81 +114,141 @@ async def on_ready():
     print(f'Бот работает на {len(bot.guilds)} серверах')
 
 
+@bot.before_invoke
+async def before_command(ctx):
+    """Запоминает время начала выполнения команды для метрик."""
+    ctx.metrics_started = time.perf_counter()
+
+
+@bot.after_invoke
+async def after_command(ctx):
+    """Записывает метрики выполнения команды (вызывается и при ошибке)."""
+    command = ctx.command.qualified_name if ctx.command else "unknown"
+    outcome = "error" if ctx.command_failed else "ok"
+    BOT_COMMANDS.labels(command, outcome).inc()
+    started = getattr(ctx, "metrics_started", None)
+    if started is not None:
+        BOT_COMMAND_SECONDS.labels(command).observe(time.perf_counter() - started)
+
+
 @bot.command(name='match')
 async def match_command(ctx):
     """
     Команда !match - выводит список игроков текущего матча с ссылками на Dotabuff.
-    Формат: Ник - Dotabuff ссылка
+    Формат: Ник (ранг · винрейт · любимые герои) - Dotabuff ссылка
     """
-    # Получаем последний файл матча
-    match_file = get_latest_match_file()
+    # Матч автора команды (по !link) или последний матч
+    match_file = await find_match_file(ctx)
     
     if not match_file:
-        await ctx.send("❌ Файлы матчей не найдены. Убедитесь, что сервер GSI запущен и матч активен.")
+        await send_no_match(ctx)
         return
     
-    # Извлекаем игроков
-    players = get_players_from_match(match_file)
-    
-    if not players:
-        await ctx.send("❌ Игроки не найдены в данных матча.")
+    # Одновременные !match по одной версии матча ждут одного вычисления,
+    # готовый ответ используется, пока сервер не запишет новые данные
+    for message in await match_responses.get(match_file):
+        await ctx.send(message)
+
+
+@bot.command(name='live')
+async def live_command(ctx, action: Optional[str] = None):
+    """
+    Команда !live - табло текущего матча в одном сообщении, которое обновляется по ходу игры.
+    !live stop - остановить табло в этом канале.
+    """
+    if action == "stop":
+        if live_scoreboards.remove(ctx.channel.id):
+            await ctx.send("⏹️ Табло остановлено.")
+        else:
+            await ctx.send("В этом канале нет табло.")
         return
     
-    # Формируем сообщение в формате "Ник - Dotabuff ссылка"
-    lines = []
+    match_file = await find_match_file(ctx)
+    if not match_file:
+        await send_no_match(ctx)
+        return
     
-    for player in players:
-        name = player.get('name', 'Unknown')
-        dotabuff_url = player.get('dotabuff_url')
-        
-        if dotabuff_url:
-            # Формат: Ник - Dotabuff ссылка
-            lines.append(f"{name} - {dotabuff_url}")
-        else:
-            # Если нет ссылки на Dotabuff, пропускаем игрока или показываем без ссылки
-            steamid = player.get('steamid', 'N/A')
-            if steamid != 'N/A':
-                # Пытаемся создать ссылку вручную
-                dotabuff_url = get_dotabuff_url(str(steamid))
-                if dotabuff_url:
-                    lines.append(f"{name} - {dotabuff_url}")
-                else:
-                    lines.append(f"{name} - (SteamID: {steamid})")
-            else:
-                lines.append(f"{name} - (нет SteamID)")
+    text = await live_scoreboards.current(match_file)
+    if text is None:
+        # Файл матча удален после поиска по каталогу - следить не за чем
+        await ctx.send("❌ Матч недоступен: файл матча не найден.")
+        return
+    message = await ctx.send(text)
+    # Новое табло в канале заменяет предыдущее
+    live_scoreboards.add(ctx.channel.id, match_file, lambda content: message.edit(content=content), text)
+
+
+@bot.command(name='link')
+async def link_command(ctx, steamid: Optional[str] = None):
+    """
+    Команда !link <steamid> - привязать свой аккаунт Steam (SteamID64 или ID из Dotabuff/OpenDota).
+    После привязки !match и !live показывают матч с этим аккаунтом.
+    """
+    normalized = normalize_steamid(steamid) if steamid else None
+    if not normalized:
+        await ctx.send(f"Использование: `{COMMAND_PREFIX}link <steamid>` (SteamID64 или ID из Dotabuff)")
+        return
+    guild_id = ctx.guild.id if ctx.guild else None
+    await asyncio.to_thread(lambda: get_account_links().link(guild_id, ctx.author.id, normalized))
+    await ctx.send(f"✅ Аккаунт {normalized} привязан. `{COMMAND_PREFIX}match` покажет матч с ним.")
+
+
+@bot.command(name='unlink')
+async def unlink_command(ctx):
+    """Команда !unlink - удалить привязку аккаунта Steam на этом сервере."""
+    guild_id = ctx.guild.id if ctx.guild else None
+    if await asyncio.to_thread(lambda: get_account_links().unlink(guild_id, ctx.author.id)):
+        await ctx.send("Привязка удалена.")
+    else:
+        await ctx.send("Аккаунт не был привязан.")
+
+
+def format_history(history) -> str:
+    """Текст ответа !history."""
+    def winrate(entry):
+        return f"{entry['winrate']:.0%}" if entry.get("winrate") is not None else "—"
     
-    message_text = "\n".join(lines)
+    def average(value):
+        return f"{value:g}" if value is not None else "—"
     
-    # Discord имеет лимит на длину сообщения (2000 символов)
-    # Если сообщение слишком длинное, разбиваем на части
-    if len(message_text) > 2000:
-        # Разбиваем на части по 1900 символов
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for line in lines:
-            line_length = len(line) + 1  # +1 для переноса строки
-            
-            if current_length + line_length > 1900:
-                chunks.append("\n".join(current_chunk))
-                current_chunk = [line]
-                current_length = line_length
-            else:
-                current_chunk.append(line)
-                current_length += line_length
-        
-        if current_chunk:
-            chunks.append("\n".join(current_chunk))
-        
-        # Отправляем первое сообщение
-        await ctx.send(chunks[0])
-        
-        # Отправляем остальные части
-        for chunk in chunks[1:]:
-            await ctx.send(chunk)
+    lines = [
+        f"📊 **{history.get('name') or history['steamid']}** - {history['games']} игр, "
+        f"{history['wins']} побед ({winrate(history)})",
+        f"K/D/A: {average(history['avg_kills'])}/{average(history['avg_deaths'])}/{average(history['avg_assists'])}"
+        f" · GPM {average(history['avg_gpm'])} · XPM {average(history['avg_xpm'])}",
+    ]
+    if history["heroes"]:
+        lines.append("Герои: " + ", ".join(
+            f"{hero['hero'].replace('npc_dota_hero_', '')} ({hero['games']}, {winrate(hero)})"
+            for hero in history["heroes"][:5]
+        ))
+    for key, title in (("teammates", "Союзники"), ("opponents", "Противники")):
+        if history[key]:
+            lines.append(f"{title}: " + ", ".join(
+                f"{peer.get('name') or peer['steamid']} ({peer['games']}, {winrate(peer)})" for peer in history[key][:5]
+            ))
+    return "\n".join(lines)
+
+
+@bot.command(name='history')
+async def history_command(ctx, steamid: Optional[str] = None):
+    """
+    Команда !history [steamid] - статистика игрока по всем сохраненным матчам
+    (по умолчанию - аккаунт, привязанный через !link).
+    """
+    if steamid:
+        steamid = normalize_steamid(steamid)
     else:
-        await ctx.send(message_text)
+        steamid = await asyncio.to_thread(linked_steamid, ctx)
+    if not steamid:
+        await ctx.send(f"Использование: `{COMMAND_PREFIX}history <steamid>` или привяжите аккаунт: "
+                       f"`{COMMAND_PREFIX}link <steamid>`")
+        return
+    history = await asyncio.to_thread(lambda: get_player_history().history(steamid))
+    if history is None:
+        await ctx.send(f"❌ Игрок {steamid} не найден в завершенных матчах.")
+        return
+    await ctx.send(format_history(history))
 
 
 @bot.command(name='ping')
@@ -183,6 +268,10 @@ def main():
         print("  set DISCORD_TOKEN=ваш_токен_бота  # Windows")
         return
     
+    if BOT_METRICS_PORT:
+        start_metrics_server(BOT_METRICS_PORT)
+        print(f"Метрики доступны на порту {BOT_METRICS_PORT}")
+    
     try:
         bot.run(DISCORD_TOKEN)
     except discord.LoginFailure:
@@ -0,0 +1,68 @@
+"""Скрипт для выгрузки матчей в Parquet/CSV (одна строка на обновление)."""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from config import OUTPUT_DIR
+from export import EXPORT_BATCH_ROWS, default_format, export_matches, find_match_files
+
+
+def parse_date(value: str) -> str:
+    """Проверяет дату в формате YYYY-MM-DD."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Некорректная дата: {value} (ожидается YYYY-MM-DD)")
+    return value
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Выгрузка матчей из папки output в Parquet или CSV")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help="Папка с матчами")
+    parser.add_argument("--out", type=Path, default=Path("export"), help="Папка для выгрузки")
+    parser.add_argument("--from", dest="date_from", type=parse_date, help="Первая дата (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=parse_date, help="Последняя дата (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=["auto", "parquet", "csv"], default="auto",
+                        help="Формат (auto - parquet, если установлен pyarrow, иначе csv)")
+    parser.add_argument("--jobs", type=int, default=None, help="Количество процессов (по умолчанию - число CPU)")
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS,
+                        help="Сколько строк держать в памяти перед записью")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Выводить результат по каждому файлу")
+    args = parser.parse_args()
+    
+    fmt = default_format() if args.format == "auto" else args.format
+    paths = find_match_files(args.output_dir, args.date_from, args.date_to)
+    if not paths:
+        print("Файлы матчей не найдены.")
+        return
+    
+    print(f"Выгрузка {len(paths)} матчей в {args.out} ({fmt})...")
+    started = time.perf_counter()
+    files = rows = size = errors = 0
+    try:
+        for result in export_matches(paths, args.output_dir, args.out, fmt, args.jobs, args.batch_rows):
+            if result["error"]:
+                errors += 1
+                print(f"Ошибка в {result['path']}: {result['error']}")
+                continue
+            files += 1
+            rows += result["rows"]
+            size += result["bytes"]
+            if args.verbose:
+                print(f"{result['path']} -> {result['output']}: {result['rows']} строк")
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    
+    print(f"\nФайлов: {files}, ошибок: {errors}, строк: {rows}, размер: {size / 1024 / 1024:.1f} МБ")
+    print(f"Время: {elapsed:.1f} с ({rows / elapsed if elapsed else 0:.0f} строк/с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 """Скрипт для получения аккаунтов игроков из последнего матча."""
 import sys
-import json
 from pathlib import Path
 from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from data_processor import DataProcessor
+from match_summary import read_match_summary
 from utils import get_dotabuff_url, get_opendota_url
 
 def get_latest_match_file():
@@ -36,19 +35,8 @@ def main():
         return
     
     try:
-        with open(match_file, 'r', encoding='utf-8') as f:
-            match_data = json.load(f)
-        
-        # Извлекаем аккаунты из последнего состояния
-        current_state = match_data.get("current_state", match_data.get("initial_state", {}))
-        raw_data = current_state.get("raw_data", {})
-        
-        # Если нет raw_data, пробуем использовать сам current_state
-        if not raw_data:
-            raw_data = current_state
-        
-        processor = DataProcessor()
-        players = processor.extract_players_accounts(raw_data)
+        # Извлекаем аккаунты из последнего состояния (из сводки матча, документ целиком не читается)
+        players = read_match_summary(match_file).get("players") or []
         
         if players:
             print(f"\nАккаунты игроков из матча ({len(players)}):")
@@ -77,7 +65,7 @@ def main():
             print("1. Убедитесь, что матч активен")
             print("2. Проверьте, что сервер получает данные от Dota 2")
             print("3. Откройте файл матча напрямую для просмотра данных")
-            
+    
     except Exception as e:
         print(f"Ошибка при чтении файла: {e}")
         import traceback
@@ -0,0 +1,128 @@
+"""Скрипт для повторной обработки сохраненных матчей и перевода в текущий формат хранения."""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from catalog import MatchCatalog
+from compaction import find_match_files
+from config import CATALOG_DB_PATH, OUTPUT_DIR
+from file_manager import read_match_header
+from reprocess import CHECKPOINT_NAME, load_checkpoint, pending_files, record_checkpoint, reprocess_matches
+
+# Как часто выводить ход обработки (в секундах)
+PROGRESS_INTERVAL_SECONDS = 10
+
+
+def format_bytes(size: int) -> str:
+    """Форматирует размер в байтах в читаемый вид."""
+    for unit in ("Б", "КБ", "МБ"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "Б" else f"{size} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(
+        description="Повторная обработка матчей (DataProcessor по сохраненному raw_data) и перевод в текущий формат"
+    )
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help="Папка с матчами")
+    parser.add_argument("--jobs", type=int, default=None, help="Количество процессов (по умолчанию - число CPU)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Только показать, какие поля изменятся, не переписывая файлы")
+    parser.add_argument("--force", action="store_true",
+                        help="Пересчитать и матчи, уже обработанные текущей версией")
+    parser.add_argument("--restart", action="store_true",
+                        help="Не продолжать с контрольной точки, начать заново")
+    parser.add_argument("--top", type=int, default=20, help="Сколько измененных полей показать")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Выводить результат по каждому файлу")
+    args = parser.parse_args()
+    
+    paths = find_match_files(args.output_dir)
+    if not paths:
+        print("Файлы матчей не найдены.")
+        return
+    
+    checkpoint_path = args.output_dir / CHECKPOINT_NAME
+    if args.restart:
+        checkpoint_path.unlink(missing_ok=True)
+    pending = paths if args.dry_run else pending_files(paths, load_checkpoint(checkpoint_path))
+    if len(pending) < len(paths):
+        print(f"Продолжение с контрольной точки: {len(paths) - len(pending)} файлов уже обработано")
+    
+    catalog = None
+    checkpoint = None
+    if not args.dry_run:
+        catalog_path = CATALOG_DB_PATH if args.output_dir == OUTPUT_DIR else args.output_dir / CATALOG_DB_PATH.name
+        catalog = MatchCatalog(catalog_path, args.output_dir)
+        checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+    
+    started = time.perf_counter()
+    last_progress = started
+    totals = {"reprocessed": 0, "skipped": 0, "error": 0}
+    legacy = changed_matches = updates = changed_updates = bytes_read = bytes_written = 0
+    field_counts = {}
+    try:
+        for done, result in enumerate(reprocess_matches(pending, args.dry_run, args.force, args.jobs), 1):
+            totals[result["status"]] += 1
+            if result["status"] == "reprocessed":
+                legacy += result["legacy"]
+                updates += result["updates"]
+                changed_updates += result["changed_updates"]
+                changed_matches += bool(result["changed_fields"])
+                bytes_read += result["bytes_before"]
+                bytes_written += result["bytes_after"]
+                for field, count in result["changed_fields"].items():
+                    field_counts[field] = field_counts.get(field, 0) + count
+                if checkpoint is not None:
+                    record_checkpoint(checkpoint, result)
+                    path = Path(result["path"])
+                    # Сводка матча могла измениться; время изменения файла сохранено
+                    catalog.update(path, read_match_header(path), path.stat().st_mtime)
+                if args.verbose:
+                    format_note = ", старый формат" if result["legacy"] else ""
+                    print(f"{result['path']}: {result['updates']} обновлений, "
+                          f"изменено {result['changed_updates']}{format_note}, "
+                          f"{format_bytes(result['bytes_before'])} -> {format_bytes(result['bytes_after'])}")
+            elif result["status"] == "error":
+                print(f"Ошибка в {result['path']}: {result['reason']}")
+            elif args.verbose:
+                print(f"{result['path']}: пропущен ({result['reason']})")
+            
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                last_progress = now
+                print(f"... {done}/{len(pending)} файлов, {updates / (now - started):.0f} обновлений/с")
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if catalog is not None:
+            catalog.close()
+    elapsed = time.perf_counter() - started
+    
+    if not args.dry_run and not totals["error"]:
+        # Все файлы обработаны - контрольная точка больше не нужна
+        checkpoint_path.unlink(missing_ok=True)
+    
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"\n{prefix}Файлов: {len(pending)}, пересчитано: {totals['reprocessed']} "
+          f"(из старого формата: {legacy}), пропущено: {totals['skipped']}, ошибок: {totals['error']}")
+    if totals["reprocessed"]:
+        print(f"{prefix}Обновлений: {updates}, изменилось: {changed_updates} "
+              f"в {changed_matches} матчах")
+        print(f"{prefix}Размер: {format_bytes(bytes_read)} -> {format_bytes(bytes_written)}")
+    if field_counts:
+        print(f"{prefix}Измененные поля (число обновлений):")
+        for field, count in sorted(field_counts.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {field}: {count}")
+    if elapsed > 0:
+        print(f"Время: {elapsed:.1f} с, {totals['reprocessed'] / elapsed:.1f} файлов/с, "
+              f"{updates / elapsed:.0f} обновлений/с, {format_bytes(bytes_read / elapsed)}/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Бенчмарк: одновременные !match в начале матча (объединение запросов в боте).
+
+Запускает локальный сервер с ответами в формате OpenDota и заданной
+задержкой, создает матч с десятью игроками и отправляет пачку одновременных
+команд !match:
+- без объединения - каждая команда строит ответ сама (как раньше);
+- с MatchResponseCache - одновременные команды ждут одного вычисления;
+- повторная пачка по тому же списку игроков - готовый ответ из памяти;
+- пачка после обновления сводки матча (игроки те же) - тоже из памяти.
+
+Для каждого варианта выводится задержка команд, число построений ответа и
+число запросов к OpenDota. Кэш профилей перед каждым вариантом пустой.
+
+Пример:
+    python scripts/bench_bot_burst.py --commands 20 --latency 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+PLAYERS = 10
+
+
+class FakeOpenDota(BaseHTTPRequestHandler):
+    """Ответы в формате OpenDota с задержкой сети."""
+    
+    latency = 0.1
+    requests = 0
+    lock = threading.Lock()
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        with FakeOpenDota.lock:
+            FakeOpenDota.requests += 1
+        time.sleep(self.latency)
+        if self.path.endswith("/constants/heroes"):
+            body = {str(i): {"id": i, "localized_name": f"Hero {i}"} for i in range(1, 31)}
+        elif self.path.endswith("/recentMatches"):
+            body = [{"player_slot": i % 2 * 128, "radiant_win": i % 3 == 0, "hero_id": i % 7 + 1} for i in range(20)]
+        elif "/players/" in self.path:
+            body = {"rank_tier": 54, "profile": {"personaname": "bench"}}
+        else:
+            # Остальные запросы (матч по match_id бот не запрашивает)
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def create_match(output_dir: Path) -> Path:
+    """Записывает матч с десятью игроками (как в режиме наблюдателя) и возвращает путь к файлу."""
+    from data_processor import DataProcessor
+    from file_manager import FileManager
+    
+    raw = {
+        "map": {"matchid": "4243", "game_time": 0, "game_state": "DOTA_GAMERULES_STATE_GAME_IN_PROGRESS"},
+        "player": {"steamid": "76561198000000000", "name": "player0", "team": "radiant"},
+        "allplayers": {
+            f"player{i}": {"steamid": str(76561198000000000 + i), "name": f"player{i}",
+                           "team": "radiant" if i < 5 else "dire"}
+            for i in range(PLAYERS)
+        }
+    }
+    manager = FileManager(output_dir, fsync_policy="never", session_key="bench")
+    manager.start_new_match(DataProcessor.process_gsi_data(raw))
+    return manager.current_file_path
+
+
+def percentiles(samples: list) -> str:
+    """Форматирует p50/max в миллисекундах."""
+    samples = sorted(samples)
+    return f"p50 {samples[len(samples) // 2] * 1000:7.1f} мс   max {samples[-1] * 1000:7.1f} мс"
+
+
+async def burst(get_response, commands: int) -> list:
+    """Отправляет commands одновременных команд и возвращает их задержки."""
+    async def command():
+        started = time.perf_counter()
+        await get_response()
+        return time.perf_counter() - started
+    return await asyncio.gather(*(command() for _ in range(commands)))
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк одновременных !match")
+    parser.add_argument("--commands", type=int, default=20, help="Количество одновременных команд")
+    parser.add_argument("--latency", type=float, default=0.1, help="Задержка ответа OpenDota (в секундах)")
+    args = parser.parse_args()
+    
+    FakeOpenDota.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenDota)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["OUTPUT_DIR"] = tmp
+        os.environ["OPENDOTA_API_URL"] = f"http://127.0.0.1:{server.server_port}/api"
+        import bot_responses
+        import player_profiles
+        from match_summary import summary_path_for
+        
+        match_file = create_match(Path(tmp))
+        builds = 0
+        builds_lock = threading.Lock()
+        
+        def build(path: Path) -> list:
+            nonlocal builds
+            with builds_lock:
+                builds += 1
+            return bot_responses.build_match_messages(path)
+        
+        def run(label: str, get_response, db_name: str, reset: bool = True) -> None:
+            nonlocal builds
+            if reset:
+                player_profiles._default_cache = player_profiles.PlayerProfileCache(Path(tmp) / db_name)
+            builds = 0
+            FakeOpenDota.requests = 0
+            samples = asyncio.run(burst(get_response, args.commands))
+            print(f"{label:<28} {percentiles(samples)}   построений: {builds:3d}   "
+                  f"запросов к OpenDota: {FakeOpenDota.requests}")
+        
+        print(f"{args.commands} одновременных !match, {PLAYERS} игроков, задержка OpenDota {args.latency * 1000:.0f} мс\n")
+        run("без объединения", lambda: asyncio.to_thread(build, match_file), "plain.db")
+        cache = bot_responses.MatchResponseCache(build)
+        run("MatchResponseCache", lambda: cache.get(match_file), "single_flight.db")
+        run("повторная пачка (из памяти)", lambda: cache.get(match_file), "", reset=False)
+        # Сервер переписывает сводку идущего матча раз в секунду
+        os.utime(summary_path_for(match_file))
+        run("сводка обновлена", lambda: cache.get(match_file), "", reset=False)
+    
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
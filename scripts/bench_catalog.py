@@ -0,0 +1,118 @@
+"""Бенчмарк: время ответа списка матчей (/matches) при разном размере архива.
+
+Заполняет каталог синтетическими матчами (по умолчанию 10 000 и 100 000 строк)
+и измеряет задержку запросов страниц: первая страница, глубокая страница по
+курсору и запросы с фильтрами.
+
+Пример:
+    python scripts/bench_catalog.py --rows 10000 100000 --queries 500
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from catalog import MatchCatalog
+
+HEROES = [f"npc_dota_hero_{name}" for name in (
+    "antimage", "axe", "bane", "bloodseeker", "crystal_maiden", "drow_ranger", "earthshaker",
+    "juggernaut", "mirana", "morphling", "nevermore", "phantom_lancer", "puck", "pudge", "razor",
+    "sand_king", "storm_spirit", "sven", "tiny", "vengefulspirit"
+)]
+STEAMIDS = [str(76561198000000000 + i) for i in range(200)]
+
+
+def make_header(rng: random.Random, index: int, start: datetime) -> dict:
+    """Создает синтетические поля документа матча."""
+    team = rng.choice(["radiant", "dire"])
+    winner = rng.choice(["radiant", "dire"])
+    steamid = rng.choice(STEAMIDS)
+    match_start = start + timedelta(minutes=index * 5)
+    return {
+        "match_id": str(7000000000 + index),
+        "session_key": f"token-{steamid[-6:]}",
+        "match_start": match_start.isoformat(),
+        "match_end": (match_start + timedelta(minutes=40)).isoformat(),
+        "final_state": {
+            "player": {"steamid": steamid, "name": f"player{steamid[-3:]}", "team": team,
+                       "kills": rng.randint(0, 20), "deaths": rng.randint(0, 15), "assists": rng.randint(0, 30)},
+            "hero": {"id": rng.randint(1, 120), "name": rng.choice(HEROES)},
+            "map": {"game_time": rng.randint(900, 4200), "win_team": winner}
+        }
+    }
+
+
+def fill_catalog(catalog: MatchCatalog, rows: int) -> None:
+    """Заполняет каталог синтетическими матчами."""
+    rng = random.Random(rows)
+    start = datetime(2025, 1, 1)
+    batch = []
+    for index in range(rows):
+        match_file = catalog.output_dir / f"{index // 100:05d}" / f"match_{7000000000 + index}_bench.json"
+        batch.append((match_file, make_header(rng, index, start), 0.0))
+        if len(batch) >= 5000:
+            catalog.update_many(batch)
+            batch = []
+    if batch:
+        catalog.update_many(batch)
+
+
+def percentiles(samples: list) -> str:
+    """Форматирует p50/p99 в миллисекундах."""
+    samples = sorted(samples)
+    n = len(samples)
+    return f"p50 {samples[n // 2] * 1000:6.2f} мс   p99 {samples[min(n - 1, int(n * 0.99))] * 1000:6.2f} мс"
+
+
+def measure(catalog: MatchCatalog, queries: int) -> dict:
+    """Измеряет задержку запросов разных типов."""
+    rng = random.Random(0)
+    deep_cursor = None
+    for _ in range(50):
+        deep_cursor = catalog.list_matches(limit=20, cursor=deep_cursor)["next_cursor"]
+    
+    cases = {
+        "первая страница": lambda: catalog.list_matches(limit=20),
+        "страница 51 (по курсору)": lambda: catalog.list_matches(limit=20, cursor=deep_cursor),
+        "steamid": lambda: catalog.list_matches(limit=20, steamid=rng.choice(STEAMIDS)),
+        "hero + result": lambda: catalog.list_matches(limit=20, hero=rng.choice(HEROES), result="win"),
+        "date range + min_duration": lambda: catalog.list_matches(
+            limit=20, date_from="2025-02-01", date_to="2025-02-07", min_duration=2400),
+    }
+    results = {}
+    for name, query in cases.items():
+        samples = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - started)
+        results[name] = samples
+    return results
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк списка матчей при разном размере каталога")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="Размеры каталога")
+    parser.add_argument("--queries", type=int, default=500, help="Количество запросов каждого типа")
+    args = parser.parse_args()
+    
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            catalog = MatchCatalog(Path(tmp) / "catalog.db", output_dir=Path(tmp))
+            started = time.perf_counter()
+            fill_catalog(catalog, rows)
+            print(f"\nКаталог: {rows} матчей (заполнен за {time.perf_counter() - started:.1f} с)")
+            for name, samples in measure(catalog, args.queries).items():
+                print(f"  {name:<28} {percentiles(samples)}")
+            catalog.close()
+
+
+if __name__ == "__main__":
+    main()
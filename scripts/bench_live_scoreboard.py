@@ -0,0 +1,130 @@
+"""Бенчмарк: живое табло !live при частых записях матча и многих каналах.
+
+Сервер (MatchSession) в отдельном потоке пишет матч из gsi_generator с
+заданной частотой тиков и интервалом записи документа, а LiveScoreboard
+ведет табло этого матча в нескольких каналах (правка сообщения - задержка
+сети вместо Discord). Выводится:
+- сколько версий файла матча записано и сколько раз построено табло;
+- сколько правок отправлено и схлопнуто и сколько их было бы без
+  ограничения (правка на каждую версию в каждом канале, правка на каждый тик);
+- частота правок одного сообщения и минимальный интервал между правками
+  по сравнению с границей LIVE_EDIT_INTERVAL_SECONDS.
+
+Время в бенчмарке сжато: интервалы заданы в секундах реального времени.
+
+Пример:
+    python scripts/bench_live_scoreboard.py --channels 50 --tick-rate 200 --seconds 20
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from gsi_generator import MatchSimulator  # noqa: E402
+from live_scoreboard import LiveScoreboard  # noqa: E402
+from session import MatchSession  # noqa: E402
+
+
+def feed_match(session: MatchSession, simulator: MatchSimulator, tick_rate: float, stop: threading.Event,
+               counters: dict) -> None:
+    """Отправляет тики матча в сессию с заданной частотой."""
+    started = time.perf_counter()
+    for index, raw_data in enumerate(simulator):
+        if stop.is_set():
+            break
+        delay = started + index / tick_rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        session.handle(raw_data)
+        counters["ticks"] += 1
+        path = session.file_manager.current_file_path
+        if path is not None:
+            counters["match_file"] = path
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if mtime != counters["mtime"]:
+                counters["mtime"] = mtime
+                counters["versions"] += 1
+    session.file_manager.flush()
+
+
+async def run(args) -> bool:
+    """Прогоняет матч и возвращает, соблюдена ли граница частоты правок."""
+    counters = {"ticks": 0, "versions": 0, "mtime": None, "match_file": None}
+    stop = threading.Event()
+    with tempfile.TemporaryDirectory() as tmp:
+        session = MatchSession("bench", output_dir=Path(tmp))
+        session.file_manager.save_interval = args.save_interval
+        simulator = MatchSimulator(0, args.game_minutes, spectator=True)
+        thread = threading.Thread(target=feed_match, args=(session, simulator, args.tick_rate, stop, counters),
+                                  daemon=True)
+        thread.start()
+        while counters["match_file"] is None:
+            await asyncio.sleep(0.01)
+        match_file = counters["match_file"]
+        
+        scoreboard = LiveScoreboard(edit_interval=args.edit_interval, poll_interval=args.poll_interval)
+        edits = {channel: [] for channel in range(args.channels)}
+        
+        def editor(channel):
+            async def edit(text):
+                await asyncio.sleep(args.edit_latency)
+                edits[channel].append(time.perf_counter())
+            return edit
+        
+        started = time.perf_counter()
+        for channel in range(args.channels):
+            text = await scoreboard.current(match_file)
+            scoreboard.add(channel, match_file, editor(channel), text)
+        while time.perf_counter() - started < args.seconds and thread.is_alive():
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        thread.join()
+        for channel in range(args.channels):
+            scoreboard.remove(channel)
+    
+    stats = scoreboard.stats
+    per_message = [len(times) for times in edits.values()]
+    gaps = [b - a for times in edits.values() for a, b in zip(times, times[1:])]
+    rate = max(per_message) / elapsed * 60
+    bound = 60 / args.edit_interval
+    print(f"Тиков: {counters['ticks']} ({counters['ticks'] / elapsed:.0f}/с), версий файла матча: "
+          f"{counters['versions']}, каналов: {args.channels}, время: {elapsed:.1f} с")
+    print(f"Построений табло: {stats['renders']} (одно на версию для всех каналов)")
+    print(f"Правок: отправлено {stats['sent']}, схлопнуто {stats['coalesced']}, ошибок {stats['failed']}")
+    print(f"Без ограничения: {counters['versions'] * args.channels} правок (на каждую версию), "
+          f"{counters['ticks'] * args.channels} (на каждый тик)")
+    print(f"Правок одного сообщения в минуту: до {rate:.1f} (граница {bound:.1f}), "
+          f"минимальный интервал: {min(gaps) if gaps else 0:.2f} с (граница {args.edit_interval:.2f} с)")
+    ok = not gaps or min(gaps) >= args.edit_interval * 0.95
+    print("Граница частоты правок соблюдена" if ok else "ГРАНИЦА ЧАСТОТЫ ПРАВОК НАРУШЕНА")
+    return ok
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк живого табло !live")
+    parser.add_argument("--channels", type=int, default=20, help="Сколько каналов следят за матчем")
+    parser.add_argument("--tick-rate", type=float, default=200.0, help="Тиков GSI в секунду")
+    parser.add_argument("--save-interval", type=float, default=0.05, help="Интервал записи документа матча")
+    parser.add_argument("--edit-interval", type=float, default=1.0, help="Минимальный интервал правок сообщения")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Интервал проверки файла матча")
+    parser.add_argument("--edit-latency", type=float, default=0.05, help="Задержка одной правки (сеть)")
+    parser.add_argument("--seconds", type=float, default=15.0, help="Длительность прогона")
+    parser.add_argument("--game-minutes", type=float, default=30.0, help="Длительность игры")
+    args = parser.parse_args()
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
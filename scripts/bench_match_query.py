@@ -0,0 +1,118 @@
+"""Бенчмарк: задержка запросов к сохраненному матчу (/matches/{id}/state и /series).
+
+Создает во временной папке матч длительностью 60 минут (10 обновлений в
+секунду игрового времени) и измеряет задержку слоя запросов: поиск по
+индексу, чтение колонок и сериализацию ответа.
+
+Пример:
+    python scripts/bench_match_query.py --minutes 60 --queries 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+
+def make_raw(match_id: str, tick: int) -> dict:
+    """Создает payload GSI с заполненными основными секциями."""
+    game_time = tick // 10 - 90
+    return {
+        "provider": {"name": "Dota 2", "appid": 570, "version": 47, "timestamp": 1700000000 + tick // 10},
+        "map": {"matchid": match_id, "game_time": game_time, "clock_time": game_time,
+                "game_state": "DOTA_GAMERULES_STATE_GAME_IN_PROGRESS", "daytime": True},
+        "player": {"steamid": "76561198000000000", "name": "bench", "kills": tick // 3000,
+                   "deaths": tick // 4000, "assists": tick // 2000, "last_hits": tick // 50,
+                   "gold": 600 + tick % 5000, "gpm": 400 + tick % 100, "xpm": 500 + tick % 120},
+        "hero": {"id": 1, "name": "npc_dota_hero_antimage", "level": min(30, 1 + tick // 1200),
+                 "health": 400 + tick % 1200, "max_health": 1600, "mana": 200 + tick % 300, "max_mana": 600},
+        "abilities": {f"ability{i}": {"name": f"antimage_ability_{i}", "level": 1 + i, "can_cast": True,
+                                      "cooldown": tick % 20} for i in range(6)},
+        "items": {f"slot{i}": {"name": f"item_{i}", "can_cast": False, "charges": 0} for i in range(6)},
+        "buildings": {"radiant": {f"dota_goodguys_tower{i}_mid": {"health": 1800 - tick % 1800} for i in range(1, 4)}}
+    }
+
+
+def create_match(output_dir: Path, minutes: int) -> Path:
+    """Записывает матч через FileManager (как сервер) и возвращает путь к файлу."""
+    from data_processor import DataProcessor
+    from file_manager import FileManager
+    
+    manager = FileManager(output_dir, save_interval=1e9, fsync_policy="never", session_key="bench")
+    ticks = (minutes * 60 + 90) * 10
+    manager.start_new_match(DataProcessor.process_gsi_data(make_raw("4242", 0)))
+    for tick in range(1, ticks):
+        manager.save_match_data(DataProcessor.process_gsi_data(make_raw("4242", tick)))
+        if tick % 600 == 0:
+            manager.flush()
+    path = manager.current_file_path
+    manager.finalize_match(DataProcessor.process_gsi_data(make_raw("4242", ticks)))
+    return path
+
+
+def percentiles(samples: list) -> str:
+    """Форматирует p50/p99/max в миллисекундах."""
+    samples = sorted(samples)
+    n = len(samples)
+    return (f"p50 {samples[n // 2] * 1000:7.2f} мс   p99 {samples[min(n - 1, int(n * 0.99))] * 1000:7.2f} мс   "
+            f"max {samples[-1] * 1000:7.2f} мс")
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк запросов к сохраненному матчу")
+    parser.add_argument("--minutes", type=int, default=60, help="Длительность матча")
+    parser.add_argument("--queries", type=int, default=1000, help="Количество запросов каждого типа")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["OUTPUT_DIR"] = tmp
+        from match_query import find_match_file, iter_series_json, query_series
+        from seek_index import state_at
+        
+        started = time.perf_counter()
+        path = create_match(Path(tmp), args.minutes)
+        print(f"Матч: {path.stat().st_size / 1024 / 1024:.1f} МБ, создан за {time.perf_counter() - started:.1f} с")
+        
+        end_time = args.minutes * 60
+        fields = ["player.gold", "hero.health", "player.gpm"]
+        
+        def series(start, end, step):
+            match_file = find_match_file("4242")
+            result = query_series(match_file, fields, start, end, step)
+            return sum(len(chunk) for chunk in iter_series_json("4242", fields, result, step))
+        
+        started = time.perf_counter()
+        series(None, None, 1.0)
+        print(f"Первый запрос series (построение колонок): {(time.perf_counter() - started) * 1000:.0f} мс")
+        
+        rng = random.Random(1)
+        state_samples = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            state_at(find_match_file("4242"), game_time=rng.uniform(-90, end_time))
+            state_samples.append(time.perf_counter() - started)
+        print(f"state  (случайный game_time):            {percentiles(state_samples)}")
+        
+        for label, make_query in (
+            ("series (весь матч, step=1)", lambda: (None, None, 1.0)),
+            ("series (весь матч, step=10)", lambda: (None, None, 10.0)),
+            ("series (10 минут, без step)", lambda: (lambda s: (s, s + 600, None))(rng.uniform(0, end_time - 600))),
+        ):
+            samples = []
+            size = 0
+            for _ in range(args.queries):
+                query = make_query()
+                started = time.perf_counter()
+                size = series(*query)
+                samples.append(time.perf_counter() - started)
+            print(f"{label:<40} {percentiles(samples)}   ({size / 1024:.0f} КБ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Бенчмарк кольцевого буфера последних тиков (/live/recent).
+
+Заполняет буфер сессии тиками с частотой 10 Гц и измеряет:
+- время записи одного тика и рост памяти при записи (должен быть нулевым:
+  массивы выделены заранее);
+- время оконного запроса для окон разной длины - оно растет с размером окна
+  и не зависит от длины матча;
+- память буфера на одну сессию.
+
+Пример:
+    python scripts/bench_recent_ticks.py --capacity 1200
+"""
+import argparse
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from config import RECENT_TICKS_FIELDS  # noqa: E402
+from recent_ticks import RecentTicks  # noqa: E402
+
+TICK_SECONDS = 0.1
+
+
+def make_tick(tick: int) -> dict:
+    """Обработанный снимок с числовыми полями игрока и героя."""
+    return {
+        "map": {"game_time": tick // 10},
+        "player": {"gold": 600 + tick * 2, "kills": tick // 900, "deaths": tick // 2000, "assists": tick // 700,
+                   "last_hits": tick // 60, "denies": tick // 400, "gpm": 450, "xpm": 520},
+        "hero": {"level": min(30, 1 + tick // 1000), "health": 900 - tick % 300, "max_health": 1200,
+                 "mana": 300 + tick % 50, "max_mana": 400, "alive": True, "xpos": tick % 7000, "ypos": 0},
+    }
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк кольцевого буфера последних тиков")
+    parser.add_argument("--capacity", type=int, default=1200, help="Емкость буфера (тиков)")
+    parser.add_argument("--ticks", type=int, default=36000, help="Сколько тиков записать (10 в секунду)")
+    args = parser.parse_args()
+    
+    ticks = [make_tick(tick) for tick in range(args.ticks)]
+    buffer = RecentTicks(args.capacity)
+    # Первый проход заполняет буфер, второй измеряет запись по кругу
+    for tick, data in enumerate(ticks[:args.capacity]):
+        buffer.append(data, tick * TICK_SECONDS)
+    started = time.perf_counter()
+    for tick, data in enumerate(ticks, args.capacity):
+        buffer.append(data, tick * TICK_SECONDS)
+    elapsed = time.perf_counter() - started
+    # Рост памяти - отдельным проходом: tracemalloc замедляет запись
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for tick, data in enumerate(ticks, args.capacity + len(ticks)):
+        buffer.append(data, tick * TICK_SECONDS)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Поля: {len(RECENT_TICKS_FIELDS)}, емкость: {args.capacity} тиков "
+          f"({args.capacity * TICK_SECONDS:.0f} с при throttle 0.1), память: {buffer.memory_bytes() / 1024:.1f} КБ на сессию")
+    print(f"Запись: {elapsed / len(ticks) * 1e6:.1f} мкс/тик, рост памяти за {len(ticks)} тиков: {after - before} байт\n")
+    
+    fields = ["player.gold", "hero.health"]
+    print("Окно      тиков   запрос (2 поля)")
+    for window in (1, 10, 30, 60, 120):
+        number = 200
+        seconds = min(timeit.repeat(lambda: buffer.aggregate(fields, window), number=number, repeat=5)) / number
+        print(f"{window:>4} с   {buffer.aggregate(fields, window)['ticks']:>6}   {seconds * 1e6:8.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
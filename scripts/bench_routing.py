@@ -0,0 +1,111 @@
+"""Бенчмарк: поиск матча пользователя бота (!link) при росте архива.
+
+Заполняет каталог матчей синтетическими матчами (по десять игроков из общего
+пула) и базу привязок аккаунтов, затем замеряет маршрутизацию команды так,
+как ее делает discord_bot.find_match_file: SteamID по привязке и последний
+матч с этим SteamID по каталогу. Замер повторяется после каждого шага роста
+архива - задержка не должна зависеть от числа матчей и пользователей.
+Для сравнения выводится время прежнего способа: обход папки output.
+
+Пример:
+    python scripts/bench_routing.py --steps 1000 10000 100000 --users 20000
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from account_links import AccountLinks  # noqa: E402
+from catalog import MatchCatalog  # noqa: E402
+
+PLAYERS = 10
+STEAMID_BASE = 76561198000000000
+
+
+def synthetic_header(index: int, steamids) -> dict:
+    """Заголовок матча с игроками в данных GSI."""
+    raw_data = {
+        "player": {"steamid": str(steamids[0]), "name": f"player_{steamids[0]}", "team_name": "radiant"},
+        "allplayers": {f"player{slot}": {"steamid": str(steamid), "name": f"player_{steamid}"}
+                       for slot, steamid in enumerate(steamids)}
+    }
+    return {
+        "match_id": str(8000000000 + index),
+        "match_start": f"2026-01-01T00:00:00.{index:09d}",
+        "current_state": {"player": raw_data["player"], "raw_data": raw_data}
+    }
+
+
+def percentile(values, fraction: float) -> float:
+    """Перцентиль отсортированного списка."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска матча пользователя бота")
+    parser.add_argument("--steps", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Размеры архива (матчей), на которых делается замер")
+    parser.add_argument("--users", type=int, default=20000, help="Сколько пользователей привязали аккаунт")
+    parser.add_argument("--lookups", type=int, default=2000, help="Сколько поисков на каждом шаге")
+    parser.add_argument("--scan-files", type=int, default=2000, help="Сколько файлов создать для замера обхода папки")
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    pool = [STEAMID_BASE + i for i in range(args.users)]
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        catalog = MatchCatalog(output_dir / "catalog.db", output_dir)
+        links = AccountLinks(output_dir / "links.db")
+        for user, steamid in enumerate(pool):
+            links.link(user % 50, user, str(steamid))
+        
+        print(f"Пользователей с привязкой: {args.users}")
+        print(f"{'матчей':>8} | {'p50, мкс':>9} | {'p99, мкс':>9} | {'нашлось':>7}")
+        added = 0
+        for size in sorted(args.steps):
+            batch = []
+            while added < size:
+                batch.append((output_dir / f"2026-01-01/match_{added}.json",
+                              synthetic_header(added, rng.sample(pool, PLAYERS)), None))
+                added += 1
+                if len(batch) >= 1000:
+                    catalog.update_many(batch)
+                    batch = []
+            if batch:
+                catalog.update_many(batch)
+            
+            timings = []
+            found = 0
+            for _ in range(args.lookups):
+                user = rng.randrange(args.users)
+                started = time.perf_counter()
+                steamid = links.steamid(user % 50, user)
+                match_file = catalog.latest(steamid)
+                timings.append((time.perf_counter() - started) * 1e6)
+                found += match_file is not None
+            timings.sort()
+            print(f"{size:>8} | {percentile(timings, 0.5):>9.1f} | {percentile(timings, 0.99):>9.1f} | "
+                  f"{found / args.lookups:>6.0%}")
+        
+        # Прежний способ: последний файл по времени изменения в последней папке с датой
+        scan_dir = output_dir / "scan" / "2026-01-01"
+        scan_dir.mkdir(parents=True)
+        for index in range(args.scan_files):
+            (scan_dir / f"match_{index}.json").write_bytes(b"{}")
+        started = time.perf_counter()
+        dates = sorted([d for d in scan_dir.parent.iterdir() if d.is_dir()], reverse=True)
+        sorted(dates[0].glob("match_*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        print(f"\nОбход папки с {args.scan_files} файлами (прежний !match, без учета пользователя): "
+              f"{(time.perf_counter() - started) * 1e6:.0f} мкс")
+        catalog.close()
+        links.close()
+
+
+if __name__ == "__main__":
+    main()
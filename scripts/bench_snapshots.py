@@ -0,0 +1,128 @@
+"""Бенчмарк: общие неизменившиеся секции соседних снимков (structural sharing).
+
+Генерирует последовательность payload режима игрока с частотой 10 Гц: карта,
+игрок и герой меняются каждый тик, кулдауны способностей - раз в секунду
+после применения, предметы - при покупке, здоровье зданий - во время атаки
+на башню. Последовательность обрабатывается двумя способами:
+- без предыдущего снимка - каждая секция собирается заново (как раньше);
+- с предыдущим снимком - неизменившиеся секции берутся из него.
+
+Выводится время обработки одного тика и память на один удерживаемый снимок
+(все снимки держатся в памяти, как в кэшах и кольцевых буферах).
+
+Пример:
+    python scripts/bench_snapshots.py --ticks 3000
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from data_processor import DataProcessor  # noqa: E402
+
+TOWERS = [f"tower{tier}_{lane}" for tier in (1, 2, 3) for lane in ("top", "mid", "bot")] + ["tower4_top", "tower4_bot"]
+ITEMS = ["item_tango", "item_magic_wand", "item_power_treads", "item_blink", "item_black_king_bar", "item_manta"]
+
+
+def make_payload(tick: int) -> bytes:
+    """Сериализованный payload GSI для тика (10 тиков в секунду)."""
+    second = tick // 10
+    abilities = {}
+    for slot in range(6):
+        # Способность применяется раз в 20 секунд, кулдаун 8 секунд меняется раз в секунду
+        since_cast = (second + slot * 3) % 20
+        abilities[f"ability{slot}"] = {
+            "name": f"hero_ability_{slot}", "level": min(4, 1 + second // 120), "can_cast": since_cast >= 8,
+            "passive": False, "ability_active": True, "cooldown": max(0, 8 - since_cast), "ultimate": slot == 5
+        }
+    owned = min(len(ITEMS), 1 + second // 60)  # Покупка раз в минуту
+    items = {f"slot{i}": {"name": ITEMS[i], "purchaser": 0, "can_cast": True, "cooldown": 0, "passive": False}
+             if i < owned else {"name": "empty"} for i in range(9)}
+    items.update({f"stash{i}": {"name": "empty"} for i in range(6)})
+    items["teleport0"] = {"name": "item_tpscroll", "purchaser": 0, "can_cast": True, "cooldown": 0, "charges": 1}
+    items["neutral0"] = {"name": "empty"}
+    # Башню атакуют 5 секунд из каждых 60
+    attacked = second % 60 < 5
+    buildings = {
+        "radiant": {f"dota_goodguys_{name}": {"health": 1800, "max_health": 1800} for name in TOWERS},
+        "dire": {f"dota_badguys_{name}": {"health": 1800, "max_health": 1800} for name in TOWERS},
+    }
+    if attacked:
+        buildings["dire"]["dota_badguys_tower1_mid"]["health"] = 1800 - (tick % 600) * 3
+    payload = {
+        "provider": {"name": "Dota 2", "appid": 570, "version": 47, "timestamp": 1760000000 + second},
+        "map": {"matchid": "8100000000", "game_time": second, "clock_time": second - 90, "daytime": True,
+                "game_state": "DOTA_GAMERULES_STATE_GAME_IN_PROGRESS", "paused": False, "win_team": "none"},
+        "player": {"steamid": "76561198000000001", "name": "bench", "kills": second // 90, "deaths": second // 200,
+                   "assists": second // 70, "last_hits": second // 6, "denies": second // 40, "gold": 600 + tick % 900,
+                   "gold_reliable": 200, "gold_unreliable": 400 + tick % 900, "gpm": 450, "xpm": 520},
+        "hero": {"id": 1, "name": "npc_dota_hero_antimage", "level": min(30, 1 + second // 100), "alive": True,
+                 "health": 900 - tick % 300, "max_health": 1200, "health_percent": 75, "mana": 300 + tick % 50,
+                 "max_mana": 400, "mana_percent": 80, "xpos": tick % 7000, "ypos": -tick % 7000},
+        "abilities": abilities,
+        "items": items,
+        "buildings": buildings,
+        "events": [],
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+def retained_memory(encoded: list, share: bool) -> float:
+    """Обрабатывает все тики, удерживая снимки в памяти, и возвращает байт на снимок."""
+    tracemalloc.start()
+    retained = []
+    previous = None
+    for body in encoded:
+        previous = DataProcessor.process_gsi_data(json.loads(body), previous if share else None)
+        retained.append(previous)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / len(encoded)
+
+
+def timing(encoded: list, share: bool, repeat: int) -> float:
+    """Лучшее время обработки одного тика (в мкс), без учета разбора JSON и сборки мусора."""
+    best = None
+    for _ in range(repeat):
+        payloads = [json.loads(body) for body in encoded]
+        gc.collect()
+        gc.disable()
+        try:
+            previous = None
+            started = time.perf_counter()
+            for raw_data in payloads:
+                previous = DataProcessor.process_gsi_data(raw_data, previous if share else None)
+            elapsed = (time.perf_counter() - started) / len(payloads) * 1e6
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк общих секций соседних снимков")
+    parser.add_argument("--ticks", type=int, default=3000, help="Количество тиков (10 в секунду)")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество замеров времени")
+    args = parser.parse_args()
+    
+    encoded = [make_payload(tick) for tick in range(args.ticks)]
+    print(f"{args.ticks} тиков ({args.ticks / 600:.1f} мин игры), payload ~{len(encoded[-1]) / 1024:.1f} КБ\n")
+    results = {}
+    for label, share in (("без общих секций", False), ("с общими секциями", True)):
+        per_tick = retained_memory(encoded, share)
+        cpu = timing(encoded, share, args.repeat)
+        results[share] = (cpu, per_tick)
+        print(f"{label:<20} обработка {cpu:6.1f} мкс/тик   память {per_tick / 1024:6.1f} КБ на снимок")
+    (cpu_before, mem_before), (cpu_after, mem_after) = results[False], results[True]
+    print(f"\nЭкономия: CPU {100 * (1 - cpu_after / cpu_before):.0f}%, память {100 * (1 - mem_after / mem_before):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Бенчмарк: обработка данных GSI в режиме наблюдателя (все десять игроков).
+
+Прогоняет payload из scripts/fixtures/spectator_*.json и выводит пропускную
+способность (payload в секунду):
+- slot_players - поигровой обход: словарь на каждого игрока (так данные по
+  слотам получают при чтении сохраненного снимка);
+- DataProcessor.process_gsi_data - обработка снимка, как на сервере (данные
+  игроков по слотам при этом не копируются, они остаются в raw_data).
+
+Payload синтетические: составлены вручную по формату GSI наблюдателя, а не
+записаны из игры. Размер и состав секций настоящих payload могут
+отличаться. Раскладка по колонкам на этих payload не давала выигрыша перед
+поигровым обходом, поэтому оставлен более простой обход.
+
+Пример:
+    python scripts/bench_spectator.py --repeat 7
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from data_processor import DataProcessor  # noqa: E402
+from spectator import slot_players  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def measure(func, payload: dict, repeat: int) -> float:
+    """Возвращает число вызовов func(payload) в секунду (лучший из repeat замеров)."""
+    timer = timeit.Timer(lambda: func(payload))
+    number, _ = timer.autorange()
+    return number / min(timer.repeat(repeat=repeat, number=number))
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк обработки данных в режиме наблюдателя")
+    parser.add_argument("--repeat", type=int, default=7, help="Количество замеров каждого варианта")
+    args = parser.parse_args()
+    
+    variants = [
+        ("slot_players", slot_players),
+        ("process_gsi_data", DataProcessor.process_gsi_data),
+    ]
+    for fixture in sorted(FIXTURES_DIR.glob("spectator_*.json")):
+        payload = json.loads(fixture.read_text(encoding="utf-8"))
+        print(f"{fixture.name} (синтетический):")
+        for label, func in variants:
+            rate = measure(func, payload, args.repeat)
+            print(f"  {label:<24} {rate:10.0f} payload/с   {1e6 / rate:7.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Бенчмарк хранилища матчей (FileManager, интерфейс storage.MatchStorage).
+
+Записывает матчи во временную папку и измеряет:
+- скорость записи (обновлений в секунду, без учета подготовки данных) и
+  размер на диске;
+- задержку запросов: состояние на момент игрового времени, обновления за
+  60 секунд игрового времени и список матчей игрока по steamid (из каталога).
+
+Каждый матч - последовательность payload режима игрока с частотой 10 Гц,
+игрок матча выбирается из пула, чтобы у steamid было несколько матчей.
+
+Пример:
+    python scripts/bench_storage.py --matches 20 --updates 3000
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from catalog import MatchCatalog  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from file_manager import FileManager  # noqa: E402
+
+STEAMID_BASE = 76561198000000000
+TOWERS = [f"tower{tier}_{lane}" for tier in (1, 2, 3) for lane in ("top", "mid", "bot")]
+
+
+def make_payload(match: int, steamid: int, tick: int) -> dict:
+    """Payload GSI режима игрока для тика матча (10 тиков в секунду)."""
+    second = tick // 10
+    return {
+        "provider": {"name": "Dota 2", "appid": 570, "version": 47, "timestamp": 1760000000 + second},
+        "map": {"matchid": str(8200000000 + match), "game_time": second, "clock_time": second - 90,
+                "daytime": True, "game_state": "DOTA_GAMERULES_STATE_GAME_IN_PROGRESS", "paused": False},
+        "player": {"steamid": str(steamid), "name": f"player{steamid % 1000}", "kills": second // 90,
+                   "deaths": second // 200, "assists": second // 70, "last_hits": second // 6,
+                   "denies": second // 40, "gold": 600 + tick % 900, "gpm": 450, "xpm": 520},
+        "hero": {"id": 1, "name": "npc_dota_hero_antimage", "level": min(30, 1 + second // 100), "alive": True,
+                 "health": 900 - tick % 300, "max_health": 1200, "mana": 300 + tick % 50, "max_mana": 400,
+                 "xpos": tick % 7000, "ypos": -tick % 7000},
+        "abilities": {f"ability{slot}": {"name": f"hero_ability_{slot}", "level": 1, "can_cast": True,
+                                         "cooldown": max(0, 8 - (second + slot) % 20)} for slot in range(6)},
+        "items": {f"slot{slot}": {"name": "item_tango", "charges": 3} for slot in range(6)},
+        "buildings": {
+            "radiant": {f"dota_goodguys_{name}": {"health": 1800, "max_health": 1800} for name in TOWERS},
+            "dire": {f"dota_badguys_{name}": {"health": 1800, "max_health": 1800} for name in TOWERS},
+        },
+    }
+
+
+def ingest(storage, matches: int, updates: int, players: int) -> float:
+    """Записывает матчи в хранилище и возвращает время, потраченное хранилищем (в секундах)."""
+    spent = 0.0
+    for match in range(matches):
+        steamid = STEAMID_BASE + match % players
+        previous = None
+        for tick in range(updates):
+            previous = DataProcessor.process_gsi_data(make_payload(match, steamid, tick), previous)
+            started = time.perf_counter()
+            if tick == 0:
+                storage.start_new_match(previous)
+            else:
+                storage.save_match_data(previous)
+            spent += time.perf_counter() - started
+        started = time.perf_counter()
+        storage.finalize_match(previous)
+        spent += time.perf_counter() - started
+    return spent
+
+
+def latency(function, calls: list) -> tuple:
+    """p50 и p95 времени вызова (в мс)."""
+    samples = []
+    for args in calls:
+        started = time.perf_counter()
+        function(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def disk_size(directory: Path) -> int:
+    """Суммарный размер файлов в папке."""
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк хранилища матчей")
+    parser.add_argument("--matches", type=int, default=20, help="Количество матчей")
+    parser.add_argument("--updates", type=int, default=3000, help="Обновлений в матче (10 в секунду)")
+    parser.add_argument("--players", type=int, default=5, help="Размер пула игроков (steamid)")
+    parser.add_argument("--queries", type=int, default=200, help="Количество запросов каждого вида")
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    duration = args.updates // 10
+    match_ids = [str(8200000000 + match) for match in range(args.matches)]
+    state_calls = [(rng.choice(match_ids), rng.uniform(0, duration)) for _ in range(args.queries)]
+    range_calls = [(match_id, start, start + 60) for match_id, start in
+                   ((rng.choice(match_ids), rng.uniform(0, max(0, duration - 60))) for _ in range(args.queries))]
+    steamid_calls = [(str(STEAMID_BASE + rng.randrange(args.players)),) for _ in range(args.queries)]
+    
+    print(f"{args.matches} матчей по {args.updates} обновлений ({duration} с игры), игроков: {args.players}\n")
+    print(f"{'запись, обн/с':>14} {'на диске':>10}   "
+          f"{'state_at p50/p95':>17} {'60 с p50/p95':>16} {'steamid p50/p95':>16}  (мс)")
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        catalog = MatchCatalog(directory / "catalog.db", directory)
+        storage = FileManager(directory, session_key="bench", catalog=catalog)
+        spent = ingest(storage, args.matches, args.updates, args.players)
+        size = disk_size(directory)
+        results = [latency(storage.state_at, state_calls), latency(storage.updates_between, range_calls),
+                   latency(storage.match_ids_for_steamid, steamid_calls)]
+        sample = storage.updates_between(*range_calls[0])
+        found = len(storage.match_ids_for_steamid(*steamid_calls[0]))
+        catalog.close()
+        print(f"{args.matches * args.updates / spent:>14.0f} {size / 1024 / 1024:>8.1f} МБ   "
+              + "  ".join(f"{p50:>7.2f} / {p95:<7.2f}" for p50, p95 in results)
+              + f"  [проверка: {len(sample)} обн., {found} матчей]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Бенчмарк: пропускная способность приема GSI при разном количестве процессов сервера.
+
+Запускает сервер с SERVER_WORKERS=1, 2, 4 ... во временной папке output и
+отправляет payload от нескольких клиентов одновременно (у каждого свой auth token).
+
+Каждый запрос идет по новому соединению: процессы uvicorn делят один сокет,
+и соединение принимает любой из них, поэтому при нескольких процессах часть
+payload попадает не к владельцу сессии и пересылается ему (как у Dota 2,
+которая не держит соединение между запросами). С одним соединением на
+клиента все его запросы обрабатывал бы один процесс, и пересылка почти не
+проверялась бы.
+
+Пример:
+    python scripts/bench_workers.py --workers 1 2 4 --clients 16 --seconds 10
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def make_payload(token: str, tick: int) -> bytes:
+    """Создает минимальный payload GSI для одного тика матча."""
+    return json.dumps({
+        "auth": {"token": token},
+        "provider": {"name": "Dota 2", "appid": 570, "version": 47, "timestamp": 1700000000 + tick},
+        "map": {
+            "matchid": f"9{abs(hash(token)) % 10 ** 9}",
+            "game_time": tick // 10,
+            "clock_time": tick // 10 - 90,
+            "game_state": "DOTA_GAMERULES_STATE_GAME_IN_PROGRESS"
+        },
+        "player": {"steamid": "76561198000000000", "name": token, "gold": 600 + tick, "kills": tick // 600},
+        "hero": {"id": 1, "name": "npc_dota_hero_antimage", "level": 1 + tick // 600, "health": 640}
+    }).encode("utf-8")
+
+
+def free_port() -> int:
+    """Возвращает свободный TCP порт."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 30.0) -> None:
+    """Ждет, пока сервер начнет отвечать на /health."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Сервер не запустился")
+
+
+def client_loop(port: int, token: str, stop_at: float, latencies: list) -> None:
+    """Отправляет payload одного клиента подряд до stop_at (каждый по новому соединению)."""
+    tick = 0
+    while time.time() < stop_at:
+        body = make_payload(token, tick)
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        try:
+            conn.request("POST", "/", body=body, headers={"Content-Type": "application/json", "Connection": "close"})
+            conn.getresponse().read()
+        finally:
+            conn.close()
+        latencies.append(time.perf_counter() - started)
+        tick += 1
+
+
+def run(workers: int, clients: int, seconds: float) -> dict:
+    """Запускает сервер с заданным числом процессов и измеряет пропускную способность."""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as output_dir:
+        env = dict(os.environ, SERVER_WORKERS=str(workers), PORT=str(port), OUTPUT_DIR=output_dir)
+        server = subprocess.Popen(
+            [sys.executable, str(ROOT_DIR / "run_server.py")],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(port)
+            latencies = []
+            stop_at = time.time() + seconds
+            threads = [
+                threading.Thread(target=client_loop, args=(port, f"bench-{i}", stop_at, latencies))
+                for i in range(clients)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        # Матч каждого клиента должен остаться в одном файле, сколько бы процессов его ни принимали
+        match_files = len(list(Path(output_dir).glob("*/match_*.json")))
+    
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "workers": workers,
+        "match_files": match_files,
+        "requests": n,
+        "rps": n / seconds,
+        "p50_ms": latencies[n // 2] * 1000 if n else 0,
+        "p99_ms": latencies[min(n - 1, int(n * 0.99))] * 1000 if n else 0
+    }
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Бенчмарк приема GSI для разного числа процессов")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16, help="Количество одновременных клиентов GSI")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Длительность замера для каждого числа процессов")
+    args = parser.parse_args()
+    
+    print(f"Процессоров: {os.cpu_count()}, клиентов: {args.clients}")
+    print(f"{'Процессов':>10} {'Запросов':>10} {'Запросов/с':>12} {'p50, мс':>10} {'p99, мс':>10} {'Файлов':>8}")
+    failures = 0
+    for workers in args.workers:
+        result = run(workers, args.clients, args.seconds)
+        print(f"{result['workers']:>10} {result['requests']:>10} {result['rps']:>12.1f} "
+              f"{result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f} {result['match_files']:>8}")
+        failures += result["match_files"] != args.clients
+    if failures:
+        print("ОШИБКА: матч клиента записан не в один файл")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Проверка производной аналитики матча: инкрементальный подсчет равен пересчету по всей истории.
+
+Прогоняет матчи из gsi_generator (режим игрока и наблюдателя, несколько seed)
+через MatchSession во временной папке и сравнивает аналитику сессии с
+пересчетом по полной последовательности снимков - отдельной реализацией,
+которая считает каждый показатель по рядам значений игрока целиком. Кроме
+того проверяется, что аналитика сохранена в сводке матча, что повторная
+обработка (reprocess_match_file) пересчитывает ее по записанным снимкам, и
+выводится время обновления аналитики на тике в начале и в конце матча (оно
+не должно расти с длиной матча).
+
+Код возврата 1 при расхождении - скрипт можно запускать в CI.
+
+Пример:
+    python scripts/check_analytics.py --seeds 3 --game-minutes 40
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from data_processor import DataProcessor  # noqa: E402
+from gsi_generator import MatchSimulator  # noqa: E402
+from match_analytics import MatchAnalytics, tick_players  # noqa: E402
+from match_summary import read_match_summary  # noqa: E402
+from reprocess import reprocess_match_file  # noqa: E402
+from session import MatchSession  # noqa: E402
+
+
+def batch_analytics(stream: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Пересчитывает аналитику по всей последовательности снимков матча."""
+    rows: Dict[str, List[tuple]] = {}
+    teams: Dict[str, Any] = {}
+    for data in stream:
+        clock = data["raw_data"]["map"]["clock_time"]
+        for slot, player, hero, team in tick_players(data):
+            key = str(player.get("steamid") or (slot if slot is not None else "player"))
+            teams[key] = team
+            rows.setdefault(key, []).append((
+                clock, player.get("gold", 0), hero.get("xp", 0), player.get("kills", 0), player.get("deaths", 0),
+                player.get("assists", 0), hero.get("alive"), hero.get("respawn_seconds", 0),
+                hero.get("buyback_cooldown", 0), player.get("net_worth")
+            ))
+    last_map = stream[-1]["raw_data"]["map"]
+    team_kills = {"radiant": last_map["radiant_score"], "dire": last_map["dire_score"]}
+    players = {}
+    for key, series in rows.items():
+        clock, gold, xp, kills, deaths, assists, alive, respawn, cooldown, net_worth = map(list, zip(*series))
+        minute = [int(value // 60) if value > 0 else 0 for value in clock]
+        steps = range(1, len(series))
+        died = [False] + [deaths[i] > deaths[i - 1] for i in steps]
+        bought = [False] + [cooldown[i] > cooldown[i - 1] for i in steps]
+        delta = [0] + [gold[i] - gold[i - 1] for i in steps]
+        xp_delta = [0] + [max(0, xp[i] - xp[i - 1]) for i in steps]
+        gold_curve = [0] * (max(minute[i] for i in steps if delta[i] > 0) + 1 if any(d > 0 for d in delta) else 0)
+        xp_curve = [0] * (max(minute[i] for i in steps if xp_delta[i] > 0) + 1 if any(xp_delta) else 0)
+        for i in steps:
+            if delta[i] > 0:
+                gold_curve[minute[i]] += delta[i]
+            if xp_delta[i] > 0:
+                xp_curve[minute[i]] += xp_delta[i]
+        items_gold = sum(-delta[i] for i in steps if delta[i] < 0 and not died[i] and not bought[i])
+        earned = sum(gold_curve)
+        minutes = clock[-1] / 60 if clock[-1] > 0 else None
+        total = team_kills[teams[key]]
+        players[key] = {
+            "kills": kills[-1], "deaths": deaths[-1], "assists": assists[-1], "gold": gold[-1],
+            "net_worth": net_worth[-1] if net_worth[-1] is not None else gold[-1] + items_gold,
+            "items_gold": items_gold, "gold_earned": earned, "xp_earned": sum(xp_curve),
+            "gold_per_minute": gold_curve, "xp_per_minute": xp_curve,
+            "gpm": round(earned / minutes, 1) if minutes else None,
+            "xpm": round(sum(xp_curve) / minutes, 1) if minutes else None,
+            "kill_participation": round((kills[-1] + assists[-1]) / total, 4) if total else None,
+            "deaths_per_10": round(deaths[-1] / minutes * 10, 3) if minutes else None,
+            "dead_seconds": sum(respawn[i] for i in steps if died[i] and alive[i] is False)
+            - sum(respawn[i - 1] for i in steps if bought[i] and alive[i - 1] is False and alive[i] is not False),
+            "buybacks": sum(bought), "buyback_gold": sum(-delta[i] for i in steps if delta[i] < 0 and bought[i]
+                                                     and not died[i]),
+            "gold_lost": sum(-delta[i] for i in steps if delta[i] < 0 and died[i]),
+        }
+    return {"ticks": len(stream), "team_kills": team_kills, "players": players}
+
+
+def compare(label: str, actual: Dict[str, Any], expected: Dict[str, Any]) -> List[str]:
+    """Сравнивает аналитику сессии с пересчетом."""
+    failures = []
+    for name in ("ticks", "team_kills"):
+        if actual.get(name) != expected[name]:
+            failures.append(f"{label}: {name} {actual.get(name)} != {expected[name]}")
+    if set(actual["players"]) != set(expected["players"]):
+        failures.append(f"{label}: игроки {sorted(actual['players'])} != {sorted(expected['players'])}")
+        return failures
+    for key, fields in expected["players"].items():
+        record = actual["players"][key]
+        for name, value in fields.items():
+            if record.get(name) != value:
+                failures.append(f"{label}: игрок {key}, {name}: {record.get(name)} != {value}")
+    return failures
+
+
+def check_match(label: str, simulator: MatchSimulator) -> List[str]:
+    """Прогоняет матч через MatchSession и сверяет аналитику с пересчетом и сохраненной копией."""
+    failures = []
+    stream = []
+    with tempfile.TemporaryDirectory() as tmp:
+        session = MatchSession("check", output_dir=Path(tmp))
+        for raw_data in simulator:
+            session.handle(raw_data)
+            stream.append(session._last_processed)
+            if DataProcessor.is_match_ended(raw_data):
+                # Аналитика учитывает тики до первого снимка POST_GAME включительно
+                break
+        state = session.analytics.state
+        failures += compare(label, state, batch_analytics(stream))
+        saved = json.loads(json.dumps(state))
+        files = list(Path(tmp).rglob("*.json"))
+        stored = read_match_summary(files[0]).get("analytics") if len(files) == 1 else None
+        if stored != saved:
+            failures.append(f"{label}: сохраненная аналитика отличается от аналитики сессии")
+        if len(files) == 1:
+            # Повторная обработка считает аналитику по записанным снимкам документа
+            document = json.loads(files[0].read_text(encoding="utf-8"))
+            persisted = ([document["initial_state"]] + [update["data"] for update in document["updates"]]
+                         + ([document["final_state"]] if document.get("final_state") else []))
+            result = reprocess_match_file(files[0], force=True)
+            if result["status"] != "reprocessed":
+                failures.append(f"{label}: повторная обработка: {result['status']} ({result['reason']})")
+            else:
+                failures += compare(f"{label}, повторная обработка",
+                                    read_match_summary(files[0]).get("analytics") or {"players": {}},
+                                    batch_analytics(persisted))
+    players = state["players"].values()
+    print(f"{label}: {len(stream)} тиков, игроков {len(players)}, выкупов {sum(p['buybacks'] for p in players)}, "
+          f"смертей {sum(p['deaths'] for p in players)}, расхождений: {len(failures)}")
+    return failures
+
+
+def update_cost(simulator: MatchSimulator) -> None:
+    """Время обновления аналитики в первой и последней десятой части матча."""
+    stream = []
+    previous = None
+    for raw_data in simulator:
+        previous = DataProcessor.process_gsi_data(raw_data, previous)
+        stream.append(previous)
+    analytics = MatchAnalytics()
+    tenth = len(stream) // 10
+    timings = []
+    for part in (stream[:tenth], stream[tenth:-tenth], stream[-tenth:]):
+        started = time.perf_counter()
+        for data in part:
+            analytics.update(data)
+        timings.append((time.perf_counter() - started) / len(part) * 1e6)
+    print(f"  обновление на тике: {timings[0]:.1f} мкс в начале, {timings[2]:.1f} мкс в конце матча")
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Проверка инкрементальной аналитики матча")
+    parser.add_argument("--seeds", type=int, default=2, help="Сколько матчей каждого режима проверить")
+    parser.add_argument("--game-minutes", type=float, default=35.0, help="Длительность игры")
+    args = parser.parse_args()
+    
+    failures = []
+    for spectator in (False, True):
+        mode = "наблюдатель" if spectator else "игрок"
+        for seed in range(args.seeds):
+            simulator = MatchSimulator(seed, args.game_minutes, spectator=spectator)
+            failures += check_match(f"{mode}, seed {seed}", simulator)
+        update_cost(MatchSimulator(0, args.game_minutes, spectator=spectator))
+    
+    for failure in failures[:20]:
+        print(f"  ОШИБКА: {failure}")
+    if failures:
+        print(f"\nРасхождений: {len(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
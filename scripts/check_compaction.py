@@ -0,0 +1,97 @@
+"""Проверка сжатия матчей: прореживание не теряет ключевые моменты.
+
+Прогоняет матчи из gsi_generator в режиме игрока и в режиме наблюдателя через
+DataProcessor (как сервер), прореживает обновления (downsample_updates) и
+проверяет, что сохранено каждое обновление, в котором у кого-то из игроков
+изменились убийства, смерти, уровень или предметы, а также смена game_state,
+первое и последнее обновление. Переходы определяются по сырым данным GSI,
+независимо от compaction.key_state.
+
+Код возврата 1 при потере ключевого момента - скрипт можно запускать в CI.
+
+Пример:
+    python scripts/check_compaction.py --seed 1 --game-minutes 10
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from compaction import downsample_updates  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from gsi_generator import MatchSimulator  # noqa: E402
+from spectator import by_slot, is_spectator_payload  # noqa: E402
+
+
+def player_events(raw_data: dict) -> tuple:
+    """Убийства, смерти, уровень и предметы каждого игрока по сырым данным GSI."""
+    if is_spectator_payload(raw_data):
+        sections = zip(by_slot(raw_data.get("player")), by_slot(raw_data.get("hero")),
+                       by_slot(raw_data.get("items")))
+    else:
+        sections = [(raw_data.get("player"), raw_data.get("hero"), raw_data.get("items"))]
+    events = []
+    for player, hero, items in sections:
+        player, hero, items = player or {}, hero or {}, items or {}
+        events.append((
+            player.get("kills"), player.get("deaths"), hero.get("level"),
+            tuple(sorted((slot, item.get("name")) for slot, item in items.items() if isinstance(item, dict)))
+        ))
+    return tuple(events), (raw_data.get("map") or {}).get("game_state")
+
+
+def check_match(label: str, simulator: MatchSimulator, interval: float) -> list:
+    """Прореживает один матч и возвращает список потерянных ключевых моментов."""
+    started = datetime(2026, 1, 1)
+    updates = []
+    previous = None
+    for tick, raw_data in enumerate(simulator):
+        previous = DataProcessor.process_gsi_data(raw_data, previous)
+        timestamp = started + timedelta(seconds=tick / simulator.tick_rate)
+        updates.append({"timestamp": timestamp.isoformat(), "data": previous})
+    
+    kept = {id(update) for update in downsample_updates(updates, interval)}
+    failures = []
+    transitions = 0
+    before = None
+    for index, update in enumerate(updates):
+        events = player_events(update["data"]["raw_data"])
+        key_moment = index in (0, len(updates) - 1) or events != before
+        before = events
+        if not key_moment:
+            continue
+        transitions += 1
+        if id(update) not in kept:
+            failures.append(f"{label}: тик {index} потерян (изменились убийства, смерти, уровень, предметы "
+                            f"или game_state)")
+    print(f"{label}: {len(updates)} тиков -> {len(kept)}, ключевых моментов {transitions}, "
+          f"потеряно {len(failures)}")
+    return failures
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Проверка сжатия матчей")
+    parser.add_argument("--seed", type=int, default=1, help="Начальное значение генератора")
+    parser.add_argument("--game-minutes", type=float, default=10.0, help="Длительность игры")
+    parser.add_argument("--interval", type=float, default=1.0, help="Интервал между обычными обновлениями")
+    args = parser.parse_args()
+    
+    failures = []
+    for label, spectator in (("Режим игрока", False), ("Режим наблюдателя", True)):
+        failures += check_match(label, MatchSimulator(args.seed, args.game_minutes, spectator=spectator),
+                                args.interval)
+    
+    for failure in failures[:20]:
+        print(f"  ОШИБКА: {failure}")
+    if failures:
+        print(f"\nПотеряно ключевых моментов: {len(failures)}")
+        sys.exit(1)
+    print("Ключевые моменты сохранены")
+
+
+if __name__ == "__main__":
+    main()
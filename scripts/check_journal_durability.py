@@ -0,0 +1,202 @@
+"""Проверка журнала матча: процесс записи убивается посреди записи, данные до последнего fsync целы.
+
+Запускает в отдельном процессе писателя (FileManager с политикой fsync
+interval и частой перезаписью документа), который пишет пронумерованные
+обновления и сообщает родителю номер последнего обновления, уже сброшенного
+на диск (FileManager.synced_seq). Сброс журнала по таймеру выполняется в
+отдельном потоке, как в сервере (server.sync_journals). В случайный момент
+(в том числе посреди записи документа) писатель убивается через SIGKILL,
+после чего журнал воспроизводится (FileManager.recover_journals) и
+проверяется, что:
+- в документе есть все обновления до последнего сообщенного fsync;
+- обновления идут подряд, без пропусков и повторов;
+- после восстановления не осталось журнала и временного файла.
+
+Отдельно проверяется пауза в данных: после пачки обновлений писатель
+замолкает, и последнее обновление должно попасть на диск по таймеру за
+несколько интервалов fsync, без новых записей.
+
+SIGKILL не сбрасывает кэш ОС, поэтому проверяется падение процесса, а не
+отключение питания: для него гарантию дает только fsync, и проверка
+следит, что номер последнего fsync не обгоняет записанные данные.
+
+Код возврата 1 при потере данных - скрипт можно запускать в CI.
+
+Пример:
+    python scripts/check_journal_durability.py --rounds 30
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from file_manager import FileManager, journal_path_for, load_match_document  # noqa: E402
+
+FSYNC_INTERVAL = 0.02
+SAVE_INTERVAL = 0.05
+PADDING = "x" * 2000  # Крупные обновления, чтобы запись документа занимала заметное время
+
+
+def run_writer(output_dir: Path, match_id: str, burst: int) -> None:
+    """
+    Процесс писателя: пишет обновления и печатает номер последнего fsync.
+    
+    С burst > 0 пишет burst обновлений и замолкает (проверка сброса по таймеру).
+    """
+    file_manager = FileManager(output_dir, save_interval=SAVE_INTERVAL, fsync_policy="interval",
+                               fsync_interval=FSYNC_INTERVAL)
+    
+    def report():
+        reported = -1
+        while True:
+            file_manager.sync_journal()
+            if file_manager.synced_seq != reported:
+                reported = file_manager.synced_seq
+                print(f"synced {reported}", flush=True)
+            time.sleep(FSYNC_INTERVAL / 4)
+    
+    file_manager.start_new_match({"map": {"matchid": match_id}})
+    threading.Thread(target=report, daemon=True).start()
+    marker = 0
+    while True:
+        marker += 1
+        file_manager.save_match_data({"map": {"matchid": match_id, "game_time": marker}, "marker": marker,
+                                      "padding": PADDING})
+        if burst and marker >= burst:
+            print(f"written {marker}", flush=True)
+            time.sleep(3600)
+
+
+def spawn_writer(output_dir: Path, match_id: str, burst: int = 0) -> subprocess.Popen:
+    """Запускает писателя в отдельном процессе."""
+    return subprocess.Popen(
+        [sys.executable, __file__, "--writer", str(output_dir), "--match-id", match_id, "--burst", str(burst)],
+        stdout=subprocess.PIPE, text=True
+    )
+
+
+class WriterOutput:
+    """Читает сообщения писателя в отдельном потоке."""
+    
+    def __init__(self, process: subprocess.Popen):
+        self.synced = 0
+        self.written = None
+        self._thread = threading.Thread(target=self._read, args=(process,), daemon=True)
+        self._thread.start()
+    
+    def _read(self, process: subprocess.Popen) -> None:
+        for line in process.stdout:
+            kind, _, value = line.strip().partition(" ")
+            if kind == "synced":
+                self.synced = max(self.synced, int(value))
+            elif kind == "written":
+                self.written = int(value)
+    
+    def join(self) -> None:
+        self._thread.join()
+
+
+def recovered_markers(output_dir: Path) -> tuple:
+    """Восстанавливает журнал и возвращает (номера обновлений в документе, список проблем)."""
+    problems = []
+    recovered = FileManager(output_dir).recover_journals()
+    paths = sorted(output_dir.glob("*/match_*.json"))
+    if len(paths) != 1:
+        return [], [f"ожидался один файл матча, найдено {len(paths)}"]
+    match_path = paths[0]
+    if journal_path_for(match_path).exists() and match_path not in recovered:
+        problems.append("журнал не воспроизведен")
+    if list(match_path.parent.glob(match_path.name + ".*tmp")):
+        problems.append("остался временный файл документа")
+    _, updates = load_match_document(match_path)
+    return [json.loads(encoded)["data"]["marker"] for encoded in updates], problems
+
+
+def check_crash(round_index: int, rng: random.Random) -> list:
+    """Один прогон: убийство писателя в случайный момент и проверка восстановления."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        process = spawn_writer(output_dir, str(9100000000 + round_index))
+        output = WriterOutput(process)
+        time.sleep(rng.uniform(0.3, 1.2))
+        process.kill()
+        process.wait()
+        output.join()
+        
+        markers, problems = recovered_markers(output_dir)
+        if markers != list(range(1, len(markers) + 1)):
+            problems.append("обновления идут не подряд (пропуск или повтор)")
+        if len(markers) < output.synced:
+            problems.append(f"потеряны обновления после fsync: в документе {len(markers)}, "
+                            f"сброшено на диск {output.synced}")
+        print(f"  прогон {round_index + 1}: сброшено на диск {output.synced}, восстановлено {len(markers)}")
+        return [f"прогон {round_index + 1}: {problem}" for problem in problems]
+
+
+def check_quiet_period(burst: int) -> list:
+    """Пауза в данных: последнее обновление попадает на диск по таймеру."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        process = spawn_writer(output_dir, "9199999999", burst=burst)
+        output = WriterOutput(process)
+        deadline = time.monotonic() + 30
+        while output.written is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        written_at = time.monotonic()
+        while output.synced < burst and time.monotonic() - written_at < FSYNC_INTERVAL * 10:
+            time.sleep(0.005)
+        waited = time.monotonic() - written_at
+        process.kill()
+        process.wait()
+        output.join()
+        
+        problems = []
+        if output.synced < burst:
+            problems.append(f"пауза: последнее обновление {burst} не сброшено на диск за {waited:.2f} с "
+                            f"(сброшено {output.synced})")
+        markers, recover_problems = recovered_markers(output_dir)
+        if markers != list(range(1, burst + 1)):
+            problems.append(f"пауза: восстановлено {len(markers)} обновлений из {burst}")
+        print(f"Пауза в данных: обновление {burst} сброшено на диск через {waited * 1000:.0f} мс после записи")
+        return problems + recover_problems
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Проверка журнала матча при падении процесса")
+    parser.add_argument("--rounds", type=int, default=10, help="Сколько раз убить писателя")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно случайных моментов убийства")
+    parser.add_argument("--writer", help=argparse.SUPPRESS)
+    parser.add_argument("--match-id", help=argparse.SUPPRESS)
+    parser.add_argument("--burst", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.writer:
+        run_writer(Path(args.writer), args.match_id, args.burst)
+        return
+    
+    rng = random.Random(args.seed)
+    failures = []
+    print(f"Убийство писателя (fsync раз в {FSYNC_INTERVAL * 1000:.0f} мс, "
+          f"запись документа раз в {SAVE_INTERVAL * 1000:.0f} мс):")
+    for round_index in range(args.rounds):
+        failures += check_crash(round_index, rng)
+    failures += check_quiet_period(burst=37)
+    
+    for failure in failures:
+        print(f"  ОШИБКА: {failure}")
+    if failures:
+        sys.exit(1)
+    print("Потерь нет")
+
+
+if __name__ == "__main__":
+    main()
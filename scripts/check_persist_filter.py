@@ -0,0 +1,223 @@
+"""Проверка фильтра значимых обновлений: ни один значимый переход не теряется.
+
+Генерирует случайную последовательность payload с частотой 10 Гц (убийства,
+смерти и возрождение, помощь, уровни, покупки, урон по зданиям, доход золота,
+регенерация здоровья и маны, смена game_state) в режиме игрока и в режиме
+наблюдателя, прогоняет ее через MatchSession во временной папке и читает
+записанный файл матча. Проверяется, что:
+- записан каждый снимок, значимые поля которого (persist_filter.significant_state
+  и здания) отличаются от предыдущего снимка;
+- золото любого снимка отличается от последнего записанного до него не больше
+  чем на порог;
+- текущее состояние сессии в памяти - всегда последний снимок, а final_state -
+  последний снимок матча;
+- на модельном времени (0.1 с на тик) промежуток между записанными снимками
+  не превышает максимальный интервал.
+
+Выводит долю отброшенных снимков. Код возврата 1 при нарушении - скрипт можно
+запускать в CI.
+
+Пример:
+    python scripts/check_persist_filter.py --ticks 20000 --seed 7
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from data_processor import DataProcessor  # noqa: E402
+from file_manager import load_match_document  # noqa: E402
+from persist_filter import PersistFilter, gold_values, significant_state  # noqa: E402
+from session import MatchSession  # noqa: E402
+
+# Синтетический payload наблюдателя (составлен вручную по формату GSI, не запись из игры)
+FIXTURE = Path(__file__).parent / "fixtures" / "spectator_in_progress.json"
+TICK_SECONDS = 0.1
+ITEMS = ["item_tango", "item_magic_wand", "item_power_treads", "item_blink", "item_black_king_bar", "item_manta"]
+
+
+def _mutate_player(rng: random.Random, player: Dict[str, Any], hero: Dict[str, Any],
+                   items: Dict[str, Any], tick: int) -> None:
+    """Один тик жизни игрока: регенерация, доход и редкие значимые события."""
+    hero["health"] = min(hero["max_health"], hero["health"] + rng.randint(0, 3))
+    hero["mana"] = min(hero["max_mana"], hero["mana"] + rng.randint(0, 2))
+    hero["xpos"] += rng.randint(-30, 30)
+    player["gold"] += rng.randint(0, 4)
+    if hero["alive"]:
+        roll = rng.random()
+        if roll < 0.002:
+            player["kills"] += 1
+            player["gold"] += rng.randint(150, 400)
+        elif roll < 0.004:
+            player["assists"] += 1
+        elif roll < 0.005:
+            player["deaths"] += 1
+            hero["alive"] = False
+            hero["respawn_seconds"] = tick + rng.randint(50, 400)
+        elif roll < 0.008:
+            hero["level"] = min(30, hero["level"] + 1)
+        elif roll < 0.010:
+            # Покупка: золото тратится, предмет появляется в слоте
+            slot = f"slot{rng.randrange(6)}"
+            items[slot] = {"name": rng.choice(ITEMS), "purchaser": 0, "can_cast": True, "cooldown": 0}
+            player["gold"] = max(0, player["gold"] - rng.randint(50, 2000))
+    elif tick >= hero["respawn_seconds"]:
+        hero["alive"] = True
+        hero["respawn_seconds"] = 0
+
+
+def player_payloads(ticks: int, seed: int) -> Iterator[Dict[str, Any]]:
+    """Последовательность payload режима игрока."""
+    rng = random.Random(seed)
+    player = {"steamid": "76561198000000001", "name": "check", "kills": 0, "deaths": 0, "assists": 0,
+              "last_hits": 0, "denies": 0, "gold": 600}
+    hero = {"id": 1, "name": "npc_dota_hero_antimage", "level": 1, "alive": True, "respawn_seconds": 0,
+            "health": 600, "max_health": 1200, "mana": 200, "max_mana": 400, "xpos": 0, "ypos": 0}
+    items = {f"slot{i}": {"name": "empty"} for i in range(9)}
+    buildings = {
+        "radiant": {"dota_goodguys_tower1_mid": {"health": 1800, "max_health": 1800}},
+        "dire": {"dota_badguys_tower1_mid": {"health": 1800, "max_health": 1800}},
+    }
+    yield from _sequence(rng, ticks, lambda tick: _mutate_player(rng, player, hero, items, tick),
+                         lambda: {"player": player, "hero": hero, "items": items, "buildings": buildings},
+                         buildings)
+
+
+def spectator_payloads(ticks: int, seed: int) -> Iterator[Dict[str, Any]]:
+    """Последовательность payload режима наблюдателя (на основе фикстуры)."""
+    rng = random.Random(seed)
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    slots = [(team, f"player{slot}") for team, first in (("team2", 0), ("team3", 5)) for slot in range(first, first + 5)]
+    
+    def mutate(tick: int) -> None:
+        for team, slot in slots:
+            _mutate_player(rng, base["player"][team][slot], base["hero"][team][slot], base["items"][team][slot], tick)
+    
+    yield from _sequence(rng, ticks, mutate, lambda: {key: base[key] for key in base if key not in ("map", "provider")},
+                         base["buildings"])
+
+
+def _sequence(rng: random.Random, ticks: int, mutate, sections, buildings: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Общая часть последовательности: время, game_state, атаки на здания."""
+    for tick in range(ticks):
+        if tick < 100:
+            game_state = "DOTA_GAMERULES_STATE_PRE_GAME"
+        elif tick < ticks - 1:
+            game_state = "DOTA_GAMERULES_STATE_GAME_IN_PROGRESS"
+        else:
+            game_state = "DOTA_GAMERULES_STATE_POST_GAME"
+        mutate(tick)
+        if tick % 600 < 30:
+            # Атака на башню: здоровье падает несколько тиков подряд
+            team = rng.choice(list(buildings))
+            building = next(iter(buildings[team].values()))
+            building["health"] = max(0, building["health"] - rng.randint(0, 20))
+        payload = {
+            "provider": {"name": "Dota 2", "appid": 570, "version": 47, "timestamp": 1760000000 + tick},
+            "map": {"matchid": "8100000001", "game_time": tick // 10, "clock_time": tick // 10 - 90,
+                    "game_state": game_state, "paused": False},
+        }
+        payload.update(sections())
+        # Как после разбора тела запроса: каждый payload - новые объекты
+        yield json.loads(json.dumps(payload))
+
+
+def _fail(failures: List[str], message: str) -> None:
+    """Запоминает нарушение."""
+    failures.append(message)
+    print(f"  ОШИБКА: {message}")
+
+
+def check_session(label: str, payloads: Iterator[Dict[str, Any]], persist_filter: PersistFilter) -> List[str]:
+    """Прогоняет последовательность через MatchSession и проверяет записанный файл матча."""
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        session = MatchSession("check", output_dir=Path(tmp))
+        session.persist_filter = persist_filter
+        stream = []
+        for raw_data in payloads:
+            session.handle(raw_data)
+            stream.append(session._last_processed)
+            header = session.file_manager._header
+            if header is not None and "current_state" in header and header["current_state"] is not stream[-1]:
+                _fail(failures, f"тик {len(stream) - 1}: текущее состояние в памяти - не последний снимок")
+        files = list(Path(tmp).rglob("*.json"))
+        if len(files) != 1:
+            _fail(failures, f"ожидался один файл матча, найдено {len(files)}")
+            return failures
+        header, encoded = load_match_document(files[0])
+    
+    persisted = {json.loads(line)["data"]["metadata"]["timestamp"] for line in encoded}
+    persisted.add(stream[0]["metadata"]["timestamp"])  # Первый снимок - initial_state
+    if header.get("final_state", {}).get("metadata") != stream[-1]["metadata"]:
+        _fail(failures, "final_state - не последний снимок")
+    
+    previous = last_persisted = None
+    for tick, data in enumerate(stream):
+        key = (significant_state(data), data.get("buildings"))
+        stored = data["metadata"]["timestamp"] in persisted
+        if previous is not None and key != previous and not stored:
+            _fail(failures, f"тик {tick}: значимый переход не записан")
+        if last_persisted is not None and any(
+            old is not None and new is not None and abs(new - old) > persist_filter.gold_delta
+            for old, new in zip(gold_values(last_persisted), gold_values(data))
+        ) and not stored:
+            _fail(failures, f"тик {tick}: золото ушло от записанного больше чем на {persist_filter.gold_delta:g}")
+        if stored:
+            last_persisted = data
+        previous = key
+    
+    print(f"{label}: {len(stream)} снимков, записано {len(persisted)}, "
+          f"отброшено {1 - len(persisted) / len(stream):.1%}, нарушений: {len(failures)}")
+    return failures
+
+
+def check_interval(label: str, payloads: Iterator[Dict[str, Any]], persist_filter: PersistFilter) -> List[str]:
+    """Проверяет максимальный интервал между записями на модельном времени."""
+    failures: List[str] = []
+    previous = None
+    last_persisted_at = 0.0
+    for tick, raw_data in enumerate(payloads):
+        now = tick * TICK_SECONDS
+        previous = DataProcessor.process_gsi_data(raw_data, previous)
+        if tick == 0:
+            persist_filter.start(previous, now)
+        elif persist_filter.should_persist(previous, now):
+            last_persisted_at = now
+        elif now - last_persisted_at >= persist_filter.max_interval + 1e-9:
+            _fail(failures, f"тик {tick}: {now - last_persisted_at:.1f} с без записи")
+    print(f"{label} (модельное время): записано {persist_filter.persisted}, "
+          f"отброшено {persist_filter.reduction():.1%}, нарушений: {len(failures)}")
+    return failures
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Проверка фильтра значимых обновлений")
+    parser.add_argument("--ticks", type=int, default=6000, help="Количество тиков в каждом режиме (10 в секунду)")
+    parser.add_argument("--seed", type=int, default=1, help="Начальное значение генератора случайных чисел")
+    parser.add_argument("--gold-delta", type=float, default=100, help="Порог изменения золота")
+    parser.add_argument("--max-interval", type=float, default=1.0, help="Максимальный интервал между записями")
+    args = parser.parse_args()
+    
+    failures = []
+    for label, payloads in (("Режим игрока", player_payloads), ("Режим наблюдателя", spectator_payloads)):
+        failures += check_session(label, payloads(args.ticks, args.seed),
+                                  PersistFilter(args.gold_delta, args.max_interval, enabled=True))
+        failures += check_interval(label, payloads(args.ticks, args.seed),
+                                   PersistFilter(args.gold_delta, args.max_interval, enabled=True))
+    
+    if failures:
+        print(f"\nНарушений: {len(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Проверка истории игроков: приращения при завершении матчей равны проходу по архиву и пересчету.
+
+Прогоняет несколько матчей из gsi_generator (режим наблюдателя и игрока,
+игроки случайно перемешаны между матчами и командами) через MatchSession с
+историей игроков, затем строит вторую историю параллельным проходом по
+сохраненным файлам и сравнивает обе с прямым пересчетом по
+match_participants всех матчей. Повторный проход не должен ничего добавить.
+Выводится время запроса истории игрока.
+
+Код возврата 1 при расхождении - скрипт можно запускать в CI.
+
+Пример:
+    python scripts/check_player_history.py --matches 6 --game-minutes 3
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from compaction import find_match_files  # noqa: E402
+from file_manager import read_match_header  # noqa: E402
+from gsi_generator import MatchSimulator  # noqa: E402
+from player_history import PlayerHistory, match_participants  # noqa: E402
+from session import MatchSession  # noqa: E402
+
+POOL_SIZE = 14
+STEAMID_BASE = 76561198000000100
+
+
+def expected_history(headers):
+    """Прямой пересчет агрегатов по игрокам всех матчей."""
+    players = {}
+    for header in headers:
+        participants = match_participants(header)
+        for player in participants:
+            entry = players.setdefault(player["steamid"], {
+                "games": 0, "wins": 0, "decided": 0, "kda": [0, 0, 0], "stat_games": 0, "rates": [0.0, 0.0],
+                "rate_games": 0, "heroes": {}, "teammate": {}, "opponent": {}
+            })
+            entry["games"] += 1
+            entry["decided"] += player["won"] is not None
+            entry["wins"] += bool(player["won"])
+            if player["kills"] is not None:
+                entry["stat_games"] += 1
+                for index, field in enumerate(("kills", "deaths", "assists")):
+                    entry["kda"][index] += player[field]
+            if player["gpm"] is not None:
+                entry["rate_games"] += 1
+                entry["rates"][0] += player["gpm"]
+                entry["rates"][1] += player["xpm"]
+            if player["hero"]:
+                entry["heroes"][player["hero"]] = entry["heroes"].get(player["hero"], 0) + 1
+            for other in participants:
+                if other is player or player["team"] is None or other["team"] is None:
+                    continue
+                relation = "teammate" if other["team"] == player["team"] else "opponent"
+                entry[relation][other["steamid"]] = entry[relation].get(other["steamid"], 0) + 1
+    return players
+
+
+def compare(label, history: PlayerHistory, expected) -> list:
+    """Сравнивает историю из базы с пересчетом."""
+    failures = []
+    for steamid, entry in expected.items():
+        actual = history.history(steamid, limit=50)
+        if actual is None:
+            failures.append(f"{label}: игрок {steamid} не найден")
+            continue
+        checks = {
+            "games": (actual["games"], entry["games"]),
+            "wins": (actual["wins"], entry["wins"]),
+            "losses": (actual["losses"], entry["decided"] - entry["wins"]),
+            "avg_kills": (actual["avg_kills"], round(entry["kda"][0] / entry["stat_games"], 2)
+                          if entry["stat_games"] else None),
+            "avg_assists": (actual["avg_assists"], round(entry["kda"][2] / entry["stat_games"], 2)
+                            if entry["stat_games"] else None),
+            "avg_gpm": (actual["avg_gpm"], round(entry["rates"][0] / entry["rate_games"], 2)
+                        if entry["rate_games"] else None),
+            "heroes": ({hero["hero"]: hero["games"] for hero in actual["heroes"]}, entry["heroes"]),
+            "teammates": ({peer["steamid"]: peer["games"] for peer in actual["teammates"]}, entry["teammate"]),
+            "opponents": ({peer["steamid"]: peer["games"] for peer in actual["opponents"]}, entry["opponent"]),
+        }
+        for name, (got, want) in checks.items():
+            if isinstance(got, float) or isinstance(want, float):
+                mismatch = got is None or want is None or abs(got - want) > 0.011
+            else:
+                mismatch = got != want
+            if mismatch:
+                failures.append(f"{label}: игрок {steamid}, {name}: {got} != {want}")
+    return failures
+
+
+def play_match(session: MatchSession, seed: int, game_minutes: float, spectator: bool) -> None:
+    """Прогоняет матч, подменяя SteamID игроков случайными из общего пула."""
+    rng = random.Random(seed)
+    pool = rng.sample(range(POOL_SIZE), 10)
+    mapping = {str(STEAMID_BASE + slot): str(STEAMID_BASE + 1000 + pool[slot]) for slot in range(10)}
+    for raw_data in MatchSimulator(seed, game_minutes, spectator=spectator, match_id=str(8400000000 + seed)):
+        text = json.dumps(raw_data)
+        for old, new in mapping.items():
+            text = text.replace(old, new)
+        session.handle(json.loads(text))
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Проверка истории игроков")
+    parser.add_argument("--matches", type=int, default=5, help="Сколько матчей прогнать")
+    parser.add_argument("--game-minutes", type=float, default=3.0, help="Длительность игры")
+    parser.add_argument("--jobs", type=int, default=2, help="Процессов для прохода по архиву")
+    args = parser.parse_args()
+    
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        incremental = PlayerHistory(output_dir / "history.db", output_dir)
+        session = MatchSession("check", output_dir=output_dir, history=incremental)
+        for seed in range(args.matches):
+            # Каждый третий матч - в режиме игрока (известен только сам игрок)
+            play_match(session, seed, args.game_minutes, spectator=seed % 3 != 2)
+        session.close()
+        
+        paths = find_match_files(output_dir)
+        headers = [read_match_header(path) for path in paths]
+        finished = [header for header in headers if header.get("match_end")]
+        expected = expected_history(finished)
+        print(f"Матчей: {len(paths)}, завершено: {len(finished)}, игроков: {len(expected)}")
+        if len(finished) != args.matches:
+            failures.append(f"завершено {len(finished)} матчей из {args.matches}")
+        
+        failures += compare("приращения", incremental, expected)
+        
+        scanned = PlayerHistory(output_dir / "scanned.db", output_dir)
+        started = time.perf_counter()
+        result = scanned.backfill(jobs=args.jobs)
+        print(f"Проход по архиву: {result['scanned']} файлов, добавлено {result['added']} матчей "
+              f"за {time.perf_counter() - started:.2f} с")
+        failures += compare("проход по архиву", scanned, expected)
+        again = scanned.backfill(jobs=1)
+        if again["added"]:
+            failures.append(f"повторный проход добавил {again['added']} матчей")
+        if incremental.backfill(jobs=1)["added"]:
+            failures.append("проход по архиву повторно учел матчи, добавленные при завершении")
+        
+        steamids = list(expected)
+        started = time.perf_counter()
+        for index in range(1000):
+            incremental.history(steamids[index % len(steamids)])
+        print(f"Запрос истории игрока: {(time.perf_counter() - started) * 1000:.0f} мкс")
+        incremental.close()
+        scanned.close()
+    
+    for failure in failures[:20]:
+        print(f"  ОШИБКА: {failure}")
+    if failures:
+        print(f"\nРасхождений: {len(failures)}")
+        sys.exit(1)
+    print("Расхождений нет")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Проверка времени запуска: бюджет импорта точек входа и время до первого запроса сервера.
+
+Для каждой точки входа (сервер, бот, CLI) модуль импортируется в отдельном
+процессе с ``python -X importtime``, и суммарное время импорта сравнивается с
+бюджетом. Импорт выполняется с пустой OUTPUT_DIR: если после импорта она
+появилась, значит модуль трогает файловую систему при импорте - это тоже
+ошибка. Точки входа, для которых не установлены зависимости (fastapi,
+discord.py), пропускаются. Для бота импорт discord_bot.py - это все, что
+происходит до подключения к Discord (само подключение зависит от сети).
+
+С ``--serve`` дополнительно запускается run_server.py и измеряется время от
+старта процесса до первого успешного ответа /health.
+
+Код возврата 1, если какой-либо бюджет превышен, - скрипт можно запускать в CI.
+
+Пример:
+    python scripts/check_startup.py --serve
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Бюджет импорта точек входа (в миллисекундах), с запасом для медленных машин
+IMPORT_BUDGETS_MS = {
+    "run_server": 600,
+    "discord_bot": 700,
+    "get_players": 100,
+    "test_bot": 100,
+    "compact_matches": 120,
+    "export_matches": 120,
+    "visualize_match": 100,
+}
+# Бюджет времени от запуска run_server.py до первого ответа /health
+SERVER_READY_BUDGET_MS = 1500
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+_MISSING_MODULE = re.compile(r"ModuleNotFoundError: No module named '([^']+)'")
+
+
+def measure_import(module: str, repeat: int) -> Tuple[Optional[float], str]:
+    """
+    Измеряет время импорта модуля точки входа.
+    
+    Returns:
+        (лучшее время импорта в мс или None, описание проблемы или пустая строка)
+    """
+    code = f"import sys; sys.path.insert(0, {str(ROOT_DIR)!r}); import {module}"
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_dir = Path(tmp) / "output"
+            env = dict(os.environ, OUTPUT_DIR=str(output_dir))
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", code],
+                cwd=tmp, env=env, capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                missing = _MISSING_MODULE.search(result.stderr)
+                if missing:
+                    return None, f"пропущен: не установлен {missing.group(1)}"
+                return None, "ошибка импорта:\n" + result.stderr.strip().splitlines()[-1]
+            if output_dir.exists():
+                return None, f"создает {output_dir.name}/ при импорте"
+        total = None
+        for line in result.stderr.splitlines():
+            match = _IMPORT_LINE.match(line)
+            if match and not match.group(3) and match.group(4) == module:
+                total = int(match.group(2)) / 1000
+        if total is not None and (best is None or total < best):
+            best = total
+    return best, ""
+
+
+def _free_port() -> int:
+    """Возвращает свободный TCP порт."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_server_ready(timeout: float = 30.0) -> Tuple[Optional[float], str]:
+    """
+    Запускает run_server.py и ждет первого успешного ответа /health.
+    
+    Returns:
+        (время до первого ответа в мс или None, описание проблемы или пустая строка)
+    """
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PORT=str(port), OUTPUT_DIR=tmp, SERVER_WORKERS="1")
+        # Логи сервера - в файл, чтобы заполненный pipe не остановил процесс
+        log_path = Path(tmp) / "server.log"
+        started = time.perf_counter()
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(
+                [sys.executable, str(ROOT_DIR / "run_server.py")],
+                env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+        try:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    missing = _MISSING_MODULE.search(log_path.read_text(encoding="utf-8", errors="replace"))
+                    if missing:
+                        return None, f"пропущен: не установлен {missing.group(1)}"
+                    return None, f"сервер завершился с кодом {process.returncode}"
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                        if response.status == 200:
+                            return (time.perf_counter() - started) * 1000, ""
+                except OSError:
+                    time.sleep(0.01)
+            return None, f"нет ответа за {timeout:.0f} с"
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def report(label: str, value: Optional[float], budget: float, problem: str, failures: Dict[str, str]) -> None:
+    """Печатает результат проверки и запоминает превышения бюджета."""
+    if value is None:
+        print(f"  {label:<28} {problem}")
+        if not problem.startswith("пропущен"):
+            failures[label] = problem
+        return
+    status = "ok" if value <= budget else "ПРЕВЫШЕН"
+    print(f"  {label:<28} {value:8.1f} мс   бюджет {budget:6.0f} мс   {status}")
+    if value > budget:
+        failures[label] = f"{value:.1f} мс > {budget:.0f} мс"
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Проверка времени запуска точек входа")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество замеров импорта (берется лучший)")
+    parser.add_argument("--serve", action="store_true", help="Измерить время до первого ответа сервера")
+    parser.add_argument("--scale", type=float, default=1.0, help="Множитель бюджетов (для медленных машин)")
+    args = parser.parse_args()
+    
+    failures: Dict[str, str] = {}
+    print("Время импорта точек входа (python -X importtime):")
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        value, problem = measure_import(module, args.repeat)
+        report(f"{module}.py", value, budget * args.scale, problem, failures)
+    
+    if args.serve:
+        print("\nЗапуск сервера:")
+        value, problem = measure_server_ready()
+        report("run_server.py -> /health", value, SERVER_READY_BUDGET_MS * args.scale, problem, failures)
+    
+    if failures:
+        print(f"\nПревышено бюджетов: {len(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
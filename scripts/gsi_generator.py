@@ -0,0 +1,537 @@
+"""Детерминированный генератор payload Dota 2 GSI для проверок и нагрузочных тестов.
+
+MatchSimulator моделирует матч от загрузки до экрана результатов и выдает
+payload в том виде, в котором их отправляет клиент Dota 2 (throttle 0.1 -
+10 payload в секунду):
+- game_state проходит весь цикл: WAIT_FOR_PLAYERS_TO_LOAD, HERO_SELECTION,
+  STRATEGY_TIME, PRE_GAME, GAME_IN_PROGRESS и POST_GAME с win_team;
+- у десяти героев растут золото (надежное и ненадежное), опыт и уровень,
+  добиваются крипы, в драках случаются убийства, смерти с возрождением или
+  выкупом и помощь, покупаются предметы и изучаются способности;
+- башни и казармы теряют здоровье и разрушаются (разрушенные здания
+  пропадают из buildings, как в игре), матч заканчивается разрушением трона
+  проигравшей команды;
+- events: руны богатства, рошан и аегис, убийства курьеров;
+- в режиме наблюдателя (spectator=True) секции player, hero, abilities и
+  items содержат всех игроков по командам (team2/team3 -> player0..9), как в
+  scripts/fixtures/spectator_in_progress.json; в режиме игрока - только
+  игрока-стримера, а buildings - только его команду.
+
+Одинаковые параметры и seed дают одинаковую последовательность; каждый
+payload - новые объекты (как после разбора тела запроса).
+
+Пример (JSON Lines в stdout):
+    python scripts/gsi_generator.py --seed 3 --game-minutes 5 --spectator > match.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+PHASES = (
+    ("DOTA_GAMERULES_STATE_WAIT_FOR_PLAYERS_TO_LOAD", 5),
+    ("DOTA_GAMERULES_STATE_HERO_SELECTION", 30),
+    ("DOTA_GAMERULES_STATE_STRATEGY_TIME", 15),
+    ("DOTA_GAMERULES_STATE_PRE_GAME", 90),
+)
+GAME_IN_PROGRESS = "DOTA_GAMERULES_STATE_GAME_IN_PROGRESS"
+POST_GAME = "DOTA_GAMERULES_STATE_POST_GAME"
+POST_GAME_SECONDS = 10
+
+STEAMID_BASE = 76561198000000000
+HEROES = [
+    (1, "antimage"), (2, "axe"), (5, "crystal_maiden"), (8, "juggernaut"), (11, "nevermore"), (14, "pudge"),
+    (17, "storm_spirit"), (18, "sven"), (22, "zuus"), (25, "lina"), (26, "lion"), (27, "shadow_shaman"),
+    (35, "sniper"), (41, "faceless_void"), (44, "phantom_assassin"), (74, "invoker"), (86, "rubick"),
+    (106, "ember_spirit"), (114, "monkey_king"), (129, "mars"),
+]
+STARTING_ITEMS = ["item_tango", "item_branches", "item_quelling_blade"]
+ITEM_BUILD = [
+    ("item_boots", 500), ("item_magic_wand", 450), ("item_power_treads", 1400), ("item_blink", 2250),
+    ("item_black_king_bar", 4050), ("item_manta", 4650), ("item_butterfly", 5450), ("item_satanic", 5050),
+]
+NEUTRAL_ITEMS = ["item_arcane_ring", "item_grove_bow", "item_spider_legs", "item_timeless_relic"]
+ITEM_SLOTS = [f"slot{i}" for i in range(9)] + [f"stash{i}" for i in range(6)]
+# Суммарный опыт для уровней 2..30
+XP_LEVELS = [240, 640, 1160, 1760, 2440, 3200, 4000, 4900, 5900, 7000, 8200, 9500, 10900, 12400, 14000,
+             15700, 17500, 19400, 21400, 23600, 26000, 28600, 31400, 34400, 38400, 43400, 49400, 56400, 63900]
+LANES = ("top", "mid", "bot")
+FIGHTS_PER_SECOND = 1 / 35
+TEAM_KEYS = {"radiant": "team2", "dire": "team3"}
+
+
+def building_layout(team: str) -> Dict[str, int]:
+    """Здания команды с максимальным здоровьем, от внешних к трону (порядок разрушения)."""
+    prefix, short = ("goodguys", "good") if team == "radiant" else ("badguys", "bad")
+    layout = {}
+    for tier, health in ((1, 1800), (2, 2500), (3, 2500)):
+        for lane in LANES:
+            layout[f"dota_{prefix}_tower{tier}_{lane}"] = health
+    for lane in LANES:
+        layout[f"{short}_rax_melee_{lane}"] = 2200
+        layout[f"{short}_rax_range_{lane}"] = 1300
+    layout[f"dota_{prefix}_tower4_top"] = 2600
+    layout[f"dota_{prefix}_tower4_bot"] = 2600
+    layout[f"{prefix}_fort"] = 4500
+    return layout
+
+
+class MatchSimulator:
+    """Модель одного матча, выдающая payload GSI с заданной частотой."""
+    
+    def __init__(self, seed: int = 0, game_minutes: float = 30.0, tick_rate: float = 10.0,
+                 spectator: bool = False, match_id: Optional[str] = None, token: Optional[str] = None,
+                 start_timestamp: int = 1760000000):
+        """
+        Args:
+            seed: Начальное значение генератора случайных чисел
+            game_minutes: Длительность GAME_IN_PROGRESS (до разрушения трона)
+            tick_rate: Payload в секунду (1 / throttle из конфига GSI)
+            spectator: Режим наблюдателя (все десять игроков) вместо режима игрока
+            match_id: map.matchid (по умолчанию выводится из seed)
+            token: auth.token (по нему сервер определяет сессию)
+            start_timestamp: provider.timestamp первого payload
+        """
+        self.seed = seed
+        self.game_seconds = max(60.0, game_minutes * 60)
+        self.tick_rate = tick_rate
+        self.spectator = spectator
+        self.match_id = match_id or str(8300000000 + seed)
+        self.token = token
+        self.start_timestamp = start_timestamp
+    
+    @property
+    def total_ticks(self) -> int:
+        """Количество payload в матче."""
+        seconds = sum(duration for _, duration in PHASES) + self.game_seconds + POST_GAME_SECONDS
+        return int(seconds * self.tick_rate)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Выдает payload матча по порядку (каждый вызов - заново с того же seed)."""
+        rng = random.Random(self.seed)
+        match = _Match(rng, self)
+        dt = 1.0 / self.tick_rate
+        for tick in range(self.total_ticks):
+            match.advance(tick * dt, dt)
+            yield match.payload()
+
+
+class _Match:
+    """Состояние матча: фаза, игроки, здания и события."""
+    
+    def __init__(self, rng: random.Random, simulator: MatchSimulator):
+        self.rng = rng
+        self.simulator = simulator
+        self.streamer = rng.randrange(10)
+        self.winner = rng.choice(("radiant", "dire"))
+        heroes = rng.sample(HEROES, 10)
+        self.players = [_player(rng, slot, heroes[slot]) for slot in range(10)]
+        self.buildings = {team: dict(building_layout(team)) for team in ("radiant", "dire")}
+        self.health = {team: dict(layout) for team, layout in self.buildings.items()}
+        self.sieges = self._plan_sieges()
+        self.events: List[Dict[str, Any]] = []
+        self.score = {"radiant": 0, "dire": 0}
+        self.seconds = 0.0
+        self.game_state = PHASES[0][0]
+        self.clock_time = 0
+        self.clock = 0.0
+        self.next_rune = 0.0
+        self.next_roshan = rng.uniform(15, 20) * 60
+    
+    def _plan_sieges(self) -> List[List[Any]]:
+        """
+        План разрушения зданий: [команда, здание, начало осады, конец осады].
+        
+        Проигравшая команда теряет все внешние башни, одну линию до казарм,
+        четвертые башни и трон (конец осады трона - конец игры); победитель -
+        часть внешних башен.
+        """
+        rng = self.rng
+        loser = "dire" if self.winner == "radiant" else "radiant"
+        prefix, short = ("goodguys", "good") if loser == "radiant" else ("badguys", "bad")
+        lane = rng.choice(LANES)
+        targets = []
+        for tier in ("tower1", "tower2"):
+            towers = [name for name in self.buildings[loser] if tier in name]
+            rng.shuffle(towers)
+            targets += towers
+        targets += [f"dota_{prefix}_tower3_{lane}", f"{short}_rax_range_{lane}", f"{short}_rax_melee_{lane}",
+                    f"dota_{prefix}_tower4_top", f"dota_{prefix}_tower4_bot", f"{prefix}_fort"]
+        end = self.simulator.game_seconds
+        sieges = []
+        for index, name in enumerate(targets, 1):
+            finish = end * (0.25 + 0.75 * index / len(targets))
+            sieges.append([loser, name, finish - rng.uniform(20, 45), finish])
+        winner_towers = [name for name in self.buildings[self.winner] if "tower1" in name]
+        for name in rng.sample(winner_towers, rng.randint(1, 3)):
+            finish = rng.uniform(0.3, 0.8) * end
+            sieges.append([self.winner, name, finish - rng.uniform(20, 45), finish])
+        return sieges
+    
+    def advance(self, seconds: float, dt: float) -> None:
+        """Продвигает матч к моменту seconds от начала загрузки."""
+        self.seconds = seconds
+        elapsed = seconds
+        for game_state, duration in PHASES:
+            if elapsed < duration:
+                self.game_state = game_state
+                # До горна часы идут от -90 (PRE_GAME), в выборе героев - обратный отсчет фазы
+                self.clock_time = int(elapsed - duration) if game_state.endswith("PRE_GAME") else int(duration - elapsed)
+                if game_state.endswith("PRE_GAME"):
+                    for player in self.players:
+                        _regenerate(player, dt)
+                return
+            elapsed -= duration
+        if elapsed < self.simulator.game_seconds:
+            self.game_state = GAME_IN_PROGRESS
+            self.clock_time = int(elapsed)
+            self.clock = elapsed
+            self._play(elapsed, dt)
+            return
+        if self.game_state != POST_GAME:
+            loser = "dire" if self.winner == "radiant" else "radiant"
+            self._destroy(loser, "goodguys_fort" if loser == "radiant" else "badguys_fort", elapsed)
+        self.game_state = POST_GAME
+    
+    def _play(self, clock: float, dt: float) -> None:
+        """Один тик игры: фарм, драки, осады и события."""
+        rng = self.rng
+        for player in self.players:
+            _farm(rng, player, clock, dt)
+        if rng.random() < FIGHTS_PER_SECOND * dt:
+            self._fight(clock)
+        for team, name, start, finish in self.sieges:
+            if start <= clock and name in self.buildings[team]:
+                if clock >= finish:
+                    self._destroy(team, name, clock)
+                else:
+                    maximum = self.buildings[team][name]
+                    self.health[team][name] = int(maximum * (finish - clock) / (finish - start))
+        if clock >= self.next_rune:
+            for team in ("radiant", "dire"):
+                player = rng.choice([p for p in self.players if p["team"] == team])
+                value = 36 + int(clock // 300) * 9
+                self._event(clock, "bounty_rune_pickup", player_id=player["slot"], team=team,
+                            bounty_value=value, team_gold=value * 5)
+                player["gold_reliable"] += value
+                player["earned"] += value
+            self.next_rune += 180
+        if clock >= self.next_roshan:
+            killer = rng.choice([p for p in self.players if p["alive"]])
+            self._event(clock, "roshan_killed", killed_by_team=killer["team"], killer_player_id=killer["slot"])
+            self._event(clock, "aegis_picked_up", player_id=killer["slot"], snatched=rng.random() < 0.1)
+            self.next_roshan = clock + rng.uniform(8, 11) * 60
+        if rng.random() < dt / 600:
+            owner, killer = rng.sample(self.players, 2)
+            if owner["team"] != killer["team"]:
+                self._event(clock, "courier_killed", courier_team=owner["team"], killer_player_id=killer["slot"],
+                            owner_player_id=owner["slot"])
+    
+    def _fight(self, clock: float) -> None:
+        """Драка: один из живых героев погибает, убийце - золото, союзникам убийцы - помощь."""
+        rng = self.rng
+        alive = [player for player in self.players if player["alive"]]
+        victims = [player for player in alive if any(other["team"] != player["team"] for other in alive)]
+        if not victims:
+            return
+        victim = rng.choice(victims)
+        enemies = [player for player in alive if player["team"] != victim["team"]]
+        killer = rng.choice(enemies)
+        for helper in rng.sample([p for p in enemies if p is not killer], min(len(enemies) - 1, rng.randint(0, 3))):
+            helper["assists"] += 1
+            helper["gold_reliable"] += 60
+            helper["earned"] += 60
+            helper["hero_damage"] += rng.randint(100, 600)
+        bounty = 110 + 8 * victim["level"] + 30 * victim["kill_streak"]
+        killer["kills"] += 1
+        killer["kill_streak"] += 1
+        killer["gold_reliable"] += bounty
+        killer["earned"] += bounty
+        killer["hero_damage"] += rng.randint(400, 1500)
+        killer["health"] = max(1, killer["health"] - rng.randint(100, 500))
+        lost = min(victim["gold_unreliable"], 30 * victim["level"])
+        victim["gold_unreliable"] -= lost
+        victim["deaths"] += 1
+        victim["kill_streak"] = 0
+        victim["alive"] = False
+        victim["health"] = 0
+        victim["respawn_at"] = clock + 4 + 2.5 * victim["level"]
+        if clock > 1200 and clock >= victim["buyback_until"] and rng.random() < 0.2:
+            # Поздняя игра: часть смертей заканчивается выкупом
+            victim["buyback_at"] = clock + rng.uniform(2, (victim["respawn_at"] - clock) / 2)
+        self.score[killer["team"]] += 1
+    
+    def _destroy(self, team: str, name: str, clock: float) -> None:
+        """Разрушает здание: оно пропадает из buildings, атакующей команде - золото."""
+        if name not in self.buildings[team]:
+            return
+        del self.buildings[team][name]
+        del self.health[team][name]
+        attackers = [player for player in self.players if player["team"] != team]
+        for player in attackers:
+            player["gold_reliable"] += 90
+            player["earned"] += 90
+            player["tower_damage"] += self.rng.randint(100, 600)
+    
+    def _event(self, clock: float, event_type: str, **fields: Any) -> None:
+        """Добавляет событие (список events растет в течение матча)."""
+        self.events.append({"game_time": int(clock), "event_type": event_type, **fields})
+    
+    def payload(self) -> Dict[str, Any]:
+        """Payload GSI текущего тика."""
+        simulator = self.simulator
+        started = self.game_state not in (PHASES[0][0], PHASES[1][0])
+        payload: Dict[str, Any] = {
+            "provider": {"name": "Dota 2", "appid": 570, "version": 47,
+                         "timestamp": simulator.start_timestamp + int(self.seconds)},
+            "map": {
+                "name": "start", "matchid": simulator.match_id, "game_time": int(self.seconds),
+                "clock_time": self.clock_time, "daytime": self.clock_time % 600 < 300,
+                "nightstalker_night": False, "radiant_score": self.score["radiant"],
+                "dire_score": self.score["dire"], "game_state": self.game_state, "paused": False,
+                "win_team": self.winner if self.game_state == POST_GAME else "none",
+                "customgamename": "", "ward_purchase_cooldown": 0
+            },
+        }
+        if simulator.spectator:
+            sections = {"player": {}, "hero": {}, "abilities": {}, "items": {}}
+            for player in self.players:
+                team_key = TEAM_KEYS[player["team"]]
+                slot_key = f"player{player['slot']}"
+                values = {"player": _player_section(player, self.clock)}
+                if started:
+                    values.update(hero=_hero_section(player, self.clock), abilities=_abilities_section(player),
+                                  items=_items_section(player))
+                for section, value in values.items():
+                    sections[section].setdefault(team_key, {})[slot_key] = value
+            payload.update({section: value for section, value in sections.items() if value})
+            payload["buildings"] = self._buildings_section(("radiant", "dire"))
+            payload["draft"] = {}
+            payload["wearables"] = {}
+        else:
+            player = self.players[self.streamer]
+            payload["player"] = _player_section(player, self.clock)
+            if started:
+                payload["hero"] = _hero_section(player, self.clock)
+                payload["abilities"] = _abilities_section(player)
+                payload["items"] = _items_section(player)
+            payload["buildings"] = self._buildings_section((player["team"],))
+        payload["events"] = [dict(event) for event in self.events]
+        if simulator.token:
+            payload["auth"] = {"token": simulator.token}
+        return payload
+    
+    def _buildings_section(self, teams) -> Dict[str, Any]:
+        """Секция buildings для команд."""
+        return {
+            team: {name: {"health": health, "max_health": self.buildings[team][name]}
+                   for name, health in self.health[team].items()}
+            for team in teams
+        }
+
+
+def _player(rng: random.Random, slot: int, hero: tuple) -> Dict[str, Any]:
+    """Начальное состояние игрока слота (0-4 - Radiant, 5-9 - Dire)."""
+    hero_id, hero_name = hero
+    player = {
+        "slot": slot, "team": "radiant" if slot < 5 else "dire", "steamid": str(STEAMID_BASE + 100 + slot),
+        "name": f"player_{slot}", "hero_id": hero_id, "hero_name": f"npc_dota_hero_{hero_name}",
+        "kills": 0, "deaths": 0, "assists": 0, "last_hits": 0, "denies": 0, "kill_streak": 0,
+        "gold_reliable": 0, "gold_unreliable": 600.0, "earned": 0.0, "spent": 0,
+        "xp": 0.0, "level": 1, "alive": True, "respawn_at": 0.0, "health": 0, "mana": 0,
+        "xpos": -6700 if slot < 5 else 6700, "ypos": -6200 if slot < 5 else 6000,
+        "hero_damage": 0, "tower_damage": 0, "farm": rng.uniform(0.08, 0.3),
+        "buyback_at": None, "buyback_until": 0.0,
+        "abilities": [{"name": f"{hero_name}_ability_{index}", "level": 0, "cooldown": 0.0}
+                      for index in range(4)],
+        "items": {slot_name: None for slot_name in ITEM_SLOTS}, "build": 0, "neutral": None,
+    }
+    for index, name in enumerate(STARTING_ITEMS):
+        player["items"][f"slot{index}"] = name
+    player["gold_unreliable"] -= 250
+    player["spent"] += 250
+    _learn_ability(rng, player)
+    player["health"] = _max_health(player)
+    player["mana"] = _max_mana(player)
+    return player
+
+
+def _max_health(player: Dict[str, Any]) -> int:
+    return 560 + 90 * (player["level"] - 1)
+
+
+def _max_mana(player: Dict[str, Any]) -> int:
+    return 300 + 40 * (player["level"] - 1)
+
+
+def _learn_ability(rng: random.Random, player: Dict[str, Any]) -> None:
+    """Очко способности нового уровня: ультимейт на 6/12/18, иначе обычная способность."""
+    abilities = player["abilities"]
+    ultimate = abilities[3]
+    if player["level"] in (6, 12, 18) and ultimate["level"] < 3:
+        ultimate["level"] += 1
+        return
+    basic = [ability for ability in abilities[:3] if ability["level"] < 4]
+    if basic:
+        lowest = min(ability["level"] for ability in basic)
+        rng.choice([ability for ability in basic if ability["level"] == lowest])["level"] += 1
+
+
+def _regenerate(player: Dict[str, Any], dt: float) -> None:
+    """Регенерация здоровья и маны живого героя."""
+    if player["alive"]:
+        player["health"] = min(_max_health(player), player["health"] + 3 * dt)
+        player["mana"] = min(_max_mana(player), player["mana"] + 1.5 * dt)
+
+
+def _farm(rng: random.Random, player: Dict[str, Any], clock: float, dt: float) -> None:
+    """Тик жизни героя: доход, опыт, уровни, способности, покупки и перемещение."""
+    if not player["alive"]:
+        if player["buyback_at"] is not None and clock >= player["buyback_at"]:
+            player["buyback_at"] = None
+            cost = _buyback_cost(player)
+            if _gold(player) >= cost:
+                unreliable = min(player["gold_unreliable"], cost)
+                player["gold_unreliable"] -= unreliable
+                player["gold_reliable"] -= cost - unreliable
+                player["buyback_until"] = clock + 480
+                player["respawn_at"] = clock
+        if clock >= player["respawn_at"]:
+            player["alive"] = True
+            player["health"] = _max_health(player)
+            player["mana"] = _max_mana(player)
+            player["xpos"], player["ypos"] = (-6700, -6200) if player["team"] == "radiant" else (6700, 6000)
+        return
+    # Пассивный доход - 1.5 золота в секунду
+    player["gold_unreliable"] += 1.5 * dt
+    player["earned"] += 1.5 * dt
+    player["xp"] += rng.uniform(2, 4) * dt
+    if rng.random() < player["farm"] * dt:
+        gold = rng.randint(34, 62)
+        player["last_hits"] += 1
+        player["gold_unreliable"] += gold
+        player["earned"] += gold
+        player["xp"] += rng.randint(20, 60)
+    elif rng.random() < player["farm"] * dt / 8:
+        player["denies"] += 1
+    while player["level"] < 30 and player["xp"] >= XP_LEVELS[player["level"] - 1]:
+        player["level"] += 1
+        _learn_ability(rng, player)
+    _regenerate(player, dt)
+    if rng.random() < 0.4 * dt:
+        player["health"] = max(1, player["health"] - rng.randint(20, 150))
+    for ability in player["abilities"]:
+        ability["cooldown"] = max(0.0, ability["cooldown"] - dt)
+        if ability["level"] and not ability["cooldown"] and player["mana"] >= 100 and rng.random() < 0.05 * dt:
+            player["mana"] -= 100
+            ability["cooldown"] = rng.uniform(8, 20) if ability is not player["abilities"][3] else rng.uniform(60, 120)
+    player["xpos"] = max(-8000, min(8000, player["xpos"] + rng.randint(-40, 40)))
+    player["ypos"] = max(-8000, min(8000, player["ypos"] + rng.randint(-40, 40)))
+    if player["build"] < len(ITEM_BUILD):
+        name, cost = ITEM_BUILD[player["build"]]
+        if _gold(player) >= cost and rng.random() < 0.2 * dt:
+            _spend(player, cost)
+            free = [slot for slot in ITEM_SLOTS if player["items"][slot] is None]
+            # Полный инвентарь - продается самый дешевый стартовый предмет
+            slot = free[0] if free else next((s for s in ITEM_SLOTS if player["items"][s] in STARTING_ITEMS), None)
+            if slot is not None:
+                player["items"][slot] = name
+            player["build"] += 1
+    if player["neutral"] is None and clock >= 420:
+        player["neutral"] = rng.choice(NEUTRAL_ITEMS)
+
+
+def _buyback_cost(player: Dict[str, Any]) -> int:
+    return 200 + 12 * player["level"]
+
+
+def _gold(player: Dict[str, Any]) -> int:
+    return int(player["gold_reliable"] + player["gold_unreliable"])
+
+
+def _spend(player: Dict[str, Any], cost: int) -> None:
+    """Тратит сначала ненадежное золото, потом надежное."""
+    unreliable = min(player["gold_unreliable"], cost)
+    player["gold_unreliable"] -= unreliable
+    player["gold_reliable"] -= cost - unreliable
+    player["spent"] += cost
+
+
+def _player_section(player: Dict[str, Any], clock: float) -> Dict[str, Any]:
+    """Секция player одного игрока (clock - секунды игры после горна)."""
+    minutes = max(1.0, clock / 60)
+    return {
+        "steamid": player["steamid"], "accountid": str(int(player["steamid"]) - 76561197960265728),
+        "name": player["name"], "activity": "playing", "kills": player["kills"], "deaths": player["deaths"],
+        "assists": player["assists"], "last_hits": player["last_hits"], "denies": player["denies"],
+        "kill_streak": player["kill_streak"], "team_name": player["team"], "player_slot": player["slot"],
+        "team_slot": player["slot"] % 5, "gold": _gold(player), "gold_reliable": int(player["gold_reliable"]),
+        "gold_unreliable": int(player["gold_unreliable"]), "gpm": int(player["earned"] / minutes),
+        "xpm": int(player["xp"] / minutes), "net_worth": _gold(player) + player["spent"],
+        "hero_damage": player["hero_damage"], "hero_healing": 0, "tower_damage": player["tower_damage"]
+    }
+
+
+def _hero_section(player: Dict[str, Any], clock: float) -> Dict[str, Any]:
+    """Секция hero одного игрока (clock - секунды игры после горна)."""
+    max_health = _max_health(player)
+    max_mana = _max_mana(player)
+    health = int(player["health"])
+    mana = int(player["mana"])
+    return {
+        "xpos": player["xpos"], "ypos": player["ypos"], "id": player["hero_id"], "name": player["hero_name"],
+        "level": player["level"], "xp": int(player["xp"]), "alive": player["alive"],
+        "respawn_seconds": 0 if player["alive"] else max(0, int(player["respawn_at"] - clock)),
+        "buyback_cost": _buyback_cost(player), "buyback_cooldown": max(0, int(player["buyback_until"] - clock)),
+        "health": health, "max_health": max_health, "health_percent": health * 100 // max_health,
+        "mana": mana, "max_mana": max_mana, "mana_percent": mana * 100 // max_mana,
+        "silenced": False, "stunned": False, "disarmed": False, "magicimmune": False, "hexed": False,
+        "muted": False, "break": False, "aghanims_scepter": False, "aghanims_shard": False,
+        "smoked": False, "has_debuff": False
+    }
+
+
+def _abilities_section(player: Dict[str, Any]) -> Dict[str, Any]:
+    """Секция abilities одного игрока."""
+    return {
+        f"ability{index}": {
+            "name": ability["name"], "level": ability["level"], "can_cast": bool(ability["level"])
+            and not ability["cooldown"], "passive": False, "ability_active": True,
+            "cooldown": int(ability["cooldown"]), "ultimate": index == 3
+        }
+        for index, ability in enumerate(player["abilities"])
+    }
+
+
+def _items_section(player: Dict[str, Any]) -> Dict[str, Any]:
+    """Секция items одного игрока."""
+    def item(name: Optional[str], **extra: Any) -> Dict[str, Any]:
+        if name is None:
+            return {"name": "empty"}
+        return {"name": name, "purchaser": player["slot"], "item_level": 1, "can_cast": True,
+                "cooldown": 0, "passive": False, **extra}
+    
+    items = {slot: item(name) for slot, name in player["items"].items()}
+    items["teleport0"] = item("item_tpscroll", charges=1)
+    items["neutral0"] = item(player["neutral"])
+    return items
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Генератор payload Dota 2 GSI (JSON Lines в stdout)")
+    parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора случайных чисел")
+    parser.add_argument("--game-minutes", type=float, default=30.0, help="Длительность игры (GAME_IN_PROGRESS)")
+    parser.add_argument("--tick-rate", type=float, default=10.0, help="Payload в секунду")
+    parser.add_argument("--spectator", action="store_true", help="Режим наблюдателя (все десять игроков)")
+    parser.add_argument("--token", help="auth.token в каждом payload")
+    args = parser.parse_args()
+    
+    simulator = MatchSimulator(args.seed, args.game_minutes, args.tick_rate, args.spectator, token=args.token)
+    for payload in simulator:
+        sys.stdout.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""Нагрузочный тест сервера: одновременные клиенты GSI до насыщения.
+
+Каждый клиент - отдельный экземпляр Dota 2 со своим auth.token (своя сессия
+на сервере) и своим матчем из gsi_generator. Как и игра, клиент держит одно
+соединение (keep-alive) и ждет ответа перед следующим payload: следующий
+уходит через 1 / tick-rate секунды после предыдущего или сразу после ответа,
+если ответ пришел позже (пропущенные тики не догоняются).
+
+Нагрузка растет ступенями (--clients 1,10,50,...), клиенты предыдущих
+ступеней продолжают работать. На каждой ступени после прогрева измеряются:
+- выполненные запросы в секунду и доля от ожидаемых (клиенты * tick-rate);
+- задержка ответа p50/p95/p99 и ошибки;
+- очереди сессий клиентов из /health: сервер отвечает сразу, а обработка
+  идет в очереди сессии, поэтому отставание обработки видно по
+  объединенным (coalesced) и отброшенным (dropped) payload. При нескольких
+  процессах сервера /health показывает только сессии ответившего процесса.
+
+Ступень насыщена, если выполнено меньше 95% ожидаемых запросов, p99 выше
+--max-p99-ms, ошибок больше 1% или больше 1% payload объединено/отброшено в
+очередях. Тест останавливается после первой насыщенной ступени и выводит,
+сколько клиентов (стримеров) сервер выдерживает.
+
+Payload заранее кодируются (--variants матчей), в каждый запрос только
+подставляются токен и match_id клиента, поэтому генерация не нагружает
+клиент. Загрузка CPU клиента выводится для каждой ступени: если она около
+100%, упирается сам тест, а не сервер.
+
+Тест создает на сервере матчи - запускайте сервер с отдельной OUTPUT_DIR
+или с флагом --serve: тогда скрипт сам запускает run_server.py (SERVER_WORKERS
+из --workers) во временной папке.
+
+Пример:
+    python scripts/load_gsi.py --serve --workers 1 --clients 1,10,50,100,200 --duration 10
+    python scripts/load_gsi.py --url http://127.0.0.1:3000/ --spectator
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_workers import ROOT_DIR, free_port, wait_ready  # noqa: E402
+from gsi_generator import MatchSimulator  # noqa: E402
+
+TOKEN_PLACEHOLDER = "__LOAD_TOKEN__"
+MATCH_PLACEHOLDER = "__LOAD_MATCH__"
+
+
+class HttpConnection:
+    """Минимальный клиент HTTP/1.1 с keep-alive (один запрос за раз)."""
+    
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.path = parts.path or "/"
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+    
+    async def request(self, method: str, body: bytes = b"", path: Optional[str] = None) -> Tuple[int, bytes]:
+        """
+        Отправляет запрос и читает ответ.
+        
+        Returns:
+            (HTTP статус, тело ответа)
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        head = (f"{method} {path or self.path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        try:
+            self._writer.write(head.encode("ascii") + body)
+            await self._writer.drain()
+            status_line = await self._reader.readline()
+            if not status_line:
+                raise ConnectionError("Сервер закрыл соединение")
+            status = int(status_line.split()[1])
+            length = 0
+            keep_alive = True
+            while True:
+                line = await self._reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                name = name.strip().lower()
+                if name == "content-length":
+                    length = int(value)
+                elif name == "connection" and value.strip().lower() == "close":
+                    keep_alive = False
+            data = await self._reader.readexactly(length)
+        except BaseException:
+            self.close()
+            raise
+        if not keep_alive:
+            self.close()
+        return status, data
+    
+    def close(self) -> None:
+        """Закрывает соединение (следующий запрос откроет новое)."""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+class StepStats:
+    """Результаты запросов одной ступени нагрузки."""
+    
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+    
+    def record(self, latency: float, ok: bool) -> None:
+        """Запоминает результат запроса."""
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+
+
+def session_key(token: str) -> str:
+    """Ключ сессии на сервере для токена (как server.get_session_key)."""
+    return f"token-{hashlib.sha1(token.encode('utf-8')).hexdigest()[:12]}"
+
+
+def encode_variants(variants: int, game_minutes: float, tick_rate: float, spectator: bool) -> List[List[bytes]]:
+    """Кодирует матчи-образцы с местами для токена и match_id клиента."""
+    encoded = []
+    for seed in range(variants):
+        simulator = MatchSimulator(seed, game_minutes, tick_rate, spectator, match_id=MATCH_PLACEHOLDER,
+                                   token=TOKEN_PLACEHOLDER)
+        encoded.append([json.dumps(payload, separators=(",", ":")).encode("utf-8") for payload in simulator])
+    return encoded
+
+
+async def run_client(index: int, url: str, bodies: List[bytes], offset: int, run_id: int, args,
+                     window: List[Optional[StepStats]], stop: asyncio.Event) -> None:
+    """Один клиент: отправляет payload своего матча с частотой tick-rate."""
+    loop = asyncio.get_running_loop()
+    connection = HttpConnection(url)
+    token = f"load-{run_id}-{index}".encode("utf-8")
+    token_placeholder = TOKEN_PLACEHOLDER.encode("utf-8")
+    match_placeholder = MATCH_PLACEHOLDER.encode("utf-8")
+    interval = 1.0 / args.tick_rate
+    position, lap = offset, 0
+    match_id = f"9{run_id:05d}{index:04d}{lap:02d}".encode("utf-8")
+    next_at = loop.time()
+    while not stop.is_set():
+        body = bodies[position].replace(token_placeholder, token).replace(match_placeholder, match_id)
+        started = time.perf_counter()
+        try:
+            status, data = await asyncio.wait_for(connection.request("POST", body), args.timeout)
+            # Ошибки обработки сервер возвращает с кодом 200 и status "error"
+            ok = status == 200 and json.loads(data).get("status") == "ok"
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            connection.close()
+            ok = False
+        stats = window[0]
+        if stats is not None:
+            stats.record(time.perf_counter() - started, ok)
+        position += 1
+        if position == len(bodies):
+            # Матч закончился - следующий круг идет как новый матч
+            position, lap = 0, lap + 1
+            match_id = f"9{run_id:05d}{index:04d}{lap % 100:02d}".encode("utf-8")
+        next_at += interval
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            next_at = loop.time()
+    connection.close()
+
+
+async def queue_totals(url: str, keys: set) -> Optional[Dict[str, int]]:
+    """Суммирует статистику очередей сессий клиентов из /health (None, если недоступно)."""
+    connection = HttpConnection(url)
+    try:
+        status, data = await asyncio.wait_for(connection.request("GET", path="/health"), 30)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+        return None
+    finally:
+        connection.close()
+    if status != 200:
+        return None
+    totals = {"processed": 0, "coalesced": 0, "dropped": 0, "depth": 0}
+    for key, session in json.loads(data).get("sessions", {}).items():
+        queue = session.get("queue")
+        if key in keys and queue:
+            for name in totals:
+                totals[name] += queue.get(name, 0)
+    return totals
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Перцентиль отсортированной выборки."""
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else 0.0
+
+
+def summarize(clients: int, stats: StepStats, before: Optional[Dict[str, int]], after: Optional[Dict[str, int]],
+              args) -> Dict[str, Any]:
+    """Итоги ступени и причины насыщения."""
+    elapsed = time.perf_counter() - stats.started
+    samples = sorted(stats.latencies)
+    sent = len(samples)
+    expected = clients * args.tick_rate * elapsed
+    result = {
+        "clients": clients,
+        "rps": sent / elapsed,
+        "share": sent / expected if expected else 0.0,
+        "p50": statistics.median(samples) * 1000 if samples else 0.0,
+        "p95": percentile(samples, 0.95) * 1000,
+        "p99": percentile(samples, 0.99) * 1000,
+        "errors": stats.errors / sent if sent else 1.0,
+        "cpu": (time.process_time() - stats.cpu_started) / elapsed,
+        "lost": None,
+        "depth": None,
+    }
+    if before is not None and after is not None:
+        lost = after["coalesced"] + after["dropped"] - before["coalesced"] - before["dropped"]
+        result["lost"] = lost / sent if sent else 0.0
+        result["depth"] = after["depth"]
+    reasons = []
+    if result["share"] < 0.95:
+        reasons.append(f"выполнено {result['share']:.0%} запросов")
+    if result["p99"] > args.max_p99_ms:
+        reasons.append(f"p99 {result['p99']:.0f} мс")
+    if result["errors"] > 0.01:
+        reasons.append(f"ошибок {result['errors']:.1%}")
+    if result["lost"] is not None and result["lost"] > 0.01:
+        reasons.append(f"объединено/отброшено в очередях {result['lost']:.1%}")
+    result["reasons"] = reasons
+    return result
+
+
+async def run(args) -> int:
+    """Проводит ступени нагрузки; возвращает код возврата."""
+    steps = sorted({int(value) for value in args.clients.split(",") if value.strip()})
+    run_id = args.run_id if args.run_id is not None else int(time.time()) % 100000
+    started = time.perf_counter()
+    variants = encode_variants(args.variants, args.game_minutes, args.tick_rate, args.spectator)
+    size = sum(len(body) for bodies in variants for body in bodies)
+    print(f"Матчей-образцов: {len(variants)} по {len(variants[0])} payload "
+          f"({size / len(variants) / len(variants[0]) / 1024:.1f} КБ в среднем, всего {size / 1024 / 1024:.0f} МБ, "
+          f"подготовка {time.perf_counter() - started:.1f} с)")
+    if await queue_totals(args.url, set()) is None:
+        print(f"Сервер {args.url} не отвечает на /health")
+        return 1
+    
+    rng = random.Random(run_id)
+    window: List[Optional[StepStats]] = [None]
+    stop = asyncio.Event()
+    tasks: List[asyncio.Task] = []
+    keys: set = set()
+    interval = 1.0 / args.tick_rate
+    results = []
+    print(f"\nКлиентов: ступени {steps}, {args.tick_rate:g} payload/с на клиента, "
+          f"прогрев {args.warmup:g} с, замер {args.duration:g} с\n")
+    print(f"{'клиенты':>8} {'запросов/с':>11} {'выполнено':>10} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'ошибки':>7} {'очереди':>8} {'CPU':>5}")
+    try:
+        for clients in steps:
+            # Новые клиенты стартуют вразброс в пределах одного тика и с разных мест матча
+            for index in range(len(tasks), clients):
+                bodies = variants[index % len(variants)]
+                offset = rng.randrange(len(bodies))
+                keys.add(session_key(f"load-{run_id}-{index}"))
+                tasks.append(asyncio.create_task(run_client(index, args.url, bodies, offset, run_id, args,
+                                                            window, stop)))
+                if index % 50 == 49:
+                    await asyncio.sleep(interval / 10)
+            await asyncio.sleep(args.warmup)
+            before = await queue_totals(args.url, keys)
+            window[0] = stats = StepStats()
+            await asyncio.sleep(args.duration)
+            window[0] = None
+            after = await queue_totals(args.url, keys)
+            result = summarize(clients, stats, before, after, args)
+            results.append(result)
+            lost = f"{result['lost']:.1%}" if result["lost"] is not None else "-"
+            print(f"{clients:>8} {result['rps']:>11.0f} {result['share']:>10.0%} {result['p50']:>6.1f}мс "
+                  f"{result['p95']:>6.1f}мс {result['p99']:>6.1f}мс {result['errors']:>7.1%} {lost:>8} "
+                  f"{result['cpu']:>5.0%}" + (f"  насыщение: {', '.join(result['reasons'])}" if result["reasons"] else ""))
+            if result["reasons"]:
+                break
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    sustained = [result for result in results if not result["reasons"]]
+    print()
+    if not sustained:
+        print("Сервер не выдержал даже первую ступень")
+    elif len(sustained) == len(results):
+        best = sustained[-1]
+        print(f"Насыщение не достигнуто: {best['clients']} клиентов, {best['rps']:.0f} запросов/с "
+              f"(p99 {best['p99']:.1f} мс) - добавьте ступени")
+    else:
+        best = sustained[-1]
+        print(f"Сервер выдерживает {best['clients']} клиентов по {args.tick_rate:g} payload/с: "
+              f"{best['rps']:.0f} запросов/с, p99 {best['p99']:.1f} мс "
+              f"(насыщение на {results[-1]['clients']} клиентах)")
+    if any(result["cpu"] > 0.9 for result in results):
+        print("Внимание: CPU клиента выше 90% - результат может ограничивать сам тест")
+    return 0
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера GSI")
+    parser.add_argument("--url", default="http://127.0.0.1:3000/", help="Адрес сервера (endpoint POST /)")
+    parser.add_argument("--clients", default="1,5,10,25,50,100,200,400,800",
+                        help="Ступени количества клиентов через запятую")
+    parser.add_argument("--tick-rate", type=float, default=10.0, help="Payload в секунду на клиента (1 / throttle)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность замера ступени (секунды)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Прогрев перед замером ступени (секунды)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Таймаут запроса (timeout из конфига GSI)")
+    parser.add_argument("--max-p99-ms", type=float, default=100.0, help="Допустимая задержка p99 (мс)")
+    parser.add_argument("--spectator", action="store_true", help="Payload режима наблюдателя")
+    parser.add_argument("--game-minutes", type=float, default=3.0, help="Длительность игры в матчах-образцах")
+    parser.add_argument("--variants", type=int, default=2, help="Количество разных матчей-образцов")
+    parser.add_argument("--run-id", type=int, help="Номер прогона (токены и match_id клиентов)")
+    parser.add_argument("--serve", action="store_true", help="Запустить сервер во временной папке")
+    parser.add_argument("--workers", type=int, default=1, help="SERVER_WORKERS для --serve")
+    args = parser.parse_args()
+    
+    if not args.serve:
+        sys.exit(asyncio.run(run(args)))
+    port = free_port()
+    with tempfile.TemporaryDirectory() as output_dir:
+        env = dict(os.environ, SERVER_WORKERS=str(args.workers), PORT=str(port), OUTPUT_DIR=output_dir)
+        server = subprocess.Popen(
+            [sys.executable, str(ROOT_DIR / "run_server.py")],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(port)
+            args.url = f"http://127.0.0.1:{port}/"
+            code = asyncio.run(run(args))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Привязки аккаунтов Discord к SteamID (команды !link и !unlink).
+
+Привязка хранится отдельно для каждого сервера Discord (guild): на разных
+серверах один пользователь может указать разные аккаунты. По привязке бот
+находит матч пользователя в каталоге (см. MatchCatalog.latest), поэтому
+несколько человек могут присылать данные GSI на один сервер, и каждый
+видит свой матч. Поиск - по первичному ключу, его время не зависит от
+числа привязок.
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from config import LINKS_DB_PATH
+from db import connect
+from utils import account_id_to_steamid64, steamid64_to_account_id
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    steamid TEXT NOT NULL,
+    linked_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+"""
+
+# Личные сообщения боту (нет сервера Discord)
+_DIRECT_MESSAGES = ""
+
+
+def normalize_steamid(value: str) -> Optional[str]:
+    """
+    Приводит SteamID к SteamID64.
+    
+    Args:
+        value: SteamID64 или account_id (32-битный ID из OpenDota/Dotabuff)
+    
+    Returns:
+        SteamID64 в виде строки или None, если значение не похоже на SteamID
+    """
+    value = str(value or "").strip()
+    if not value.isdigit():
+        return None
+    if steamid64_to_account_id(value) is not None:
+        return str(int(value))
+    number = int(value)
+    return account_id_to_steamid64(number) if 0 < number < 2 ** 32 else None
+
+
+class AccountLinks:
+    """Привязки пользователей Discord к SteamID по серверам."""
+    
+    def __init__(self, db_path: Path = LINKS_DB_PATH):
+        """
+        Args:
+            db_path: Путь к базе SQLite
+        """
+        self._conn = connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def link(self, guild_id: Any, user_id: Any, steamid: str) -> None:
+        """Привязывает SteamID64 к пользователю на сервере (заменяет прежнюю привязку)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO links (guild_id, user_id, steamid, linked_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET steamid = excluded.steamid, "
+                "linked_at = excluded.linked_at",
+                (_guild_key(guild_id), str(user_id), steamid, time.time())
+            )
+    
+    def unlink(self, guild_id: Any, user_id: Any) -> bool:
+        """Удаляет привязку. Возвращает False, если ее не было."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM links WHERE guild_id = ? AND user_id = ?", (_guild_key(guild_id), str(user_id))
+            )
+        return cursor.rowcount > 0
+    
+    def steamid(self, guild_id: Any, user_id: Any) -> Optional[str]:
+        """SteamID64, привязанный к пользователю на сервере, или None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT steamid FROM links WHERE guild_id = ? AND user_id = ?", (_guild_key(guild_id), str(user_id))
+            ).fetchone()
+        return row["steamid"] if row else None
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+
+
+def _guild_key(guild_id: Any) -> str:
+    """Ключ сервера Discord в базе (пустая строка - личные сообщения)."""
+    return _DIRECT_MESSAGES if guild_id is None else str(guild_id)
@@ -0,0 +1,191 @@
+"""Ответы Discord бота на !match с объединением одновременных запросов.
+
+Когда начинается матч, !match часто вызывают несколько человек сразу. Ответ
+зависит только от списка игроков матча (match_id и игроки из сводки), поэтому
+готовый список сообщений запоминается для этого списка, а одновременные
+команды по одному списку ждут одного и того же вычисления (single-flight).
+Сводка идущего матча переписывается раз в секунду, но ответ строится заново,
+только когда меняется состав игроков.
+
+Модуль не зависит от discord.py, чтобы его можно было проверить бенчмарком
+(см. scripts/bench_bot_burst.py).
+"""
+import asyncio
+import itertools
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from match_summary import match_players, read_match_summary, summary_path_for
+from metrics import BOT_MATCH_FILE_READS, BOT_MATCH_RESPONSES
+from player_profiles import enrich_players, format_profile
+from utils import get_dotabuff_url
+
+# Discord ограничивает длину сообщения 2000 символами
+MESSAGE_LIMIT = 2000
+_CHUNK_LIMIT = 1900
+
+# Для скольких файлов матчей хранить готовые ответы
+_CACHED_MATCHES = 8
+
+MatchVersion = Tuple[str, int, int, int, Optional[int]]
+PlayersVersion = Tuple[str, Optional[str], Tuple[Tuple[Any, ...], ...]]
+
+
+def match_version(match_file: Path) -> MatchVersion:
+    """
+    Версия матча для живого табло: путь, inode, размер и время изменения документа и сводки.
+    
+    Сводка обновляется и между записями документа (текущее состояние), поэтому
+    учитывается отдельно.
+    """
+    stat = os.stat(match_file)
+    try:
+        summary_mtime = os.stat(summary_path_for(match_file)).st_mtime_ns
+    except OSError:
+        summary_mtime = None
+    return str(match_file), stat.st_ino, stat.st_size, stat.st_mtime_ns, summary_mtime
+
+
+def players_version(match_file: Path, summary: Dict[str, Any]) -> PlayersVersion:
+    """Версия ответа !match: путь, match_id и игроки сводки (steamid, имя, команда)."""
+    players = tuple(sorted((str(player.get("steamid")), player.get("name"), player.get("team"))
+                           for player in summary.get("players") or [] if isinstance(player, dict)))
+    return str(match_file), summary.get("match_id"), players
+
+
+def get_players_from_match(match_file: Path) -> List[Dict[str, Any]]:
+    """Извлекает игроков из файла матча."""
+    try:
+        # Читаем только сводку матча, а не весь документ
+        summary = read_match_summary(match_file)
+        BOT_MATCH_FILE_READS.inc()
+        players = match_players(summary)
+        # Ранг, винрейт и любимые герои всех игроков (параллельно, с кэшем)
+        players = enrich_players(players)
+        
+        # Добавляем ссылки на Dotabuff
+        players_with_links = []
+        for player in players:
+            player_dict = player.copy()
+            steamid = player.get("steamid")
+            if steamid:
+                dotabuff_url = get_dotabuff_url(str(steamid))
+                player_dict["dotabuff_url"] = dotabuff_url
+            players_with_links.append(player_dict)
+        
+        return players_with_links
+    except Exception as e:
+        print(f"Ошибка при чтении файла матча: {e}")
+        return []
+
+
+def format_player_line(player: Dict[str, Any]) -> str:
+    """Строка игрока в формате "Ник (ранг · винрейт · герои) - Dotabuff ссылка"."""
+    name = f"{player.get('name', 'Unknown')} ({format_profile(player.get('profile'))})"
+    dotabuff_url = player.get('dotabuff_url')
+    
+    if dotabuff_url:
+        return f"{name} - {dotabuff_url}"
+    
+    # Если нет ссылки на Dotabuff, пытаемся создать ее вручную
+    steamid = player.get('steamid', 'N/A')
+    if steamid != 'N/A':
+        dotabuff_url = get_dotabuff_url(str(steamid))
+        if dotabuff_url:
+            return f"{name} - {dotabuff_url}"
+        return f"{name} - (SteamID: {steamid})"
+    return f"{name} - (нет SteamID)"
+
+
+def split_message(lines: List[str]) -> List[str]:
+    """Разбивает строки на сообщения, укладывающиеся в лимит Discord."""
+    message_text = "\n".join(lines)
+    if len(message_text) <= MESSAGE_LIMIT:
+        return [message_text]
+    
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for line in lines:
+        line_length = len(line) + 1  # +1 для переноса строки
+        if current_length + line_length > _CHUNK_LIMIT and current_chunk:
+            chunks.append("\n".join(current_chunk))
+            current_chunk = [line]
+            current_length = line_length
+        else:
+            current_chunk.append(line)
+            current_length += line_length
+    if current_chunk:
+        chunks.append("\n".join(current_chunk))
+    return chunks
+
+
+def build_match_messages(match_file: Path) -> List[str]:
+    """
+    Строит ответ на !match: список сообщений для отправки по порядку.
+    
+    Args:
+        match_file: Путь к файлу матча
+    """
+    players = get_players_from_match(match_file)
+    if not players:
+        return ["❌ Игроки не найдены в данных матча."]
+    return split_message([format_player_line(player) for player in players])
+
+
+class MatchResponseCache:
+    """Готовые ответы !match по списку игроков матча с объединением одновременных запросов."""
+    
+    def __init__(self, build: Callable[[Path], List[str]] = build_match_messages):
+        """
+        Args:
+            build: Функция построения ответа (выполняется в отдельном потоке)
+        """
+        self._build = build
+        # Путь к файлу -> (номер построения, версия, сообщения); для каждого файла хранится
+        # только последняя версия
+        self._responses: "OrderedDict[str, Tuple[int, PlayersVersion, List[str]]]" = OrderedDict()
+        self._in_flight: Dict[PlayersVersion, asyncio.Future] = {}
+        self._builds = itertools.count()
+    
+    async def get(self, match_file: Path) -> List[str]:
+        """
+        Возвращает ответ для текущего списка игроков матча.
+        
+        Если ответ для этой версии уже готов, он возвращается сразу; если он
+        сейчас строится по другой команде, ожидается то же вычисление.
+        """
+        summary = await asyncio.to_thread(read_match_summary, match_file)
+        version = players_version(match_file, summary)
+        cached = self._responses.get(version[0])
+        if cached is not None and cached[1] == version:
+            BOT_MATCH_RESPONSES.labels("hit").inc()
+            return cached[2]
+        
+        future = self._in_flight.get(version)
+        if future is None:
+            BOT_MATCH_RESPONSES.labels("miss").inc()
+            future = asyncio.ensure_future(asyncio.to_thread(self._build, match_file))
+            self._in_flight[version] = future
+            build = next(self._builds)
+            future.add_done_callback(lambda done: self._store(build, version, done))
+        else:
+            BOT_MATCH_RESPONSES.labels("coalesced").inc()
+        # shield: отмена одной команды не должна отменять вычисление для остальных
+        return await asyncio.shield(future)
+    
+    def _store(self, build: int, version: PlayersVersion, future: asyncio.Future) -> None:
+        """Запоминает готовый ответ (ошибки не кэшируются)."""
+        self._in_flight.pop(version, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        cached = self._responses.get(version[0])
+        # Построение, начатое позже, могло успеть закончиться раньше
+        if cached is not None and cached[0] > build:
+            return
+        self._responses[version[0]] = (build, version, future.result())
+        self._responses.move_to_end(version[0])
+        while len(self._responses) > _CACHED_MATCHES:
+            self._responses.popitem(last=False)
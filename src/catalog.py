@@ -0,0 +1,372 @@
+"""Каталог сохраненных матчей (SQLite) для списка матчей с фильтрами.
+
+В каталоге хранится по строке на файл матча с краткой сводкой: герой, K/D/A,
+длительность, победитель. FileManager обновляет строку при каждой записи
+документа, а при старте сервера каталог сверяется с папкой output (новые,
+измененные и удаленные файлы). Список матчей читается только из каталога,
+файлы матчей при этом не открываются.
+
+Отдельная таблица match_players связывает steamid всех известных игроков
+матча (в режиме наблюдателя - всех десяти) с файлом матча: по ней бот
+находит последний матч привязанного аккаунта одним запросом по индексу.
+
+Постраничный вывод - по курсору (keyset pagination) в порядке от новых
+матчей к старым, поэтому время ответа не зависит ни от номера страницы,
+ни от количества матчей в архиве.
+"""
+import base64
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import CATALOG_DB_PATH, OUTPUT_DIR
+from db import connect
+from file_manager import read_match_header
+from match_summary import merge_players, state_players, summarize_match
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_file TEXT PRIMARY KEY,
+    match_id TEXT,
+    session_key TEXT,
+    match_start TEXT NOT NULL DEFAULT '',
+    match_end TEXT,
+    last_update TEXT,
+    duration INTEGER,
+    steamid TEXT,
+    player_name TEXT,
+    team TEXT,
+    hero TEXT,
+    hero_id INTEGER,
+    kills INTEGER,
+    deaths INTEGER,
+    assists INTEGER,
+    winner TEXT,
+    won INTEGER,
+    file_mtime REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS matches_start ON matches (match_start, match_file);
+CREATE INDEX IF NOT EXISTS matches_steamid ON matches (steamid, match_start, match_file);
+CREATE INDEX IF NOT EXISTS matches_hero ON matches (hero, match_start, match_file);
+CREATE INDEX IF NOT EXISTS matches_match_id ON matches (match_id);
+CREATE TABLE IF NOT EXISTS match_players (
+    steamid TEXT NOT NULL,
+    match_file TEXT NOT NULL,
+    match_start TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (steamid, match_file)
+);
+CREATE INDEX IF NOT EXISTS match_players_latest ON match_players (steamid, match_start, match_file);
+CREATE INDEX IF NOT EXISTS match_players_file ON match_players (match_file);
+"""
+
+# Версия схемы каталога (PRAGMA user_version). Версия 1 добавила match_players,
+# версия 2 - winner NULL вместо "none": строки, записанные раньше, перечитываются
+# при следующей сверке
+_SCHEMA_VERSION = 2
+
+_COLUMNS = (
+    "match_file", "match_id", "session_key", "match_start", "match_end", "last_update", "duration",
+    "steamid", "player_name", "team", "hero", "hero_id", "kills", "deaths", "assists", "winner", "won",
+    "file_mtime"
+)
+_UPSERT = (
+    f"INSERT INTO matches ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+    f"ON CONFLICT (match_file) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in _COLUMNS[1:])
+)
+
+# Поля строки каталога, которые отдаются в ответе /matches
+_SUMMARY_FIELDS = (
+    "match_id", "match_file", "match_start", "match_end", "duration", "steamid", "player_name",
+    "team", "hero", "hero_id", "kills", "deaths", "assists", "winner", "won"
+)
+
+MAX_PAGE_SIZE = 100
+
+_HERO_PREFIX = "npc_dota_hero_"
+
+
+def encode_cursor(match_start: str, match_file: str) -> str:
+    """Кодирует позицию последнего выданного матча в непрозрачный курсор."""
+    return base64.urlsafe_b64encode(json.dumps([match_start, match_file]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Декодирует курсор.
+    
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    try:
+        match_start, match_file = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Некорректный курсор")
+    return str(match_start), str(match_file)
+
+
+class MatchCatalog:
+    """Каталог матчей с поиском и постраничным выводом."""
+    
+    def __init__(self, db_path: Path = CATALOG_DB_PATH, output_dir: Path = OUTPUT_DIR):
+        """
+        Args:
+            db_path: Путь к базе SQLite
+            output_dir: Папка с матчами (пути в каталоге хранятся относительно нее)
+        """
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self._conn = connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            # Старые строки неполны (игроки, победитель): sync перечитает их заголовки
+            self._conn.execute("UPDATE matches SET file_mtime = 0")
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._lock = threading.Lock()
+    
+    def _relative(self, match_file: Path) -> str:
+        """Путь к файлу матча относительно output_dir."""
+        try:
+            return match_file.relative_to(self.output_dir).as_posix()
+        except ValueError:
+            return str(match_file)
+    
+    def update(self, match_file: Path, header: Dict[str, Any], file_mtime: Optional[float] = None) -> None:
+        """
+        Добавляет или обновляет строку матча.
+        
+        Args:
+            match_file: Путь к файлу матча
+            header: Поля документа матча
+            file_mtime: Время изменения файла (по умолчанию - текущее)
+        """
+        self.update_many([(match_file, header, file_mtime)])
+    
+    def update_many(self, entries: List[Tuple[Path, Dict[str, Any], Optional[float]]]) -> None:
+        """Добавляет или обновляет несколько матчей одной транзакцией."""
+        rows = []
+        player_rows = []
+        for match_file, header, file_mtime in entries:
+            summary = summarize_match(header)
+            summary["match_file"] = self._relative(match_file)
+            summary["won"] = None if summary["won"] is None else int(summary["won"])
+            summary["file_mtime"] = file_mtime if file_mtime is not None else time.time()
+            rows.append(tuple(summary[column] for column in _COLUMNS))
+            players: Dict[str, Dict[str, Any]] = {}
+            for key in ("initial_state", "current_state", "final_state"):
+                merge_players(players, state_players(header.get(key) or {}))
+            if summary["steamid"]:
+                players.setdefault(summary["steamid"], {})
+            player_rows += [(steamid, summary["match_file"], summary["match_start"]) for steamid in players]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(_UPSERT, rows)
+                # Игроки за матч только добавляются (в последнем состоянии могут быть не все)
+                self._conn.executemany(
+                    "INSERT INTO match_players (steamid, match_file, match_start) VALUES (?, ?, ?) "
+                    "ON CONFLICT (steamid, match_file) DO UPDATE SET match_start = excluded.match_start",
+                    player_rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def remove(self, match_files: List[str]) -> None:
+        """Удаляет строки матчей (пути относительно output_dir)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("DELETE FROM matches WHERE match_file = ?", [(f,) for f in match_files])
+                self._conn.executemany("DELETE FROM match_players WHERE match_file = ?", [(f,) for f in match_files])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def find(self, match_id: str) -> Optional[Path]:
+        """
+        Возвращает самый новый файл матча с заданным ID.
+        
+        Returns:
+            Путь к файлу или None, если матча нет в каталоге
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT match_file FROM matches WHERE match_id = ? ORDER BY match_start DESC LIMIT 1",
+                (str(match_id),)
+            ).fetchone()
+        return self.output_dir / row["match_file"] if row else None
+    
+    def latest(self, steamid: Optional[str] = None) -> Optional[Path]:
+        """
+        Возвращает последний начатый матч (идущий или завершенный).
+        
+        Один запрос по индексу: время не зависит ни от числа матчей, ни от
+        числа игроков.
+        
+        Args:
+            steamid: SteamID игрока (любого из десяти) или None - последний матч на сервере
+        
+        Returns:
+            Путь к файлу или None, если таких матчей нет в каталоге
+        """
+        with self._lock:
+            if steamid:
+                row = self._conn.execute(
+                    "SELECT match_file FROM match_players WHERE steamid = ? "
+                    "ORDER BY match_start DESC, match_file DESC LIMIT 1",
+                    (str(steamid),)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT match_file FROM matches ORDER BY match_start DESC, match_file DESC LIMIT 1"
+                ).fetchone()
+        return self.output_dir / row["match_file"] if row else None
+    
+    def match_ids(self, steamid: str) -> List[str]:
+        """
+        Возвращает ID матчей игрока (любого из десяти), от новых к старым.
+        
+        Запрос по индексу match_players, файлы матчей не читаются.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.match_id FROM match_players p JOIN matches m ON m.match_file = p.match_file "
+                "WHERE p.steamid = ? AND m.match_id IS NOT NULL "
+                "ORDER BY p.match_start DESC, p.match_file DESC",
+                (str(steamid),)
+            ).fetchall()
+        return [row["match_id"] for row in rows]
+    
+    def sync(self, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Сверяет каталог с папкой output.
+        
+        Читаются только новые и измененные после последней записи в каталог
+        файлы, причем только их заголовок (см. read_match_header).
+        
+        Returns:
+            Количество добавленных/обновленных и удаленных строк
+        """
+        with self._lock:
+            known = {
+                row["match_file"]: row["file_mtime"]
+                for row in self._conn.execute("SELECT match_file, file_mtime FROM matches")
+            }
+        
+        updated = 0
+        batch = []
+        seen = set()
+        for match_file in self.output_dir.glob("*/match_*.json"):
+            relative = self._relative(match_file)
+            seen.add(relative)
+            try:
+                mtime = match_file.stat().st_mtime
+                if known.get(relative) is not None and known[relative] >= mtime:
+                    continue
+                batch.append((match_file, read_match_header(match_file), mtime))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось добавить {match_file} в каталог: {e}")
+                continue
+            if len(batch) >= batch_size:
+                self.update_many(batch)
+                updated += len(batch)
+                batch = []
+        if batch:
+            self.update_many(batch)
+            updated += len(batch)
+        
+        removed = [relative for relative in known if relative not in seen]
+        if removed:
+            self.remove(removed)
+        return {"updated": updated, "removed": len(removed)}
+    
+    def list_matches(self, limit: int = 20, cursor: Optional[str] = None,
+                     date_from: Optional[str] = None, date_to: Optional[str] = None,
+                     steamid: Optional[str] = None, hero: Optional[str] = None,
+                     result: Optional[str] = None, min_duration: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Возвращает страницу матчей от новых к старым.
+        
+        Args:
+            limit: Размер страницы (не больше MAX_PAGE_SIZE)
+            cursor: Курсор из next_cursor предыдущей страницы
+            date_from: Начало периода (YYYY-MM-DD, включительно)
+            date_to: Конец периода (YYYY-MM-DD, включительно)
+            steamid: SteamID игрока (любого из участников, в режиме наблюдателя - из десяти)
+            hero: Герой игрока, с клиента которого пришли данные (npc_dota_hero_antimage или antimage)
+            result: win или loss для того же игрока
+            min_duration: Минимальная длительность (в секундах игрового времени)
+        
+        Returns:
+            {"matches": [...], "next_cursor": ... или None}
+        
+        Raises:
+            ValueError: Некорректные параметры
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        conditions = []
+        params: List[Any] = []
+        if steamid:
+            # Любой из известных игроков матча, а не только тот, с чьего клиента пришли данные:
+            # страница идет по индексу match_players (steamid, match_start, match_file)
+            source = "match_players AS p JOIN matches AS m ON m.match_file = p.match_file"
+            order = "p"
+            conditions.append("p.steamid = ?")
+            params.append(str(steamid))
+        else:
+            source = "matches AS m"
+            order = "m"
+        if cursor:
+            cursor_start, cursor_file = decode_cursor(cursor)
+            conditions.append(f"({order}.match_start < ? OR ({order}.match_start = ? AND {order}.match_file < ?))")
+            params += [cursor_start, cursor_start, cursor_file]
+        if date_from:
+            conditions.append(f"{order}.match_start >= ?")
+            params.append(date_from)
+        if date_to:
+            # match_start хранится в ISO формате, "~" больше любого символа времени
+            conditions.append(f"{order}.match_start <= ?")
+            params.append(date_to + "~")
+        if hero:
+            conditions.append("m.hero = ?")
+            params.append(hero if hero.startswith(_HERO_PREFIX) else _HERO_PREFIX + hero)
+        if result:
+            if result not in ("win", "loss"):
+                raise ValueError("result должен быть win или loss")
+            conditions.append("m.won = ?")
+            params.append(1 if result == "win" else 0)
+        if min_duration is not None:
+            conditions.append("m.duration >= ?")
+            params.append(int(min_duration))
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (
+            f"SELECT {', '.join('m.' + field for field in _SUMMARY_FIELDS)} FROM {source} {where} "
+            f"ORDER BY {order}.match_start DESC, {order}.match_file DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(query, params + [limit + 1]).fetchall()
+        
+        matches = []
+        for row in rows[:limit]:
+            match = dict(row)
+            match["won"] = None if match["won"] is None else bool(match["won"])
+            matches.append(match)
+        next_cursor = None
+        if len(rows) > limit:
+            last = matches[-1]
+            next_cursor = encode_cursor(last["match_start"], last["match_file"])
+        return {"matches": matches, "next_cursor": next_cursor}
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,197 @@
+"""Сжатие старых матчей: прореживание обновлений до заданной частоты.
+
+GSI присылает обновления примерно 10 раз в секунду, а для старых матчей
+достаточно одного обновления в секунду. При сжатии всегда сохраняются
+ключевые моменты - обновления, в которых изменились убийства или смерти,
+уровень героя, предметы (в режиме наблюдателя - у любого из десяти игроков),
+здоровье зданий или ``game_state``, а также первое и последнее обновление. ``initial_state``, ``current_state`` и ``final_state``
+хранятся в заголовке документа и не меняются.
+
+Сжатый документ помечается полем ``compaction``, поэтому повторный запуск
+обрабатывает только новые матчи.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import COMPACTION_INTERVAL_SECONDS, OUTPUT_DIR, RETENTION_DAYS
+from file_manager import encode_update, journal_path_for, write_match_document
+from match_query import drop_columns
+from match_summary import summary_path_for
+from persist_filter import significant_state
+from seek_index import index_path_for
+
+
+def key_state(data: Dict[str, Any]) -> Tuple:
+    """
+    Возвращает значения, изменение которых делает обновление ключевым.
+    
+    Те же поля, что и у фильтра записи (persist_filter.significant_state,
+    в режиме наблюдателя - для всех десяти игроков), плюс здоровье зданий.
+    
+    Args:
+        data: Обработанные данные GSI (результат DataProcessor.process_gsi_data)
+    
+    Returns:
+        Кортеж: значимые поля игроков и game_state, здоровье зданий
+    """
+    buildings = data.get("buildings") or {}
+    return significant_state(data) + (
+        tuple(
+            (team, tuple(health.items()) if isinstance(health, dict) else None)
+            for team, health in buildings.items()
+        ),
+    )
+
+
+def _update_time(update: Dict[str, Any]) -> Optional[float]:
+    """Время обновления в секундах (по полю timestamp)."""
+    try:
+        return datetime.fromisoformat(update["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def downsample_updates(updates: List[Dict[str, Any]], interval: float = COMPACTION_INTERVAL_SECONDS) -> List[Dict[str, Any]]:
+    """
+    Прореживает обновления матча, сохраняя ключевые моменты.
+    
+    Args:
+        updates: Обновления матча в порядке записи
+        interval: Минимальный интервал между обычными обновлениями (в секундах)
+    
+    Returns:
+        Оставшиеся обновления
+    """
+    if len(updates) <= 2:
+        return list(updates)
+    
+    kept = []
+    last_index = len(updates) - 1
+    last_kept_time = None
+    previous_key = None
+    for index, update in enumerate(updates):
+        data = update.get("data")
+        key = key_state(data) if isinstance(data, dict) else None
+        update_time = _update_time(update)
+        
+        if (
+            index == 0
+            or index == last_index
+            or key != previous_key
+            or update_time is None
+            or last_kept_time is None
+            or update_time - last_kept_time >= interval
+        ):
+            kept.append(update)
+            if update_time is not None:
+                last_kept_time = update_time
+        previous_key = key
+    return kept
+
+
+def compact_match_file(path: Path, interval: float = COMPACTION_INTERVAL_SECONDS,
+                       min_age_seconds: float = RETENTION_DAYS * 86400,
+                       dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Сжимает один файл матча.
+    
+    Args:
+        path: Путь к файлу матча
+        interval: Минимальный интервал между обычными обновлениями (в секундах)
+        min_age_seconds: Сжимать только файлы, которые не менялись дольше этого времени
+        dry_run: Только посчитать результат, не переписывая файл
+    
+    Returns:
+        Результат: status (compacted, skipped, error), reason, размеры и число обновлений
+    """
+    result = {"path": str(path), "status": "skipped", "reason": None,
+              "bytes_before": 0, "bytes_after": 0, "updates_before": 0, "updates_after": 0}
+    try:
+        stat = path.stat()
+        if time.time() - stat.st_mtime < min_age_seconds:
+            result["reason"] = "recent"
+            return result
+        if journal_path_for(path).exists():
+            # Матч пишет сервер (или ждет восстановления журнала)
+            result["reason"] = "journal"
+            return result
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if not isinstance(header, dict):
+            raise ValueError("файл не содержит объект матча")
+        if header.get("compaction"):
+            result["reason"] = "compacted"
+            return result
+        
+        updates = header.pop("updates", None) or []
+        kept = downsample_updates(updates, interval)
+        result.update(bytes_before=stat.st_size, updates_before=len(updates), updates_after=len(kept))
+        
+        header["compaction"] = {
+            "compacted_at": datetime.now().isoformat(),
+            "interval_seconds": interval,
+            "original_updates": len(updates)
+        }
+        encoded = [encode_update(update) for update in kept]
+        if dry_run:
+            # Размер документа без записи: обновления, разделители и заголовок
+            header_size = len(json.dumps(header, ensure_ascii=False).encode('utf-8'))
+            result["bytes_after"] = (len(b'{"updates": [') + sum(len(e) for e in encoded)
+                                     + max(2 * len(encoded) - 1, 0) + header_size + 4)
+        else:
+            _, result["bytes_after"] = write_match_document(path, header, encoded)
+            # Положение обновлений изменилось: индекс, колонки и сводка перестроятся при первом чтении
+            index_path_for(path).unlink(missing_ok=True)
+            summary_path_for(path).unlink(missing_ok=True)
+            drop_columns(path)
+            # Время изменения сохраняем, чтобы возраст матча не сбрасывался
+            os.utime(path, (stat.st_atime, stat.st_mtime))
+        result["status"] = "compacted"
+    except Exception as e:
+        result["status"] = "error"
+        result["reason"] = str(e)
+    return result
+
+
+def _compact_worker(args: Tuple[str, float, float, bool]) -> Dict[str, Any]:
+    """Обертка compact_match_file для пула процессов."""
+    path, interval, min_age_seconds, dry_run = args
+    return compact_match_file(Path(path), interval, min_age_seconds, dry_run)
+
+
+def find_match_files(output_dir: Path = OUTPUT_DIR) -> List[Path]:
+    """Возвращает все файлы матчей в папке output."""
+    return sorted(output_dir.glob("*/match_*.json"))
+
+
+def compact_matches(paths: Iterable[Path], interval: float = COMPACTION_INTERVAL_SECONDS,
+                    min_age_seconds: float = RETENTION_DAYS * 86400,
+                    dry_run: bool = False, jobs: Optional[int] = None) -> Iterable[Dict[str, Any]]:
+    """
+    Сжимает файлы матчей параллельно в нескольких процессах.
+    
+    Args:
+        paths: Файлы матчей
+        interval: Минимальный интервал между обычными обновлениями (в секундах)
+        min_age_seconds: Сжимать только файлы старше этого возраста
+        dry_run: Только посчитать результат
+        jobs: Количество процессов (по умолчанию - число CPU)
+    
+    Yields:
+        Результат compact_match_file для каждого файла по мере готовности
+    """
+    tasks = [(str(path), interval, min_age_seconds, dry_run) for path in paths]
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _compact_worker(task)
+        return
+    # Пул процессов (multiprocessing) импортируем только при параллельной обработке
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Файлы разного размера: мелкие порции дают равномерную загрузку процессов
+        yield from pool.map(_compact_worker, tasks, chunksize=1)
@@ -11,12 +11,26 @@ SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
 SERVER_PORT = int(os.getenv("PORT", os.getenv("SERVER_PORT", "3000")))
 
 # Пути к директориям
-OUTPUT_DIR = BASE_DIR / "output"
+OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", str(BASE_DIR / "output")))
 GSI_CONFIG_DIR = BASE_DIR / "gsi_config"
 
-# Создание директорий при необходимости
-OUTPUT_DIR.mkdir(exist_ok=True)
-GSI_CONFIG_DIR.mkdir(exist_ok=True)
+# Директории не создаются при импорте: их создает код, который пишет файлы
+# (FileManager, db.connect), чтобы импорт конфигурации не трогал файловую систему
+
+# Несколько процессов сервера (uvicorn --workers) делят состояние сессий через SQLite
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+STATE_DB_PATH = Path(os.getenv("STATE_DB_PATH", str(OUTPUT_DIR / "state.db")))
+# Каталог сохраненных матчей для /matches
+CATALOG_DB_PATH = Path(os.getenv("CATALOG_DB_PATH", str(OUTPUT_DIR / "catalog.db")))
+# Привязки аккаунтов Discord к SteamID (!link) по серверам Discord
+LINKS_DB_PATH = Path(os.getenv("LINKS_DB_PATH", str(OUTPUT_DIR / "links.db")))
+# История игроков по завершенным матчам (/players/{steamid}/history, !history) и число
+# процессов для первого прохода по архиву (0 - по числу CPU)
+HISTORY_DB_PATH = Path(os.getenv("HISTORY_DB_PATH", str(OUTPUT_DIR / "history.db")))
+HISTORY_SCAN_WORKERS = int(os.getenv("HISTORY_SCAN_WORKERS", "0")) or None
+SESSION_LEASE_SECONDS = 15  # Длительность аренды сессии процессом-владельцем
+SESSION_IDLE_SECONDS = 600  # Через сколько секунд без данных процесс освобождает сессию
+INBOX_POLL_SECONDS = 0.05  # Как часто владелец забирает пересланные ему payload
 
 # Настройки логирования
 LOG_LEVEL = "INFO"
@@ -24,5 +38,68 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
 # Настройки сохранения файлов
 SAVE_INTERVAL_SECONDS = 5  # Интервал сохранения данных (в секундах)
+# Как часто обновлять сводку матча между записями документа (текущее состояние для /players и бота)
+SUMMARY_INTERVAL_SECONDS = float(os.getenv("SUMMARY_INTERVAL_SECONDS", "1.0"))
 MAX_FILE_SIZE_MB = 10  # Максимальный размер файла в МБ
+# Политика fsync журнала: always - после каждого обновления, interval - не чаще
+# FSYNC_INTERVAL_SECONDS, never - только запись в кэш ОС (переживает падение процесса,
+# но не отключение питания)
+FSYNC_POLICY = os.getenv("FSYNC_POLICY", "interval")
+FSYNC_INTERVAL_SECONDS = float(os.getenv("FSYNC_INTERVAL_SECONDS", "1.0"))
+
+# Фильтр значимых обновлений (см. persist_filter.py): снимок записывается в файл матча,
+# если изменились K/D/A, уровень, предметы, здания, game_state, жив ли герой, золото больше
+# чем на PERSIST_GOLD_DELTA или с последней записи прошло PERSIST_MAX_INTERVAL_SECONDS
+PERSIST_FILTER_ENABLED = os.getenv("PERSIST_FILTER", "1") not in ("0", "false", "no")
+PERSIST_GOLD_DELTA = float(os.getenv("PERSIST_GOLD_DELTA", "100"))
+PERSIST_MAX_INTERVAL_SECONDS = float(os.getenv("PERSIST_MAX_INTERVAL_SECONDS", "1.0"))
+
+# Хранение старых матчей (см. compact_matches.py): матчи старше RETENTION_DAYS дней
+# прореживаются до одного обновления в COMPACTION_INTERVAL_SECONDS секунд
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "7"))
+COMPACTION_INTERVAL_SECONDS = float(os.getenv("COMPACTION_INTERVAL_SECONDS", "1.0"))
+
+# Запросы к сохраненным матчам (/matches/...)
+SERIES_CACHE_MATCHES = 32  # Для скольких матчей держать колонки полей в памяти
+SERIES_MAX_FIELDS = 16  # Максимум полей в одном запросе ряда значений
+SERIES_MAX_POINTS = 100000  # Максимум точек в одном ответе
+
+# OpenDota API (для бенчмарков можно подменить на локальный сервер)
+OPENDOTA_API_URL = os.getenv("OPENDOTA_API_URL", "https://api.opendota.com/api")
+# Профили игроков OpenDota (ранг, винрейт, любимые герои) для /players и !match
+PLAYER_CACHE_DB_PATH = Path(os.getenv("PLAYER_CACHE_DB_PATH", str(OUTPUT_DIR / "players.db")))
+PLAYER_CACHE_TTL_SECONDS = float(os.getenv("PLAYER_CACHE_TTL_SECONDS", str(6 * 3600)))
+OPENDOTA_CONCURRENCY = int(os.getenv("OPENDOTA_CONCURRENCY", "24"))  # Максимум одновременных запросов
+OPENDOTA_TIMEOUT_SECONDS = 5
+
+# Последние тики сессии в памяти для оконных запросов (/live/recent, см. recent_ticks.py):
+# сколько тиков хранить (1200 - 2 минуты при throttle 0.1) и какие числовые поля.
+# Память сессии: (число полей + 2) * 8 байт * RECENT_TICKS_CAPACITY
+RECENT_TICKS_CAPACITY = int(os.getenv("RECENT_TICKS_CAPACITY", "1200"))
+RECENT_TICKS_FIELDS = (
+    "player.gold", "player.kills", "player.deaths", "player.assists", "player.last_hits", "player.denies",
+    "player.gpm", "player.xpm", "hero.level", "hero.health", "hero.max_health", "hero.mana", "hero.max_mana",
+    "hero.alive", "hero.xpos", "hero.ypos"
+)
+
+# Живое табло !live в Discord (см. live_scoreboard.py): одно сообщение редактируется
+# не чаще, чем раз в LIVE_EDIT_INTERVAL_SECONDS; сводка матча проверяется раз в
+# LIVE_POLL_INTERVAL_SECONDS; табло останавливается, если матч не обновлялся LIVE_IDLE_SECONDS
+LIVE_EDIT_INTERVAL_SECONDS = float(os.getenv("LIVE_EDIT_INTERVAL_SECONDS", "5"))
+LIVE_POLL_INTERVAL_SECONDS = float(os.getenv("LIVE_POLL_INTERVAL_SECONDS", "1"))
+LIVE_IDLE_SECONDS = float(os.getenv("LIVE_IDLE_SECONDS", "600"))
+
+# Максимальная длина очереди приема GSI данных одной сессии
+# (при переполнении промежуточные снимки заменяются самым новым)
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+# Пропускать payload, совпадающий байт в байт с предыдущим payload сессии (1 - пропускать).
+# По умолчанию обрабатывается каждый payload: повтор - тоже тик (время последнего
+# обновления, окна /live/recent); совпадения только считаются в метрике
+DEDUP_IDENTICAL_PAYLOADS = os.getenv("DEDUP_IDENTICAL_PAYLOADS", "0") == "1"
 
+# Настройки администрирования и диагностики
+# Токен для /admin/* endpoints (передается в заголовке X-Admin-Token); пустой - админка выключена
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+STAGE_WINDOW_SIZE = 1024  # Сколько последних измерений хранить для каждого этапа обработки
+PROFILE_INTERVAL_SECONDS = 0.005  # Интервал сэмплирования профилировщика
+PROFILE_MAX_SECONDS = 60  # Максимальная длительность одного сеанса профилирования
@@ -1,40 +1,76 @@
 """Обработчик данных от Dota 2 Game State Integration."""
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List
 
+from spectator import is_spectator_payload, spectator_players
 from utils import get_players_from_opendota
 
 logger = logging.getLogger(__name__)
 
+# Версия обработки: увеличивается при изменении извлекаемых полей, чтобы
+# reprocess_matches.py пересчитал сохраненные матчи (в документах без версии - 0).
+# 2: снимки наблюдателя больше не хранят секцию spectator (копию raw_data по колонкам)
+PROCESSOR_VERSION = 2
+
+_MISSING = object()
+
 
 class DataProcessor:
     """Обрабатывает и структурирует данные от Dota 2 GSI."""
     
     @staticmethod
-    def process_gsi_data(raw_data: Dict[str, Any]) -> Dict[str, Any]:
+    def process_gsi_data(raw_data: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Обрабатывает сырые данные от GSI и структурирует их.
         
+        Секции abilities, items, buildings и events между соседними payload
+        меняются редко. Если передан предыдущий снимок и исходные данные
+        секции не изменились, секция берется из него без пересборки, а равные
+        исходные данные хранятся одним объектом. Поэтому секции снимков
+        неизменяемы: их нельзя менять на месте.
+        
         Args:
             raw_data: Сырые данные от Dota 2 GSI
+            previous: Результат обработки предыдущего payload той же сессии
             
         Returns:
             Структурированные данные
         """
+        spectator = is_spectator_payload(raw_data)
         processed = {
             "metadata": DataProcessor._extract_metadata(raw_data),
             "map": DataProcessor._extract_map_info(raw_data),
-            "player": DataProcessor._extract_player_info(raw_data),
-            "hero": DataProcessor._extract_hero_info(raw_data),
-            "abilities": DataProcessor._extract_abilities_info(raw_data),
-            "items": DataProcessor._extract_items_info(raw_data),
-            "buildings": DataProcessor._extract_buildings_info(raw_data),
-            "events": DataProcessor._extract_events_info(raw_data),
+            # В режиме наблюдателя секции одного игрока пусты: данные всех игроков - в raw_data
+            # (см. spectator.by_slot и spectator.slot_players)
+            "player": {} if spectator else DataProcessor._extract_player_info(raw_data),
+            "hero": {} if spectator else DataProcessor._extract_hero_info(raw_data),
+            "abilities": [] if spectator else DataProcessor._shared_section(
+                raw_data, previous, "abilities", DataProcessor._extract_abilities_info),
+            "items": {} if spectator else DataProcessor._shared_section(
+                raw_data, previous, "items", DataProcessor._extract_items_info),
+            "buildings": DataProcessor._shared_section(raw_data, previous, "buildings", DataProcessor._extract_buildings_info),
+            "events": DataProcessor._shared_section(raw_data, previous, "events", DataProcessor._extract_events_info),
             "raw_data": raw_data  # Сохраняем оригинальные данные
         }
         
         return processed
     
+    @staticmethod
+    def _shared_section(raw_data: Dict[str, Any], previous: Optional[Dict[str, Any]], key: str,
+                        extract: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Извлекает секцию или берет ее из предыдущего снимка, если исходные данные секции не изменились."""
+        if previous is not None and key in previous:
+            previous_raw = previous.get("raw_data")
+            if isinstance(previous_raw, dict):
+                source = raw_data.get(key, _MISSING)
+                previous_source = previous_raw.get(key, _MISSING)
+                # Сравнение словарей выполняется в C и дешевле извлечения секции
+                if source is previous_source or source == previous_source:
+                    if source is not _MISSING:
+                        raw_data[key] = previous_source
+                    return previous[key]
+        return extract(raw_data)
+    
     @staticmethod
     def _extract_metadata(raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """Извлекает метаданные матча."""
@@ -271,12 +307,23 @@ class DataProcessor:
         game_state = map_data.get("game_state")
         return game_state in ["DOTA_GAMERULES_STATE_GAME_IN_PROGRESS", "DOTA_GAMERULES_STATE_PRE_GAME"]
     
+    @staticmethod
+    def match_winner(map_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Победившая команда по секции map или None, если победителя нет.
+        
+        Пока игра идет, Dota 2 присылает win_team "none": это не команда, а
+        отсутствие победителя.
+        """
+        winner = map_data.get("win_team") if isinstance(map_data, dict) else None
+        return None if winner in (None, "", "none") else winner
+    
     @staticmethod
     def is_match_ended(raw_data: Dict[str, Any]) -> bool:
         """Проверяет, завершен ли матч."""
         map_data = raw_data.get("map", {})
         game_state = map_data.get("game_state")
-        return game_state == "DOTA_GAMERULES_STATE_POST_GAME" or map_data.get("win_team") is not None
+        return game_state == "DOTA_GAMERULES_STATE_POST_GAME" or DataProcessor.match_winner(map_data) is not None
     
     @staticmethod
     def extract_players_accounts(raw_data: Dict[str, Any], match_id: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -301,6 +348,10 @@ class DataProcessor:
                 return opendota_players
         
         # Если OpenDota не сработал, используем данные из GSI
+        # В режиме наблюдателя доступны все десять игроков
+        if is_spectator_payload(raw_data):
+            return spectator_players(raw_data)
+        
         # Текущий игрок (всегда доступен)
         player_data = raw_data.get("player", {})
         if player_data and isinstance(player_data, dict):
@@ -0,0 +1,29 @@
+"""Общие настройки подключения к SQLite."""
+import sqlite3
+from pathlib import Path
+
+# Сколько ждать освобождения блокировки другим процессом (в секундах)
+BUSY_TIMEOUT_SECONDS = 10.0
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """
+    Открывает базу SQLite в режиме WAL для совместного доступа нескольких процессов.
+    
+    Соединение работает в режиме autocommit (транзакции открываются явно
+    через BEGIN) и может использоваться из разных потоков при внешней
+    синхронизации.
+    
+    Args:
+        path: Путь к файлу базы
+    
+    Returns:
+        Открытое соединение
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_SECONDS * 1000)}")
+    conn.row_factory = sqlite3.Row
+    return conn
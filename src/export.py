@@ -0,0 +1,278 @@
+"""Выгрузка матчей в плоские таблицы (Parquet или CSV) для аналитики.
+
+Каждое обновление матча превращается в строку с колонками: match_id, время,
+``map.*``, ``player.*``, ``hero.*``, предметы в слотах (``items.slot0`` - имя
+предмета) и здоровье зданий (``buildings.radiant.dota_goodguys_tower1_top``).
+Набор колонок строится по структуре DataProcessor, поэтому он одинаков для
+всех матчей.
+
+Файл матча читается построчно (см. seek_index.scan_document), строки пишутся
+пачками, так что память процесса не зависит от размера матча. Каждый матч
+выгружается в отдельный файл, матчи обрабатываются параллельно в пуле процессов.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from data_processor import DataProcessor
+from file_manager import read_match_header
+from seek_index import LegacyFormatError, scan_document
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Сколько строк держать в памяти перед записью
+EXPORT_BATCH_ROWS = 5000
+
+# Поля, которые не выгружаются (списки и вложенные структуры)
+_SKIPPED_FIELDS = {("hero", "selected_units")}
+_STRING_FIELDS = {
+    ("map", "name"), ("map", "matchid"), ("map", "game_state"), ("map", "win_team"), ("map", "customgamename"),
+    ("player", "steamid"), ("player", "name"), ("player", "activity"), ("player", "team"), ("hero", "name"),
+}
+_BOOL_FIELDS = {
+    ("map", "daytime"), ("map", "nightstalker_night"), ("map", "paused"), ("hero", "alive"), ("hero", "silenced"),
+    ("hero", "stunned"), ("hero", "disarmed"), ("hero", "magicimmune"), ("hero", "hexed"), ("hero", "muted"),
+    ("hero", "break"), ("hero", "has_debuff"),
+}
+
+
+def _kind(section: str, key: str) -> str:
+    """Тип колонки: string, bool или int."""
+    if (section, key) in _STRING_FIELDS:
+        return "string"
+    if (section, key) in _BOOL_FIELDS:
+        return "bool"
+    return "int"
+
+
+def _build_layout() -> Tuple[List[Tuple[str, List[str]]], List[str], List[Tuple[str, List[str]]]]:
+    """
+    Строит раскладку колонок по структуре DataProcessor.
+    
+    Returns:
+        (ключи секций map/player/hero, слоты предметов, здания по командам)
+    """
+    empty = DataProcessor.process_gsi_data({})
+    sections = [
+        (section, [key for key in empty[section] if (section, key) not in _SKIPPED_FIELDS])
+        for section in ("map", "player", "hero")
+    ]
+    buildings = [(team, list(team_buildings)) for team, team_buildings in empty["buildings"].items()]
+    return sections, list(empty["items"]), buildings
+
+
+_SECTION_KEYS, _ITEM_SLOTS, _BUILDING_KEYS = _build_layout()
+
+# Колонки в порядке значений строки: (имя, тип)
+COLUMNS: List[Tuple[str, str]] = [("match_id", "string"), ("match_file", "string"), ("timestamp", "string")]
+COLUMNS += [(f"{section}.{key}", _kind(section, key)) for section, keys in _SECTION_KEYS for key in keys]
+COLUMNS += [(f"items.{slot}", "string") for slot in _ITEM_SLOTS]
+COLUMNS += [(f"buildings.{team}.{building}", "int") for team, keys in _BUILDING_KEYS for building in keys]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+
+def flatten_update(match_id: Optional[str], match_file: str, update: Dict[str, Any]) -> List[Any]:
+    """
+    Превращает обновление матча в строку таблицы (в порядке COLUMN_NAMES).
+    
+    Значения не приводятся к типу колонки - это делает запись в Parquet
+    (по колонкам, что быстрее, чем по ячейкам).
+    
+    Args:
+        match_id: ID матча
+        match_file: Путь к файлу матча относительно папки output
+        update: Обновление ({"timestamp": ..., "data": ...})
+    """
+    data = update.get("data") or {}
+    row = [match_id, match_file, update.get("timestamp")]
+    for section, keys in _SECTION_KEYS:
+        values = data.get(section)
+        row.extend(map(values.get, keys) if isinstance(values, dict) else [None] * len(keys))
+    items = data.get("items")
+    if not isinstance(items, dict):
+        items = {}
+    for slot in _ITEM_SLOTS:
+        item = items.get(slot)
+        row.append(item.get("name") if isinstance(item, dict) else None)
+    buildings = data.get("buildings")
+    if not isinstance(buildings, dict):
+        buildings = {}
+    for team, keys in _BUILDING_KEYS:
+        values = buildings.get(team)
+        row.extend(map(values.get, keys) if isinstance(values, dict) else [None] * len(keys))
+    return row
+
+
+def _coerce(values: Sequence[Any], kind: str) -> List[Any]:
+    """Приводит значения колонки к ее типу (некорректные значения - None)."""
+    if kind == "string":
+        return [value if value is None or isinstance(value, str) else str(value) for value in values]
+    if kind == "bool":
+        return [None if value is None else bool(value) for value in values]
+    return [
+        value if type(value) is int else (int(value) if isinstance(value, (int, float)) else None)
+        for value in values
+    ]
+
+
+def iter_updates(match_path: Path) -> Iterator[Dict[str, Any]]:
+    """Перебирает обновления матча, не загружая файл целиком (кроме старого формата)."""
+    try:
+        for _, encoded in scan_document(match_path):
+            yield json.loads(encoded)
+    except LegacyFormatError:
+        with open(match_path, 'r', encoding='utf-8') as f:
+            yield from json.load(f).get("updates") or []
+
+
+def _arrow_schema():
+    """Схема Parquet для COLUMN_NAMES."""
+    types = {"string": pyarrow.string(), "bool": pyarrow.bool_(), "int": pyarrow.int64()}
+    return pyarrow.schema([pyarrow.field(name, types[kind]) for name, kind in COLUMNS])
+
+
+class _ParquetSink:
+    """Запись строк в Parquet пачками."""
+    
+    def __init__(self, path: Path):
+        self.schema = _arrow_schema()
+        self.writer = pyarrow.parquet.ParquetWriter(str(path), self.schema, compression="zstd")
+    
+    def write(self, rows: List[List[Any]]) -> None:
+        arrays = [
+            pyarrow.array(_coerce(values, kind), type=field.type)
+            for values, (_, kind), field in zip(zip(*rows), COLUMNS, self.schema)
+        ]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+    
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _CsvSink:
+    """Запись строк в CSV."""
+    
+    def __init__(self, path: Path):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMN_NAMES)
+    
+    def write(self, rows: List[List[Any]]) -> None:
+        self.writer.writerows(rows)
+    
+    def close(self) -> None:
+        self.file.close()
+
+
+def export_match_file(match_path: Path, output_dir: Path, export_dir: Path, fmt: str,
+                      batch_rows: int = EXPORT_BATCH_ROWS) -> Dict[str, Any]:
+    """
+    Выгружает один матч в файл export_dir/<дата>/<имя матча>.<parquet|csv>.
+    
+    Args:
+        match_path: Путь к файлу матча
+        output_dir: Папка output (для относительного пути матча)
+        export_dir: Папка для выгрузки
+        fmt: parquet или csv
+        batch_rows: Сколько строк держать в памяти перед записью
+    
+    Returns:
+        {"path", "output", "rows", "bytes", "error"}
+    """
+    result = {"path": str(match_path), "output": None, "rows": 0, "bytes": 0, "error": None}
+    relative = match_path.relative_to(output_dir)
+    target = export_dir / relative.with_suffix("." + fmt)
+    tmp_path = target.with_name(target.name + ".tmp")
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        match_id = read_match_header(match_path).get("match_id")
+        sink = _ParquetSink(tmp_path) if fmt == "parquet" else _CsvSink(tmp_path)
+        try:
+            batch = []
+            for update in iter_updates(match_path):
+                batch.append(flatten_update(match_id, relative.as_posix(), update))
+                if len(batch) >= batch_rows:
+                    sink.write(batch)
+                    result["rows"] += len(batch)
+                    batch = []
+            if batch:
+                sink.write(batch)
+                result["rows"] += len(batch)
+        finally:
+            sink.close()
+        os.replace(tmp_path, target)
+        result["output"] = str(target)
+        result["bytes"] = target.stat().st_size
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        result["error"] = str(e)
+    return result
+
+
+def _export_worker(args: Tuple[str, str, str, str, int]) -> Dict[str, Any]:
+    """Обертка export_match_file для пула процессов."""
+    match_path, output_dir, export_dir, fmt, batch_rows = args
+    return export_match_file(Path(match_path), Path(output_dir), Path(export_dir), fmt, batch_rows)
+
+
+def default_format() -> str:
+    """Parquet, если установлен pyarrow, иначе CSV."""
+    return "parquet" if pyarrow is not None else "csv"
+
+
+def find_match_files(output_dir: Path, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Path]:
+    """
+    Возвращает файлы матчей из папок output/YYYY-MM-DD в заданном диапазоне дат.
+    
+    Args:
+        output_dir: Папка output
+        date_from: Первая дата (YYYY-MM-DD, включительно)
+        date_to: Последняя дата (YYYY-MM-DD, включительно)
+    """
+    files = []
+    for date_dir in sorted(d for d in output_dir.iterdir() if d.is_dir()):
+        try:
+            datetime.strptime(date_dir.name, "%Y-%m-%d")
+        except ValueError:
+            continue
+        if (date_from and date_dir.name < date_from) or (date_to and date_dir.name > date_to):
+            continue
+        files.extend(sorted(date_dir.glob("match_*.json")))
+    return files
+
+
+def export_matches(paths: Iterable[Path], output_dir: Path, export_dir: Path, fmt: Optional[str] = None,
+                   jobs: Optional[int] = None, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[Dict[str, Any]]:
+    """
+    Выгружает матчи параллельно в нескольких процессах.
+    
+    Args:
+        paths: Файлы матчей
+        output_dir: Папка output
+        export_dir: Папка для выгрузки
+        fmt: parquet или csv (по умолчанию - parquet при наличии pyarrow)
+        jobs: Количество процессов (по умолчанию - число CPU)
+        batch_rows: Сколько строк держать в памяти перед записью
+    
+    Yields:
+        Результат export_match_file для каждого файла по мере готовности
+    """
+    fmt = fmt or default_format()
+    if fmt == "parquet" and pyarrow is None:
+        raise RuntimeError("Для выгрузки в Parquet нужен pyarrow (pip install pyarrow)")
+    tasks = [(str(path), str(output_dir), str(export_dir), fmt, batch_rows) for path in paths]
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _export_worker(task)
+        return
+    # multiprocessing нужен только для выгрузки в несколько процессов
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_export_worker, tasks, chunksize=1)
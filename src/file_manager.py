@@ -1,37 +1,345 @@
-"""Менеджер для сохранения данных матча в JSON файлы."""
+"""Менеджер для сохранения данных матча в JSON файлы.
+
+Каждый матч хранится в JSON документе вида::
+
+    {"updates": [
+    {...},
+    {...}
+    ], "match_start": ..., "match_id": ..., "current_state": ..., ...}
+
+Массив ``updates`` идет первым, поэтому при очередном сохранении уже записанная
+часть документа копируется без разбора JSON, а новые обновления дописываются за ней.
+Документ всегда заменяется атомарно (временный файл + ``os.replace``), а
+обновления между сохранениями пишутся в журнал ``<имя>.journal``, который
+воспроизводится при старте сервера. После каждой записи документа дописывается
+индекс ``<имя>.idx`` для перехода к состоянию на заданный момент (см. seek_index)
+и обновляется краткая сводка ``<имя>.summary`` (см. match_summary). Между
+записями документа сводка с текущим состоянием обновляется не чаще, чем раз в
+summary_interval секунд.
+"""
+import glob
 import json
 import logging
+import os
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional, List, Set, Tuple
 
-from config import OUTPUT_DIR, MAX_FILE_SIZE_MB
+from config import (
+    OUTPUT_DIR, MAX_FILE_SIZE_MB, SAVE_INTERVAL_SECONDS, SUMMARY_INTERVAL_SECONDS, FSYNC_POLICY, FSYNC_INTERVAL_SECONDS
+)
+from data_processor import PROCESSOR_VERSION
+from match_query import find_match_file
+from match_summary import (
+    build_summary, merge_players, state_players, summary_path_for, write_summary
+)
+from metrics import GSI_BYTES_PERSISTED
+from profiling import stage_timings
+from seek_index import LegacyFormatError, MatchIndex, index_key, index_path_for, state_at, write_index
+from storage import LeaseLostError, MatchFinishedError, MatchStorage
 
 logger = logging.getLogger(__name__)
 
+# Версия формата хранения матча
+STORAGE_FORMAT_VERSION = 2
+
+JOURNAL_SUFFIX = ".journal"
+_DOCUMENT_PREFIX = b'{"updates": ['
+_COPY_CHUNK_SIZE = 1024 * 1024
+_HEADER_CHUNK_SIZE = 64 * 1024
+
+
+def encode_update(update: Dict[str, Any]) -> bytes:
+    """
+    Сериализует одно обновление матча в компактный JSON.
+    
+    Args:
+        update: Обновление ({"timestamp": ..., "data": ...})
+    
+    Returns:
+        JSON в кодировке UTF-8
+    """
+    return json.dumps(update, ensure_ascii=False).encode('utf-8')
+
+
+def journal_path_for(match_path: Path) -> Path:
+    """Возвращает путь к журналу для файла матча."""
+    return match_path.with_suffix(JOURNAL_SUFFIX)
+
+
+def tmp_path_for(path: Path) -> Path:
+    """
+    Возвращает путь к временному файлу для атомарной записи документа.
+    
+    Имя содержит pid: процессы, которые одновременно пишут один документ
+    (например, воркеры сервера при восстановлении), не портят файлы друг друга.
+    """
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def _remove_stale_tmp(path: Path) -> None:
+    """Удаляет временные файлы документа, оставшиеся от прерванной записи."""
+    for stale in glob.glob(glob.escape(str(path)) + ".*tmp"):
+        Path(stale).unlink(missing_ok=True)
+
+
+def _fsync_directory(directory: Path) -> None:
+    """Сбрасывает на диск запись каталога (нужно после os.replace)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # На Windows каталоги нельзя открыть для fsync
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_match_document(path: Path, header: Dict[str, Any], updates: List[bytes],
+                         prefix_length: int = 0, prefix_count: int = 0,
+                         fsync: bool = True,
+                         offsets: Optional[List[Tuple[int, int]]] = None) -> Tuple[int, int]:
+    """
+    Атомарно записывает документ матча.
+    
+    Первые prefix_length байт (уже записанные prefix_count обновлений)
+    копируются из текущего файла без разбора JSON, новые обновления
+    дописываются за ними, в конце записываются остальные поля документа.
+    Поля документа сериализуются после обновлений, поэтому генератор
+    обновлений может дополнить header по ходу записи.
+    
+    Args:
+        path: Путь к файлу матча
+        header: Поля документа кроме updates
+        updates: Новые сериализованные обновления
+        prefix_length: Сколько байт скопировать из существующего файла
+        prefix_count: Сколько обновлений содержится в копируемой части
+        fsync: Сбрасывать ли данные на диск перед заменой файла
+        offsets: Список, в который добавляются (смещение, длина) новых обновлений
+    
+    Returns:
+        (позиция конца массива updates, размер записанного файла)
+    """
+    tmp_path = tmp_path_for(path)
+    
+    with open(tmp_path, 'wb') as f:
+        if prefix_length:
+            with open(path, 'rb') as src:
+                remaining = prefix_length
+                while remaining:
+                    chunk = src.read(min(_COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f"Файл {path} короче ожидаемого ({prefix_length} байт)")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        else:
+            f.write(_DOCUMENT_PREFIX)
+        
+        count = prefix_count
+        for encoded in updates:
+            f.write(b',\n' if count else b'\n')
+            if offsets is not None:
+                offsets.append((f.tell(), len(encoded)))
+            f.write(encoded)
+            count += 1
+        updates_end = f.tell()
+        
+        header_json = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        f.write(b'\n]')
+        if len(header_json) > 2:
+            f.write(b', ')
+            f.write(header_json[1:])
+        else:
+            f.write(b'}')
+        f.write(b'\n')
+        size = f.tell()
+        
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    
+    os.replace(tmp_path, path)
+    if fsync:
+        _fsync_directory(path.parent)
+    
+    GSI_BYTES_PERSISTED.inc(size - prefix_length)
+    return updates_end, size
+
+
+def load_match_document(path: Path) -> Tuple[Dict[str, Any], List[bytes]]:
+    """
+    Загружает документ матча любой версии формата.
+    
+    Args:
+        path: Путь к файлу матча
+    
+    Returns:
+        (поля документа кроме updates, сериализованные обновления)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Файл {path} не содержит объект матча")
+    updates = data.pop("updates", None) or []
+    return data, [encode_update(update) for update in updates]
+
+
+def read_match_header(path: Path) -> Dict[str, Any]:
+    """
+    Читает поля документа матча кроме updates, не разбирая обновления.
+    
+    Поля документа записаны после массива updates, поэтому читается только
+    конец файла. Файлы старого формата загружаются целиком.
+    
+    Args:
+        path: Путь к файлу матча
+    
+    Returns:
+        Поля документа (match_id, current_state, final_state и т.д.)
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        chunk_size = _HEADER_CHUNK_SIZE
+        while True:
+            start = max(0, size - chunk_size)
+            f.seek(start)
+            tail = f.read(size - start)
+            # Внутри JSON обновлений и заголовка нет переводов строк, поэтому
+            # последний "\n]" - конец массива updates
+            marker = tail.rfind(b'\n]')
+            if marker >= 0 or start == 0:
+                break
+            chunk_size *= 4
+    if marker >= 0:
+        rest = tail[marker + 2:].rstrip()
+        try:
+            if rest == b'}':
+                return {}
+            if rest.startswith(b', '):
+                header = json.loads(b'{' + rest[2:])
+                if isinstance(header, dict):
+                    return header
+        except ValueError:
+            pass
+    return load_match_document(path)[0]
+
+
+def read_journal(journal_path: Path, after_seq: int = 0) -> List[Tuple[int, bytes]]:
+    """
+    Читает записи журнала с номером больше after_seq.
+    
+    Недописанная последняя строка (обрыв при падении) игнорируется.
+    
+    Args:
+        journal_path: Путь к журналу
+        after_seq: Номер последней записи, уже попавшей в документ
+    
+    Returns:
+        Список (номер записи, сериализованное обновление)
+    """
+    records = []
+    with open(journal_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            seq = record.get("seq", 0)
+            if seq > after_seq:
+                records.append((seq, encode_update(record["update"])))
+    return records
+
+
+def _replay_journal(match_path: Path) -> Tuple[Dict[str, Any], List[bytes], int]:
+    """
+    Загружает документ матча и добавляет к нему записи журнала, которых в нем нет.
+    
+    Returns:
+        (поля документа, сериализованные обновления, число восстановленных записей)
+    """
+    header, updates = load_match_document(match_path)
+    journal_path = journal_path_for(match_path)
+    records = read_journal(journal_path, header.get("journal_seq", 0)) if journal_path.exists() else []
+    if records:
+        updates.extend(encoded for _, encoded in records)
+        last_update = json.loads(records[-1][1])
+        header["last_update"] = last_update.get("timestamp")
+        header["current_state"] = last_update.get("data")
+        header["journal_seq"] = records[-1][0]
+    header["format_version"] = STORAGE_FORMAT_VERSION
+    return header, updates, len(records)
+
 
-class FileManager:
+class FileManager(MatchStorage):
     """Управляет сохранением данных матча в JSON файлы."""
     
-    def __init__(self, output_dir: Path = OUTPUT_DIR):
+    def __init__(self, output_dir: Path = OUTPUT_DIR, save_interval: float = SAVE_INTERVAL_SECONDS,
+                 fsync_policy: str = FSYNC_POLICY, fsync_interval: float = FSYNC_INTERVAL_SECONDS,
+                 session_key: Optional[str] = None, catalog=None, history=None,
+                 lease: Optional[Callable[[], bool]] = None, summary_interval: float = SUMMARY_INTERVAL_SECONDS):
         """
         Инициализация менеджера файлов.
         
         Args:
             output_dir: Директория для сохранения файлов
+            save_interval: Как часто переписывать документ матча (в секундах)
+            fsync_policy: Политика fsync журнала (always, interval, never)
+            fsync_interval: Интервал fsync для политики interval (в секундах)
+            session_key: Идентификатор клиента GSI, записывается в файл матча
+            catalog: Каталог матчей (catalog.MatchCatalog), обновляется при каждой записи документа
+            history: История игроков (player_history.PlayerHistory), пополняется при завершении матча
+            lease: Проверка, что процесс все еще владеет сессией (SessionStore.holds);
+                вызывается перед каждой записью документа и сводки
+            summary_interval: Как часто обновлять сводку между записями документа (в секундах)
         """
+        if fsync_policy not in ("always", "interval", "never"):
+            raise ValueError(f"Неизвестная политика fsync: {fsync_policy}")
         self.output_dir = output_dir
-        self.output_dir.mkdir(exist_ok=True)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.save_interval = save_interval
+        self.summary_interval = summary_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.session_key = session_key
+        self.catalog = catalog
+        self.history = history
+        self.lease = lease
         self.current_match_id: Optional[str] = None
         self.current_file_path: Optional[Path] = None
         
+        # Состояние открытого матча
+        self._header: Optional[Dict[str, Any]] = None
+        self._pending: List[bytes] = []
+        self._pending_keys: List[Tuple[float, int]] = []
+        self._players: Dict[str, Dict[str, Any]] = {}
+        self._update_count = 0
+        self._updates_end = 0
+        self._seq = 0
+        self._journal = None
+        # Журнал дописывает обработчик очереди, а сбрасывает на диск еще и таймер сервера
+        self._journal_lock = threading.Lock()
+        self._unsynced = False
+        self._journal_seq = 0
+        self._last_flush = 0.0
+        self._last_summary = 0.0
+        self._last_fsync = 0.0
+        # Номер последнего обновления, которое уже на диске (fsync журнала или документа)
+        self.synced_seq = 0
+    
     def _generate_filename(self, match_id: Optional[str] = None) -> str:
         """
         Генерирует уникальное имя файла для матча.
         
         Args:
             match_id: ID матча (если доступен)
-            
+        
         Returns:
             Имя файла
         """
@@ -57,9 +365,12 @@ class FileManager:
         
         Args:
             match_data: Начальные данные матча
-            
+        
         Returns:
             Path к созданному файлу
+        
+        Raises:
+            MatchFinishedError: Если файл матча с этим match_id уже завершен
         """
         # Пытаемся получить ID матча из данных
         match_id = match_data.get("map", {}).get("matchid") or match_data.get("matchid")
@@ -78,97 +389,372 @@ class FileManager:
             existing_files = list(match_dir.glob(f"match_{self.current_match_id}_*.json"))
             if existing_files:
                 # Используем самый новый файл
-                self.current_file_path = max(existing_files, key=lambda p: p.stat().st_mtime)
-                logger.debug(f"Найден существующий файл матча: {self.current_file_path}")
-                return self.current_file_path
+                existing_file = max(existing_files, key=lambda p: p.stat().st_mtime)
+                if existing_file == self.current_file_path and self._header is not None:
+                    return self.current_file_path
+                try:
+                    self.resume_match(existing_file)
+                    logger.debug(f"Найден существующий файл матча: {self.current_file_path}")
+                    return self.current_file_path
+                except MatchFinishedError:
+                    self.current_match_id = None
+                    raise
+                except (OSError, ValueError) as e:
+                    # Поврежденный файл не перезаписываем, а откладываем в сторону
+                    corrupt_path = existing_file.with_name(existing_file.name + ".corrupt")
+                    logger.error(f"Файл матча {existing_file} поврежден ({e}), сохранен как {corrupt_path}")
+                    existing_file.replace(corrupt_path)
+                    self.current_file_path = None
+                    self._header = None
         
-        # Если файл уже установлен и существует, используем его
-        if self.current_file_path and self.current_file_path.exists():
+        # Если файл уже установлен и открыт, используем его
+        if self.current_file_path and self._header is not None:
             logger.debug(f"Используем существующий файл: {self.current_file_path}")
             return self.current_file_path
-            
+        
+        # Закрываем журнал предыдущего матча, если он остался открытым
+        self._close_journal()
+        
         # Создаем новый файл
         filename = self._generate_filename(self.current_match_id)
         self.current_file_path = match_dir / filename
         
         # Сохраняем начальные данные
-        initial_data = {
+        self._header = {
+            "format_version": STORAGE_FORMAT_VERSION,
+            "processor_version": PROCESSOR_VERSION,
             "match_start": datetime.now().isoformat(),
             "match_id": self.current_match_id,
-            "initial_state": match_data
+            "session_key": self.session_key,
+            "initial_state": match_data,
+            "journal_seq": 0
         }
+        self._pending = []
+        self._pending_keys = []
+        self._players = {}
+        self._update_count = 0
+        self._updates_end = 0
+        self._seq = 0
         
-        self._save_to_file(initial_data)
+        self._write_document()
         logger.info(f"Начат новый матч, файл: {self.current_file_path}")
         
         return self.current_file_path
     
+    def resume_match(self, file_path: Path) -> None:
+        """
+        Продолжает запись в существующий файл матча (например, после перезапуска).
+        
+        Документ загружается один раз и переписывается в текущем формате,
+        дальнейшие обновления дописываются к нему.
+        
+        Args:
+            file_path: Путь к файлу матча
+        
+        Raises:
+            MatchFinishedError: Если матч в файле уже завершен
+        """
+        with stage_timings.time("file_load"):
+            header, updates, replayed = _replay_journal(file_path)
+        if header.get("match_end"):
+            # Поздний payload завершенного матча не должен снова открыть его файл
+            raise MatchFinishedError(header.get("match_id"), file_path)
+        self._close_journal()
+        if replayed:
+            logger.info(f"Из журнала {journal_path_for(file_path)} восстановлено {replayed} обновлений")
+        
+        self.current_file_path = file_path
+        self.current_match_id = header.get("match_id")
+        header["format_version"] = STORAGE_FORMAT_VERSION
+        self._header = header
+        self._seq = header.get("journal_seq", 0)
+        self._pending = updates
+        self._pending_keys = [index_key(json.loads(encoded)) for encoded in updates]
+        self._players = {}
+        self._update_count = 0
+        self._updates_end = 0
+        
+        self._write_document()
+        journal_path_for(file_path).unlink(missing_ok=True)
+        logger.info(f"Продолжена запись матча: {file_path} ({self._update_count} обновлений)")
+    
     def save_match_data(self, data: Dict[str, Any]) -> None:
         """
         Сохраняет данные матча в файл.
         
+        Обновление сразу дописывается в журнал, а документ матча
+        переписывается не чаще, чем раз в save_interval секунд.
+        
         Args:
             data: Данные для сохранения
         """
-        if not self.current_file_path or not self.current_file_path.exists():
+        if not self.current_file_path or self._header is None:
             # Если файл еще не создан, создаем его
             self.start_new_match(data)
             return
         
-        # Загружаем существующие данные
-        existing_data = self._load_from_file()
-        
-        # Если файл пустой или поврежден, пересоздаем его
-        if not existing_data:
-            logger.warning(f"Файл {self.current_file_path} пустой или поврежден, пересоздаем")
-            self.start_new_match(data)
-            return
+        timestamp = datetime.now().isoformat()
+        update = {"timestamp": timestamp, "data": data}
+        encoded = encode_update(update)
         
-        # Добавляем новые данные с временной меткой
-        if "updates" not in existing_data:
-            existing_data["updates"] = []
-            
-        existing_data["updates"].append({
-            "timestamp": datetime.now().isoformat(),
-            "data": data
-        })
+        self._seq += 1
+        self._append_journal(self._seq, encoded)
+        self._pending.append(encoded)
+        self._pending_keys.append(index_key(update))
         
         # Обновляем последнее состояние
-        existing_data["last_update"] = datetime.now().isoformat()
-        existing_data["current_state"] = data
+        self._header["last_update"] = timestamp
+        self._header["current_state"] = data
         
-        self._save_to_file(existing_data)
+        now = time.monotonic()
+        if now - self._last_flush >= self.save_interval:
+            self.flush()
+        elif now - self._last_summary >= self.summary_interval:
+            self._write_summary()
     
-    def _save_to_file(self, data: Dict[str, Any]) -> None:
+    def update_current_state(self, data: Dict[str, Any]) -> None:
         """
-        Сохраняет данные в JSON файл.
+        Обновляет текущее состояние матча, не добавляя обновление.
+        
+        Используется для снимков, отброшенных фильтром значимых обновлений:
+        текущее состояние попадет в документ при следующей записи.
         
         Args:
-            data: Данные для сохранения
+            data: Обработанные данные GSI
         """
+        if self._header is None:
+            return
+        self._header["last_update"] = datetime.now().isoformat()
+        self._header["current_state"] = data
+        if time.monotonic() - self._last_summary >= self.summary_interval:
+            self._write_summary()
+    
+    def attach_analytics(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Привязывает аналитику к документу матча (поле analytics, см. MatchStorage)."""
+        if self._header is None:
+            return state
+        return self._header.setdefault("analytics", state)
+    
+    def flush(self) -> None:
+        """Записывает накопленные обновления в документ матча и очищает журнал."""
+        if not self.current_file_path or self._header is None or not self._pending:
+            return
+        self._write_document()
+        self._truncate_journal()
+    
+    def _write_document(self) -> None:
+        """Атомарно записывает документ текущего матча с накопленными обновлениями."""
+        self._check_lease()
+        self._header["journal_seq"] = self._seq
+        offsets = []
         try:
-            with open(self.current_file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with stage_timings.time("file_save"):
+                self._updates_end, _ = write_match_document(
+                    self.current_file_path,
+                    self._header,
+                    self._pending,
+                    prefix_length=self._updates_end,
+                    prefix_count=self._update_count,
+                    fsync=self.fsync_policy != "never",
+                    offsets=offsets
+                )
         except Exception as e:
             logger.error(f"Ошибка при сохранении файла {self.current_file_path}: {e}")
             raise
+        if self.fsync_policy != "never":
+            self.synced_seq = self._seq
+        try:
+            write_index(self.current_file_path, self._pending_keys, offsets, start=self._update_count)
+        except OSError as e:
+            # Индекс перестроится по документу при первом чтении
+            logger.warning(f"Не удалось обновить индекс {index_path_for(self.current_file_path)}: {e}")
+        if self.catalog is not None:
+            try:
+                self.catalog.update(self.current_file_path, self._header, self.current_file_path.stat().st_mtime)
+            except Exception as e:
+                # Каталог сверится с файлами при следующем запуске сервера
+                logger.warning(f"Не удалось обновить каталог матчей: {e}")
+        self._write_summary(check_lease=False)
+        self._update_count += len(self._pending)
+        self._pending = []
+        self._pending_keys = []
+        self._last_flush = time.monotonic()
+    
+    def _check_lease(self) -> None:
+        """Проверяет, что процесс все еще владеет сессией, иначе писать ее матч нельзя."""
+        if self.lease is not None and not self.lease():
+            # Аренда истекла - сессию мог забрать другой процесс, матч теперь пишет он
+            raise LeaseLostError(f"Аренда сессии {self.session_key} истекла, файл {self.current_file_path} не пишем")
     
-    def _load_from_file(self) -> Dict[str, Any]:
+    def _write_summary(self, check_lease: bool = True) -> None:
         """
-        Загружает данные из текущего файла.
+        Перезаписывает сводку текущего матча по заголовку в памяти.
         
-        Returns:
-            Словарь с данными или пустой словарь если файл не существует
+        Вызывается после каждой записи документа и между ними (не чаще, чем раз
+        в summary_interval): сводка подписана текущей версией документа, поэтому
+        читатели видят последнее состояние, не дожидаясь записи документа.
         """
-        if not self.current_file_path or not self.current_file_path.exists():
-            return {}
-            
+        if check_lease:
+            self._check_lease()
+        self._last_summary = time.monotonic()
         try:
-            with open(self.current_file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            # Игроков собираем за весь матч: в последнем состоянии могут быть не все
+            merge_players(self._players, state_players(self._header.get("current_state") or {}))
+            write_summary(self.current_file_path, build_summary(self.current_file_path, self._header, self._players))
         except Exception as e:
-            logger.warning(f"Ошибка при загрузке файла {self.current_file_path}: {e}")
-            return {}
+            # Сводка перестроится по документу при первом чтении
+            logger.warning(f"Не удалось обновить сводку {summary_path_for(self.current_file_path)}: {e}")
+    
+    def _append_journal(self, seq: int, encoded: bytes) -> None:
+        """Дописывает обновление в журнал текущего матча с учетом политики fsync."""
+        line = b'{"seq": ' + str(seq).encode() + b', "update": ' + encoded + b'}\n'
+        with self._journal_lock:
+            if self._journal is None:
+                self._journal = open(journal_path_for(self.current_file_path), 'ab')
+            self._journal.write(line)
+            # Сбрасываем буфер Python, чтобы запись пережила падение процесса
+            self._journal.flush()
+            self._unsynced = True
+            self._journal_seq = seq
+            if self.fsync_policy == "always" or (
+                    self.fsync_policy == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval):
+                self._fsync_journal()
+        GSI_BYTES_PERSISTED.inc(len(line))
+    
+    def _fsync_journal(self) -> None:
+        """Сбрасывает журнал на диск (вызывается под _journal_lock)."""
+        os.fsync(self._journal.fileno())
+        self._unsynced = False
+        self._last_fsync = time.monotonic()
+        self.synced_seq = self._journal_seq
+    
+    def sync_journal(self) -> None:
+        """
+        Сбрасывает на диск записи журнала, накопленные после последнего fsync.
+        
+        При политике interval fsync делается при записи обновления, поэтому
+        последние обновления перед паузой в данных (пауза в игре, потеря
+        связи) остались бы только в кэше ОС. Сервер вызывает этот метод по
+        таймеру, и такие записи попадают на диск не позже, чем через
+        fsync_interval секунд.
+        """
+        if self.fsync_policy != "interval":
+            return
+        with self._journal_lock:
+            if self._journal is not None and self._unsynced \
+                    and time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync_journal()
+    
+    def _truncate_journal(self) -> None:
+        """Очищает журнал после того, как его записи попали в документ."""
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.truncate(0)
+                self._journal.flush()
+                self._unsynced = False
+    
+    def _close_journal(self, remove: bool = False) -> None:
+        """Закрывает журнал текущего матча (и удаляет его при remove=True)."""
+        with self._journal_lock:
+            if self._journal is not None:
+                if self._unsynced and not remove and self.fsync_policy != "never":
+                    # Журнал остается на диске (матч продолжит другой процесс)
+                    self._fsync_journal()
+                self._journal.close()
+                self._journal = None
+                self._unsynced = False
+        if remove and self.current_file_path:
+            journal_path_for(self.current_file_path).unlink(missing_ok=True)
+    
+    def recover_journals(self, skip: Optional[Set[str]] = None,
+                         claim: Optional[Callable[[str], bool]] = None) -> List[Path]:
+        """
+        Воспроизводит журналы, оставшиеся после аварийного завершения.
+        
+        Для каждого найденного журнала записи с номером больше сохраненного
+        в документе journal_seq дописываются в документ, после чего журнал
+        удаляется.
+        
+        Args:
+            skip: Файлы матчей, которые не нужно трогать
+            claim: Получение владения сессией матча (по session_key документа)
+                перед восстановлением. Если владение не получено, журнал
+                пропускается: матч пишет или восстанавливает другой процесс
+        
+        Returns:
+            Пути к восстановленным файлам матчей
+        """
+        skip = skip or set()
+        recovered = []
+        for journal_path in sorted(self.output_dir.glob(f"*/match_*{JOURNAL_SUFFIX}")):
+            match_path = journal_path.with_suffix(".json")
+            if str(match_path) in skip:
+                continue
+            try:
+                if not match_path.exists():
+                    logger.warning(f"Журнал {journal_path} без файла матча, пропускаем")
+                    continue
+                if claim is not None:
+                    if not claim(read_match_header(match_path).get("session_key") or "default"):
+                        continue
+                    if not journal_path.exists():
+                        # Журнал уже восстановил процесс, владевший сессией до нас
+                        continue
+                # Временный файл от прерванной записи документа не нужен: документ
+                # заменяется только целиком, а его содержимое есть в журнале
+                _remove_stale_tmp(match_path)
+                header, updates, replayed = _replay_journal(match_path)
+                write_match_document(match_path, header, updates, fsync=self.fsync_policy != "never")
+                # Индекс и сводка перестроятся по документу при первом чтении
+                index_path_for(match_path).unlink(missing_ok=True)
+                summary_path_for(match_path).unlink(missing_ok=True)
+                journal_path.unlink()
+                recovered.append(match_path)
+                logger.info(f"Восстановлен матч {match_path}: {replayed} обновлений из журнала")
+            except Exception as e:
+                logger.error(f"Ошибка при восстановлении журнала {journal_path}: {e}")
+        return recovered
+    
+    def current_file_size(self) -> int:
+        """
+        Возвращает размер текущего файла матча.
+        
+        Returns:
+            Размер в байтах или 0, если матч не идет
+        """
+        path = self.current_file_path
+        if not path:
+            return 0
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+    
+    def close(self) -> None:
+        """
+        Сохраняет накопленные обновления и закрывает файл, не завершая матч.
+        
+        Следующее сохранение продолжит тот же файл через start_new_match.
+        """
+        if self.current_file_path and self._header is not None:
+            self.flush()
+        self._close_journal(remove=True)
+        self.current_file_path = None
+        self._header = None
+    
+    def detach(self) -> None:
+        """
+        Перестает писать текущий матч, не трогая файлы.
+        
+        Используется, когда файл матча перешел к другому процессу: журнал
+        остается на диске и будет воспроизведен новым владельцем.
+        """
+        self._close_journal()
+        self.current_file_path = None
+        self._header = None
+        self._pending = []
+        self._pending_keys = []
+        self._players = {}
     
     def finalize_match(self, final_data: Dict[str, Any]) -> None:
         """
@@ -177,17 +763,62 @@ class FileManager:
         Args:
             final_data: Финальные данные матча
         """
-        if not self.current_file_path:
+        if not self.current_file_path or self._header is None:
             return
-            
-        existing_data = self._load_from_file()
-        existing_data["match_end"] = datetime.now().isoformat()
-        existing_data["final_state"] = final_data
         
-        self._save_to_file(existing_data)
+        self._header["match_end"] = datetime.now().isoformat()
+        self._header["final_state"] = final_data
+        
+        self._write_document()
+        self._close_journal(remove=True)
         logger.info(f"Матч завершен, файл: {self.current_file_path}")
+        if self.history is not None:
+            try:
+                self.history.add_match(self.current_file_path, self._header)
+            except Exception as e:
+                # Матч будет учтен при следующем проходе по архиву
+                logger.warning(f"Не удалось обновить историю игроков: {e}")
         
         # Сбрасываем текущий матч
         self.current_match_id = None
         self.current_file_path = None
-
+        self._header = None
+    
+    def state_at(self, match_id: str, game_time: float) -> Optional[Dict[str, Any]]:
+        """Последнее записанное обновление матча не позже game_time (по индексу матча)."""
+        match_path = find_match_file(match_id, self.output_dir)
+        return state_at(match_path, game_time) if match_path else None
+    
+    def updates_between(self, match_id: str, start: float, end: float) -> List[Dict[str, Any]]:
+        """Записанные обновления матча с game_time в диапазоне [start, end] (по индексу матча)."""
+        match_path = find_match_file(match_id, self.output_dir)
+        if match_path is None:
+            return []
+        try:
+            with MatchIndex(match_path) as index:
+                position = index.find_game_time(start)
+                # Обновлений с game_time == start может быть несколько: идем к первому
+                while position >= 0 and index.entry(position)[1] == start:
+                    position -= 1
+                updates = []
+                for position in range(position + 1, len(index)):
+                    game_time = index.entry(position)[1]
+                    if game_time is not None and game_time > end:
+                        break
+                    if game_time is not None and game_time >= start:
+                        updates.append(index.read(position))
+                return updates
+        except LegacyFormatError:
+            with open(match_path, 'r', encoding='utf-8') as f:
+                updates = json.load(f).get("updates") or []
+            return [update for update in updates if start <= index_key(update)[1] <= end]
+    
+    def match_ids_for_steamid(self, steamid: str) -> List[str]:
+        """
+        ID матчей игрока от новых к старым.
+        
+        Отвечает каталог матчей (индекс match_players), файлы не читаются.
+        """
+        if self.catalog is None:
+            raise RuntimeError("Поиск матчей игрока требует каталога матчей (FileManager(catalog=...))")
+        return self.catalog.match_ids(steamid)
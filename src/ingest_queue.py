@@ -0,0 +1,138 @@
+"""Ограниченная очередь приема GSI данных с последовательной обработкой по сессиям.
+
+HTTP обработчик только разбирает JSON и кладет payload в очередь сессии, после
+чего сразу отвечает Dota 2. Обработка (DataProcessor, запись файлов, OpenDota)
+выполняется воркером сессии в пуле потоков, строго в порядке поступления.
+
+Если очередь заполнена, промежуточные снимки состояния заменяются самым новым
+(каждый payload GSI - полный снимок), а переходы состояния матча (смена
+match_id, начало и конец матча) сохраняются.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from config import INGEST_QUEUE_SIZE
+from data_processor import DataProcessor
+from metrics import GSI_PAYLOADS_COALESCED, GSI_PAYLOADS_DROPPED, GSI_PROCESS_SECONDS
+from profiling import stage_timings
+
+logger = logging.getLogger(__name__)
+
+_DROPPED_OVERFLOW = GSI_PAYLOADS_DROPPED.labels("overflow")
+_DROPPED_PROCESSING = GSI_PAYLOADS_DROPPED.labels("processing_error")
+
+
+def match_state_of(raw_data: Dict[str, Any]) -> Tuple[Optional[str], bool, bool]:
+    """
+    Возвращает ключевое состояние матча для payload.
+    
+    Returns:
+        (match_id, матч начался, матч завершен)
+    """
+    map_data = raw_data.get("map", {})
+    match_id = map_data.get("matchid") if isinstance(map_data, dict) else None
+    return (
+        str(match_id) if match_id else None,
+        DataProcessor.is_match_started(raw_data),
+        DataProcessor.is_match_ended(raw_data),
+    )
+
+
+class IngestQueue:
+    """Очередь payload одной сессии с собственным воркером."""
+    
+    def __init__(self, key: str, handler: Callable[[Dict[str, Any]], None], maxsize: int = INGEST_QUEUE_SIZE):
+        """
+        Args:
+            key: Идентификатор сессии
+            handler: Синхронный обработчик payload (вызывается в пуле потоков)
+            maxsize: Максимальная длина очереди
+        """
+        self.key = key
+        self.maxsize = maxsize
+        self._handler = handler
+        # Элементы: (payload, является ли переходом состояния матча)
+        self._items: Deque[Tuple[Dict[str, Any], bool]] = deque()
+        self._last_state: Optional[Tuple[Optional[str], bool, bool]] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.last_body: bytes = b""
+        self.coalesced = 0
+        self.dropped = 0
+        self.processed = 0
+    
+    @property
+    def depth(self) -> int:
+        """Текущая длина очереди."""
+        return len(self._items)
+    
+    @property
+    def busy(self) -> bool:
+        """Есть ли payload в очереди или в обработке."""
+        return bool(self._items) or (self._worker is not None and not self._worker.done())
+    
+    def put(self, raw_data: Dict[str, Any]) -> None:
+        """
+        Добавляет payload в очередь и при необходимости запускает воркер.
+        
+        Должен вызываться из потока event loop.
+        
+        Args:
+            raw_data: Сырые данные от Dota 2 GSI
+        """
+        state = match_state_of(raw_data)
+        is_transition = state != self._last_state
+        self._last_state = state
+        
+        if len(self._items) >= self.maxsize:
+            self._coalesce()
+        self._items.append((raw_data, is_transition))
+        
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._drain())
+    
+    def _coalesce(self) -> None:
+        """Освобождает место: убирает промежуточные снимки, оставляя переходы матча."""
+        kept = deque(item for item in self._items if item[1])
+        removed = len(self._items) - len(kept)
+        self._items = kept
+        if removed:
+            self.coalesced += removed
+            GSI_PAYLOADS_COALESCED.inc(removed)
+        # Очередь целиком из переходов - теряем самый старый
+        while len(self._items) >= self.maxsize:
+            self._items.popleft()
+            self.dropped += 1
+            _DROPPED_OVERFLOW.inc()
+    
+    async def _drain(self) -> None:
+        """Обрабатывает payload из очереди по одному, пока очередь не опустеет."""
+        while self._items:
+            raw_data, _ = self._items.popleft()
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._handler, raw_data)
+                self.processed += 1
+            except Exception as e:
+                _DROPPED_PROCESSING.inc()
+                logger.error(f"[{self.key}] Ошибка при обработке данных GSI: {e}", exc_info=True)
+            elapsed = time.perf_counter() - started
+            GSI_PROCESS_SECONDS.observe(elapsed)
+            stage_timings.record("worker", elapsed)
+    
+    async def join(self) -> None:
+        """Ожидает, пока воркер обработает все payload из очереди."""
+        while self._worker is not None and not self._worker.done():
+            await self._worker
+    
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику очереди."""
+        return {
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped
+        }
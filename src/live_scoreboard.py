@@ -0,0 +1,294 @@
+"""Живое табло матча в Discord: одно сообщение, которое бот редактирует по ходу матча.
+
+Команда !live отправляет сообщение с табло (время, счет, K/D/A, золото и
+уровень игроков) и дальше редактирует его. Источник данных - сводка матча
+(см. match_summary): сервер перезаписывает ее вместе с документом и между
+его записями не чаще, чем раз в SUMMARY_INTERVAL_SECONDS, и в ней уже есть
+аналитика по всем игрокам (см. match_analytics), поэтому частота тиков GSI
+на бота не влияет.
+
+Число правок ограничено:
+- табло строится один раз на версию файла матча и общее для всех каналов,
+  которые следят за этим матчем;
+- каждое сообщение редактируется не чаще, чем раз в LIVE_EDIT_INTERVAL_SECONDS
+  (не больше 60 / LIVE_EDIT_INTERVAL_SECONDS правок в минуту, в одном канале -
+  одно табло); версии табло, построенные между правками, схлопываются -
+  отправляется только последняя;
+- сообщение не редактируется, если текст табло не изменился.
+
+Табло останавливается после конца матча (последняя правка - итог) или если
+матч не обновлялся LIVE_IDLE_SECONDS.
+
+Модуль не зависит от discord.py: сообщение передается функцией правки
+(см. discord_bot.py и scripts/bench_live_scoreboard.py).
+"""
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from bot_responses import MESSAGE_LIMIT, MatchVersion, match_version
+from config import LIVE_EDIT_INTERVAL_SECONDS, LIVE_IDLE_SECONDS, LIVE_POLL_INTERVAL_SECONDS
+from match_summary import read_match_summary
+from metrics import BOT_LIVE_EDITS, BOT_LIVE_MESSAGES, BOT_LIVE_RENDERS
+
+logger = logging.getLogger(__name__)
+
+_HERO_PREFIX = "npc_dota_hero_"
+_TEAM_TITLES = {"radiant": "Radiant", "dire": "Dire"}
+
+EditMessage = Callable[[str], Awaitable[Any]]
+
+
+def format_clock(seconds: Any) -> str:
+    """Игровое время в формате м:сс (до начала игры - с минусом)."""
+    if not isinstance(seconds, (int, float)):
+        return "--:--"
+    sign = "-" if seconds < 0 else ""
+    seconds = int(abs(seconds))
+    return f"{sign}{seconds // 60}:{seconds % 60:02d}"
+
+
+def _player_line(record: Dict[str, Any]) -> str:
+    """Строка игрока табло: герой, ник, K/D/A, золото и уровень."""
+    hero = str(record.get("hero") or "?")
+    if hero.startswith(_HERO_PREFIX):
+        hero = hero[len(_HERO_PREFIX):]
+    kda = f"{record.get('kills') or 0}/{record.get('deaths') or 0}/{record.get('assists') or 0}"
+    return (f"`{hero[:16]:<16}` {record.get('name') or 'Unknown'} - {kda} · "
+            f"{int(record.get('gold') or 0)} з. · ур. {int(record.get('level') or 0)}")
+
+
+def render_scoreboard(summary: Dict[str, Any]) -> str:
+    """
+    Текст табло по сводке матча.
+    
+    Args:
+        summary: Сводка матча (см. match_summary.read_match_summary)
+    """
+    state = summary.get("state") or {}
+    map_data = state.get("map") or {}
+    analytics = summary.get("analytics") or {}
+    records = list((analytics.get("players") or {}).values())
+    if not records and state.get("player"):
+        # Матч записан до появления аналитики: только игрок из последнего состояния
+        player, hero = state["player"], state.get("hero") or {}
+        records = [{"name": player.get("name"), "team": summary.get("team"), "hero": hero.get("name"),
+                    "level": hero.get("level"), "kills": player.get("kills"), "deaths": player.get("deaths"),
+                    "assists": player.get("assists"), "gold": player.get("gold")}]
+    
+    clock = map_data.get("clock_time", summary.get("duration"))
+    kills = analytics.get("team_kills") or {}
+    score = f"Radiant {kills.get('radiant', 0)} : {kills.get('dire', 0)} Dire"
+    if summary.get("match_end"):
+        winner = _TEAM_TITLES.get(str(summary.get("winner")).lower(), summary.get("winner") or "?")
+        lines = [f"🏁 **Матч завершен** · {format_clock(clock)} · {score} · победа {winner}"]
+    else:
+        lines = [f"🔴 **LIVE** · {format_clock(clock)} · {score}"]
+    
+    for team in ("radiant", "dire", None):
+        team_records = [r for r in records if (r.get("team") if r.get("team") in _TEAM_TITLES else None) == team]
+        if not team_records:
+            continue
+        if team is not None:
+            lines.append(f"**{_TEAM_TITLES[team]}**")
+        team_records.sort(key=lambda r: (r.get("slot") is None, r.get("slot") or 0))
+        lines.extend(_player_line(record) for record in team_records)
+    if len(lines) == 1:
+        lines.append("Данных игроков пока нет.")
+    if summary.get("match_id"):
+        lines.append(f"Матч {summary['match_id']}")
+    
+    text = "\n".join(lines)
+    # Табло - одно сообщение: лишнее обрезается
+    return text if len(text) <= MESSAGE_LIMIT else text[:MESSAGE_LIMIT - 1] + "…"
+
+
+def build_scoreboard(match_file: Path) -> Tuple[str, bool]:
+    """
+    Строит табло по файлу матча (выполняется в отдельном потоке).
+    
+    Returns:
+        (текст табло, завершен ли матч)
+    """
+    summary = read_match_summary(match_file)
+    return render_scoreboard(summary), bool(summary.get("match_end"))
+
+
+class _Watcher:
+    """Сообщение с табло в одном канале."""
+    
+    __slots__ = ("channel", "edit", "text", "last_edit")
+    
+    def __init__(self, channel: Hashable, edit: EditMessage, text: str, last_edit: float):
+        self.channel = channel
+        self.edit = edit
+        self.text = text  # Текст, который сейчас показан в сообщении
+        self.last_edit = last_edit
+
+
+class _Feed:
+    """Табло одного матча, общее для всех каналов."""
+    
+    def __init__(self, match_file: Path, now: float):
+        self.match_file = match_file
+        self.version: Optional[MatchVersion] = None
+        self.text: Optional[str] = None
+        self.finished = False
+        self.changed_at = now
+        self.watchers: Dict[Hashable, _Watcher] = {}
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+
+class LiveScoreboard:
+    """Живые табло матчей: общее построение на матч и ограниченные правки сообщений."""
+    
+    def __init__(self, build: Callable[[Path], Tuple[str, bool]] = build_scoreboard,
+                 edit_interval: float = LIVE_EDIT_INTERVAL_SECONDS, poll_interval: float = LIVE_POLL_INTERVAL_SECONDS,
+                 idle_timeout: float = LIVE_IDLE_SECONDS, version: Callable[[Path], Any] = match_version):
+        """
+        Args:
+            build: Построение табло по файлу матча (выполняется в отдельном потоке)
+            edit_interval: Минимальный интервал между правками одного сообщения (секунды)
+            poll_interval: Как часто проверять, изменился ли файл матча (секунды)
+            idle_timeout: Через сколько секунд без изменений матча остановить табло
+            version: Версия файла матча (меняется при каждой записи)
+        """
+        self._build = build
+        self._version = version
+        self.edit_interval = edit_interval
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self._feeds: Dict[str, _Feed] = {}
+        # Канал -> табло матча, за которым он следит
+        self._channels: Dict[Hashable, _Feed] = {}
+        # Счетчики для бенчмарка (те же значения уходят в метрики Prometheus)
+        self.stats = {"renders": 0, "sent": 0, "coalesced": 0, "failed": 0}
+    
+    async def current(self, match_file: Path) -> Optional[str]:
+        """
+        Текущее табло матча (одно построение на версию файла для всех каналов).
+        
+        Args:
+            match_file: Путь к файлу матча
+        
+        Returns:
+            Текст табло или None, если файл матча недоступен (например, удален
+            между поиском матча и построением табло)
+        """
+        feed = self._feed(match_file)
+        await self._refresh(feed)
+        return feed.text
+    
+    def add(self, channel: Hashable, match_file: Path, edit: EditMessage, text: str) -> None:
+        """
+        Начинает редактировать отправленное сообщение с табло.
+        
+        Args:
+            channel: Канал сообщения (табло в канале заменяет предыдущее)
+            match_file: Путь к файлу матча
+            edit: Функция правки сообщения (принимает новый текст)
+            text: Текст, с которым сообщение отправлено
+        """
+        self.remove(channel)
+        feed = self._feed(match_file)
+        feed.watchers[channel] = _Watcher(channel, edit, text, time.monotonic())
+        self._channels[channel] = feed
+        BOT_LIVE_MESSAGES.inc()
+    
+    def remove(self, channel: Hashable) -> bool:
+        """Перестает редактировать табло в канале. Возвращает False, если табло не было."""
+        feed = self._channels.pop(channel, None)
+        if feed is None:
+            return False
+        if feed.watchers.pop(channel, None) is not None:
+            BOT_LIVE_MESSAGES.dec()
+        return True
+    
+    def watching(self) -> int:
+        """Сколько сообщений с табло сейчас редактируется."""
+        return len(self._channels)
+    
+    def _feed(self, match_file: Path) -> _Feed:
+        """Табло матча; цикл обновления запускается при первом обращении."""
+        key = str(match_file)
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = _Feed(match_file, time.monotonic())
+            feed.task = asyncio.ensure_future(self._run(key, feed))
+        return feed
+    
+    async def _refresh(self, feed: _Feed) -> None:
+        """Перестраивает табло, если файл матча изменился."""
+        async with feed.lock:
+            try:
+                version = await asyncio.to_thread(self._version, feed.match_file)
+                if version == feed.version:
+                    return
+                text, finished = await asyncio.to_thread(self._build, feed.match_file)
+            except OSError:
+                # Файл удален (очистка старых матчей) - табло больше не обновится
+                feed.finished = True
+                return
+            self.stats["renders"] += 1
+            BOT_LIVE_RENDERS.inc()
+            feed.version = version
+            feed.finished = finished
+            feed.changed_at = time.monotonic()
+            if text == feed.text:
+                return
+            for watcher in feed.watchers.values():
+                if watcher.text != feed.text:
+                    # Предыдущая версия табло так и не попала в это сообщение
+                    self.stats["coalesced"] += 1
+                    BOT_LIVE_EDITS.labels("coalesced").inc()
+            feed.text = text
+    
+    async def _run(self, key: str, feed: _Feed) -> None:
+        """Цикл табло матча: проверка файла и правки сообщений, пока за матчем кто-то следит."""
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                if not feed.watchers:
+                    return
+                try:
+                    await self._refresh(feed)
+                except Exception as e:
+                    logger.warning(f"Не удалось построить табло {feed.match_file}: {e}")
+                now = time.monotonic()
+                due = [watcher for watcher in feed.watchers.values() if feed.text is not None
+                       and watcher.text != feed.text and now - watcher.last_edit >= self.edit_interval]
+                if due:
+                    await asyncio.gather(*(self._edit(feed, watcher, now) for watcher in due))
+                if feed.finished:
+                    # Итог матча уже показан - сообщение больше не меняется
+                    for watcher in list(feed.watchers.values()):
+                        if watcher.text == feed.text:
+                            self.remove(watcher.channel)
+                elif now - feed.changed_at >= self.idle_timeout:
+                    for channel in list(feed.watchers):
+                        self.remove(channel)
+        finally:
+            if self._feeds.get(key) is feed:
+                del self._feeds[key]
+            for channel in list(feed.watchers):
+                self.remove(channel)
+    
+    async def _edit(self, feed: _Feed, watcher: _Watcher, now: float) -> None:
+        """Правит одно сообщение; при ошибке (сообщение удалено, нет прав) табло в канале останавливается."""
+        text = feed.text
+        watcher.last_edit = now
+        try:
+            await watcher.edit(text)
+        except Exception as e:
+            self.stats["failed"] += 1
+            BOT_LIVE_EDITS.labels("failed").inc()
+            logger.warning(f"Не удалось обновить табло в канале {watcher.channel}: {e}")
+            if feed.watchers.get(watcher.channel) is watcher:
+                self.remove(watcher.channel)
+            return
+        watcher.text = text
+        self.stats["sent"] += 1
+        BOT_LIVE_EDITS.labels("sent").inc()
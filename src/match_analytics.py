@@ -0,0 +1,174 @@
+"""Производная аналитика матча, которая обновляется на каждом тике за O(1).
+
+Из сырых счетчиков GSI для каждого игрока (в режиме наблюдателя - для всех
+десяти) кроме текущих K/D/A, золота, героя и уровня поддерживаются:
+- net_worth - из GSI (режим наблюдателя) или оценка: золото плюс золото,
+  потраченное на предметы (уменьшение золота не из-за смерти или выкупа);
+- золото и опыт по минутам игры из приращений между тиками
+  (gold_per_minute, xp_per_minute) и средние gpm/xpm по ним;
+- участие в убийствах ((убийства + помощь) / убийства команды) и смерти на
+  10 минут;
+- время в смерти: respawn_seconds в момент смерти минус остаток таймера при
+  выкупе;
+- выкупы (рост buyback_cooldown) с потраченным золотом и золото, потерянное
+  при смертях.
+
+Тик меняет только счетчики игроков и последний элемент кривых, история
+матча не перечитывается. Состояние - обычный словарь JSON: хранилище
+держит этот же объект в матче (поле analytics документа) и сводке, поэтому
+после перезапуска аналитика продолжается с сохраненного места (первый тик
+после перезапуска - только точка отсчета).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from spectator import TEAMS, by_slot, is_spectator_payload
+
+ANALYTICS_VERSION = 1
+
+
+def empty_state() -> Dict[str, Any]:
+    """Состояние аналитики нового матча."""
+    return {"version": ANALYTICS_VERSION, "ticks": 0, "clock_time": None,
+            "team_kills": {"radiant": 0, "dire": 0}, "players": {}}
+
+
+def tick_players(data: Dict[str, Any]) -> List[Tuple[Optional[int], Dict[str, Any], Dict[str, Any], Optional[str]]]:
+    """
+    Игроки тика по сырым данным GSI.
+    
+    Returns:
+        Список (слот или None в режиме игрока, секция player, секция hero, команда)
+    """
+    raw_data = data.get("raw_data") or {}
+    if is_spectator_payload(raw_data):
+        heroes = by_slot(raw_data.get("hero"))
+        return [(slot, player, heroes[slot] or {}, TEAMS[slot])
+                for slot, player in enumerate(by_slot(raw_data.get("player"))) if player is not None]
+    player = raw_data.get("player")
+    if not isinstance(player, dict) or not player:
+        return []
+    hero = raw_data.get("hero")
+    return [(None, player, hero if isinstance(hero, dict) else {}, player.get("team_name") or player.get("team"))]
+
+
+def _number(value: Any) -> float:
+    """Числовое значение счетчика (0, если его нет)."""
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _add_to_minute(curve: List[float], minute: int, value: float) -> None:
+    """Прибавляет значение к минуте кривой (пропущенные минуты - нули)."""
+    while len(curve) <= minute:
+        curve.append(0)
+    curve[minute] += value
+
+
+class MatchAnalytics:
+    """Инкрементальный агрегатор аналитики одного матча."""
+    
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            state: Сохраненное состояние (продолжение матча) или None для нового матча
+        """
+        self.state = state if state is not None else empty_state()
+        # Значения предыдущего тика по игрокам: (золото, опыт, смерти, жив, respawn_seconds, buyback_cooldown)
+        self._previous: Dict[str, Tuple[float, float, float, Any, float, float]] = {}
+    
+    def update(self, data: Dict[str, Any]) -> None:
+        """
+        Учитывает тик.
+        
+        Args:
+            data: Обработанные данные GSI (с raw_data)
+        """
+        state = self.state
+        raw_map = (data.get("raw_data") or {}).get("map") or {}
+        clock = raw_map.get("clock_time")
+        clock = clock if isinstance(clock, (int, float)) else None
+        state["ticks"] += 1
+        state["clock_time"] = clock
+        minute = int(clock // 60) if clock is not None and clock > 0 else 0
+        minutes = clock / 60 if clock is not None and clock > 0 else None
+        
+        players = tick_players(data)
+        team_kills = state["team_kills"]
+        if "radiant_score" in raw_map or "dire_score" in raw_map:
+            team_kills["radiant"] = _number(raw_map.get("radiant_score"))
+            team_kills["dire"] = _number(raw_map.get("dire_score"))
+        elif len(players) > 1:
+            team_kills["radiant"] = sum(_number(p.get("kills")) for _, p, _, team in players if team == "radiant")
+            team_kills["dire"] = sum(_number(p.get("kills")) for _, p, _, team in players if team == "dire")
+        
+        records = state["players"]
+        for slot, player, hero, team in players:
+            key = str(player.get("steamid") or (slot if slot is not None else "player"))
+            record = records.get(key)
+            if record is None:
+                record = records[key] = {
+                    "slot": slot, "steamid": player.get("steamid"), "name": player.get("name"), "team": team,
+                    "hero": hero.get("name"), "level": 0,
+                    "kills": 0, "deaths": 0, "assists": 0, "gold": 0, "net_worth": 0, "net_worth_estimated": True,
+                    "items_gold": 0, "gold_earned": 0, "xp_earned": 0, "gold_per_minute": [], "xp_per_minute": [],
+                    "gpm": None, "xpm": None, "kill_participation": None, "deaths_per_10": None,
+                    "dead_seconds": 0, "buybacks": 0, "buyback_gold": 0, "gold_lost": 0
+                }
+            kills = _number(player.get("kills"))
+            deaths = _number(player.get("deaths"))
+            assists = _number(player.get("assists"))
+            gold = _number(player.get("gold"))
+            xp = _number(hero.get("xp"))
+            alive = hero.get("alive")
+            respawn = _number(hero.get("respawn_seconds"))
+            cooldown = _number(hero.get("buyback_cooldown"))
+            
+            previous = self._previous.get(key)
+            if previous is not None:
+                prev_gold, prev_xp, prev_deaths, prev_alive, prev_respawn, prev_cooldown = previous
+                died = deaths > prev_deaths
+                bought_back = cooldown > prev_cooldown
+                delta = gold - prev_gold
+                if delta > 0:
+                    record["gold_earned"] += delta
+                    _add_to_minute(record["gold_per_minute"], minute, delta)
+                elif delta < 0:
+                    # Золото уменьшилось: потеря при смерти, выкуп или покупка предметов
+                    if died:
+                        record["gold_lost"] -= delta
+                    elif bought_back:
+                        record["buyback_gold"] -= delta
+                    else:
+                        record["items_gold"] -= delta
+                if xp > prev_xp:
+                    record["xp_earned"] += xp - prev_xp
+                    _add_to_minute(record["xp_per_minute"], minute, xp - prev_xp)
+                if died and alive is False:
+                    record["dead_seconds"] += respawn
+                if bought_back:
+                    record["buybacks"] += 1
+                    if prev_alive is False and alive is not False:
+                        # Выкуп сокращает смерть на остаток таймера
+                        record["dead_seconds"] -= prev_respawn
+            self._previous[key] = (gold, xp, deaths, alive, respawn, cooldown)
+            
+            record["name"] = player.get("name") or record["name"]
+            record["team"] = team or record["team"]
+            record["hero"] = hero.get("name") or record["hero"]
+            record["level"] = _number(hero.get("level"))
+            record["kills"] = kills
+            record["deaths"] = deaths
+            record["assists"] = assists
+            record["gold"] = gold
+            net_worth = player.get("net_worth")
+            if isinstance(net_worth, (int, float)):
+                record["net_worth"] = net_worth
+                record["net_worth_estimated"] = False
+            else:
+                record["net_worth"] = gold + record["items_gold"]
+                record["net_worth_estimated"] = True
+            total_kills = team_kills.get(team) if team else None
+            record["kill_participation"] = round((kills + assists) / total_kills, 4) if total_kills else None
+            if minutes:
+                record["gpm"] = round(record["gold_earned"] / minutes, 1)
+                record["xpm"] = round(record["xp_earned"] / minutes, 1)
+                record["deaths_per_10"] = round(deaths / minutes * 10, 3)
@@ -0,0 +1,339 @@
+"""Запросы к сохраненным матчам: состояние на момент и ряды значений полей.
+
+Состояние на момент ищется по индексу матча (см. seek_index) одним чтением.
+
+Для рядов значений (графиков) используются колонки: для каждого запрошенного
+числового поля хранится массив float64 со значением в каждом обновлении.
+Колонка строится при первом запросе поля и дальше только дописывается новыми
+обновлениями, поэтому повторные запросы, в том числе по идущему матчу, не
+разбирают JSON уже прочитанных обновлений. Колонки завершенных матчей
+сохраняются рядом с файлом матча в папке ``<имя>.cols``.
+"""
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import OUTPUT_DIR, SERIES_CACHE_MATCHES, SERIES_MAX_FIELDS, SERIES_MAX_POINTS
+from seek_index import MatchIndex
+
+COLUMNS_SUFFIX = ".cols"
+_COLUMN_EXTENSION = ".f64"
+_SERIES_CHUNK_ROWS = 1000
+
+_MATCH_ID_RE = re.compile(r"^[0-9A-Za-z_-]+$")
+_FIELD_RE = re.compile(r"^[0-9A-Za-z_]+(\.[0-9A-Za-z_]+)*$")
+
+class QueryError(ValueError):
+    """Некорректные параметры запроса."""
+
+
+def columns_path_for(match_path: Path) -> Path:
+    """Возвращает путь к папке колонок файла матча."""
+    return match_path.with_suffix(COLUMNS_SUFFIX)
+
+
+def drop_columns(match_path: Path) -> None:
+    """Удаляет сохраненные колонки (если положение обновлений в файле изменилось)."""
+    shutil.rmtree(columns_path_for(match_path), ignore_errors=True)
+
+
+def find_match_file(match_id: str, output_dir: Path = OUTPUT_DIR) -> Optional[Path]:
+    """
+    Ищет файл матча по его ID.
+    
+    Args:
+        match_id: ID матча
+        output_dir: Папка с матчами
+    
+    Returns:
+        Самый новый файл матча или None
+    """
+    if not _MATCH_ID_RE.match(match_id):
+        raise QueryError(f"Некорректный ID матча: {match_id}")
+    files = list(output_dir.glob(f"*/match_{match_id}_*.json"))
+    if not files:
+        return None
+    return max(files, key=lambda p: p.stat().st_mtime)
+
+
+def parse_fields(fields: str) -> List[str]:
+    """
+    Разбирает список полей из параметра запроса (через запятую).
+    
+    Raises:
+        QueryError: Если поле некорректно или полей слишком много
+    """
+    result = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        if not _FIELD_RE.match(field):
+            raise QueryError(f"Некорректное поле: {field}")
+        if field not in result:
+            result.append(field)
+    if not result:
+        raise QueryError("Не указаны поля")
+    if len(result) > SERIES_MAX_FIELDS:
+        raise QueryError(f"Слишком много полей (максимум {SERIES_MAX_FIELDS})")
+    return result
+
+
+def get_field(data: Any, field: str) -> Any:
+    """
+    Возвращает значение поля по пути через точку (например, ``player.gold``).
+    
+    Числовые части пути обращаются к элементам списков (``abilities.0.level``).
+    """
+    for part in field.split("."):
+        if isinstance(data, dict):
+            data = data.get(part)
+        elif isinstance(data, list) and part.isdigit() and int(part) < len(data):
+            data = data[int(part)]
+        else:
+            return None
+    return data
+
+
+def _numeric(value: Any) -> float:
+    """Значение для числовой колонки: числа и bool как есть, остальное - NaN."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return math.nan
+
+
+class _MatchColumns:
+    """Колонки одного матча."""
+    
+    __slots__ = ("game_time", "values", "lock", "signature", "live", "last_entry")
+    
+    def __init__(self):
+        self.game_time = array('d')
+        self.values: Dict[str, array] = {}
+        self.lock = threading.Lock()
+        # Документ, по которому построены колонки: (inode, размер, mtime_ns)
+        self.signature: Optional[Tuple[int, int, int]] = None
+        # Писался ли матч (был журнал), когда колонки дописывались в последний раз
+        self.live = False
+        # (смещение, длина) последнего прочитанного обновления в документе
+        self.last_entry: Optional[Tuple[int, int]] = None
+
+
+class ColumnCache:
+    """Кэш колонок матчей (LRU по матчам) с дозаписью новых обновлений."""
+    
+    def __init__(self, max_matches: int = SERIES_CACHE_MATCHES):
+        """
+        Args:
+            max_matches: Сколько матчей держать в памяти
+        """
+        self.max_matches = max_matches
+        self._matches: "OrderedDict[str, _MatchColumns]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _get(self, match_path: Path) -> _MatchColumns:
+        """Возвращает колонки матча из кэша, вытесняя самый старый матч."""
+        key = str(match_path)
+        with self._lock:
+            columns = self._matches.get(key)
+            if columns is None:
+                columns = self._matches[key] = _MatchColumns()
+                while len(self._matches) > self.max_matches:
+                    self._matches.popitem(last=False)
+            else:
+                self._matches.move_to_end(key)
+            return columns
+    
+    def columns(self, match_path: Path, fields: Sequence[str]) -> _MatchColumns:
+        """
+        Возвращает колонки матча, дописанные до последнего сохраненного обновления.
+        
+        Args:
+            match_path: Путь к файлу матча
+            fields: Нужные поля
+        
+        Returns:
+            Колонки (game_time и values для запрошенных полей)
+        """
+        columns = self._get(match_path)
+        with columns.lock, MatchIndex(match_path) as index:
+            count = len(index)
+            live = match_path.with_suffix(".journal").exists()
+            if columns.signature is not None and index.signature != columns.signature \
+                    and not self._appended(columns, index):
+                # Документ переписан (сжатие, повторная обработка) - кэш устарел
+                columns.game_time = array('d')
+                columns.values.clear()
+                drop_columns(match_path)
+            
+            for position in range(len(columns.game_time), count):
+                game_time = index.entry(position)[1]
+                columns.game_time.append(-math.inf if game_time is None else float(game_time))
+            
+            missing = [field for field in fields if field not in columns.values]
+            for field in missing:
+                columns.values[field] = self._load(match_path, field, count)
+            
+            stale = {field: columns.values[field] for field in fields if len(columns.values[field]) < count}
+            if stale:
+                start = min(len(values) for values in stale.values())
+                for position in range(start, count):
+                    data = index.read(position).get("data")
+                    for field, values in stale.items():
+                        if len(values) == position:
+                            values.append(_numeric(get_field(data, field)))
+                # Пока матч пишется, колонки только в памяти
+                if not live:
+                    for field, values in stale.items():
+                        self._save(match_path, field, values)
+            
+            columns.signature = index.signature
+            columns.live = live
+            columns.last_entry = index.entry(count - 1)[2:] if count else None
+        return columns
+    
+    @staticmethod
+    def _appended(columns: _MatchColumns, index: MatchIndex) -> bool:
+        """
+        Проверяет, что документ только дописан после построения колонок.
+        
+        Сервер при сохранении копирует уже записанные обновления байт в байт,
+        поэтому их смещения не меняются. Сжатие и повторная обработка не
+        трогают матч, пока он пишется (есть журнал), и записывают документ
+        заново. Дописывание признается, только если при прошлом обращении
+        матч писался и последнее прочитанное обновление осталось на месте.
+        """
+        known = len(columns.game_time)
+        if not columns.live or known > len(index):
+            return False
+        return known == 0 or index.entry(known - 1)[2:] == columns.last_entry
+    
+    @staticmethod
+    def _load(match_path: Path, field: str, count: int) -> array:
+        """Загружает сохраненную колонку поля (или пустую)."""
+        values = array('d')
+        try:
+            data = (columns_path_for(match_path) / (field + _COLUMN_EXTENSION)).read_bytes()
+        except OSError:
+            return values
+        if len(data) % values.itemsize == 0 and len(data) // values.itemsize <= count:
+            values.frombytes(data)
+        return values
+    
+    @staticmethod
+    def _save(match_path: Path, field: str, values: array) -> None:
+        """Атомарно сохраняет колонку поля."""
+        directory = columns_path_for(match_path)
+        directory.mkdir(exist_ok=True)
+        path = directory / (field + _COLUMN_EXTENSION)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(values.tobytes())
+        os.replace(tmp_path, path)
+
+
+column_cache = ColumnCache()
+
+
+def _json_values(values: Sequence[float]) -> List[Any]:
+    """Значения колонки для JSON: NaN - null, целые без дробной части."""
+    return [int(value) if value.is_integer() else (None if value != value else value) for value in values]
+
+
+def query_series(match_path: Path, fields: Sequence[str], start: Optional[float] = None,
+                 end: Optional[float] = None, step: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Выбирает значения полей по игровому времени.
+    
+    Без step возвращаются все обновления в диапазоне, со step - состояние на
+    моменты start, start + step, ... (последнее обновление не позже момента).
+    
+    Args:
+        match_path: Путь к файлу матча
+        fields: Поля (только числовые значения, остальные - null)
+        start: Начало диапазона (game_time, в секундах)
+        end: Конец диапазона включительно
+        step: Шаг прореживания (в секундах игрового времени)
+    
+    Returns:
+        {"times": [...], "positions": [...], "columns": {поле: array}}
+    """
+    if step is not None and step <= 0:
+        raise QueryError("step должен быть больше 0")
+    if start is not None and end is not None and start > end:
+        raise QueryError("from больше to")
+    
+    columns = column_cache.columns(match_path, fields)
+    game_time = columns.game_time
+    # Обновления без game_time (меню, демо) идут в начале и в выборку не попадают
+    low = bisect_right(game_time, -math.inf)
+    high = len(game_time)
+    if start is not None:
+        low = max(low, bisect_left(game_time, start))
+    if end is not None:
+        high = bisect_right(game_time, end, low)
+    
+    times: List[float] = []
+    positions: List[int] = []
+    if low < high:
+        if step is None:
+            if high - low > SERIES_MAX_POINTS:
+                raise QueryError(f"Слишком много точек ({high - low}), укажите step")
+            positions = list(range(low, high))
+            times = [game_time[position] for position in positions]
+        else:
+            first = float(start) if start is not None else game_time[low]
+            last = float(end) if end is not None else game_time[high - 1]
+            if (last - first) / step > SERIES_MAX_POINTS:
+                raise QueryError("Слишком много точек, увеличьте step")
+            moment = first
+            while moment <= last:
+                position = bisect_right(game_time, moment, low, high) - 1
+                if position >= low:
+                    times.append(moment)
+                    positions.append(position)
+                moment += step
+    
+    return {
+        "times": times,
+        "positions": positions,
+        "columns": {field: columns.values[field] for field in fields}
+    }
+
+
+def iter_series_json(match_id: str, fields: Sequence[str], series: Dict[str, Any],
+                     step: Optional[float] = None) -> Iterator[bytes]:
+    """
+    Сериализует ряд значений в JSON частями для потоковой отдачи.
+    
+    Формат: {"status": "ok", "match_id": ..., "fields": ["game_time", ...],
+    "step": ..., "count": N, "points": [[game_time, значение, ...], ...]}
+    """
+    times = series["times"]
+    positions = series["positions"]
+    values = [series["columns"][field] for field in fields]
+    header = {
+        "status": "ok",
+        "match_id": match_id,
+        "fields": ["game_time", *fields],
+        "step": step,
+        "count": len(times)
+    }
+    yield json.dumps(header, ensure_ascii=False)[:-1].encode("utf-8") + b', "points": ['
+    for chunk_start in range(0, len(times), _SERIES_CHUNK_ROWS):
+        chunk_end = chunk_start + _SERIES_CHUNK_ROWS
+        chunk_positions = positions[chunk_start:chunk_end]
+        # Собираем по колонкам, а строки получаем через zip - так быстрее, чем по ячейкам
+        chunk_columns = [_json_values(times[chunk_start:chunk_end])]
+        chunk_columns.extend(_json_values([column[position] for position in chunk_positions]) for column in values)
+        chunk = json.dumps(list(zip(*chunk_columns)))[1:-1].encode("utf-8")
+        yield (b", " if chunk_start else b"") + chunk
+    yield b"]}"
+
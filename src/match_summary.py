@@ -0,0 +1,197 @@
+"""Краткая сводка матча в отдельном файле ``<имя>.summary``.
+
+Чтобы узнать ID матча, последнее состояние игрока или список игроков, не нужно
+читать документ матча (он может занимать десятки мегабайт): FileManager после
+каждой записи документа атомарно перезаписывает рядом небольшой JSON со
+сводкой - ID, время, последние секции map/player/hero, известные игроки,
+результат и аналитика матча (см. match_analytics). Размер сводки не зависит
+от длины матча.
+
+В сводке записаны inode, размер и время изменения документа, по которому она
+построена. Если документ изменился без сводки (восстановление журнала, сжатие,
+файл старой версии), сводка строится заново по заголовку документа.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from data_processor import DataProcessor
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SUFFIX = ".summary"
+# Версия 3: winner null вместо "none" (сводки прежних версий перестраиваются при чтении)
+SUMMARY_VERSION = 3
+
+# Секции последнего состояния, которые попадают в сводку
+_STATE_SECTIONS = ("map", "player", "hero")
+
+
+def summary_path_for(match_path: Path) -> Path:
+    """Возвращает путь к сводке для файла матча."""
+    return match_path.with_suffix(SUMMARY_SUFFIX)
+
+
+def latest_state(header: Dict[str, Any]) -> Dict[str, Any]:
+    """Последнее известное состояние матча: финальное, текущее или начальное."""
+    return header.get("final_state") or header.get("current_state") or header.get("initial_state") or {}
+
+
+def summarize_match(header: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Составляет сводку матча по полям документа (без обновлений).
+    
+    Args:
+        header: Поля документа матча (см. file_manager.read_match_header)
+    
+    Returns:
+        Сводка: игрок, герой, K/D/A, длительность, победитель
+    """
+    state = latest_state(header)
+    player = state.get("player") or {}
+    hero = state.get("hero") or {}
+    map_data = state.get("map") or {}
+    
+    game_time = map_data.get("game_time")
+    team = player.get("team")
+    if team is None:
+        # DataProcessor не сохраняет team_name, берем его из сырых данных
+        raw_player = (state.get("raw_data") or {}).get("player")
+        team = raw_player.get("team_name") if isinstance(raw_player, dict) else None
+    winner = DataProcessor.match_winner(map_data)
+    won = None
+    if winner and team and header.get("match_end"):
+        won = str(winner).lower() == str(team).lower()
+    
+    return {
+        "match_id": header.get("match_id"),
+        "session_key": header.get("session_key"),
+        "match_start": header.get("match_start") or "",
+        "match_end": header.get("match_end"),
+        "last_update": header.get("last_update"),
+        "duration": max(0, int(game_time)) if isinstance(game_time, (int, float)) else None,
+        "steamid": str(player["steamid"]) if player.get("steamid") else None,
+        "player_name": player.get("name"),
+        "team": team,
+        "hero": hero.get("name"),
+        "hero_id": hero.get("id"),
+        "kills": player.get("kills"),
+        "deaths": player.get("deaths"),
+        "assists": player.get("assists"),
+        "winner": winner,
+        "won": won
+    }
+
+
+def state_players(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Игроки из состояния матча (по данным GSI, без запросов к OpenDota)."""
+    raw_data = state.get("raw_data") or state
+    return DataProcessor.extract_players_accounts(raw_data) if isinstance(raw_data, dict) else []
+
+
+def merge_players(known: Dict[str, Dict[str, Any]], players: Iterable[Dict[str, Any]]) -> None:
+    """Добавляет игроков в словарь steamid -> игрок (новые данные заменяют старые)."""
+    for player in players:
+        steamid = player.get("steamid")
+        if steamid:
+            known[str(steamid)] = player
+
+
+def build_summary(match_path: Path, header: Dict[str, Any],
+                  known_players: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Строит сводку матча по полям документа.
+    
+    Args:
+        match_path: Путь к файлу матча
+        header: Поля документа кроме updates
+        known_players: Игроки, встреченные за матч (steamid -> игрок)
+    
+    Returns:
+        Сводка (без подписи документа)
+    """
+    players: Dict[str, Dict[str, Any]] = {}
+    for key in ("initial_state", "current_state", "final_state"):
+        merge_players(players, state_players(header.get(key) or {}))
+    if known_players:
+        merge_players(players, known_players.values())
+    
+    state = latest_state(header)
+    summary = {"summary_version": SUMMARY_VERSION, "match_file": match_path.name}
+    summary.update(summarize_match(header))
+    summary["state"] = {section: state.get(section) or {} for section in _STATE_SECTIONS}
+    summary["players"] = list(players.values())
+    summary["analytics"] = header.get("analytics")
+    return summary
+
+
+def _document_signature(stat: os.stat_result) -> List[int]:
+    """inode, размер и время изменения документа, по которому построена сводка."""
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def write_summary(match_path: Path, summary: Dict[str, Any], signature: Optional[List[int]] = None) -> None:
+    """
+    Атомарно записывает сводку для текущей версии файла матча.
+    
+    Вызывается сразу после записи документа. fsync не нужен: сводка
+    строится заново по документу, если она потерялась или устарела.
+    
+    Args:
+        match_path: Путь к файлу матча
+        summary: Сводка (см. build_summary)
+        signature: Подпись документа, по которому построена сводка (по умолчанию - текущая)
+    """
+    summary["document"] = signature or _document_signature(os.stat(match_path))
+    path = summary_path_for(match_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(json.dumps(summary, ensure_ascii=False).encode('utf-8'))
+    os.replace(tmp_path, path)
+
+
+def read_match_summary(match_path: Path) -> Dict[str, Any]:
+    """
+    Читает сводку матча.
+    
+    Если сводки нет или она построена по другой версии документа, сводка
+    строится по заголовку документа и сохраняется (кроме матчей, которые
+    сейчас пишутся - их сводку обновит FileManager).
+    
+    Args:
+        match_path: Путь к файлу матча
+    
+    Returns:
+        Сводка: match_id, время, state (map/player/hero), players, результат, analytics
+    """
+    from file_manager import journal_path_for, read_match_header
+    
+    signature = _document_signature(os.stat(match_path))
+    try:
+        with open(summary_path_for(match_path), 'rb') as f:
+            summary = json.load(f)
+        if (isinstance(summary, dict) and summary.get("summary_version") == SUMMARY_VERSION
+                and summary.get("document") == signature):
+            return summary
+    except (OSError, ValueError):
+        pass
+    
+    summary = build_summary(match_path, read_match_header(match_path))
+    if not journal_path_for(match_path).exists():
+        try:
+            # Подпись снята до чтения заголовка: если документ успели переписать, сводка будет перестроена
+            write_summary(match_path, summary, signature)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить сводку {summary_path_for(match_path)}: {e}")
+    return summary
+
+
+def match_players(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Возвращает игроков матча из данных GSI, сохраненных в сводке.
+    
+    OpenDota не запрашивается: во время матча он все равно не знает match_id,
+    а блокирующий запрос замедлял бы каждое построение ответа бота.
+    """
+    return DataProcessor.extract_players_accounts({"players": summary.get("players") or []})
@@ -0,0 +1,398 @@
+"""Метрики в текстовом формате Prometheus.
+
+Счетчики рассчитаны на горячий путь обработки GSI: обновление значения - это
+одна операция над атрибутом объекта со ``__slots__`` без блокировок и без
+выделения памяти под сам сэмпл. Дочерние метрики с метками создаются один раз
+(``labels(...)``) и хранятся в модульных переменных у вызывающего кода.
+
+Обновления выполняются без блокировок: при гонке между потоками отдельный
+сэмпл теоретически может потеряться, что допустимо для мониторинга.
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы бакетов по умолчанию (в секундах) для задержек обработки
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+# Границы бакетов для сетевых запросов (OpenDota)
+NETWORK_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    """Форматирует число для текстового формата Prometheus."""
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Форматирует набор меток ``{name="value",...}``."""
+    parts = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    if not parts:
+        return ""
+    return "{" + ",".join(parts) + "}"
+
+
+class _CounterChild:
+    """Значение счетчика для конкретного набора меток."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличивает счетчик."""
+        self.value += amount
+
+
+class _GaugeChild:
+    """Значение gauge для конкретного набора меток."""
+
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        """Устанавливает значение."""
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличивает значение."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Уменьшает значение."""
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Задает функцию, значение которой читается только в момент сбора метрик.
+
+        Args:
+            function: Функция без аргументов, возвращающая текущее значение
+        """
+        self.function = function
+
+    def get(self) -> float:
+        """Возвращает текущее значение."""
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class _HistogramChild:
+    """Гистограмма для конкретного набора меток."""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Последний элемент - бакет +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    """Базовый класс метрики с поддержкой меток."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Возвращает дочернюю метрику для набора значений меток.
+
+        Дочерние метрики стоит получать заранее и хранить в переменных,
+        чтобы на горячем пути не было поиска по словарю.
+        """
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"Метрика {self.name} требует метки {self.labelnames}")
+        return self._children[()]
+
+    def collect(self) -> List[str]:
+        """Возвращает строки метрики в текстовом формате."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for key, child in list(self._children.items()):
+            lines.extend(self._collect_child(key, child))
+        return lines
+
+    def _collect_child(self, key: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонно возрастающий счетчик."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличивает счетчик без меток."""
+        self._default().value += amount
+
+    def _collect_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    """Значение, которое может как расти, так и уменьшаться."""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        """Устанавливает значение gauge без меток."""
+        self._default().value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличивает значение gauge без меток."""
+        self._default().value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Уменьшает значение gauge без меток."""
+        self._default().value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Задает функцию для вычисления значения при сборе метрик."""
+        self._default().set_function(function)
+
+    def _collect_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"]
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами бакетов."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                 registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение в гистограмму без меток."""
+        self._default().observe(value)
+
+    def _collect_child(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        counts = list(child.counts)
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Реестр метрик процесса."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        """Регистрирует метрику."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# === Метрики GSI сервера ===
+
+GSI_REQUESTS = Counter(
+    "gsi_requests_total", "GSI requests by outcome", ("outcome",)
+)
+GSI_INGEST_SECONDS = Histogram(
+    "gsi_ingest_seconds", "Time spent handling a GSI request"
+)
+GSI_BYTES_PERSISTED = Counter(
+    "gsi_bytes_persisted_total", "Bytes written to match files"
+)
+GSI_MATCH_FILE_BYTES = Gauge(
+    "gsi_match_file_bytes", "Size of the current match file in bytes"
+)
+GSI_ACTIVE_SESSIONS = Gauge(
+    "gsi_active_sessions", "Matches currently in progress"
+)
+GSI_PAYLOADS_DROPPED = Counter(
+    "gsi_payloads_dropped_total", "GSI payloads dropped without processing", ("reason",)
+)
+GSI_PAYLOADS_DUPLICATE = Counter(
+    "gsi_payloads_duplicate_total", "GSI payloads identical to the previous one"
+)
+GSI_PAYLOADS_COALESCED = Counter(
+    "gsi_payloads_coalesced_total", "Queued GSI snapshots replaced by a newer one"
+)
+GSI_QUEUE_DEPTH = Gauge(
+    "gsi_ingest_queue_depth", "GSI payloads waiting for processing"
+)
+GSI_PROCESS_SECONDS = Histogram(
+    "gsi_process_seconds", "Time spent processing a queued GSI payload"
+)
+GSI_UPDATES_FILTERED = Counter(
+    "gsi_updates_filtered_total", "Match updates by persistence filter decision (persisted, skipped)", ("result",)
+)
+
+# === Метрики OpenDota (используются и сервером, и ботом) ===
+
+OPENDOTA_REQUEST_SECONDS = Histogram(
+    "opendota_request_seconds", "OpenDota API call latency", ("endpoint",),
+    buckets=NETWORK_LATENCY_BUCKETS
+)
+OPENDOTA_FAILURES = Counter(
+    "opendota_failures_total", "Failed OpenDota API calls", ("endpoint",)
+)
+OPENDOTA_PROFILE_CACHE = Counter(
+    "opendota_profile_cache_total", "Player profile cache lookups by result", ("result",)
+)
+
+# === Метрики Discord бота ===
+
+BOT_COMMANDS = Counter(
+    "discord_commands_total", "Discord bot commands by command and outcome", ("command", "outcome")
+)
+BOT_COMMAND_SECONDS = Histogram(
+    "discord_command_seconds", "Time spent handling a Discord command", ("command",),
+    buckets=NETWORK_LATENCY_BUCKETS
+)
+BOT_MATCH_FILE_READS = Counter(
+    "discord_match_file_reads_total", "Match files read by the Discord bot"
+)
+BOT_MATCH_RESPONSES = Counter(
+    "discord_match_responses_total", "!match responses by source (hit, miss, coalesced)", ("result",)
+)
+BOT_LIVE_MESSAGES = Gauge(
+    "discord_live_messages", "Live scoreboard messages currently being edited"
+)
+BOT_LIVE_RENDERS = Counter(
+    "discord_live_renders_total", "Live scoreboards rendered (one per match summary version)"
+)
+BOT_LIVE_EDITS = Counter(
+    "discord_live_edits_total", "Live scoreboard edits by result (sent, coalesced, failed)", ("result",)
+)
+
+
+def render_metrics() -> str:
+    """Возвращает метрики процесса в текстовом формате Prometheus."""
+    return REGISTRY.render()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> "ThreadingHTTPServer":
+    """
+    Запускает HTTP сервер метрик в фоновом потоке.
+
+    Используется процессами без собственного HTTP сервера (Discord бот).
+
+    Args:
+        port: Порт для прослушивания
+        host: Адрес для прослушивания
+
+    Returns:
+        Запущенный HTTP сервер
+    """
+    # http.server нужен только процессам без своего HTTP сервера - не импортируем его заранее
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        """HTTP обработчик, отдающий метрики на любом GET запросе."""
+
+        def do_GET(self):
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Не засоряем stdout логами каждого запроса от Prometheus
+            pass
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
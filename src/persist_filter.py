@@ -0,0 +1,177 @@
+"""Фильтр значимых обновлений перед записью в файл матча.
+
+При ``throttle 0.1`` Dota 2 присылает до 10 снимков в секунду, и большинство
+соседних снимков отличаются только игровым временем и регенерацией здоровья и
+маны. В файл матча записывается только снимок, в котором по сравнению с
+последним записанным изменилось что-то значимое:
+
+- убийства, смерти, помощь, уровень героя, жив ли герой;
+- предметы (имена по слотам, включая рюкзак);
+- здоровье зданий;
+- game_state;
+- золото - больше чем на PERSIST_GOLD_DELTA.
+
+Кроме того, снимок записывается, если с последней записи прошло не меньше
+PERSIST_MAX_INTERVAL_SECONDS. В режиме наблюдателя те же поля сравниваются
+для всех десяти игроков. Отфильтрованные снимки по-прежнему становятся
+текущим состоянием сессии в памяти (FileManager.update_current_state).
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config import PERSIST_FILTER_ENABLED, PERSIST_GOLD_DELTA, PERSIST_MAX_INTERVAL_SECONDS
+from metrics import GSI_UPDATES_FILTERED
+from spectator import ITEM_SLOTS, by_slot, is_spectator_payload
+
+_PERSISTED = GSI_UPDATES_FILTERED.labels("persisted")
+_SKIPPED = GSI_UPDATES_FILTERED.labels("skipped")
+
+_SPECTATOR_PLAYER_FIELDS = ("kills", "deaths", "assists")
+_SPECTATOR_HERO_FIELDS = ("level", "alive")
+
+
+def significant_state(data: Dict[str, Any]) -> Tuple:
+    """
+    Возвращает значения, изменение которых делает снимок значимым (кроме золота и зданий).
+    
+    Args:
+        data: Обработанные данные GSI (результат DataProcessor.process_gsi_data)
+    
+    Returns:
+        Кортеж: K/D/A, уровень, жив ли герой, предметы, game_state и те же поля наблюдателя
+    """
+    player = data.get("player") or {}
+    hero = data.get("hero") or {}
+    raw_data = data.get("raw_data") or {}
+    # Предметы - по сырым данным: DataProcessor не хранит слоты рюкзака (slot6-8),
+    # а покупка в рюкзак - такое же изменение, как и в режиме наблюдателя
+    items = raw_data.get("items")
+    if not isinstance(items, dict):
+        items = data.get("items") or {}
+    return (
+        player.get("kills"),
+        player.get("deaths"),
+        player.get("assists"),
+        hero.get("level"),
+        hero.get("alive"),
+        tuple(item.get("name") if isinstance(item, dict) else None for item in map(items.get, ITEM_SLOTS)),
+        (data.get("map") or {}).get("game_state"),
+        _spectator_state(raw_data) if is_spectator_payload(raw_data) else (),
+    )
+
+
+def _spectator_state(raw_data: Dict[str, Any]) -> Tuple:
+    """K/D/A, уровень, жив ли герой и предметы всех десяти игроков (по сырым данным наблюдателя)."""
+    state = []
+    sections = zip(by_slot(raw_data.get("player")), by_slot(raw_data.get("hero")), by_slot(raw_data.get("items")))
+    for player, hero, items in sections:
+        player, hero, items = player or {}, hero or {}, items or {}
+        state.append((
+            tuple(map(player.get, _SPECTATOR_PLAYER_FIELDS)),
+            tuple(map(hero.get, _SPECTATOR_HERO_FIELDS)),
+            tuple(item.get("name") if isinstance(item, dict) else None for item in map(items.get, ITEM_SLOTS)),
+        ))
+    return tuple(state)
+
+
+def gold_values(data: Dict[str, Any]) -> Tuple[Optional[int], ...]:
+    """Золото игрока (и всех игроков в режиме наблюдателя)."""
+    gold = ((data.get("player") or {}).get("gold"),)
+    raw_data = data.get("raw_data") or {}
+    if is_spectator_payload(raw_data):
+        gold += tuple((player or {}).get("gold") for player in by_slot(raw_data.get("player")))
+    return gold
+
+
+def _gold_changed(before: Tuple[Optional[int], ...], after: Tuple[Optional[int], ...], delta: float) -> bool:
+    """Проверяет, изменилось ли чье-то золото больше чем на delta."""
+    if len(before) != len(after):
+        return True
+    for old, new in zip(before, after):
+        if old is None or new is None:
+            if old is not new:
+                return True
+        elif abs(new - old) > delta:
+            return True
+    return False
+
+
+class PersistFilter:
+    """
+    Решает, записывать ли снимок в файл матча.
+    
+    Снимок сравнивается с последним записанным, а не с предыдущим, поэтому
+    медленные изменения (золото) накапливаются и записываются, когда
+    превысят порог, а значимый переход не теряется ни при каком темпе тиков.
+    """
+    
+    def __init__(self, gold_delta: float = PERSIST_GOLD_DELTA,
+                 max_interval: float = PERSIST_MAX_INTERVAL_SECONDS, enabled: bool = PERSIST_FILTER_ENABLED):
+        """
+        Args:
+            gold_delta: Изменение золота, после которого снимок записывается
+            max_interval: Максимальный интервал между записанными снимками (в секундах)
+            enabled: Если False, записывается каждый снимок
+        """
+        self.gold_delta = gold_delta
+        self.max_interval = max_interval
+        self.enabled = enabled
+        self.persisted = 0
+        self.skipped = 0
+        self._state: Optional[Tuple] = None
+        self._gold: Tuple[Optional[int], ...] = ()
+        self._buildings: Any = None
+        self._persisted_at = 0.0
+    
+    def should_persist(self, data: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """
+        Проверяет снимок и, если его нужно записать, запоминает как последний записанный.
+        
+        Args:
+            data: Обработанные данные GSI
+            now: Время по time.monotonic (по умолчанию - текущее)
+        """
+        if now is None:
+            now = time.monotonic()
+        state = significant_state(data)
+        gold = gold_values(data)
+        buildings = data.get("buildings")
+        if (self.enabled and self._state is not None and now - self._persisted_at < self.max_interval
+                and state == self._state and not _gold_changed(self._gold, gold, self.gold_delta)
+                # Секция зданий без изменений - тот же объект (см. DataProcessor._shared_section)
+                and (buildings is self._buildings or buildings == self._buildings)):
+            self.skipped += 1
+            _SKIPPED.inc()
+            return False
+        self._remember(state, gold, buildings, now)
+        return True
+    
+    def start(self, data: Dict[str, Any], now: Optional[float] = None) -> None:
+        """Начинает новый матч: сбрасывает статистику и запоминает первый снимок (он записывается всегда)."""
+        self.persisted = 0
+        self.skipped = 0
+        self._remember(significant_state(data), gold_values(data), data.get("buildings"),
+                       time.monotonic() if now is None else now)
+    
+    def _remember(self, state: Tuple, gold: Tuple[Optional[int], ...], buildings: Any, now: float) -> None:
+        """Запоминает значимые поля последнего записанного снимка."""
+        self.persisted += 1
+        _PERSISTED.inc()
+        self._state = state
+        self._gold = gold
+        self._buildings = buildings
+        self._persisted_at = now
+    
+    def reduction(self) -> float:
+        """Доля снимков текущего матча, которые не были записаны."""
+        total = self.persisted + self.skipped
+        return self.skipped / total if total else 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику фильтра."""
+        return {
+            "enabled": self.enabled,
+            "persisted": self.persisted,
+            "skipped": self.skipped,
+            "reduction": round(self.reduction(), 4)
+        }
@@ -0,0 +1,397 @@
+"""История игроков по всем сохраненным матчам (SQLite).
+
+Для каждого SteamID хранятся готовые агрегаты по завершенным матчам: число
+игр и побед, суммы K/D/A, GPM и XPM (для средних), герои, а также
+союзники и противники, с которыми игрок встречался. Агрегаты обновляются
+приращениями: FileManager.finalize_match добавляет завершенный матч, а
+матчи, сохраненные до появления истории, один раз добавляются параллельным
+проходом по архиву (backfill). Каждый матч учитывается один раз (таблица
+history_matches), поэтому проход и завершение матчей можно выполнять
+одновременно.
+
+Запрос истории игрока - чтение строк по первичному ключу и индексам, файлы
+матчей при этом не открываются.
+
+Игроки матча берутся из аналитики (match_analytics: K/D/A, GPM/XPM, герой и
+команда каждого игрока) и из данных GSI (extract_players_accounts, см.
+match_summary.state_players). В режиме игрока известен только сам игрок,
+поэтому союзники и противники появляются в матчах режима наблюдателя.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from compaction import find_match_files
+from config import HISTORY_DB_PATH, HISTORY_SCAN_WORKERS, OUTPUT_DIR
+from db import connect
+from file_manager import read_match_header
+from match_summary import latest_state, state_players, summarize_match
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_matches (
+    match_file TEXT PRIMARY KEY,
+    match_id TEXT,
+    match_start TEXT NOT NULL DEFAULT '',
+    players INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS player_totals (
+    steamid TEXT PRIMARY KEY,
+    name TEXT,
+    games INTEGER NOT NULL DEFAULT 0,
+    decided INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    stat_games INTEGER NOT NULL DEFAULT 0,
+    kills INTEGER NOT NULL DEFAULT 0,
+    deaths INTEGER NOT NULL DEFAULT 0,
+    assists INTEGER NOT NULL DEFAULT 0,
+    rate_games INTEGER NOT NULL DEFAULT 0,
+    gpm_total REAL NOT NULL DEFAULT 0,
+    xpm_total REAL NOT NULL DEFAULT 0,
+    last_match_id TEXT,
+    last_match_start TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS player_heroes (
+    steamid TEXT NOT NULL,
+    hero TEXT NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    decided INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (steamid, hero)
+);
+CREATE INDEX IF NOT EXISTS player_heroes_games ON player_heroes (steamid, games);
+CREATE TABLE IF NOT EXISTS player_peers (
+    steamid TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    peer TEXT NOT NULL,
+    peer_name TEXT,
+    games INTEGER NOT NULL DEFAULT 0,
+    decided INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (steamid, relation, peer)
+);
+CREATE INDEX IF NOT EXISTS player_peers_games ON player_peers (steamid, relation, games);
+CREATE TABLE IF NOT EXISTS history_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_UPSERT_TOTALS = """
+INSERT INTO player_totals (steamid, name, games, decided, wins, stat_games, kills, deaths, assists,
+                           rate_games, gpm_total, xpm_total, last_match_id, last_match_start)
+VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (steamid) DO UPDATE SET
+    games = games + 1, decided = decided + excluded.decided, wins = wins + excluded.wins,
+    stat_games = stat_games + excluded.stat_games, kills = kills + excluded.kills,
+    deaths = deaths + excluded.deaths, assists = assists + excluded.assists,
+    rate_games = rate_games + excluded.rate_games, gpm_total = gpm_total + excluded.gpm_total,
+    xpm_total = xpm_total + excluded.xpm_total,
+    name = CASE WHEN excluded.last_match_start >= last_match_start THEN coalesce(excluded.name, name) ELSE name END,
+    last_match_id = CASE WHEN excluded.last_match_start >= last_match_start
+                         THEN excluded.last_match_id ELSE last_match_id END,
+    last_match_start = max(last_match_start, excluded.last_match_start)
+"""
+_UPSERT_HERO = """
+INSERT INTO player_heroes (steamid, hero, games, decided, wins) VALUES (?, ?, 1, ?, ?)
+ON CONFLICT (steamid, hero) DO UPDATE SET
+    games = games + 1, decided = decided + excluded.decided, wins = wins + excluded.wins
+"""
+_UPSERT_PEER = """
+INSERT INTO player_peers (steamid, relation, peer, peer_name, games, decided, wins) VALUES (?, ?, ?, ?, 1, ?, ?)
+ON CONFLICT (steamid, relation, peer) DO UPDATE SET
+    games = games + 1, decided = decided + excluded.decided, wins = wins + excluded.wins,
+    peer_name = coalesce(excluded.peer_name, peer_name)
+"""
+
+_HERO_PREFIX = "npc_dota_hero_"
+_TEAMS = ("radiant", "dire")
+_BACKFILLED = "backfilled"
+
+MAX_LIST_SIZE = 50
+
+
+def _team(value: Any) -> Optional[str]:
+    """Команда в нижнем регистре (radiant/dire) или None."""
+    team = str(value).lower() if value else None
+    return team if team in _TEAMS else None
+
+
+def match_participants(header: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Игроки завершенного матча с результатом и показателями.
+    
+    Args:
+        header: Поля документа матча (см. file_manager.read_match_header)
+    
+    Returns:
+        Список словарей: steamid, name, team, hero, won (None, если неизвестно),
+        kills/deaths/assists и gpm/xpm (None, если неизвестны)
+    """
+    winner = _team((latest_state(header).get("map") or {}).get("win_team"))
+    participants: Dict[str, Dict[str, Any]] = {}
+    
+    def participant(steamid: Any) -> Dict[str, Any]:
+        return participants.setdefault(str(steamid), {
+            "steamid": str(steamid), "name": None, "team": None, "hero": None,
+            "kills": None, "deaths": None, "assists": None, "gpm": None, "xpm": None
+        })
+    
+    # Все игроки, которых видел GSI (в режиме наблюдателя - все десять)
+    for key in ("initial_state", "current_state", "final_state"):
+        for player in state_players(header.get(key) or {}):
+            if player.get("steamid"):
+                entry = participant(player["steamid"])
+                entry["name"] = player.get("name") or entry["name"]
+                entry["team"] = _team(player.get("team")) or entry["team"]
+    
+    records = ((header.get("analytics") or {}).get("players") or {}).values()
+    if records:
+        for record in records:
+            if not record.get("steamid"):
+                continue
+            entry = participant(record["steamid"])
+            entry["name"] = record.get("name") or entry["name"]
+            entry["team"] = _team(record.get("team")) or entry["team"]
+            entry["hero"] = record.get("hero")
+            for field in ("kills", "deaths", "assists", "gpm", "xpm"):
+                entry[field] = record.get(field)
+    else:
+        # Матч сохранен до появления аналитики: показатели есть только у игрока GSI
+        summary = summarize_match(header)
+        if summary.get("steamid"):
+            player = latest_state(header).get("player") or {}
+            entry = participant(summary["steamid"])
+            entry["name"] = summary.get("player_name") or entry["name"]
+            entry["team"] = _team(summary.get("team")) or entry["team"]
+            entry["hero"] = summary.get("hero")
+            for field in ("kills", "deaths", "assists", "gpm", "xpm"):
+                entry[field] = summary.get(field, player.get(field))
+    
+    for entry in participants.values():
+        entry["won"] = entry["team"] == winner if winner and entry["team"] else None
+        if entry["hero"] and not str(entry["hero"]).startswith(_HERO_PREFIX):
+            entry["hero"] = _HERO_PREFIX + str(entry["hero"])
+    return list(participants.values())
+
+
+def _load_finalized(path: str) -> Optional[Tuple[str, Optional[str], str, List[Dict[str, Any]]]]:
+    """Игроки завершенного матча из файла (для пула процессов); None - матч не завершен или не читается."""
+    try:
+        header = read_match_header(Path(path))
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать {path} для истории игроков: {e}")
+        return None
+    if not header.get("match_end"):
+        return None
+    return path, header.get("match_id"), header.get("match_start") or "", match_participants(header)
+
+
+class PlayerHistory:
+    """Агрегаты игроков по завершенным матчам с обновлением приращениями."""
+    
+    def __init__(self, db_path: Path = HISTORY_DB_PATH, output_dir: Path = OUTPUT_DIR):
+        """
+        Args:
+            db_path: Путь к базе SQLite
+            output_dir: Папка с матчами (пути в базе хранятся относительно нее)
+        """
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self._conn = connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def _relative(self, match_file: Path) -> str:
+        """Путь к файлу матча относительно output_dir."""
+        try:
+            return Path(match_file).relative_to(self.output_dir).as_posix()
+        except ValueError:
+            return str(match_file)
+    
+    def add_match(self, match_file: Path, header: Dict[str, Any]) -> bool:
+        """
+        Учитывает завершенный матч (вызывается из FileManager.finalize_match).
+        
+        Returns:
+            False, если матч уже учтен
+        """
+        entry = (str(match_file), header.get("match_id"), header.get("match_start") or "", match_participants(header))
+        return self.add_many([entry]) == 1
+    
+    def add_many(self, entries: Iterable[Tuple[str, Optional[str], str, List[Dict[str, Any]]]]) -> int:
+        """
+        Учитывает несколько матчей одной транзакцией.
+        
+        Args:
+            entries: (путь к файлу, match_id, match_start, игроки из match_participants)
+        
+        Returns:
+            Сколько матчей добавлено (уже учтенные пропускаются)
+        """
+        added = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for match_file, match_id, match_start, participants in entries:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO history_matches (match_file, match_id, match_start, players) "
+                        "VALUES (?, ?, ?, ?)",
+                        (self._relative(Path(match_file)), match_id, match_start, len(participants))
+                    )
+                    if cursor.rowcount == 0:
+                        continue
+                    self._apply(match_id, match_start, participants)
+                    added += 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+    
+    def _apply(self, match_id: Optional[str], match_start: str, participants: List[Dict[str, Any]]) -> None:
+        """Прибавляет матч к агрегатам игроков (внутри транзакции)."""
+        totals, heroes, peers = [], [], []
+        for player in participants:
+            decided = int(player["won"] is not None)
+            wins = int(bool(player["won"]))
+            has_stats = player["kills"] is not None
+            has_rates = player["gpm"] is not None
+            totals.append((
+                player["steamid"], player["name"], decided, wins, int(has_stats),
+                player["kills"] or 0, player["deaths"] or 0, player["assists"] or 0,
+                int(has_rates), player["gpm"] or 0, player["xpm"] or 0, match_id, match_start
+            ))
+            if player["hero"]:
+                heroes.append((player["steamid"], player["hero"], decided, wins))
+            if player["team"] is None:
+                continue
+            for other in participants:
+                if other is player or other["team"] is None:
+                    continue
+                relation = "teammate" if other["team"] == player["team"] else "opponent"
+                peers.append((player["steamid"], relation, other["steamid"], other["name"], decided, wins))
+        self._conn.executemany(_UPSERT_TOTALS, totals)
+        self._conn.executemany(_UPSERT_HERO, heroes)
+        self._conn.executemany(_UPSERT_PEER, peers)
+    
+    def backfilled(self) -> bool:
+        """Выполнен ли проход по архиву."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM history_meta WHERE key = ?", (_BACKFILLED,)).fetchone()
+        return row is not None
+    
+    def backfill(self, jobs: Optional[int] = HISTORY_SCAN_WORKERS, batch_size: int = 200) -> Dict[str, int]:
+        """
+        Один раз добавляет в историю завершенные матчи архива.
+        
+        Заголовки файлов читаются параллельно в нескольких процессах, уже
+        учтенные матчи пропускаются, поэтому прерванный проход продолжается
+        с места остановки.
+        
+        Args:
+            jobs: Количество процессов (None - число CPU)
+            batch_size: Сколько матчей добавлять одной транзакцией
+        
+        Returns:
+            Количество просмотренных файлов и добавленных матчей
+        """
+        with self._lock:
+            known = {row["match_file"] for row in self._conn.execute("SELECT match_file FROM history_matches")}
+        paths = [str(path) for path in find_match_files(self.output_dir) if self._relative(path) not in known]
+        
+        added = 0
+        batch = []
+        if jobs == 1 or len(paths) <= 1:
+            results = map(_load_finalized, paths)
+            pool = None
+        else:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: проход запускается и из потока сервера, fork многопоточного процесса небезопасен
+            pool = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn"))
+            results = pool.map(_load_finalized, paths, chunksize=16)
+        try:
+            for entry in results:
+                if entry is None:
+                    continue
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    added += self.add_many(batch)
+                    batch = []
+            if batch:
+                added += self.add_many(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO history_meta (key, value) VALUES (?, '1')", (_BACKFILLED,))
+        return {"scanned": len(paths), "added": added}
+    
+    def history(self, steamid: str, limit: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        История игрока по всем учтенным матчам.
+        
+        Args:
+            steamid: SteamID64 игрока
+            limit: Сколько героев, союзников и противников вернуть (самые частые)
+        
+        Returns:
+            Агрегаты игрока или None, если игрок не встречался в завершенных матчах
+        """
+        limit = max(1, min(int(limit), MAX_LIST_SIZE))
+        steamid = str(steamid)
+        with self._lock:
+            totals = self._conn.execute("SELECT * FROM player_totals WHERE steamid = ?", (steamid,)).fetchone()
+            if totals is None:
+                return None
+            heroes = self._conn.execute(
+                "SELECT hero, games, decided, wins FROM player_heroes WHERE steamid = ? ORDER BY games DESC LIMIT ?",
+                (steamid, limit)
+            ).fetchall()
+            peers = {
+                relation: self._conn.execute(
+                    "SELECT peer, peer_name, games, decided, wins FROM player_peers "
+                    "WHERE steamid = ? AND relation = ? ORDER BY games DESC LIMIT ?",
+                    (steamid, relation, limit)
+                ).fetchall()
+                for relation in ("teammate", "opponent")
+            }
+        
+        def rate(wins: int, decided: int) -> Optional[float]:
+            return round(wins / decided, 4) if decided else None
+        
+        def average(total: float, games: int) -> Optional[float]:
+            return round(total / games, 2) if games else None
+        
+        return {
+            "steamid": steamid,
+            "name": totals["name"],
+            "games": totals["games"],
+            "wins": totals["wins"],
+            "losses": totals["decided"] - totals["wins"],
+            "winrate": rate(totals["wins"], totals["decided"]),
+            "avg_kills": average(totals["kills"], totals["stat_games"]),
+            "avg_deaths": average(totals["deaths"], totals["stat_games"]),
+            "avg_assists": average(totals["assists"], totals["stat_games"]),
+            "avg_gpm": average(totals["gpm_total"], totals["rate_games"]),
+            "avg_xpm": average(totals["xpm_total"], totals["rate_games"]),
+            "last_match_id": totals["last_match_id"],
+            "last_match_start": totals["last_match_start"] or None,
+            "heroes": [{"hero": row["hero"], "games": row["games"], "wins": row["wins"],
+                        "winrate": rate(row["wins"], row["decided"])} for row in heroes],
+            "teammates": [{"steamid": row["peer"], "name": row["peer_name"], "games": row["games"],
+                           "wins": row["wins"], "winrate": rate(row["wins"], row["decided"])}
+                          for row in peers["teammate"]],
+            "opponents": [{"steamid": row["peer"], "name": row["peer_name"], "games": row["games"],
+                           "wins": row["wins"], "winrate": rate(row["wins"], row["decided"])}
+                          for row in peers["opponent"]],
+        }
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
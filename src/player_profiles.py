@@ -0,0 +1,335 @@
+"""Профили игроков OpenDota: ранг, винрейт в последних матчах, любимые герои.
+
+Для игроков матча профили запрашиваются параллельно (не больше
+OPENDOTA_CONCURRENCY запросов одновременно), поэтому десять игроков без кэша
+загружаются примерно за время одного запроса. Загруженные профили хранятся в
+SQLite (по account_id) PLAYER_CACHE_TTL_SECONDS секунд и общие для сервера и
+бота, так что повторный !match или /players обходится без запросов к OpenDota.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    OPENDOTA_API_URL, OPENDOTA_CONCURRENCY, OPENDOTA_TIMEOUT_SECONDS, PLAYER_CACHE_DB_PATH, PLAYER_CACHE_TTL_SECONDS
+)
+from db import connect
+from metrics import OPENDOTA_FAILURES, OPENDOTA_PROFILE_CACHE, OPENDOTA_REQUEST_SECONDS
+from profiling import stage_timings
+from utils import steamid64_to_account_id
+
+logger = logging.getLogger(__name__)
+
+# Список героев меняется только с патчами
+HEROES_TTL_SECONDS = 7 * 86400
+# Сколько любимых героев показывать
+TOP_HEROES = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_profiles (
+    account_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS opendota_constants (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+_RANK_NAMES = {
+    1: "Herald", 2: "Guardian", 3: "Crusader", 4: "Archon",
+    5: "Legend", 6: "Ancient", 7: "Divine", 8: "Immortal"
+}
+
+
+def rank_name(rank_tier: Optional[int]) -> Optional[str]:
+    """
+    Переводит rank_tier OpenDota в название ранга.
+    
+    Args:
+        rank_tier: Десятки - медаль, единицы - звезды (например, 54 - Legend 4)
+    
+    Returns:
+        Название ранга или None, если ранга нет
+    """
+    if not isinstance(rank_tier, int) or rank_tier <= 0:
+        return None
+    medal, stars = divmod(rank_tier, 10)
+    name = _RANK_NAMES.get(medal)
+    if name is None:
+        return None
+    return name if medal == 8 or not stars else f"{name} {stars}"
+
+
+def _fetch_json(path: str, endpoint: str) -> Optional[Any]:
+    """
+    Выполняет GET запрос к OpenDota API.
+    
+    Args:
+        path: Путь относительно OPENDOTA_API_URL
+        endpoint: Название запроса для метрик
+    
+    Returns:
+        Ответ в виде JSON или None при ошибке
+    """
+    started = time.perf_counter()
+    try:
+        import urllib.request  # тяжелый импорт, нужен только при запросах
+        with urllib.request.urlopen(f"{OPENDOTA_API_URL}/{path}", timeout=OPENDOTA_TIMEOUT_SECONDS) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except Exception as e:
+        OPENDOTA_FAILURES.labels(endpoint).inc()
+        logger.warning(f"Ошибка запроса к OpenDota ({path}): {e}")
+        return None
+    finally:
+        elapsed = time.perf_counter() - started
+        OPENDOTA_REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+        stage_timings.record("opendota", elapsed)
+
+
+def build_profile(account_id: int, player: Dict[str, Any], recent_matches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Составляет профиль игрока из ответов OpenDota.
+    
+    Args:
+        account_id: Account ID игрока
+        player: Ответ /players/{account_id}
+        recent_matches: Ответ /players/{account_id}/recentMatches
+    
+    Returns:
+        Профиль: ранг, результаты последних матчей и любимые герои (hero_id)
+    """
+    profile = player.get("profile") or {}
+    wins = 0
+    heroes: Dict[int, List[int]] = {}
+    for match in recent_matches:
+        if not isinstance(match, dict):
+            continue
+        radiant = (match.get("player_slot") or 0) < 128
+        won = match.get("radiant_win") is not None and bool(match.get("radiant_win")) == radiant
+        wins += won
+        stats = heroes.setdefault(match.get("hero_id"), [0, 0])
+        stats[0] += 1
+        stats[1] += won
+    games = sum(stats[0] for stats in heroes.values())
+    top = sorted(((hero_id, stats) for hero_id, stats in heroes.items() if hero_id),
+                 key=lambda item: (-item[1][0], -item[1][1]))[:TOP_HEROES]
+    rank_tier = player.get("rank_tier")
+    return {
+        "account_id": account_id,
+        "personaname": profile.get("personaname"),
+        "rank_tier": rank_tier,
+        "rank": rank_name(rank_tier),
+        "leaderboard_rank": player.get("leaderboard_rank"),
+        "recent_matches": games,
+        "recent_wins": wins,
+        "win_rate": round(wins / games, 3) if games else None,
+        "top_heroes": [{"hero_id": hero_id, "games": stats[0], "wins": stats[1]} for hero_id, stats in top]
+    }
+
+
+class PlayerProfileCache:
+    """Постоянный кэш профилей игроков (SQLite) с временем жизни записей."""
+    
+    def __init__(self, db_path: Path = PLAYER_CACHE_DB_PATH, ttl: float = PLAYER_CACHE_TTL_SECONDS):
+        """
+        Args:
+            db_path: Путь к базе SQLite
+            ttl: Сколько секунд профиль считается свежим
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self._conn = connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def get_many(self, account_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Возвращает свежие профили из кэша (отсутствующие и устаревшие пропускаются)."""
+        account_ids = list(account_ids)
+        if not account_ids:
+            return {}
+        placeholders = ", ".join("?" * len(account_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT account_id, data FROM player_profiles WHERE account_id IN ({placeholders}) "
+                f"AND fetched_at >= ?",
+                account_ids + [time.time() - self.ttl]
+            ).fetchall()
+        return {row["account_id"]: json.loads(row["data"]) for row in rows}
+    
+    def put_many(self, profiles: Dict[int, Dict[str, Any]]) -> None:
+        """Сохраняет профили одной транзакцией."""
+        if not profiles:
+            return
+        now = time.time()
+        rows = [(account_id, json.dumps(profile, ensure_ascii=False), now) for account_id, profile in profiles.items()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO player_profiles (account_id, data, fetched_at) VALUES (?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def get_constant(self, name: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """Возвращает справочник OpenDota из кэша, если он не старше ttl секунд (без ttl - любой)."""
+        min_fetched_at = time.time() - ttl if ttl is not None else float("-inf")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM opendota_constants WHERE name = ? AND fetched_at >= ?", (name, min_fetched_at)
+            ).fetchone()
+        return json.loads(row["data"]) if row else None
+    
+    def put_constant(self, name: str, data: Any) -> None:
+        """Сохраняет справочник OpenDota."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO opendota_constants (name, data, fetched_at) VALUES (?, ?, ?)",
+                (name, json.dumps(data, ensure_ascii=False), time.time())
+            )
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[PlayerProfileCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> PlayerProfileCache:
+    """Возвращает общий кэш профилей процесса (создается при первом обращении)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PlayerProfileCache()
+        return _default_cache
+
+
+def _hero_names(heroes: Any) -> Dict[str, str]:
+    """Имена героев из ответа /constants/heroes: hero_id (строкой) -> имя."""
+    if not isinstance(heroes, dict):
+        return {}
+    return {
+        str(hero.get("id", hero_id)): hero.get("localized_name") or hero.get("name")
+        for hero_id, hero in heroes.items() if isinstance(hero, dict)
+    }
+
+
+def fetch_profiles(account_ids: List[int], cache: Optional[PlayerProfileCache] = None,
+                   max_workers: int = OPENDOTA_CONCURRENCY) -> Dict[int, Dict[str, Any]]:
+    """
+    Возвращает профили игроков: из кэша, а недостающие - из OpenDota.
+    
+    Все запросы к OpenDota (по два на игрока и при необходимости список
+    героев) выполняются параллельно, не больше max_workers одновременно.
+    
+    Args:
+        account_ids: Account ID игроков
+        cache: Кэш профилей (по умолчанию - общий кэш процесса)
+        max_workers: Максимум одновременных запросов
+    
+    Returns:
+        account_id -> профиль (игроки, чей профиль загрузить не удалось, пропускаются)
+    """
+    cache = cache or get_profile_cache()
+    account_ids = list(dict.fromkeys(account_ids))
+    profiles = cache.get_many(account_ids)
+    missing = [account_id for account_id in account_ids if account_id not in profiles]
+    OPENDOTA_PROFILE_CACHE.labels("hit").inc(len(profiles))
+    if missing:
+        OPENDOTA_PROFILE_CACHE.labels("miss").inc(len(missing))
+        profiles.update(_fetch_missing(missing, cache, max_workers))
+    
+    # Имена героев подставляем при чтении: устаревший список героев лучше, чем запрос к OpenDota
+    heroes = cache.get_constant("heroes") or {}
+    for profile in profiles.values():
+        for hero in profile.get("top_heroes") or []:
+            hero["name"] = heroes.get(str(hero.get("hero_id")))
+    return profiles
+
+
+def _fetch_missing(missing: List[int], cache: PlayerProfileCache, max_workers: int) -> Dict[int, Dict[str, Any]]:
+    """Загружает профили из OpenDota параллельно и сохраняет их в кэш."""
+    heroes = cache.get_constant("heroes", HEROES_TTL_SECONDS)
+    requests: List[Tuple[str, str]] = []
+    for account_id in missing:
+        requests.append((f"players/{account_id}", "players"))
+        requests.append((f"players/{account_id}/recentMatches", "recent_matches"))
+    if heroes is None:
+        requests.append(("constants/heroes", "heroes"))
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(requests)))) as pool:
+        responses = list(pool.map(lambda request: _fetch_json(*request), requests))
+    
+    if heroes is None:
+        heroes = _hero_names(responses.pop())
+        if heroes:
+            cache.put_constant("heroes", heroes)
+    
+    fetched = {}
+    for index, account_id in enumerate(missing):
+        player, recent_matches = responses[2 * index], responses[2 * index + 1]
+        # Профиль кэшируем только целиком: при ошибке одного из запросов повторим в следующий раз
+        if not isinstance(player, dict) or not isinstance(recent_matches, list):
+            continue
+        fetched[account_id] = build_profile(account_id, player, recent_matches)
+    try:
+        cache.put_many(fetched)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить профили игроков в кэш: {e}")
+    return fetched
+
+
+def enrich_players(players: List[Dict[str, Any]], cache: Optional[PlayerProfileCache] = None,
+                   max_workers: int = OPENDOTA_CONCURRENCY) -> List[Dict[str, Any]]:
+    """
+    Добавляет игрокам профиль OpenDota (поле ``profile``, None - если профиль недоступен).
+    
+    Args:
+        players: Игроки матча (со steamid в формате SteamID64)
+        cache: Кэш профилей (по умолчанию - общий кэш процесса)
+        max_workers: Максимум одновременных запросов к OpenDota
+    
+    Returns:
+        Копии словарей игроков с полем profile
+    """
+    account_ids = {}
+    for player in players:
+        account_id = steamid64_to_account_id(player.get("steamid"))
+        if account_id:
+            account_ids[str(player.get("steamid"))] = account_id
+    profiles = fetch_profiles(list(account_ids.values()), cache, max_workers) if account_ids else {}
+    
+    enriched = []
+    for player in players:
+        account_id = account_ids.get(str(player.get("steamid")))
+        enriched.append({**player, "profile": profiles.get(account_id)})
+    return enriched
+
+
+def format_profile(profile: Optional[Dict[str, Any]]) -> str:
+    """
+    Краткое описание профиля для сообщения бота.
+    
+    Пример: ``Legend 4 · WR 60% (12/20) · Anti-Mage, Axe, Pudge``
+    """
+    if not profile:
+        return "профиль недоступен"
+    parts = [profile.get("rank") or "без ранга"]
+    if profile.get("recent_matches"):
+        parts.append(f"WR {profile['win_rate'] * 100:.0f}% ({profile['recent_wins']}/{profile['recent_matches']})")
+    heroes = [hero.get("name") or f"#{hero.get('hero_id')}" for hero in profile.get("top_heroes") or []]
+    if heroes:
+        parts.append(", ".join(heroes))
+    return " · ".join(parts)
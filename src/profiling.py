@@ -0,0 +1,182 @@
+"""Поэтапные таймеры и сэмплирующий профилировщик для диагностики обработки GSI."""
+import sys
+import threading
+import time
+from collections import Counter as _StackCounter, deque
+from typing import Deque, Dict, Any
+
+from config import PROFILE_INTERVAL_SECONDS, PROFILE_MAX_SECONDS, STAGE_WINDOW_SIZE
+
+
+class StageTimings:
+    """
+    Хранит длительности последних выполнений каждого этапа обработки.
+
+    Для каждого этапа держится кольцевой буфер фиксированного размера,
+    поэтому память не растет со временем, а статистика отражает недавние
+    запросы. Перцентили считаются только при запросе статистики.
+    """
+
+    def __init__(self, window_size: int = STAGE_WINDOW_SIZE):
+        """
+        Args:
+            window_size: Сколько последних измерений хранить для каждого этапа
+        """
+        self.window_size = window_size
+        self._samples: Dict[str, Deque[float]] = {}
+        self._totals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """
+        Записывает длительность этапа.
+
+        Args:
+            stage: Название этапа
+            seconds: Длительность в секундах
+        """
+        samples = self._samples.get(stage)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(stage, deque(maxlen=self.window_size))
+                self._totals.setdefault(stage, 0)
+        samples.append(seconds)
+        self._totals[stage] += 1
+
+    def time(self, stage: str) -> "_StageTimer":
+        """
+        Возвращает контекстный менеджер, измеряющий длительность блока.
+
+        Пример:
+            with stage_timings.time("parse"):
+                data = json.loads(body)
+        """
+        return _StageTimer(self, stage)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает статистику по последним измерениям каждого этапа.
+
+        Returns:
+            Словарь {этап: {count, window, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}
+        """
+        result = {}
+        for stage, samples in list(self._samples.items()):
+            values = sorted(samples)
+            if not values:
+                continue
+            n = len(values)
+            result[stage] = {
+                "count": self._totals.get(stage, 0),
+                "window": n,
+                "mean_ms": round(sum(values) / n * 1000, 3),
+                "p50_ms": round(values[int(n * 0.50)] * 1000, 3),
+                "p95_ms": round(values[min(n - 1, int(n * 0.95))] * 1000, 3),
+                "p99_ms": round(values[min(n - 1, int(n * 0.99))] * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+        return result
+
+
+class _StageTimer:
+    """Контекстный менеджер для измерения одного этапа."""
+
+    __slots__ = ("_timings", "_stage", "_started")
+
+    def __init__(self, timings: StageTimings, stage: str):
+        self._timings = timings
+        self._stage = stage
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._timings.record(self._stage, time.perf_counter() - self._started)
+        return False
+
+
+class ProfilerBusyError(RuntimeError):
+    """Профилировщик уже запущен."""
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик стеков всех потоков процесса.
+
+    Работает в отдельном потоке и периодически читает ``sys._current_frames()``,
+    не устанавливая трассировку в профилируемый код, поэтому его можно включать
+    на работающем сервере во время матча. Одновременно может работать только
+    один сеанс профилирования, длительность ограничена ``PROFILE_MAX_SECONDS``.
+
+    Результат - текст в формате collapsed stacks (``frame;frame;frame count``),
+    который понимают flamegraph.pl, speedscope и inferno.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS, max_seconds: float = PROFILE_MAX_SECONDS):
+        """
+        Args:
+            interval: Интервал между сэмплами в секундах
+            max_seconds: Максимальная длительность одного сеанса
+        """
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Идет ли сейчас профилирование."""
+        return self._lock.locked()
+
+    def profile(self, seconds: float) -> str:
+        """
+        Собирает сэмплы стеков в течение заданного времени.
+
+        Блокирует вызывающий поток на время профилирования, поэтому из
+        асинхронного кода его нужно вызывать через ``asyncio.to_thread``.
+
+        Args:
+            seconds: Длительность профилирования (обрезается до max_seconds)
+
+        Returns:
+            Стеки в формате collapsed stacks
+
+        Raises:
+            ProfilerBusyError: Если профилирование уже запущено
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("Профилирование уже запущено")
+        try:
+            seconds = max(0.0, min(float(seconds), self.max_seconds))
+            stacks = _StackCounter()
+            own_id = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample(stacks, own_id)
+                time.sleep(self.interval)
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _sample(stacks: _StackCounter, own_id: int) -> None:
+        """Добавляет по одному сэмплу стека каждого потока (кроме собственного)."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            frames.append(names.get(thread_id, str(thread_id)))
+            frames.reverse()
+            stacks[";".join(frames)] += 1
+
+
+# Общие экземпляры для процесса
+stage_timings = StageTimings()
+profiler = SamplingProfiler()
+
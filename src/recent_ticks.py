@@ -0,0 +1,164 @@
+"""Кольцевой буфер последних тиков сессии для оконных запросов (виджеты оверлея).
+
+Для вопросов вида "сколько золота получено за последние 60 секунд" или
+"как менялось здоровье за 10 секунд" не нужно читать файл матча: каждая
+сессия держит в памяти последние RECENT_TICKS_CAPACITY тиков в компактном
+виде - числовые поля RECENT_TICKS_FIELDS по колонкам (массив float64 на поле,
+как колонки match_query). Массивы выделяются один раз при создании сессии,
+запись тика перезаписывает самую старую строку, поэтому память сессии
+ограничена и не растет: (число полей + 2) * 8 байт * емкость.
+
+Окно отсчитывается по времени получения тика (time.monotonic) назад от
+последнего тика, и запрос проходит только по строкам окна - O(размер окна).
+Буфер пишет один поток (обработчик очереди сессии), а читают другие. Когда
+буфер заполнен, запись перезаписывает самую старую строку, и чтение окна без
+блокировки могло бы смешать в ней старые и новые значения. Поэтому запись тика
+и копирование строк окна выполняются под блокировкой (обе - микросекунды),
+а агрегаты считаются по копии уже без нее.
+"""
+import math
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import RECENT_TICKS_CAPACITY, RECENT_TICKS_FIELDS
+
+
+class RecentTicks:
+    """Последние тики сессии по колонкам фиксированной емкости."""
+    
+    def __init__(self, capacity: int = RECENT_TICKS_CAPACITY, fields: Sequence[str] = RECENT_TICKS_FIELDS):
+        """
+        Args:
+            capacity: Сколько последних тиков хранить
+            fields: Числовые поля тика (путь через точку, как в /matches/{match_id}/series)
+        """
+        if capacity < 1:
+            raise ValueError("Емкость буфера должна быть положительной")
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._times = array('d', bytes(8 * capacity))
+        self._game_times = array('d', [math.nan]) * capacity
+        self._columns = tuple(array('d', [math.nan]) * capacity for _ in self.fields)
+        # Поля группируются по секциям, чтобы при записи тика каждая секция доставалась один раз
+        sections: Dict[str, List[Tuple[array, Tuple[str, ...]]]] = {}
+        for field, column in zip(self.fields, self._columns):
+            section, *path = field.split(".")
+            sections.setdefault(section, []).append((column, tuple(path)))
+        self._sections = tuple((section, tuple(columns)) for section, columns in sections.items())
+        self._next = 0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def append(self, data: Dict[str, Any], now: Optional[float] = None) -> None:
+        """
+        Записывает тик на место самого старого.
+        
+        Args:
+            data: Обработанные данные GSI
+            now: Время получения по time.monotonic (по умолчанию - текущее)
+        """
+        game_time = (data.get("map") or {}).get("game_time")
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            row = self._next
+            for section_name, columns in self._sections:
+                section = data.get(section_name)
+                for column, path in columns:
+                    value = section
+                    for part in path:
+                        value = value.get(part) if isinstance(value, dict) else None
+                    column[row] = value if isinstance(value, (int, float)) else math.nan
+            self._game_times[row] = game_time if isinstance(game_time, (int, float)) else math.nan
+            self._times[row] = now
+            self._next = (row + 1) % self.capacity
+            if self.count < self.capacity:
+                self.count += 1
+    
+    def clear(self) -> None:
+        """Забывает все тики (новый матч); память не освобождается."""
+        with self._lock:
+            self._next = 0
+            self.count = 0
+    
+    def _window_rows(self, seconds: float) -> List[int]:
+        """Строки тиков за последние seconds секунд, от старых к новым (вызывается под self._lock)."""
+        count = self.count
+        if not count:
+            return []
+        times = self._times
+        capacity = self.capacity
+        row = (self._next - 1) % capacity
+        start = times[row] - seconds
+        rows = []
+        for _ in range(count):
+            if times[row] < start:
+                break
+            rows.append(row)
+            row = (row - 1) % capacity
+        rows.reverse()
+        return rows
+    
+    def aggregate(self, fields: Sequence[str], seconds: float) -> Dict[str, Any]:
+        """
+        Считает агрегаты полей за окно.
+        
+        Args:
+            fields: Поля из self.fields
+            seconds: Длина окна в секундах (назад от последнего тика)
+        
+        Returns:
+            {"ticks", "seconds", "game_time": [от, до], "fields": {поле: {first, last,
+            delta, min, max, rate}}}; rate - изменение в секунду, значения null,
+            если в окне нет чисел
+        
+        Raises:
+            KeyError: Если поле не хранится в буфере
+        """
+        columns = [self._columns[self.fields.index(field)] if field in self.fields else None for field in fields]
+        unknown = [field for field, column in zip(fields, columns) if column is None]
+        if unknown:
+            raise KeyError(", ".join(unknown))
+        # Копия окна под блокировкой: запись не перезапишет строки посреди подсчета
+        with self._lock:
+            rows = self._window_rows(seconds)
+            times = [self._times[row] for row in rows]
+            values = [[column[row] for row in rows] for column in columns]
+            game_times = [self._game_times[row] for row in (rows[0], rows[-1])] if rows else []
+        result = {}
+        for field, column in zip(fields, values):
+            first = last = low = high = None
+            first_time = last_time = 0.0
+            for tick_time, value in zip(times, column):
+                if value != value:  # NaN - поля не было в тике
+                    continue
+                if first is None:
+                    first = low = high = value
+                    first_time = tick_time
+                elif value < low:
+                    low = value
+                elif value > high:
+                    high = value
+                last = value
+                last_time = tick_time
+            span = last_time - first_time
+            result[field] = {
+                "first": first,
+                "last": last,
+                "delta": last - first if first is not None else None,
+                "min": low,
+                "max": high,
+                "rate": round((last - first) / span, 4) if first is not None and span > 0 else None
+            }
+        return {
+            "ticks": len(rows),
+            "seconds": round(times[-1] - times[0], 3) if rows else 0.0,
+            "game_time": [value if value == value else None for value in game_times],
+            "fields": result
+        }
+    
+    def memory_bytes(self) -> int:
+        """Память, занятая массивами буфера (без учета заголовков объектов)."""
+        return 8 * self.capacity * (len(self._columns) + 2)
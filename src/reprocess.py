@@ -0,0 +1,288 @@
+"""Повторная обработка сохраненных матчей и перевод в текущий формат хранения.
+
+В каждом сохраненном состоянии есть исходный payload GSI (``raw_data``),
+поэтому после изменений DataProcessor обработанные секции можно пересчитать:
+каждое обновление и состояния заголовка (``initial_state``,
+``current_state``, ``final_state``) заново проходят через process_gsi_data,
+а документ переписывается в текущем формате (STORAGE_FORMAT_VERSION). Файлы
+старого формата (json.dump с отступами) при этом переводятся в новый.
+Аналитика матча (``analytics``, см. match_analytics) пересчитывается по
+переработанным обновлениям, индекс и сводка пишутся заново, сохраненные
+колонки полей удаляются (перестроятся при чтении).
+
+Переработанный документ помечается полем ``processor_version``, и файлы с
+текущей версией пропускаются. Прерванный запуск продолжается с места
+остановки по контрольной точке ``reprocess.checkpoint`` в папке output
+(нужно для ``--force``, когда версия обработки не менялась).
+"""
+import json
+import os
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from data_processor import PROCESSOR_VERSION, DataProcessor
+from file_manager import (
+    STORAGE_FORMAT_VERSION, encode_update, journal_path_for, read_match_header, tmp_path_for, write_match_document
+)
+from match_analytics import MatchAnalytics
+from match_query import drop_columns
+from match_summary import build_summary, merge_players, state_players, write_summary
+from seek_index import LegacyFormatError, index_key, scan_document, write_index
+
+CHECKPOINT_NAME = "reprocess.checkpoint"
+
+_STATE_KEYS = ("initial_state", "current_state", "final_state")
+_MISSING = object()
+
+
+def reprocess_state(state: Any, previous: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Пересчитывает обработанные секции состояния по сохраненному raw_data.
+    
+    Args:
+        state: Сохраненное состояние
+        previous: Пересчитанное предыдущее состояние (см. DataProcessor.process_gsi_data)
+    """
+    if not isinstance(state, dict):
+        return state
+    raw_data = state.get("raw_data")
+    if not isinstance(raw_data, dict):
+        # Без исходного payload пересчитать нечего
+        return state
+    return DataProcessor.process_gsi_data(raw_data, previous)
+
+
+def changed_fields(old: Any, new: Any) -> List[str]:
+    """
+    Возвращает поля состояния, значения которых изменились после пересчета.
+    
+    Returns:
+        Имена вида "секция.поле" (или "секция", если секция не словарь); raw_data не сравнивается
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return [] if old == new else ["state"]
+    changed = []
+    for section in old.keys() | new.keys():
+        if section == "raw_data":
+            continue
+        before, after = old.get(section, _MISSING), new.get(section, _MISSING)
+        if before == after:
+            continue
+        if isinstance(before, dict) and isinstance(after, dict):
+            changed.extend(
+                f"{section}.{field}" for field in before.keys() | after.keys()
+                if before.get(field, _MISSING) != after.get(field, _MISSING)
+            )
+        else:
+            changed.append(section)
+    return changed
+
+
+def _open_document(path: Path) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]], bool]:
+    """
+    Открывает документ матча для потокового чтения обновлений.
+    
+    Returns:
+        (поля документа кроме updates, обновления, старый ли формат)
+    """
+    lines = scan_document(path)
+    try:
+        first = next(lines, None)
+    except LegacyFormatError:
+        # Старый формат читается целиком: обновления не разделены по строкам
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("файл не содержит объект матча")
+        updates = data.pop("updates", None) or []
+        return data, iter(updates), True
+    encoded = chain([first] if first is not None else [], lines)
+    return read_match_header(path), (json.loads(line) for _, line in encoded), False
+
+
+def reprocess_match_file(path: Path, dry_run: bool = False, force: bool = False) -> Dict[str, Any]:
+    """
+    Пересчитывает один файл матча и переписывает его в текущем формате.
+    
+    Args:
+        path: Путь к файлу матча
+        dry_run: Только сравнить результат с сохраненным, не переписывая файл
+        force: Пересчитать, даже если документ уже обработан текущей версией
+    
+    Returns:
+        Результат: status (reprocessed, skipped, error), reason, старый ли формат,
+        размеры, число обновлений, число измененных обновлений по полям и
+        подпись переписанного файла (размер, время изменения)
+    """
+    result = {"path": str(path), "status": "skipped", "reason": None, "legacy": False,
+              "bytes_before": 0, "bytes_after": 0, "updates": 0, "changed_updates": 0,
+              "changed_fields": {}, "signature": None}
+    tmp_path = tmp_path_for(path)
+    try:
+        stat = path.stat()
+        result["bytes_before"] = stat.st_size
+        if journal_path_for(path).exists():
+            # Матч пишет сервер (или ждет восстановления журнала)
+            result["reason"] = "journal"
+            return result
+        
+        header, updates, result["legacy"] = _open_document(path)
+        if (not force and header.get("processor_version") == PROCESSOR_VERSION
+                and header.get("format_version") == STORAGE_FORMAT_VERSION):
+            result["reason"] = "current"
+            return result
+        
+        field_counts: Dict[str, int] = result["changed_fields"]
+        keys = []
+        players: Dict[str, Dict[str, Any]] = {}
+        analytics = MatchAnalytics()
+        
+        def analyze(state: Any) -> None:
+            """Учитывает состояние в аналитике матча (только пересчитанные по raw_data)."""
+            if isinstance(state, dict) and "raw_data" in state:
+                analytics.update(state)
+        
+        def reprocessed() -> Iterator[bytes]:
+            """
+            Пересчитанные обновления по одному, без загрузки матча в память.
+            
+            Аналитика считается по тем же снимкам, что видела сессия: начальное
+            состояние, обновления и финальное состояние. Заголовок документа
+            сериализуется после обновлений (write_match_document), поэтому
+            пересчитанная аналитика попадает в него.
+            """
+            analyze(header.get("initial_state"))
+            previous = None
+            for update in updates:
+                data = update.get("data")
+                processed = reprocess_state(data, previous)
+                if isinstance(processed, dict) and "raw_data" in processed:
+                    previous = processed
+                changed = changed_fields(data, processed)
+                if changed:
+                    result["changed_updates"] += 1
+                    for field in changed:
+                        field_counts[field] = field_counts.get(field, 0) + 1
+                update["data"] = processed
+                result["updates"] += 1
+                analyze(processed)
+                if not dry_run:
+                    keys.append(index_key(update))
+                    merge_players(players, state_players(processed) if isinstance(processed, dict) else [])
+                yield encode_update(update)
+            analyze(header.get("final_state"))
+            header["analytics"] = analytics.state
+        
+        for key in _STATE_KEYS:
+            if key in header:
+                header[key] = reprocess_state(header[key])
+        header["format_version"] = STORAGE_FORMAT_VERSION
+        header["processor_version"] = PROCESSOR_VERSION
+        header["reprocessed_at"] = datetime.now().isoformat()
+        
+        if dry_run:
+            # Размер документа без записи: обновления, разделители и заголовок
+            encoded_size = count = 0
+            for encoded in reprocessed():
+                encoded_size += len(encoded)
+                count += 1
+            header_size = len(json.dumps(header, ensure_ascii=False).encode('utf-8'))
+            result["bytes_after"] = (len(b'{"updates": [') + encoded_size
+                                     + max(2 * count - 1, 0) + header_size + 4)
+        else:
+            offsets: List[Tuple[int, int]] = []
+            _, result["bytes_after"] = write_match_document(path, header, reprocessed(), offsets=offsets)
+            # Время изменения сохраняем, чтобы возраст матча (для сжатия) не сбрасывался
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            # Положение обновлений изменилось: индекс и сводку пишем заново, колонки перестроятся при чтении
+            write_index(path, keys, offsets)
+            merge_players(players, state_players(header.get("current_state") or {}))
+            write_summary(path, build_summary(path, header, players))
+            drop_columns(path)
+            new_stat = path.stat()
+            result["signature"] = [new_stat.st_size, new_stat.st_mtime_ns]
+        result["status"] = "reprocessed"
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        result["status"] = "error"
+        result["reason"] = str(e)
+    return result
+
+
+def _reprocess_worker(args: Tuple[str, bool, bool]) -> Dict[str, Any]:
+    """Обертка reprocess_match_file для пула процессов."""
+    path, dry_run, force = args
+    return reprocess_match_file(Path(path), dry_run, force)
+
+
+def load_checkpoint(checkpoint_path: Path) -> Dict[str, Tuple[int, int]]:
+    """
+    Читает контрольную точку прерванного запуска.
+    
+    Returns:
+        Путь к файлу -> (размер, время изменения) после обработки; записи
+        другой версии обработки не учитываются
+    """
+    done = {}
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла не дописаться при остановке
+                    continue
+                if entry.get("processor_version") == PROCESSOR_VERSION:
+                    done[entry["path"]] = tuple(entry["signature"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def pending_files(paths: Iterable[Path], done: Dict[str, Tuple[int, int]]) -> List[Path]:
+    """Оставляет файлы, которые не обработаны или изменились после обработки."""
+    pending = []
+    for path in paths:
+        signature = done.get(str(path))
+        if signature is not None:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if signature == (stat.st_size, stat.st_mtime_ns):
+                continue
+        pending.append(path)
+    return pending
+
+
+def record_checkpoint(f, result: Dict[str, Any]) -> None:
+    """Дописывает переписанный файл в открытую контрольную точку."""
+    entry = {"path": result["path"], "signature": result["signature"], "processor_version": PROCESSOR_VERSION}
+    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    f.flush()
+
+
+def reprocess_matches(paths: Iterable[Path], dry_run: bool = False, force: bool = False,
+                      jobs: Optional[int] = None) -> Iterable[Dict[str, Any]]:
+    """
+    Пересчитывает файлы матчей параллельно в нескольких процессах.
+    
+    Args:
+        paths: Файлы матчей
+        dry_run: Только сравнить результат с сохраненным
+        force: Пересчитать и документы текущей версии
+        jobs: Количество процессов (по умолчанию - число CPU)
+    
+    Yields:
+        Результат reprocess_match_file для каждого файла по мере готовности
+    """
+    tasks = [(str(path), dry_run, force) for path in paths]
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _reprocess_worker(task)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_reprocess_worker, tasks, chunksize=1)
@@ -0,0 +1,343 @@
+"""Индекс для быстрого перехода к состоянию матча на заданный момент.
+
+Рядом с файлом матча хранится бинарный индекс ``<имя>.idx``: для каждого
+обновления - время (timestamp), ``map.game_time`` и положение обновления в
+файле (смещение и длина). Каждое обновление - полный снимок состояния, поэтому
+для ответа на вопрос "что было на 25:00" достаточно бинарного поиска по
+индексу и одного чтения из файла матча, независимо от длины матча.
+
+Индекс дописывается FileManager при каждом сохранении документа. В заголовке
+индекса записаны inode, размер и время изменения документа, для которого он
+построен; если документ изменился без индекса (падение между записью документа
+и индекса, сжатие, восстановление журнала), индекс перестраивается по файлу.
+"""
+import json
+import os
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+INDEX_SUFFIX = ".idx"
+
+_MAGIC = b"GSIIDX1\0"
+# magic, inode документа, размер документа, mtime_ns документа, число записей
+_HEADER = struct.Struct("<8sQQqQ")
+# timestamp (секунды), game_time, смещение обновления, длина обновления
+_RECORD = struct.Struct("<diQI")
+# game_time отсутствует (меню, демо)
+NO_GAME_TIME = -2 ** 31
+
+_DOCUMENT_FIRST_LINE = b'{"updates": [\n'
+
+
+class LegacyFormatError(ValueError):
+    """Файл матча записан в старом формате, для которого индекс не строится."""
+
+
+class IndexOutdatedError(ValueError):
+    """Файл матча изменился, пока по нему строился индекс."""
+
+
+def index_path_for(match_path: Path) -> Path:
+    """Возвращает путь к индексу для файла матча."""
+    return match_path.with_suffix(INDEX_SUFFIX)
+
+
+def index_key(update: Dict[str, Any]) -> Tuple[float, int]:
+    """
+    Возвращает ключи индекса для обновления.
+    
+    Args:
+        update: Обновление ({"timestamp": ..., "data": ...})
+    
+    Returns:
+        (timestamp в секундах, game_time или NO_GAME_TIME)
+    """
+    try:
+        timestamp = datetime.fromisoformat(update["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        timestamp = 0.0
+    data = update.get("data")
+    map_data = data.get("map") if isinstance(data, dict) else None
+    game_time = map_data.get("game_time") if isinstance(map_data, dict) else None
+    if not isinstance(game_time, (int, float)):
+        game_time = NO_GAME_TIME
+    return timestamp, int(game_time)
+
+
+def _document_signature(stat: os.stat_result) -> Tuple[int, int, int]:
+    """inode, размер и время изменения документа, для которого построен индекс."""
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def write_index(match_path: Path, keys: Sequence[Tuple[float, int]], offsets: Sequence[Tuple[int, int]],
+                start: int = 0) -> None:
+    """
+    Записывает записи индекса для обновлений, начиная с номера start.
+    
+    Вызывается сразу после записи документа: заголовок индекса
+    связывается с текущей версией файла матча.
+    
+    Args:
+        match_path: Путь к файлу матча
+        keys: Ключи новых обновлений (см. index_key)
+        offsets: (смещение, длина) новых обновлений в документе
+        start: Сколько записей в индексе уже есть (0 - переписать индекс)
+    """
+    index_path = index_path_for(match_path)
+    records = b"".join(
+        _RECORD.pack(timestamp, game_time, offset, length)
+        for (timestamp, game_time), (offset, length) in zip(keys, offsets)
+    )
+    count = start + len(offsets)
+    header = _HEADER.pack(_MAGIC, *_document_signature(match_path.stat()), count)
+    
+    if start and index_path.exists():
+        # Уже записанные записи не меняются, поэтому читатели, открывшие
+        # индекс раньше, видят согласованную с их заголовком часть
+        with open(index_path, 'r+b') as f:
+            f.seek(_HEADER.size + start * _RECORD.size)
+            f.write(records)
+            f.truncate()
+            f.seek(0)
+            f.write(header)
+    else:
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        tmp_path.write_bytes(header + records)
+        os.replace(tmp_path, index_path)
+
+
+def _scan_updates(f, name: str) -> Iterator[Tuple[int, bytes]]:
+    """Перебирает обновления открытого документа (см. scan_document)."""
+    first_line = f.readline()
+    if first_line != _DOCUMENT_FIRST_LINE:
+        raise LegacyFormatError(f"Файл {name} в старом формате, индекс не поддерживается")
+    offset = len(first_line)
+    for line in f:
+        if line.startswith(b']'):
+            return
+        encoded = line.rstrip(b'\n')
+        if encoded.endswith(b','):
+            encoded = encoded[:-1]
+        yield offset, encoded
+        offset += len(line)
+
+
+def scan_document(match_path: Path) -> Iterator[Tuple[int, bytes]]:
+    """
+    Перебирает обновления документа текущего формата без разбора всего JSON.
+    
+    Каждое обновление в документе записано отдельной строкой (JSON не содержит
+    переводов строк внутри значений).
+    
+    Yields:
+        (смещение, сериализованное обновление)
+    
+    Raises:
+        LegacyFormatError: Если документ записан в старом формате (json.dump с отступами)
+    """
+    with open(match_path, 'rb') as f:
+        yield from _scan_updates(f, str(match_path))
+
+
+def build_index(match_path: Path, persist: bool = True) -> bytes:
+    """
+    Строит индекс по файлу матча.
+    
+    Args:
+        match_path: Путь к файлу матча
+        persist: Сохранить индекс на диск (атомарно)
+    
+    Returns:
+        Содержимое индекса
+    """
+    records = []
+    with open(match_path, 'rb') as f:
+        signature = _document_signature(os.fstat(f.fileno()))
+        for offset, encoded in _scan_updates(f, str(match_path)):
+            timestamp, game_time = index_key(json.loads(encoded))
+            records.append(_RECORD.pack(timestamp, game_time, offset, len(encoded)))
+    content = _HEADER.pack(_MAGIC, *signature, len(records)) + b"".join(records)
+    if persist:
+        index_path = index_path_for(match_path)
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, index_path)
+    return content
+
+
+def _read_at(f, offset: int, length: int) -> bytes:
+    """Читает байты по смещению, не сдвигая позицию файла там, где есть os.pread."""
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), length, offset)
+    f.seek(offset)
+    return f.read(length)
+
+
+class MatchIndex:
+    """
+    Индекс одного матча для чтения состояния на заданный момент.
+    
+    Держит открытыми документ и индекс, для которых проверено соответствие,
+    поэтому смещения остаются верными, даже если сервер тем временем заменит
+    файл матча. Записи индекса читаются по одной (бинарный поиск делает
+    O(log n) чтений по 24 байта). Незаписанные в документ обновления (журнал
+    идущего матча) не видны.
+    """
+    
+    def __init__(self, match_path: Path):
+        """
+        Args:
+            match_path: Путь к файлу матча
+        
+        Raises:
+            LegacyFormatError: Если файл матча в старом формате
+        """
+        self.match_path = match_path
+        self._doc = open(match_path, 'rb')
+        self._index = None
+        self._content: Optional[bytes] = None
+        try:
+            self.signature = _document_signature(os.fstat(self._doc.fileno()))
+            self.count = self._open_index(self.signature)
+        except Exception:
+            self.close()
+            raise
+    
+    def _open_index(self, signature: Tuple[int, int, int]) -> int:
+        """Открывает индекс, если он построен для этого документа, иначе перестраивает его."""
+        try:
+            self._index = open(index_path_for(self.match_path), 'rb')
+            header = _read_at(self._index, 0, _HEADER.size)
+            if len(header) == _HEADER.size:
+                magic, inode, size, mtime_ns, count = _HEADER.unpack(header)
+                if magic == _MAGIC and (inode, size, mtime_ns) == signature:
+                    return count
+            self._index.close()
+            self._index = None
+        except OSError:
+            self._index = None
+        
+        # Пока матч пишется, индекс ведет сервер - перестраиваем только в памяти
+        persist = not self.match_path.with_suffix(".journal").exists()
+        content = build_index(self.match_path, persist=persist)
+        _, inode, size, mtime_ns, count = _HEADER.unpack_from(content)
+        if (inode, size, mtime_ns) != signature:
+            raise IndexOutdatedError(f"Файл {self.match_path} изменился во время построения индекса")
+        self._content = content
+        return count
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def _record(self, position: int) -> Tuple[float, int, int, int]:
+        """Читает запись индекса по номеру."""
+        offset = _HEADER.size + position * _RECORD.size
+        if self._content is not None:
+            return _RECORD.unpack_from(self._content, offset)
+        return _RECORD.unpack(_read_at(self._index, offset, _RECORD.size))
+    
+    def entry(self, position: int) -> Tuple[float, Optional[int], int, int]:
+        """
+        Возвращает запись индекса.
+        
+        Returns:
+            (timestamp, game_time или None, смещение, длина)
+        """
+        timestamp, game_time, offset, length = self._record(position)
+        return timestamp, (None if game_time == NO_GAME_TIME else game_time), offset, length
+    
+    def _bisect(self, field: int, value: float) -> int:
+        """Номер последней записи со значением поля <= value (или -1)."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[field] <= value:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+    
+    def find_game_time(self, game_time: float) -> int:
+        """
+        Ищет последнее обновление с map.game_time <= game_time.
+        
+        Returns:
+            Номер обновления или -1, если такого нет
+        """
+        return self._bisect(1, game_time)
+    
+    def find_timestamp(self, timestamp: float) -> int:
+        """
+        Ищет последнее обновление, полученное не позже timestamp.
+        
+        Args:
+            timestamp: Время в секундах (Unix time)
+        
+        Returns:
+            Номер обновления или -1, если такого нет
+        """
+        return self._bisect(0, timestamp)
+    
+    def read_raw(self, position: int) -> bytes:
+        """Читает сериализованное обновление по номеру."""
+        _, _, offset, length = self._record(position)
+        return _read_at(self._doc, offset, length)
+    
+    def read(self, position: int) -> Dict[str, Any]:
+        """Читает обновление по номеру."""
+        return json.loads(self.read_raw(position))
+    
+    def close(self) -> None:
+        """Закрывает индекс и документ."""
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        self._doc.close()
+    
+    def __enter__(self) -> "MatchIndex":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def state_at(match_path: Path, game_time: Optional[float] = None,
+             timestamp: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает обновление матча на заданный момент.
+    
+    Для файлов старого формата индекс не строится, и обновление ищется
+    полным чтением файла.
+    
+    Args:
+        match_path: Путь к файлу матча
+        game_time: Игровое время (map.game_time, в секундах)
+        timestamp: Время получения (Unix time), если game_time не задан
+    
+    Returns:
+        Последнее обновление не позже заданного момента или None
+    """
+    if game_time is None and timestamp is None:
+        raise ValueError("Нужно указать game_time или timestamp")
+    try:
+        with MatchIndex(match_path) as index:
+            if game_time is not None:
+                position = index.find_game_time(game_time)
+            else:
+                position = index.find_timestamp(timestamp)
+            return index.read(position) if position >= 0 else None
+    except LegacyFormatError:
+        pass
+    
+    with open(match_path, 'r', encoding='utf-8') as f:
+        updates: List[Dict[str, Any]] = json.load(f).get("updates") or []
+    field, value = (1, game_time) if game_time is not None else (0, timestamp)
+    found = None
+    for update in updates:
+        if index_key(update)[field] <= value:
+            found = update
+        else:
+            break
+    return found
@@ -1,14 +1,43 @@
 """HTTP сервер для приема данных от Dota 2 Game State Integration."""
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional, Set
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, HTTPException, Header, Query
+from fastapi.responses import JSONResponse, Response, PlainTextResponse, StreamingResponse
 import uvicorn
 
-from config import SERVER_HOST, SERVER_PORT, LOG_LEVEL, LOG_FORMAT
-from data_processor import DataProcessor
-from file_manager import FileManager
+from config import (
+    SERVER_HOST, SERVER_PORT, LOG_LEVEL, LOG_FORMAT, ADMIN_TOKEN,
+    SERVER_WORKERS, SESSION_LEASE_SECONDS, SESSION_IDLE_SECONDS, INBOX_POLL_SECONDS, FSYNC_INTERVAL_SECONDS,
+    DEDUP_IDENTICAL_PAYLOADS
+)
+from account_links import normalize_steamid
+from catalog import MatchCatalog
+from file_manager import FileManager, read_match_header
+from ingest_queue import IngestQueue
+from match_query import QueryError, find_match_file, iter_series_json, parse_fields, query_series
+from match_summary import match_players, read_match_summary
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    GSI_ACTIVE_SESSIONS,
+    GSI_INGEST_SECONDS,
+    GSI_MATCH_FILE_BYTES,
+    GSI_PAYLOADS_DROPPED,
+    GSI_PAYLOADS_DUPLICATE,
+    GSI_QUEUE_DEPTH,
+    GSI_REQUESTS,
+    render_metrics,
+)
+from player_history import PlayerHistory
+from player_profiles import enrich_players
+from profiling import ProfilerBusyError, profiler, stage_timings
+from seek_index import LegacyFormatError, state_at
+from session import MatchSession
+from session_store import SessionStore
 from utils import get_dotabuff_url, get_opendota_url
 
 # Настройка логирования
@@ -21,23 +50,282 @@ logger = logging.getLogger(__name__)
 # Инициализация приложения
 app = FastAPI(title="Dota 2 GSI Server", version="1.0.0")
 
-# Инициализация компонентов
-data_processor = DataProcessor()
-file_manager = FileManager()
+# Сессии клиентов GSI и их очереди приема
+sessions: Dict[str, MatchSession] = {}
+ingest_queues: Dict[str, IngestQueue] = {}
+
+# Общее для процессов сервера состояние сессий и сессии, которыми владеет этот процесс
+session_store: Optional[SessionStore] = None
+owned_sessions: Set[str] = set()
+
+# Каталог сохраненных матчей для /matches
+match_catalog: Optional[MatchCatalog] = None
+# История игроков по завершенным матчам для /players/{steamid}/history
+player_history: Optional[PlayerHistory] = None
+# Аренда прохода по архиву для истории игроков (в таблице сессий): проход
+# выполняет один процесс, остальные воркеры его пропускают
+_BACKFILL_LEASE_KEY = "lease:player-history-backfill"
+
+# Дочерние метрики получаем заранее, чтобы не искать их на каждом запросе
+_REQUESTS_OK = GSI_REQUESTS.labels("ok")
+_REQUESTS_EMPTY = GSI_REQUESTS.labels("empty")
+_REQUESTS_DUPLICATE = GSI_REQUESTS.labels("duplicate")
+_REQUESTS_ERROR = GSI_REQUESTS.labels("error")
+_REQUESTS_FORWARDED = GSI_REQUESTS.labels("forwarded")
+_DROPPED_EMPTY = GSI_PAYLOADS_DROPPED.labels("empty")
+_DROPPED_ERROR = GSI_PAYLOADS_DROPPED.labels("error")
+
+GSI_ACTIVE_SESSIONS.set_function(lambda: sum(1 for s in list(sessions.values()) if s.match_in_progress))
+GSI_MATCH_FILE_BYTES.set_function(lambda: sum(s.file_manager.current_file_size() for s in list(sessions.values())))
+GSI_QUEUE_DEPTH.set_function(lambda: sum(q.depth for q in list(ingest_queues.values())))
+
+
+def get_session_key(request: Request, raw_data: Dict[str, Any]) -> str:
+    """
+    Определяет, от какого клиента GSI пришли данные.
+    
+    Если в конфиге GSI задан блок auth с token, сессия определяется по токену,
+    иначе - по адресу клиента (с учетом прокси Railway).
+    """
+    auth = raw_data.get("auth")
+    if isinstance(auth, dict) and auth.get("token"):
+        token_hash = hashlib.sha1(str(auth["token"]).encode("utf-8")).hexdigest()[:12]
+        return f"token-{token_hash}"
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "default"
+
+
+def get_session(key: str) -> MatchSession:
+    """Возвращает сессию клиента, создавая ее при первом обращении."""
+    session = sessions.get(key)
+    if session is None:
+        session = sessions[key] = MatchSession(key, store=session_store, catalog=match_catalog,
+                                               history=player_history)
+    return session
+
+
+def get_ingest_queue(key: str) -> IngestQueue:
+    """Возвращает очередь приема сессии, создавая ее при первом обращении."""
+    queue = ingest_queues.get(key)
+    if queue is None:
+        queue = ingest_queues[key] = IngestQueue(key, get_session(key).handle)
+    return queue
+
+
+def enqueue_payload(key: str, body: bytes, raw_data: Dict[str, Any]) -> bool:
+    """
+    Ставит payload в очередь сессии, которой владеет этот процесс.
+    
+    Returns:
+        False, если payload совпадает с предыдущим и был пропущен (DEDUP_IDENTICAL_PAYLOADS)
+    """
+    queue = get_ingest_queue(key)
+    # Dota 2 повторяет неизменившееся состояние (heartbeat): повторы считаем,
+    # а пропускаем, только если это включено в конфиге
+    if body == queue.last_body:
+        GSI_PAYLOADS_DUPLICATE.inc()
+        if DEDUP_IDENTICAL_PAYLOADS:
+            _REQUESTS_DUPLICATE.inc()
+            return False
+    queue.last_body = body
+    queue.put(raw_data)
+    _REQUESTS_OK.inc()
+    return True
+
+
+async def acquire_session(key: str) -> bool:
+    """
+    Проверяет, что этот процесс владеет сессией, и пытается получить владение.
+    
+    Returns:
+        False, если сессией владеет другой процесс
+    """
+    if key in owned_sessions:
+        return True
+    state = await asyncio.to_thread(session_store.claim, key)
+    if state is None:
+        return False
+    if key not in owned_sessions:
+        owned_sessions.add(key)
+        get_session(key).adopt(state)
+        if state.get("previous_owner") not in (None, session_store.owner):
+            logger.info(f"[{key}] Сессия перешла к процессу {session_store.owner} от {state['previous_owner']}")
+    return True
+
+
+def sync_journals() -> None:
+    """Сбрасывает на диск журналы матчей, в которые давно не было записей (см. FileManager.sync_journal)."""
+    for session in list(sessions.values()):
+        try:
+            session.file_manager.sync_journal()
+        except Exception as e:
+            logger.error(f"[{session.key}] Не удалось сбросить журнал на диск: {e}")
+
+
+async def manage_owned_sessions():
+    """
+    Фоновая задача: забирает пересланные этому процессу payload,
+    сбрасывает журналы на диск, продлевает аренду сессий и освобождает простаивающие.
+    """
+    last_renew = 0.0
+    last_sync = 0.0
+    while True:
+        await asyncio.sleep(INBOX_POLL_SECONDS)
+        try:
+            if owned_sessions:
+                forwarded = await asyncio.to_thread(session_store.take_forwarded, list(owned_sessions))
+                for key, body in forwarded:
+                    enqueue_payload(key, body, json.loads(body))
+            
+            now = time.monotonic()
+            if owned_sessions and now - last_sync >= FSYNC_INTERVAL_SECONDS:
+                last_sync = now
+                await asyncio.to_thread(sync_journals)
+            
+            if now - last_renew < SESSION_LEASE_SECONDS / 3:
+                continue
+            last_renew = now
+            
+            # Освобождаем сессии, от которых давно нет данных. Между проверкой
+            # и освобождением нет await, чтобы новый payload не попал в закрываемую сессию
+            for key in list(owned_sessions):
+                session = sessions.get(key)
+                queue = ingest_queues.get(key)
+                if not session or time.time() - session.last_activity <= SESSION_IDLE_SECONDS:
+                    continue
+                if queue is not None and queue.busy:
+                    continue
+                session.close()
+                session_store.release(key)
+                owned_sessions.discard(key)
+                logger.info(f"[{key}] Сессия освобождена после простоя")
+            
+            renewed = await asyncio.to_thread(session_store.renew, list(owned_sessions))
+            for key in owned_sessions - renewed:
+                # Аренду забрал другой процесс (этот процесс не продлевал ее слишком долго)
+                logger.warning(f"[{key}] Потеряно владение сессией, файл матча больше не пишем")
+                owned_sessions.discard(key)
+                if key in sessions:
+                    sessions[key].file_manager.detach()
+        except Exception as e:
+            logger.error(f"Ошибка при обслуживании сессий: {e}", exc_info=True)
+
+
+@app.on_event("startup")
+async def restore_after_restart():
+    """Воспроизводит журналы после аварийного завершения и продолжает незавершенные матчи."""
+    global session_store, match_catalog, player_history
+    session_store = SessionStore()
+    match_catalog = MatchCatalog()
+    player_history = PlayerHistory()
+    
+    # Журнал восстанавливает только процесс, получивший владение сессией матча:
+    # воркеры, запущенные одновременно, и живые владельцы других сессий его не трогают
+    claimed = set()
+    
+    def claim_session(key: str) -> bool:
+        if key not in claimed:
+            if session_store.claim(key) is None:
+                return False
+            claimed.add(key)
+        return True
+    
+    recovered = FileManager().recover_journals(claim=claim_session)
+    restored = set()
+    for match_file in sorted(recovered, key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            match_data = read_match_header(match_file)
+        except Exception as e:
+            logger.error(f"Не удалось прочитать восстановленный матч {match_file}: {e}")
+            continue
+        key = match_data.get("session_key") or "default"
+        # Для каждой сессии продолжаем только самый свежий незавершенный матч
+        if "match_end" not in match_data and key not in restored:
+            owned_sessions.add(key)
+            get_session(key).restore(match_file)
+            restored.add(key)
+    # Сессии, полученные только ради восстановления журналов, отпускаем
+    for key in claimed - restored:
+        session_store.release(key)
+    
+    asyncio.get_running_loop().create_task(manage_owned_sessions())
+    asyncio.get_running_loop().create_task(sync_catalog())
+    if not player_history.backfilled():
+        asyncio.get_running_loop().create_task(backfill_player_history())
+
+
+async def sync_catalog():
+    """Фоновая задача: сверяет каталог матчей с папкой output после запуска."""
+    try:
+        result = await asyncio.to_thread(match_catalog.sync)
+        logger.info(f"Каталог матчей обновлен: {result['updated']} добавлено/изменено, {result['removed']} удалено")
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении каталога матчей: {e}", exc_info=True)
+
+
+async def backfill_player_history():
+    """
+    Фоновая задача: один раз добавляет в историю игроков матчи, завершенные до ее появления.
+    
+    Проход выполняет только процесс, получивший аренду _BACKFILL_LEASE_KEY, и
+    продлевает ее, пока проход идет: при SERVER_WORKERS > 1 архив читает один
+    пул процессов, а не пул в каждом воркере.
+    """
+    try:
+        if await asyncio.to_thread(session_store.claim, _BACKFILL_LEASE_KEY) is None:
+            logger.info("История игроков: проход по архиву выполняет другой процесс")
+            return
+        try:
+            # Другой процесс мог закончить проход, пока этот запускался
+            if await asyncio.to_thread(player_history.backfilled):
+                return
+            started = time.perf_counter()
+            backfill = asyncio.ensure_future(asyncio.to_thread(player_history.backfill))
+            while not backfill.done():
+                await asyncio.wait({backfill}, timeout=SESSION_LEASE_SECONDS / 3)
+                if not backfill.done() and not await asyncio.to_thread(session_store.renew, [_BACKFILL_LEASE_KEY]):
+                    logger.warning("История игроков: аренда прохода по архиву потеряна")
+            result = backfill.result()
+            logger.info(f"История игроков: просмотрено {result['scanned']} файлов, добавлено {result['added']} матчей "
+                        f"за {time.perf_counter() - started:.1f} с")
+        finally:
+            await asyncio.to_thread(session_store.release, _BACKFILL_LEASE_KEY)
+    except Exception as e:
+        logger.error(f"Ошибка при построении истории игроков: {e}", exc_info=True)
 
-# Состояние сервера
-match_in_progress = False
-current_match_id = None
+
+@app.on_event("shutdown")
+async def flush_on_shutdown():
+    """Дожидается обработки очередей и сохраняет накопленные обновления при остановке сервера."""
+    for queue in list(ingest_queues.values()):
+        await queue.join()
+    for session in list(sessions.values()):
+        session.close()
+    for key in list(owned_sessions):
+        session_store.release(key)
+    session_store.close()
+    match_catalog.close()
+    player_history.close()
+
+
+def _latest_session() -> Optional[MatchSession]:
+    """Возвращает сессию, от которой данные приходили последними."""
+    if not sessions:
+        return None
+    return max(sessions.values(), key=lambda s: s.last_activity)
 
 
 @app.get("/")
 async def root():
     """Корневой endpoint для проверки работы сервера."""
+    latest = _latest_session()
     return {
         "status": "running",
         "service": "Dota 2 GSI Server",
-        "match_in_progress": match_in_progress,
-        "current_match_id": current_match_id
+        "match_in_progress": any(s.match_in_progress for s in sessions.values()),
+        "current_match_id": latest.current_match_id if latest else None
     }
 
 
@@ -47,101 +335,52 @@ async def receive_gsi_data(request: Request):
     Основной endpoint для приема данных от Dota 2 GSI.
     
     Dota 2 отправляет POST запросы с JSON данными о текущем состоянии игры.
+    Данные разбираются и ставятся в очередь сессии, ответ возвращается сразу,
+    не дожидаясь обработки и записи на диск.
     """
-    global match_in_progress
-    
+    started = time.perf_counter()
     try:
         # Получаем данные из запроса
-        raw_data: Dict[str, Any] = await request.json()
+        body = await request.body()
+        
+        with stage_timings.time("parse"):
+            raw_data: Dict[str, Any] = json.loads(body) if body else {}
         
         if not raw_data:
             logger.warning("Получен пустой запрос")
+            _REQUESTS_EMPTY.inc()
+            _DROPPED_EMPTY.inc()
+            GSI_INGEST_SECONDS.observe(time.perf_counter() - started)
             return JSONResponse(
                 status_code=200,
                 content={"status": "ok", "message": "Empty data received"}
             )
         
-        # Логируем получение данных
-        logger.debug(f"Получены данные GSI: {raw_data.get('map', {}).get('game_state', 'Unknown')}")
-        
-        # Обрабатываем данные
-        processed_data = data_processor.process_gsi_data(raw_data)
-        
-        # Получаем ID текущего матча
-        map_data = raw_data.get("map", {})
-        incoming_match_id = map_data.get("matchid")
-        if incoming_match_id:
-            incoming_match_id = str(incoming_match_id)
+        key = get_session_key(request, raw_data)
         
-        # Проверяем состояние матча
-        is_started = data_processor.is_match_started(raw_data)
-        is_ended = data_processor.is_match_ended(raw_data)
+        if await acquire_session(key):
+            queued = enqueue_payload(key, body, raw_data)
+        else:
+            # Сессией владеет другой процесс - пересылаем ему
+            await asyncio.to_thread(session_store.forward, key, body)
+            _REQUESTS_FORWARDED.inc()
+            queued = True
         
-        global current_match_id
-        
-        # Определяем, это новый матч или продолжение текущего
-        if incoming_match_id:
-            incoming_match_id = str(incoming_match_id)
-            # Если match_id изменился, это новый матч
-            if incoming_match_id != current_match_id:
-                # Завершаем предыдущий матч, если он был
-                if match_in_progress and file_manager.current_file_path:
-                    file_manager.finalize_match(processed_data)
-                # Начинаем новый матч
-                current_match_id = incoming_match_id
-                match_in_progress = True
-                file_manager.start_new_match(processed_data)
-                logger.info(f"Матч начался (ID: {current_match_id})")
-                
-                # Выводим аккаунты игроков
-                players = data_processor.extract_players_accounts(raw_data, incoming_match_id)
-                if players:
-                    logger.info(f"Игроки в матче ({len(players)}):")
-                    for player in players:
-                        logger.info(f"  - {player.get('name', 'Unknown')} (SteamID: {player.get('steamid')}, Team: {player.get('team')})")
-            else:
-                # Продолжение текущего матча - сохраняем данные
-                if not file_manager.current_file_path:
-                    # Файл не создан, создаем
-                    file_manager.start_new_match(processed_data)
-                else:
-                    # Обновляем существующий файл
-                    file_manager.save_match_data(processed_data)
-        elif is_started and not is_ended:
-            # Матч идет, но match_id нет (может быть демо или локальная игра)
-            if not match_in_progress or not file_manager.current_file_path:
-                # Создаем новый файл
-                match_in_progress = True
-                file_manager.start_new_match(processed_data)
-                logger.info("Матч начался (без ID)")
-                
-                # Выводим аккаунты игроков (без match_id для OpenDota)
-                players = data_processor.extract_players_accounts(raw_data, None)
-                if players:
-                    logger.info(f"Игроки в матче ({len(players)}):")
-                    for player in players:
-                        logger.info(f"  - {player.get('name', 'Unknown')} (SteamID: {player.get('steamid')}, Team: {player.get('team')})")
-            else:
-                # Обновляем существующий файл
-                file_manager.save_match_data(processed_data)
-        
-        # Если матч завершен
-        if is_ended and match_in_progress:
-            if file_manager.current_file_path:
-                file_manager.finalize_match(processed_data)
-            match_in_progress = False
-            current_match_id = None
-            file_manager.current_file_path = None
-            logger.info("Матч завершен")
+        elapsed = time.perf_counter() - started
+        GSI_INGEST_SECONDS.observe(elapsed)
+        stage_timings.record("total", elapsed)
         
         # Возвращаем успешный ответ
         return JSONResponse(
             status_code=200,
-            content={"status": "ok", "processed": True}
+            content={"status": "ok", "queued": queued}
         )
-        
+    
     except Exception as e:
         logger.error(f"Ошибка при обработке данных GSI: {e}", exc_info=True)
+        _REQUESTS_ERROR.inc()
+        _DROPPED_ERROR.inc()
+        GSI_INGEST_SECONDS.observe(time.perf_counter() - started)
         # Все равно возвращаем 200, чтобы Dota 2 не повторяла запросы
         return JSONResponse(
             status_code=200,
@@ -154,34 +393,77 @@ async def health_check():
     """Health check endpoint."""
     return {
         "status": "healthy",
-        "match_in_progress": match_in_progress
+        "match_in_progress": any(s.match_in_progress for s in sessions.values()),
+        "sessions": {
+            key: {
+                "match_in_progress": session.match_in_progress,
+                "current_match_id": session.current_match_id,
+                "owned": key in owned_sessions,
+                "queue": ingest_queues[key].stats() if key in ingest_queues else None,
+                "persist": session.persist_filter.stats()
+            }
+            for key, session in sessions.items()
+        }
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики сервера в текстовом формате Prometheus."""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+def _check_admin_token(token: Optional[str]) -> None:
+    """Проверяет токен администратора из заголовка X-Admin-Token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled (ADMIN_TOKEN not set)")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/stages")
+async def admin_stages(x_admin_token: Optional[str] = Header(None)):
+    """Статистика длительности этапов обработки по последним запросам."""
+    _check_admin_token(x_admin_token)
+    return {
+        "status": "ok",
+        "stages": stage_timings.snapshot(),
+        "profiler_running": profiler.running
     }
 
 
+@app.post("/admin/profile")
+async def admin_profile(seconds: float = 10.0, x_admin_token: Optional[str] = Header(None)):
+    """
+    Запускает сэмплирующий профилировщик на заданное время.
+    
+    Возвращает стеки в формате collapsed stacks для построения flamegraph.
+    Прием GSI данных во время профилирования продолжается.
+    """
+    _check_admin_token(x_admin_token)
+    try:
+        stacks = await asyncio.to_thread(profiler.profile, seconds)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        content=stacks,
+        headers={"Content-Disposition": 'attachment; filename="gsi_profile.collapsed"'}
+    )
+
+
 @app.get("/players")
-async def get_players():
+async def get_players(profiles: bool = Query(False, description="Добавить профили OpenDota (ранг, винрейт, герои)")):
     """
     Endpoint для получения аккаунтов игроков из последнего файла матча.
     """
     def get_latest_match_file():
-        """Находит последний файл матча."""
-        output_dir = file_manager.output_dir
-        
-        if not output_dir.exists():
-            return None
-        
-        # Ищем последний файл по датам
-        date_dirs = sorted([d for d in output_dir.iterdir() if d.is_dir()], reverse=True)
-        
-        for date_dir in date_dirs:
-            match_files = sorted(date_dir.glob("match_*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-            if match_files:
-                return match_files[0]
-        
-        return None
+        """Находит последний матч по каталогу (один запрос по индексу, папка output не обходится)."""
+        match_file = match_catalog.latest()
+        # Каталог сверяется с папкой при запуске: файл мог быть удален позже
+        return match_file if match_file is not None and match_file.exists() else None
     
     # Получаем последний файл матча
-    match_file = get_latest_match_file()
+    match_file = await asyncio.to_thread(get_latest_match_file)
     
     if not match_file:
         return {
@@ -190,21 +472,12 @@ async def get_players():
         }
     
     try:
-        import json
-        with open(match_file, 'r', encoding='utf-8') as f:
-            match_data = json.load(f)
-        
-        # Извлекаем аккаунты из последнего состояния
-        current_state = match_data.get("current_state", match_data.get("initial_state", {}))
-        raw_data = current_state.get("raw_data", {})
-        
-        # Если нет raw_data, пробуем использовать сам current_state
-        if not raw_data:
-            raw_data = current_state
-        
-        # Получаем match_id для запроса к OpenDota
-        match_id = match_data.get("match_id")
-        players = data_processor.extract_players_accounts(raw_data, match_id)
+        # Сводка матча не зависит от его длины, документ целиком не читаем
+        summary = await asyncio.to_thread(read_match_summary, match_file)
+        players = await asyncio.to_thread(match_players, summary)
+        if profiles:
+            # Профили всех игроков загружаются параллельно и кэшируются (см. player_profiles)
+            players = await asyncio.to_thread(enrich_players, players)
         
         # Добавляем ссылки на Dotabuff и OpenDota для каждого игрока
         players_with_links = []
@@ -221,7 +494,7 @@ async def get_players():
             "players": players_with_links,
             "count": len(players_with_links),
             "match_file": str(match_file.name),
-            "match_id": match_data.get("match_id")
+            "match_id": summary.get("match_id")
         }
     except Exception as e:
         logger.error(f"Ошибка при получении данных игроков: {e}")
@@ -231,11 +504,170 @@ async def get_players():
         }
 
 
+@app.get("/players/{steamid}/history")
+async def get_player_history(steamid: str, limit: int = 10):
+    """
+    История игрока по всем сохраненным завершенным матчам: игры, победы,
+    средние K/D/A и GPM/XPM, самые частые герои, союзники и противники.
+    Читаются только готовые агрегаты (см. player_history), файлы матчей не открываются.
+    """
+    # Можно передать и account_id (ID из Dotabuff/OpenDota)
+    history = await asyncio.to_thread(player_history.history, normalize_steamid(steamid) or steamid, limit)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Игрок {steamid} не найден в завершенных матчах")
+    return {"status": "ok", "history": history}
+
+
+def _find_match(match_id: str):
+    """Находит файл матча по ID (в каталоге, иначе в папке output) или возвращает 404."""
+    try:
+        match_file = match_catalog.find(match_id) if match_catalog else None
+        if match_file is None or not match_file.exists():
+            match_file = find_match_file(match_id)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if match_file is None:
+        raise HTTPException(status_code=404, detail=f"Матч {match_id} не найден")
+    return match_file
+
+
+@app.get("/matches")
+async def list_matches(limit: int = 20, cursor: Optional[str] = None,
+                       date_from: Optional[str] = None, date_to: Optional[str] = None,
+                       steamid: Optional[str] = None, hero: Optional[str] = None,
+                       result: Optional[str] = None, min_duration: Optional[int] = None):
+    """
+    Список сохраненных матчей от новых к старым со сводкой (герой, K/D/A, длительность, победитель).
+    
+    Фильтры: date_from/date_to (YYYY-MM-DD), steamid, hero, result (win/loss),
+    min_duration (секунды). Следующая страница - по next_cursor из ответа.
+    """
+    try:
+        page = await asyncio.to_thread(
+            match_catalog.list_matches, limit, cursor, date_from, date_to, steamid, hero, result, min_duration
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": "ok",
+        "count": len(page["matches"]),
+        "matches": page["matches"],
+        "next_cursor": page["next_cursor"]
+    }
+
+
+@app.get("/matches/{match_id}/state")
+async def get_match_state(match_id: str, game_time: float):
+    """
+    Состояние матча на заданное игровое время (map.game_time, в секундах).
+    
+    Возвращает последнее сохраненное обновление не позже game_time.
+    """
+    match_file = _find_match(match_id)
+    update = await asyncio.to_thread(state_at, match_file, game_time)
+    if update is None:
+        raise HTTPException(status_code=404, detail=f"Нет данных на game_time={game_time}")
+    data = update.get("data") or {}
+    return {
+        "status": "ok",
+        "match_id": match_id,
+        "game_time": (data.get("map") or {}).get("game_time"),
+        "timestamp": update.get("timestamp"),
+        "state": data
+    }
+
+
+@app.get("/matches/{match_id}/series")
+async def get_match_series(match_id: str, fields: str, step: Optional[float] = None,
+                           start: Optional[float] = Query(None, alias="from"),
+                           end: Optional[float] = Query(None, alias="to")):
+    """
+    Значения числовых полей по игровому времени (для графиков).
+    
+    fields - поля через запятую (например, player.gold,hero.health), from/to -
+    диапазон game_time, step - шаг прореживания в секундах. Ответ отдается
+    потоком: {"fields": ["game_time", ...], "points": [[game_time, ...], ...]}.
+    """
+    match_file = _find_match(match_id)
+    try:
+        field_list = parse_fields(fields)
+        series = await asyncio.to_thread(query_series, match_file, field_list, start, end, step)
+    except LegacyFormatError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(iter_series_json(match_id, field_list, series, step), media_type="application/json")
+
+
+@app.get("/live/recent")
+async def get_recent_window(fields: str, window: float = 60.0, session: Optional[str] = None):
+    """
+    Агрегаты числовых полей за последние window секунд идущей сессии (для виджетов оверлея).
+    
+    Считается по кольцевому буферу последних тиков в памяти, без чтения файла
+    матча. fields - поля через запятую из RECENT_TICKS_FIELDS, session - ключ
+    сессии (по умолчанию - последняя активная). Для каждого поля: first, last,
+    delta, min, max и rate (изменение в секунду).
+    """
+    if window <= 0:
+        raise HTTPException(status_code=400, detail="window должен быть положительным")
+    target = sessions.get(session) if session else _latest_session()
+    if target is None:
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+    try:
+        result = target.recent_ticks.aggregate(parse_fields(fields), window)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Поля не хранятся в буфере: {e.args[0]}")
+    return {
+        "status": "ok",
+        "session": target.key,
+        "match_id": target.current_match_id,
+        "window": window,
+        **result
+    }
+
+
+@app.get("/live/analytics")
+async def get_live_analytics(session: Optional[str] = None):
+    """
+    Производная аналитика идущего матча сессии (net worth, золото и опыт по
+    минутам, участие в убийствах, смерти на 10 минут, время в смерти, выкупы,
+    потерянное золото). Обновляется на каждом тике, файл матча не читается.
+    session - ключ сессии (по умолчанию - последняя активная).
+    """
+    target = sessions.get(session) if session else _latest_session()
+    if target is None:
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+    # Состояние меняет поток обработчика очереди: json.dumps сериализует его целиком, не отпуская GIL
+    content = json.dumps({
+        "status": "ok",
+        "session": target.key,
+        "match_id": target.current_match_id,
+        "match_in_progress": target.match_in_progress,
+        "analytics": target.analytics.state
+    }, ensure_ascii=False)
+    return Response(content=content, media_type="application/json")
+
+
 def main():
     """Запуск сервера."""
     logger.info(f"Запуск Dota 2 GSI сервера на {SERVER_HOST}:{SERVER_PORT}")
     logger.info("Ожидание данных от Dota 2...")
     
+    if SERVER_WORKERS > 1:
+        # Для нескольких воркеров uvicorn требует строку импорта приложения
+        logger.info(f"Количество процессов: {SERVER_WORKERS}")
+        uvicorn.run(
+            "server:app",
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            log_level=LOG_LEVEL.lower(),
+            workers=SERVER_WORKERS
+        )
+        return
+    
     uvicorn.run(
         app,
         host=SERVER_HOST,
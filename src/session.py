@@ -0,0 +1,290 @@
+"""Состояние матча для одного клиента GSI (одного экземпляра Dota 2)."""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from catalog import MatchCatalog
+from config import OUTPUT_DIR
+from data_processor import DataProcessor
+from file_manager import FileManager
+from match_analytics import MatchAnalytics, empty_state
+from metrics import GSI_PAYLOADS_DROPPED
+from persist_filter import PersistFilter
+from player_history import PlayerHistory
+from profiling import stage_timings
+from recent_ticks import RecentTicks
+from session_store import SessionStore
+from storage import LeaseLostError, MatchFinishedError
+
+logger = logging.getLogger(__name__)
+
+_DROPPED_LATE = GSI_PAYLOADS_DROPPED.labels("late")
+
+
+class MatchSession:
+    """
+    Отслеживает текущий матч одного клиента и сохраняет его данные.
+    
+    Методы сессии вызываются последовательно одним обработчиком очереди,
+    поэтому внутри сессии синхронизация не нужна.
+    """
+    
+    def __init__(self, key: str, output_dir: Path = OUTPUT_DIR, store: Optional[SessionStore] = None,
+                 catalog: Optional[MatchCatalog] = None, history: Optional[PlayerHistory] = None):
+        """
+        Args:
+            key: Идентификатор клиента (см. server.get_session_key)
+            output_dir: Директория для сохранения файлов
+            store: Общее хранилище сессий (если сервер запущен в нескольких процессах)
+            catalog: Каталог матчей, который обновляется при сохранении
+            history: История игроков, которая пополняется при завершении матча
+        """
+        self.key = key
+        self.store = store
+        self._saved_state = None
+        self._pending_state: Optional[Dict[str, Any]] = None
+        # Предыдущий обработанный снимок: неизменившиеся секции берутся из него
+        self._last_processed: Optional[Dict[str, Any]] = None
+        self.data_processor = DataProcessor()
+        # Хранилище матчей (интерфейс storage.MatchStorage); документ пишется, только пока
+        # у процесса есть аренда сессии
+        lease = (lambda: store.holds(key)) if store is not None else None
+        self.file_manager = FileManager(output_dir, session_key=key, catalog=catalog, history=history,
+                                        lease=lease)
+        # Аренда истекла во время записи: payload не обрабатываются, пока владение не получено снова
+        self.lease_lost = False
+        # Какие снимки записывать в файл матча (остальные только обновляют текущее состояние)
+        self.persist_filter = PersistFilter()
+        # Последние тики в памяти для оконных запросов (память выделяется сразу)
+        self.recent_ticks = RecentTicks()
+        # Производная аналитика текущего матча (хранится вместе с матчем)
+        self.analytics = MatchAnalytics()
+        self.match_in_progress = False
+        self.current_match_id: Optional[str] = None
+        # Последний завершенный матч: после конца матча Dota 2 еще присылает его payload (экран результатов)
+        self.finished_match_id: Optional[str] = None
+        # provider.timestamp последнего обработанного payload: payload, пересланные
+        # другим процессом, приходят позже принятых напрямую, и более старые отбрасываются
+        self._last_timestamp: Optional[float] = None
+        self.last_activity = time.time()
+    
+    def handle(self, raw_data: Dict[str, Any]) -> None:
+        """
+        Обрабатывает один payload от GSI: определяет начало и конец матча и сохраняет данные.
+        
+        Args:
+            raw_data: Сырые данные от Dota 2 GSI
+        """
+        self.last_activity = time.time()
+        try:
+            if self._pending_state is not None:
+                state, self._pending_state = self._pending_state, None
+                self._adopt(state)
+            if self.lease_lost:
+                return
+            self._handle(raw_data)
+        except LeaseLostError as e:
+            # Матч продолжит новый владелец сессии по журналу, этот процесс его больше не пишет
+            logger.warning(f"[{self.key}] {e}")
+            self.lease_lost = True
+            self.file_manager.detach()
+        except MatchFinishedError as e:
+            # Payload завершенного матча (например, после смены владельца сессии,
+            # когда finished_match_id этого процесса еще не знает о нем)
+            logger.warning(f"[{self.key}] {e}")
+            self.finished_match_id = e.match_id
+            self.match_in_progress = False
+            self.current_match_id = None
+            self.file_manager.current_file_path = None
+            self._save_state()
+    
+    def _is_late(self, raw_data: Dict[str, Any]) -> bool:
+        """
+        Проверяет, что payload старше уже обработанного (по provider.timestamp).
+        
+        Payload, пересланные другим процессом, попадают в очередь при опросе
+        входящих, то есть позже принятых этим процессом напрямую. Устаревший
+        тик откатил бы состояние матча (а тик после конца матча открыл бы его
+        заново), поэтому он не обрабатывается.
+        """
+        provider = raw_data.get("provider")
+        timestamp = provider.get("timestamp") if isinstance(provider, dict) else None
+        if not isinstance(timestamp, (int, float)) or isinstance(timestamp, bool):
+            return False
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            return True
+        self._last_timestamp = timestamp
+        return False
+    
+    def _handle(self, raw_data: Dict[str, Any]) -> None:
+        """Обработка payload (см. handle)."""
+        data_processor = self.data_processor
+        file_manager = self.file_manager
+        
+        if self._is_late(raw_data):
+            _DROPPED_LATE.inc()
+            logger.debug(f"[{self.key}] Пропущен устаревший payload (provider.timestamp меньше обработанного)")
+            return
+        
+        # Логируем получение данных
+        logger.debug(f"[{self.key}] Получены данные GSI: {raw_data.get('map', {}).get('game_state', 'Unknown')}")
+        
+        # Обрабатываем данные
+        with stage_timings.time("process"):
+            processed_data = data_processor.process_gsi_data(raw_data, self._last_processed)
+        self._last_processed = processed_data
+        
+        # Получаем ID текущего матча
+        map_data = raw_data.get("map", {})
+        incoming_match_id = map_data.get("matchid")
+        if incoming_match_id:
+            incoming_match_id = str(incoming_match_id)
+        
+        # Проверяем состояние матча
+        is_started = data_processor.is_match_started(raw_data)
+        is_ended = data_processor.is_match_ended(raw_data)
+        
+        if incoming_match_id and incoming_match_id == self.finished_match_id:
+            # Матч уже завершен и записан - его поздние payload (экран результатов или
+            # тик, пересланный с опозданием) не открывают файл заново
+            self.recent_ticks.append(processed_data)
+            return
+        
+        # Определяем, это новый матч или продолжение текущего
+        if incoming_match_id:
+            # Если match_id изменился, это новый матч
+            if incoming_match_id != self.current_match_id:
+                # Завершаем предыдущий матч, если он был
+                if self.match_in_progress and file_manager.current_file_path:
+                    file_manager.finalize_match(processed_data)
+                # Начинаем новый матч
+                self.current_match_id = incoming_match_id
+                self.match_in_progress = True
+                file_manager.start_new_match(processed_data)
+                self._attach_analytics()
+                self.persist_filter.start(processed_data)
+                self.recent_ticks.clear()
+                logger.info(f"[{self.key}] Матч начался (ID: {self.current_match_id})")
+                
+                # Выводим аккаунты игроков
+                self._log_players(raw_data, incoming_match_id)
+            else:
+                # Продолжение текущего матча - сохраняем данные
+                if not file_manager.current_file_path:
+                    # Файл не создан, создаем
+                    file_manager.start_new_match(processed_data)
+                    self._attach_analytics()
+                    self.persist_filter.start(processed_data)
+                else:
+                    # Обновляем существующий файл
+                    self._save(processed_data)
+        elif is_started and not is_ended:
+            # Матч идет, но match_id нет (может быть демо или локальная игра)
+            if not self.match_in_progress or not file_manager.current_file_path:
+                # Создаем новый файл
+                self.match_in_progress = True
+                file_manager.start_new_match(processed_data)
+                self._attach_analytics()
+                self.persist_filter.start(processed_data)
+                self.recent_ticks.clear()
+                logger.info(f"[{self.key}] Матч начался (без ID)")
+                
+                # Выводим аккаунты игроков (без match_id для OpenDota)
+                self._log_players(raw_data, None)
+            else:
+                # Обновляем существующий файл
+                self._save(processed_data)
+        
+        if self.match_in_progress:
+            self.analytics.update(processed_data)
+        
+        # Если матч завершен
+        if is_ended and self.match_in_progress:
+            if file_manager.current_file_path:
+                file_manager.finalize_match(processed_data)
+            self.match_in_progress = False
+            self.finished_match_id = self.current_match_id
+            self.current_match_id = None
+            file_manager.current_file_path = None
+            logger.info(f"[{self.key}] Матч завершен (записано снимков: {self.persist_filter.persisted}, "
+                        f"отброшено фильтром: {self.persist_filter.reduction():.0%})")
+        
+        self.recent_ticks.append(processed_data)
+        self._save_state()
+    
+    def _attach_analytics(self) -> None:
+        """Берет аналитику открытого матча из хранилища (новую или сохраненную, если матч продолжен)."""
+        self.analytics = MatchAnalytics(self.file_manager.attach_analytics(empty_state()))
+    
+    def _save(self, processed_data: Dict[str, Any]) -> None:
+        """Записывает снимок в файл матча, если он значимый, иначе только обновляет текущее состояние."""
+        if self.persist_filter.should_persist(processed_data):
+            self.file_manager.save_match_data(processed_data)
+        else:
+            self.file_manager.update_current_state(processed_data)
+    
+    def adopt(self, state: Dict[str, Any]) -> None:
+        """
+        Запоминает состояние сессии, полученное вместе с владением.
+        
+        Состояние применяется перед обработкой следующего payload в потоке
+        воркера очереди, чтобы чтение файла матча не блокировало event loop.
+        
+        Args:
+            state: Состояние из SessionStore.claim
+        """
+        self._pending_state = state
+        self.lease_lost = False
+    
+    def _adopt(self, state: Dict[str, Any]) -> None:
+        """Продолжает матч, который до этого вел другой процесс."""
+        match_file = state.get("match_file")
+        if state.get("match_in_progress") and match_file:
+            path = Path(match_file)
+            if path != self.file_manager.current_file_path and path.exists():
+                self.restore(path)
+            return
+        if self.file_manager.current_file_path is None:
+            self.match_in_progress = False
+            self.current_match_id = None
+    
+    def _save_state(self) -> None:
+        """Сохраняет состояние сессии в общее хранилище, если оно изменилось."""
+        if self.store is None:
+            return
+        state = (self.current_match_id, self.file_manager.current_file_path, self.match_in_progress)
+        if state != self._saved_state:
+            self.store.save_state(self.key, *state)
+            self._saved_state = state
+    
+    def _log_players(self, raw_data: Dict[str, Any], match_id: Optional[str]) -> None:
+        """Выводит в лог аккаунты игроков матча."""
+        players = self.data_processor.extract_players_accounts(raw_data, match_id)
+        if players:
+            logger.info(f"Игроки в матче ({len(players)}):")
+            for player in players:
+                logger.info(f"  - {player.get('name', 'Unknown')} (SteamID: {player.get('steamid')}, Team: {player.get('team')})")
+    
+    def restore(self, match_file: Path) -> None:
+        """
+        Продолжает незавершенный матч после перезапуска сервера.
+        
+        Args:
+            match_file: Путь к файлу матча
+        """
+        self.file_manager.resume_match(match_file)
+        self._attach_analytics()
+        self.current_match_id = self.file_manager.current_match_id
+        self.match_in_progress = True
+        logger.info(f"[{self.key}] Восстановлен незавершенный матч (ID: {self.current_match_id})")
+        self._save_state()
+    
+    def close(self) -> None:
+        """Сохраняет накопленные обновления и закрывает файл матча (при остановке или передаче сессии)."""
+        self._save_state()
+        try:
+            self.file_manager.close()
+        except LeaseLostError as e:
+            logger.warning(f"[{self.key}] {e}")
+            self.file_manager.detach()
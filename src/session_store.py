@@ -0,0 +1,235 @@
+"""Общее для всех процессов сервера хранилище сессий GSI (SQLite WAL).
+
+Позволяет запускать несколько воркеров (``uvicorn --workers N``) или несколько
+экземпляров сервера на одной машине. У каждой сессии есть владелец - процесс,
+который единственный пишет файл ее матча. Владение оформляется арендой
+(lease), которую владелец периодически продлевает. Payload, пришедший в
+процесс, не владеющий сессией, пересылается владельцу через таблицу inbox.
+Если владелец перестал продлевать аренду (процесс упал), сессию забирает
+первый процесс, получивший для нее данные, и продолжает матч с диска.
+"""
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config import SESSION_LEASE_SECONDS, STATE_DB_PATH
+from db import connect
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    key TEXT PRIMARY KEY,
+    match_id TEXT,
+    match_file TEXT,
+    match_in_progress INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS inbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inbox_key ON inbox (key, id);
+"""
+
+
+def worker_id() -> str:
+    """Возвращает идентификатор текущего процесса сервера."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SessionStore:
+    """Состояние сессий и владение их файлами, общее для процессов сервера."""
+    
+    def __init__(self, db_path: Path = STATE_DB_PATH, lease_seconds: float = SESSION_LEASE_SECONDS):
+        """
+        Args:
+            db_path: Путь к базе SQLite
+            lease_seconds: Длительность аренды сессии
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.owner = worker_id()
+        self._conn = connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # Срок аренды сессий этого процесса по последнему claim/renew
+        self._leases: Dict[str, float] = {}
+    
+    def claim(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Пытается стать владельцем сессии.
+        
+        Владение удается получить, если сессия новая, свободна, ее аренда
+        истекла или она уже принадлежит текущему процессу.
+        
+        Args:
+            key: Идентификатор сессии
+        
+        Returns:
+            Сохраненное состояние сессии при успехе или None, если сессией
+            владеет другой живой процесс
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT * FROM sessions WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO sessions (key, owner, lease_until, updated_at) VALUES (?, ?, ?, ?)",
+                        (key, self.owner, now + self.lease_seconds, now)
+                    )
+                    state = {"key": key, "match_id": None, "match_file": None, "match_in_progress": False}
+                elif row["owner"] in (None, self.owner) or row["lease_until"] < now:
+                    self._conn.execute(
+                        "UPDATE sessions SET owner = ?, lease_until = ? WHERE key = ?",
+                        (self.owner, now + self.lease_seconds, key)
+                    )
+                    state = {
+                        "key": key,
+                        "match_id": row["match_id"],
+                        "match_file": row["match_file"],
+                        "match_in_progress": bool(row["match_in_progress"]),
+                        "previous_owner": row["owner"]
+                    }
+                else:
+                    state = None
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if state is not None:
+                self._leases[key] = now + self.lease_seconds
+        return state
+    
+    def renew(self, keys: Iterable[str]) -> Set[str]:
+        """
+        Продлевает аренду сессий текущего процесса.
+        
+        Args:
+            keys: Сессии, которыми процесс считает, что владеет
+        
+        Returns:
+            Сессии, аренду которых удалось продлить
+        """
+        keys = list(keys)
+        if not keys:
+            return set()
+        until = time.time() + self.lease_seconds
+        renewed = set()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key in keys:
+                    cursor = self._conn.execute(
+                        "UPDATE sessions SET lease_until = ? WHERE key = ? AND owner = ?",
+                        (until, key, self.owner)
+                    )
+                    if cursor.rowcount:
+                        renewed.add(key)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            for key in keys:
+                if key in renewed:
+                    self._leases[key] = until
+                else:
+                    self._leases.pop(key, None)
+        return renewed
+    
+    def holds(self, key: str, margin: Optional[float] = None) -> bool:
+        """
+        Проверяет, что аренда сессии у этого процесса еще действует (без запроса к базе).
+        
+        Другой процесс может забрать сессию только после окончания аренды, а ее
+        срок известен по последнему claim/renew этого процесса.
+        
+        Args:
+            key: Идентификатор сессии
+            margin: Сколько секунд аренды должно оставаться (запас на саму
+                запись), по умолчанию - пятая часть аренды
+        """
+        if margin is None:
+            margin = self.lease_seconds / 5
+        with self._lock:
+            return self._leases.get(key, 0.0) - margin > time.time()
+    
+    def release(self, key: str) -> None:
+        """Отказывается от владения сессией (после сохранения ее данных)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET owner = NULL, lease_until = 0 WHERE key = ? AND owner = ?",
+                (key, self.owner)
+            )
+            self._leases.pop(key, None)
+    
+    def save_state(self, key: str, match_id: Optional[str], match_file: Optional[Path], match_in_progress: bool) -> None:
+        """
+        Сохраняет состояние сессии, чтобы его мог продолжить другой процесс.
+        
+        Args:
+            key: Идентификатор сессии
+            match_id: ID текущего матча
+            match_file: Путь к файлу текущего матча
+            match_in_progress: Идет ли матч
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET match_id = ?, match_file = ?, match_in_progress = ?, updated_at = ? "
+                "WHERE key = ? AND owner = ?",
+                (match_id, str(match_file) if match_file else None, int(match_in_progress), time.time(), key, self.owner)
+            )
+    
+    def forward(self, key: str, payload: bytes) -> None:
+        """
+        Передает payload процессу-владельцу сессии.
+        
+        Args:
+            key: Идентификатор сессии
+            payload: Тело запроса GSI
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO inbox (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, payload, time.time())
+            )
+    
+    def take_forwarded(self, keys: Iterable[str]) -> List[Tuple[str, bytes]]:
+        """
+        Забирает пересланные payload для сессий текущего процесса в порядке поступления.
+        
+        Args:
+            keys: Сессии, которыми владеет процесс
+        
+        Returns:
+            Список (сессия, тело запроса)
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT id, key, payload FROM inbox WHERE key IN ({placeholders}) ORDER BY id", keys
+                ).fetchall()
+                if rows:
+                    self._conn.execute(f"DELETE FROM inbox WHERE id <= ? AND key IN ({placeholders})", [rows[-1]["id"]] + keys)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(row["key"], bytes(row["payload"])) for row in rows]
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
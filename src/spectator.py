@@ -0,0 +1,113 @@
+"""Обработка данных GSI в режиме наблюдателя (spectator/observer).
+
+В режиме наблюдателя секции player, hero, items и abilities содержат данные
+всех десяти игроков, вложенные по командам и слотам::
+
+    "player": {"team2": {"player0": {...}, ..., "player4": {...}},
+               "team3": {"player5": {...}, ..., "player9": {...}}}
+
+Отдельной копии этих данных в обработанном снимке нет: они уже лежат в
+raw_data каждого обновления. Данные по слотам (0-4 Radiant, 5-9 Dire)
+получают при чтении - by_slot для одной секции или slot_players для
+словаря на каждого игрока.
+"""
+from typing import Any, Dict, List, Optional
+
+PLAYER_SLOTS = 10
+
+# team2 - Radiant (слоты 0-4), team3 - Dire (слоты 5-9)
+_TEAM_KEYS = ("team2", "team3")
+TEAMS = ["radiant"] * 5 + ["dire"] * 5
+_SLOT_INDEX = {f"player{slot}": slot for slot in range(PLAYER_SLOTS)}
+
+PLAYER_FIELDS = (
+    "steamid", "accountid", "name", "kills", "deaths", "assists", "last_hits", "denies", "kill_streak",
+    "gold", "gold_reliable", "gold_unreliable", "gpm", "xpm", "net_worth", "hero_damage",
+    "wards_placed", "wards_destroyed", "runes_activated", "camps_stacked"
+)
+HERO_FIELDS = (
+    "id", "name", "level", "xp", "alive", "respawn_seconds", "buyback_cost", "buyback_cooldown",
+    "health", "max_health", "mana", "max_mana", "xpos", "ypos", "smoked", "aghanims_scepter", "aghanims_shard"
+)
+ITEM_SLOTS = tuple(
+    [f"slot{i}" for i in range(9)] + [f"stash{i}" for i in range(6)] + ["teleport0", "neutral0"]
+)
+
+
+def is_spectator_payload(raw_data: Dict[str, Any]) -> bool:
+    """Проверяет, что payload получен в режиме наблюдателя (данные игроков по командам)."""
+    player = raw_data.get("player")
+    return isinstance(player, dict) and ("team2" in player or "team3" in player)
+
+
+def by_slot(section: Any) -> List[Optional[Dict[str, Any]]]:
+    """
+    Раскладывает секцию режима наблюдателя по слотам игроков.
+    
+    Args:
+        section: Секция вида {"team2": {"player0": {...}}, "team3": {...}}
+    
+    Returns:
+        Список из 10 словарей (None для отсутствующих слотов)
+    """
+    slots: List[Optional[Dict[str, Any]]] = [None] * PLAYER_SLOTS
+    if not isinstance(section, dict):
+        return slots
+    for team_key in _TEAM_KEYS:
+        team = section.get(team_key)
+        if not isinstance(team, dict):
+            continue
+        for player_key, data in team.items():
+            slot = _SLOT_INDEX.get(player_key)
+            if slot is not None and isinstance(data, dict):
+                slots[slot] = data
+    return slots
+
+
+def slot_players(raw_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Данные всех игроков по слотам: словарь на каждого игрока.
+    
+    Args:
+        raw_data: Сырые данные GSI в режиме наблюдателя
+    
+    Returns:
+        Список из 10 словарей: team, поля PLAYER_FIELDS, hero (поля HERO_FIELDS)
+        и items (слот предмета -> имя, None для пустого слота)
+    """
+    players = []
+    sections = zip(by_slot(raw_data.get("player")), by_slot(raw_data.get("hero")), by_slot(raw_data.get("items")))
+    for slot, (player, hero, items) in enumerate(sections):
+        player = player or {}
+        hero = hero or {}
+        items = items or {}
+        entry = {field: player.get(field) for field in PLAYER_FIELDS}
+        entry["team"] = TEAMS[slot]
+        entry["hero"] = {field: hero.get(field) for field in HERO_FIELDS}
+        entry["items"] = {}
+        for item_slot in ITEM_SLOTS:
+            name = (items.get(item_slot) or {}).get("name")
+            entry["items"][item_slot] = None if name == "empty" else name
+        players.append(entry)
+    return players
+
+
+def spectator_players(raw_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Возвращает игроков матча в режиме наблюдателя.
+    
+    Returns:
+        Список словарей (steamid, name, team) в порядке слотов
+    """
+    players = []
+    for slot, data in enumerate(by_slot(raw_data.get("player"))):
+        if data is None:
+            continue
+        steamid = data.get("steamid")
+        if steamid:
+            players.append({
+                "steamid": str(steamid),
+                "name": data.get("name") or "Unknown",
+                "team": TEAMS[slot]
+            })
+    return players
@@ -0,0 +1,133 @@
+"""Интерфейс хранилища матчей сессии и ошибки записи.
+
+MatchSession работает с хранилищем только через методы MatchStorage.
+Единственная реализация - FileManager (документ JSON на матч с журналом,
+индексом и сводкой рядом с файлом): каталог, сводки, история игроков, бот,
+сжатие и выгрузка читают именно эти документы.
+"""
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+class LeaseLostError(RuntimeError):
+    """Процесс больше не владеет сессией: писать ее матч нельзя."""
+
+
+class MatchFinishedError(RuntimeError):
+    """Матч уже завершен (в файле есть match_end): продолжать его запись нельзя."""
+    
+    def __init__(self, match_id: Optional[str], path: Path):
+        super().__init__(f"Матч {match_id} уже завершен ({path}), запись не продолжается")
+        self.match_id = match_id
+        self.path = path
+
+
+class MatchStorage(ABC):
+    """
+    Хранилище матчей одной сессии.
+    
+    Запись идет из одного потока (обработчик очереди сессии). Открытый матч
+    описывают current_match_id и current_file_path - файл, в котором хранится
+    матч (документ матча или база); None, если матч не открыт.
+    """
+    
+    current_match_id: Optional[str] = None
+    current_file_path: Optional[Path] = None
+    
+    @abstractmethod
+    def start_new_match(self, match_data: Dict[str, Any]) -> Path:
+        """
+        Начинает матч (или продолжает незавершенный матч с тем же match_id).
+        
+        Args:
+            match_data: Начальные данные матча
+        
+        Returns:
+            Путь к файлу, в котором хранится матч
+        
+        Raises:
+            MatchFinishedError: Если матч с этим match_id уже завершен
+        """
+    
+    @abstractmethod
+    def save_match_data(self, data: Dict[str, Any]) -> None:
+        """Добавляет обновление в текущий матч."""
+    
+    @abstractmethod
+    def update_current_state(self, data: Dict[str, Any]) -> None:
+        """Обновляет текущее состояние матча, не добавляя обновление."""
+    
+    @abstractmethod
+    def flush(self) -> None:
+        """Записывает накопленные обновления."""
+    
+    @abstractmethod
+    def finalize_match(self, final_data: Dict[str, Any]) -> None:
+        """Завершает матч с финальными данными."""
+    
+    @abstractmethod
+    def resume_match(self, file_path: Path) -> None:
+        """
+        Продолжает незавершенный матч из файла (после перезапуска или смены владельца).
+        
+        Raises:
+            MatchFinishedError: Если матч в файле уже завершен
+        """
+    
+    @abstractmethod
+    def close(self) -> None:
+        """Сохраняет накопленные обновления и закрывает матч, не завершая его."""
+    
+    @abstractmethod
+    def detach(self) -> None:
+        """Перестает писать текущий матч (его продолжит другой процесс)."""
+    
+    @abstractmethod
+    def sync_journal(self) -> None:
+        """
+        Сбрасывает на диск записанные, но еще не сохраненные надежно обновления.
+        
+        Вызывается по таймеру из другого потока.
+        """
+    
+    @abstractmethod
+    def recover_journals(self, skip: Optional[set] = None,
+                         claim: Optional[Callable[[str], bool]] = None) -> List[Path]:
+        """Восстанавливает данные, не записанные из-за аварийной остановки."""
+    
+    @abstractmethod
+    def current_file_size(self) -> int:
+        """Размер данных текущего матча в байтах (0, если матч не идет)."""
+    
+    @abstractmethod
+    def attach_analytics(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Привязывает состояние аналитики (match_analytics) к открытому матчу.
+        
+        Хранилище сохраняет этот объект вместе с текущим состоянием матча, а
+        агрегатор меняет его на месте.
+        
+        Args:
+            state: Состояние аналитики нового матча
+        
+        Returns:
+            Сохраненное состояние, если матч продолжен, иначе state
+        """
+    
+    @abstractmethod
+    def state_at(self, match_id: str, game_time: float) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает последнее записанное обновление матча не позже game_time.
+        
+        Returns:
+            {"timestamp": ..., "data": ...} или None
+        """
+    
+    @abstractmethod
+    def updates_between(self, match_id: str, start: float, end: float) -> List[Dict[str, Any]]:
+        """Возвращает записанные обновления матча с game_time в диапазоне [start, end]."""
+    
+    @abstractmethod
+    def match_ids_for_steamid(self, steamid: str) -> List[str]:
+        """Возвращает ID матчей игрока, от новых к старым."""
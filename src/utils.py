@@ -1,8 +1,15 @@
 """Утилиты для работы с данными Dota 2."""
 from typing import Optional, List, Dict, Any
-import urllib.request
+import time
 import json
 
+from config import OPENDOTA_API_URL
+from metrics import OPENDOTA_REQUEST_SECONDS, OPENDOTA_FAILURES
+from profiling import stage_timings
+
+_OPENDOTA_MATCH_SECONDS = OPENDOTA_REQUEST_SECONDS.labels("matches")
+_OPENDOTA_MATCH_FAILURES = OPENDOTA_FAILURES.labels("matches")
+
 
 def get_dotabuff_url(steamid: str) -> Optional[str]:
     """
@@ -67,11 +74,17 @@ def get_players_from_opendota(match_id: str) -> Optional[List[Dict[str, Any]]]:
     Returns:
         Список игроков с информацией (steamid, name, team) или None при ошибке
     """
+    started = time.perf_counter()
     try:
-        url = f"https://api.opendota.com/api/matches/{match_id}"
+        url = f"{OPENDOTA_API_URL}/matches/{match_id}"
         
+        # urllib.request тяжелый (http.client, ssl, email) - импортируем при первом запросе
+        import urllib.request
         with urllib.request.urlopen(url, timeout=5) as response:
             data = json.loads(response.read().decode('utf-8'))
+            elapsed = time.perf_counter() - started
+            _OPENDOTA_MATCH_SECONDS.observe(elapsed)
+            stage_timings.record("opendota", elapsed)
             
             players = []
             
@@ -93,6 +106,10 @@ def get_players_from_opendota(match_id: str) -> Optional[List[Dict[str, Any]]]:
             return players if players else None
             
     except Exception as e:
+        elapsed = time.perf_counter() - started
+        _OPENDOTA_MATCH_SECONDS.observe(elapsed)
+        stage_timings.record("opendota", elapsed)
+        _OPENDOTA_MATCH_FAILURES.inc()
         print(f"Ошибка при получении данных из OpenDota: {e}")
         return None
 
@@ -114,3 +131,19 @@ def account_id_to_steamid64(account_id: int) -> Optional[str]:
     steamid64 = account_id + 76561197960265728
     return str(steamid64)
 
+
+def steamid64_to_account_id(steamid: str) -> Optional[int]:
+    """
+    Конвертирует SteamID64 в account_id (32-битный ID, который использует OpenDota).
+    
+    Args:
+        steamid: SteamID64 игрока
+    
+    Returns:
+        Account ID или None, если SteamID невалидный
+    """
+    steamid = str(steamid or "").strip()
+    if not steamid.isdigit():
+        return None
+    account_id = int(steamid) - 76561197960265728
+    return account_id if 0 < account_id < 2 ** 32 else None
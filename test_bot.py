@@ -1,11 +1,10 @@
 """Скрипт для тестирования Discord бота локально."""
 import sys
-import json
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from data_processor import DataProcessor
+from match_summary import read_match_summary
 from utils import get_dotabuff_url
 
 def test_bot_functionality():
@@ -41,18 +40,8 @@ def test_bot_functionality():
     
     # Загружаем данные
     try:
-        with open(match_file, 'r', encoding='utf-8') as f:
-            match_data = json.load(f)
-        
-        # Извлекаем игроков
-        current_state = match_data.get("current_state", match_data.get("initial_state", {}))
-        raw_data = current_state.get("raw_data", {})
-        
-        if not raw_data:
-            raw_data = current_state
-        
-        processor = DataProcessor()
-        players = processor.extract_players_accounts(raw_data)
+        # Извлекаем игроков (из сводки матча, документ целиком не читается)
+        players = read_match_summary(match_file).get("players") or []
         
         if not players:
             print("❌ Игроки не найдены в данных матча")
@@ -89,7 +78,7 @@ def test_bot_functionality():
         print("3. В Discord используйте команду: !match")
         
         return True
-        
+    
     except Exception as e:
         print(f"❌ Ошибка при тестировании: {e}")
         import traceback
@@ -5,17 +5,18 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, Optional
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.patches import Rectangle, FancyBboxPatch
-import matplotlib.font_manager as fm
-
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 from utils import get_dotabuff_url, get_opendota_url
 
-# Настройка шрифтов для поддержки кириллицы
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'sans-serif']
+
+def _pyplot():
+    """Импортирует matplotlib при первой отрисовке (импорт занимает сотни миллисекунд)."""
+    import matplotlib.pyplot as plt
+    
+    # Настройка шрифтов для поддержки кириллицы
+    plt.rcParams['font.family'] = 'DejaVu Sans'
+    plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'sans-serif']
+    return plt
 
 
 def load_match_data(json_path: Path) -> Dict[str, Any]:
@@ -43,6 +44,7 @@ def format_time(seconds: int) -> str:
 
 def create_match_visualization(match_data: Dict[str, Any], json_path: Optional[Path] = None, output_path: Optional[Path] = None) -> Path:
     """Создает визуализацию матча и сохраняет как изображение."""
+    plt = _pyplot()
     
     final_state = get_final_state(match_data)
     raw_data = final_state.get("raw_data", final_state)